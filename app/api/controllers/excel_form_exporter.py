@@ -8,6 +8,8 @@ from io import BytesIO
 from typing import Any, Dict, List, Optional
 import json
 
+from app.core import metrics
+
 try:
     import openpyxl
     from openpyxl.styles import (
@@ -883,6 +885,7 @@ class FormExcelExporter:
 
     # ── API pública ───────────────────────────────────────────────────────────
 
+    @metrics.timed_render("excel")
     def generate(self) -> BytesIO:
         self._write_header()
         self._write_all_fields()
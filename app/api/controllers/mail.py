@@ -23,8 +23,8 @@ from typing import List, Dict, Optional
 
 from fastapi import UploadFile
 
-from app.api.controllers.excel_form_exporter import generate_form_excel
 from app.api.controllers.pdf_form_exporter import FormPdfExporter
+from app.core import metrics
 from app.models import Response, Answer, FormAnswer, User
 from app.schemas import EmailAnswerItem
 
@@ -161,15 +161,75 @@ _API_URL = "https://api-forms-sfi.service.saferut.com"
 
 def _send_msg(msg: EmailMessage) -> bool:
     try:
-        with smtplib.SMTP_SSL(MAIL_HOST_ALT, int(MAIL_PORT_ALT)) as smtp:
+        with metrics.time_email("single"), smtplib.SMTP_SSL(MAIL_HOST_ALT, int(MAIL_PORT_ALT)) as smtp:
             smtp.login(MAIL_USERNAME_ALT, MAIL_PASSWORD_ALT)
             smtp.send_message(msg)
         return True
     except Exception as e:
+        metrics.email_failed("single")
         logger.error(f"❌ Error SMTP: {e}")
         return False
 
 
+# Reconexiones por lote: si el servidor corta más veces, el resto del lote
+# se da por fallido (no vale la pena insistir contra un SMTP caído).
+_SMTP_RECONNECTS = 3
+
+
+def _smtp_connect() -> smtplib.SMTP_SSL:
+    smtp = smtplib.SMTP_SSL(MAIL_HOST_ALT, int(MAIL_PORT_ALT))
+    try:
+        smtp.login(MAIL_USERNAME_ALT, MAIL_PASSWORD_ALT)
+    except Exception:
+        smtp.close()
+        raise
+    return smtp
+
+
+def _send_msgs(msgs: List[EmailMessage]) -> int:
+    """Como `_send_msg`, pero reutiliza la conexión para todo el lote.
+
+    Cada mensaje cuenta por separado: si el servidor rechaza uno (cualquier
+    SMTPException) ese queda como fallido y se sigue con el siguiente. Si
+    corta la conexión, el mensaje en curso queda como fallido (no se sabe si
+    salió: reenviarlo podría duplicarlo), se reconecta y se sigue con el
+    resto. Devuelve cuántos salieron.
+    """
+    if not msgs:
+        return 0
+    enviados = 0
+    pendientes = list(msgs)
+    reconexiones = 0
+    smtp = None
+    with metrics.time_email("batch"):
+        try:
+            smtp = _smtp_connect()
+            while pendientes:
+                msg = pendientes.pop(0)
+                try:
+                    smtp.send_message(msg)
+                    enviados += 1
+                except smtplib.SMTPServerDisconnected as e:
+                    logger.error(f"❌ SMTP desconectado enviando a {msg['To']}: {e}")
+                    if not pendientes or reconexiones >= _SMTP_RECONNECTS:
+                        break
+                    reconexiones += 1
+                    smtp.close()
+                    smtp = _smtp_connect()
+                except smtplib.SMTPException as e:
+                    logger.error(f"❌ Error SMTP enviando a {msg['To']}: {e}")
+        except Exception as e:
+            logger.error(f"❌ Error SMTP en lote ({enviados}/{len(msgs)} enviados): {e}")
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except Exception:
+                    smtp.close()
+    metrics.email_failed("batch", len(msgs) - enviados)
+    return enviados
+
+
 def _new_msg(subject: str, to_email: str, to_name: str = "") -> EmailMessage:
     msg = EmailMessage()
     msg["Subject"] = subject
@@ -392,6 +452,7 @@ def generate_response_excel_bytes(db, form, response_obj) -> Optional[bytes]:
         answers = _serialize_answers_for_export(answers_orm, db, form.id, fd)
         sc = _extract_style_config(fd)
 
+        from app.api.controllers.excel_form_exporter import generate_form_excel
         buf = generate_form_excel(
             form_design=fd, answers=answers, style_config=sc,
             form_title=form.title, response_id=response_obj.id,
@@ -409,41 +470,62 @@ def generate_response_excel_bytes(db, form, response_obj) -> Optional[bytes]:
 #  1. FORMULARIOS PENDIENTES (diario)
 # ═══════════════════════════════════════════════════════════════
 
-def send_email_daily_forms(user_email: str, user_name: str, forms: List[Dict]) -> bool:
-    try:
-        if not user_email or not user_name or not forms:
-            return False
+def _daily_forms_msg(user_email: str, user_name: str, forms: List[Dict]) -> EmailMessage:
+    rows = ""
+    for i, f in enumerate(forms):
+        bg = _C['bg'] if i % 2 == 0 else _C['white']
+        rows += f"""<tr style="background:{bg};">
+            <td style="padding:9px 12px;border-bottom:1px solid {_C['border']};font-size:13px;font-weight:600;">{f.get('title','Sin título')}</td>
+            <td style="padding:9px 12px;border-bottom:1px solid {_C['border']};font-size:13px;color:{_C['text_sec']};">{f.get('description','Sin descripción')}</td>
+        </tr>"""
 
-        rows = ""
-        for i, f in enumerate(forms):
-            bg = _C['bg'] if i % 2 == 0 else _C['white']
-            rows += f"""<tr style="background:{bg};">
-                <td style="padding:9px 12px;border-bottom:1px solid {_C['border']};font-size:13px;font-weight:600;">{f.get('title','Sin título')}</td>
-                <td style="padding:9px 12px;border-bottom:1px solid {_C['border']};font-size:13px;color:{_C['text_sec']};">{f.get('description','Sin descripción')}</td>
-            </tr>"""
+    hdr_s = f'padding:9px 12px;text-align:left;font-size:11px;font-weight:600;color:{_C["text_muted"]};text-transform:uppercase;letter-spacing:.5px;border-bottom:1px solid {_C["border"]};'
 
-        hdr_s = f'padding:9px 12px;text-align:left;font-size:11px;font-weight:600;color:{_C["text_muted"]};text-transform:uppercase;letter-spacing:.5px;border-bottom:1px solid {_C["border"]};'
+    body = _p(f'Estimado/a <strong>{user_name}</strong>, tiene formularios pendientes de completar:')
+    body += f"""<table width="100%" cellpadding="0" cellspacing="0" style="border:1px solid {_C['border']};border-collapse:collapse;border-radius:4px;overflow:hidden;">
+        <thead><tr style="background:{_C['bg']};">
+            <th style="{hdr_s}">Formulario</th>
+            <th style="{hdr_s}">Descripción</th>
+        </tr></thead>
+        <tbody>{rows}</tbody>
+    </table>"""
+    body += _btn(_APP_URL)
 
-        body = _p(f'Estimado/a <strong>{user_name}</strong>, tiene formularios pendientes de completar:')
-        body += f"""<table width="100%" cellpadding="0" cellspacing="0" style="border:1px solid {_C['border']};border-collapse:collapse;border-radius:4px;overflow:hidden;">
-            <thead><tr style="background:{_C['bg']};">
-                <th style="{hdr_s}">Formulario</th>
-                <th style="{hdr_s}">Descripción</th>
-            </tr></thead>
-            <tbody>{rows}</tbody>
-        </table>"""
-        body += _btn(_APP_URL)
+    html = _base_email_html("Formularios pendientes", body)
+    msg = _new_msg(f"Formularios pendientes — {datetime.now().strftime('%d/%m/%Y')}", user_email, user_name)
+    msg.set_content(f"Tiene {len(forms)} formularios pendientes. Ingrese a SafeMetrics para completarlos.")
+    msg.add_alternative(html, subtype="html")
+    return msg
 
-        html = _base_email_html("Formularios pendientes", body)
-        msg = _new_msg(f"Formularios pendientes — {datetime.now().strftime('%d/%m/%Y')}", user_email, user_name)
-        msg.set_content(f"Tiene {len(forms)} formularios pendientes. Ingrese a SafeMetrics para completarlos.")
-        msg.add_alternative(html, subtype="html")
-        return _send_msg(msg)
+
+def send_email_daily_forms(user_email: str, user_name: str, forms: List[Dict]) -> bool:
+    try:
+        if not user_email or not user_name or not forms:
+            return False
+        return _send_msg(_daily_forms_msg(user_email, user_name, forms))
     except Exception as e:
         logger.warning("Error enviando correo diario", extra={"event": "daily_mail_fail"})
         return False
 
 
+def send_email_daily_forms_batch(digests: List[Dict]) -> int:
+    """Envía varios resúmenes diarios por UNA sola conexión SMTP.
+
+    Cada digest es {"user_email", "user_name", "forms"}. Devuelve cuántos
+    salieron. Un rechazo del servidor solo cuenta para ese correo; si la
+    conexión se cae a mitad de lote se reconecta y se sigue (ver `_send_msgs`).
+    """
+    msgs = []
+    for d in digests:
+        if not d.get("user_email") or not d.get("user_name") or not d.get("forms"):
+            continue
+        try:
+            msgs.append(_daily_forms_msg(d["user_email"], d["user_name"], d["forms"]))
+        except Exception:
+            logger.warning("Error armando correo diario", extra={"event": "daily_mail_fail"})
+    return _send_msgs(msgs)
+
+
 # ═══════════════════════════════════════════════════════════════
 #  2. ADJUNTO DE RESPUESTAS
 # ═══════════════════════════════════════════════════════════════
@@ -775,7 +857,7 @@ def _generate_report_table_html(form_data) -> str:
 generate_report_table_html = _generate_report_table_html
 
 
-async def send_action_notification_email(
+def send_action_notification_email(
     action: str, recipient: str, form, current_date: str,
     pdf_bytes=None, pdf_filename=None, db=None, current_user=None,
     response_id: int = None,
@@ -10,6 +10,8 @@ import json
 import html as _html
 from urllib.parse import quote as _url_quote
 
+from app.core import metrics
+
 # ── utilidades HTML ───────────────────────────────────────────────────────────
 
 def _e(v: Any) -> str:
@@ -1210,6 +1212,7 @@ img { max-width: 100%; }
 
     # ── API pública ───────────────────────────────────────────────────────────
 
+    @metrics.timed_render("pdf")
     def generate(self) -> BytesIO:
         try:
             from weasyprint import HTML as WH
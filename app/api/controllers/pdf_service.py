@@ -5,11 +5,9 @@ import os
 import base64
 import logging
 from jinja2 import Environment
-import qrcode
 # from weasyprint import HTML, CSS
 from typing import List, Dict, Any, Optional, Union
 from urllib.parse import urljoin, urlparse
-import requests
 from pathlib import Path
 
 from app.api.schemas.form_data import FormData
@@ -28,6 +26,8 @@ class PdfGeneratorService:
         Genera un código QR para la URL dada y lo retorna como base64 string.
         """
         try:
+            import qrcode
+
             # Crear el código QR
             qr = qrcode.QRCode(
                 version=1,
@@ -124,6 +124,8 @@ class PdfGeneratorService:
             String base64 de la imagen o None si hay error
         """
         try:
+            import requests
+
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
@@ -8,6 +8,7 @@ from typing import Optional
 from fastapi import Query, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 
+from app.core import keyset
 from app.database import get_db
 from app.core.security import get_current_user
 from app.models import (
@@ -39,10 +40,16 @@ def register_audit_trail_route(router):
         form_id: Optional[int] = Query(None),
         user_id: Optional[int] = Query(None),
         response_status: Optional[str] = Query(None, alias="status"),
+        cursor: Optional[str] = Query(None),
+        include_total: Optional[bool] = Query(None),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user),
     ):
-        """Trazabilidad completa de los formatos asociados a un movimiento."""
+        """Trazabilidad completa de los formatos asociados a un movimiento.
+
+        Más recientes primero. Con `cursor` (el `pagination.next_cursor`
+        anterior) pagina sin OFFSET; el total solo se cuenta sin cursor o con
+        `include_total=true`."""
 
         movimiento = db.query(FormMovimientos).filter(
             FormMovimientos.id == movement_id,
@@ -62,7 +69,7 @@ def register_audit_trail_route(router):
         if not target_form_ids:
             return {
                 "movement_id": movement_id, "title": movimiento.title, "forms": [],
-                "pagination": {"page": 1, "page_size": page_size, "total_rows": 0, "total_pages": 0},
+                "pagination": {"page": 1, "page_size": page_size, "total_rows": 0, "total_pages": 0, "next_cursor": None},
                 "rows": [],
             }
 
@@ -111,10 +118,14 @@ def register_audit_trail_route(router):
             _dto = dt_to.replace(tzinfo=None) if dt_to.tzinfo else dt_to
             q = q.filter(Response.submitted_at <= _dto)
 
-        q = q.order_by(Response.submitted_at.desc())
-        total_rows = q.count()
-        total_pages = max(1, -(-total_rows // page_size))
-        responses = q.offset((page - 1) * page_size).limit(page_size).all()
+        total_rows = total_pages = None
+        if keyset.wants_total(include_total, cursor):
+            total_rows = q.count()
+            total_pages = max(1, -(-total_rows // page_size))
+        responses, next_cursor = keyset.keyset_page(
+            q, Response.submitted_at, Response.id, page_size,
+            lambda r: (r.submitted_at, r.id), cursor=cursor, page=page,
+        )
         response_ids = [r.id for r in responses]
 
         # Bulk queries
@@ -218,6 +229,9 @@ def register_audit_trail_route(router):
             "movement_id": movement_id,
             "title": movimiento.title,
             "forms": forms_list,
-            "pagination": {"page": page, "page_size": page_size, "total_rows": total_rows, "total_pages": total_pages},
+            "pagination": {
+                "page": page, "page_size": page_size, "total_rows": total_rows,
+                "total_pages": total_pages, "next_cursor": next_cursor,
+            },
             "rows": rows,
         }
@@ -12,8 +12,7 @@ from sqlalchemy.orm import Session, joinedload
 from app.crud import get_forms_by_approver, save_form_approvals, update_response_approval_status
 from app.database import get_db
 from app.core.security import get_current_user, require_roles
-from app.core import field_access, response_scope
-import pandas as pd
+from app.core import field_access, keyset, response_scope
 from app.models import Answer, AnswerHistory, ApprovalRequirement, ApprovalStatus, Form, FormApproval, FormApprovalFieldAccess, Question, Response, ResponseApproval, ResponseApprovalRequirement, User, UserType
 from app.schemas import ApprovalRequirementsCreateSchema, BulkUpdateFormApprovals, FormApprovalCreateSchema, FormWithApproversResponse, RequiredFormsResponse, ResponseDetailInfo, UpdateResponseApprovalRequest
 from fastapi import Form as FastAPIForm 
@@ -154,7 +153,7 @@ def _validate_attachment_mime(content_type: str | None) -> bool:
     return mime in ALLOWED_ATTACHMENT_MIME
 
 @router.put("/update-response-approval/{response_id}")
-async def update_response_approval(
+def update_response_approval(
     request: Request,
     response_id: int,
     db: Session = Depends(get_db),
@@ -226,7 +225,7 @@ async def update_response_approval(
                     size = 0
                     with open(file_path, "wb") as f:
                         while True:
-                            chunk = await file.read(8192)  # 8 KB chunks
+                            chunk = file.file.read(8192)  # 8 KB chunks
                             if not chunk:
                                 break
                             size += len(chunk)
@@ -263,7 +262,7 @@ async def update_response_approval(
         logger.info("Archivos procesados:", len(uploaded_files_info))
 
         # 3. Llamar a la función original (sin modificar)
-        updated_response_approval = await update_response_approval_status(
+        updated_response_approval = update_response_approval_status(
             response_id=response_id,
             user_id=current_user.id,
             update_data=update_data,
@@ -1091,7 +1090,7 @@ def get_approval_requirements_by_response(db: Session, response_id: int):
 
 
 @router.get("/response/{response_id}/approval-details", response_model=ResponseDetailInfo)
-async def get_response_approval_details(
+def get_response_approval_details(
     response_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -1270,7 +1269,7 @@ async def get_response_approval_details(
 
 @router.get("/response/{response_id}/approver/{approver_user_id}/required-forms", 
             response_model=RequiredFormsResponse)
-async def get_response_approver_required_forms(
+def get_response_approver_required_forms(
     response_id: int,
     approver_user_id: int,
     db: Session = Depends(get_db),
@@ -1529,7 +1528,7 @@ def get_approver_required_forms_responses(response_id: int, approver_user_id: in
     return results
 
 @router.get("/download-file-approvers/{file_name}")
-async def download_file_approvers(
+def download_file_approvers(
     file_name: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1695,7 +1694,7 @@ class ApprovalRequirementResponse(BaseModel):
 # GET - Obtener requisitos de aprobación por formulario y aprobador
 @router.get("/approval-requirements/form/{form_id}/approver/{approver_id}",
             response_model=List[ApprovalRequirementResponse])
-async def get_approval_requirements_by_approver(
+def get_approval_requirements_by_approver(
     form_id: int,
     approver_id: int,
     db: Session = Depends(get_db),
@@ -1742,7 +1741,7 @@ async def get_approval_requirements_by_approver(
 # GET - Obtener todos los requisitos de un formulario
 @router.get("/approval-requirements/form/{form_id}",
             response_model=List[ApprovalRequirementResponse])
-async def get_all_approval_requirements_by_form(
+def get_all_approval_requirements_by_form(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
@@ -1785,7 +1784,7 @@ async def get_all_approval_requirements_by_form(
 
 # DELETE - Eliminar un requisito de aprobación específico
 @router.delete("/approval-requirements/{requirement_id}")
-async def delete_approval_requirement(
+def delete_approval_requirement(
     requirement_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
@@ -1824,7 +1823,7 @@ async def delete_approval_requirement(
 
 # DELETE - Eliminar todos los requisitos de un aprobador en un formulario
 @router.delete("/approval-requirements/form/{form_id}/approver/{approver_id}")
-async def delete_all_requirements_by_approver(
+def delete_all_requirements_by_approver(
     form_id: int,
     approver_id: int,
     db: Session = Depends(get_db),
@@ -1857,7 +1856,7 @@ async def delete_all_requirements_by_approver(
 
 # PUT - Actualizar un requisito de aprobación
 @router.put("/approval-requirements/{requirement_id}")
-async def update_approval_requirement(
+def update_approval_requirement(
     requirement_id: int,
     linea_aprobacion: bool,
     db: Session = Depends(get_db),
@@ -2455,6 +2454,7 @@ def normalize_chain_sequence(
 @router.get("/my-participations")
 def get_my_approver_participations(
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -2465,22 +2465,27 @@ def get_my_approver_participations(
     escribí. No devuelve nada del diligenciador ni de los demás aprobadores.
 
     Alimenta la vista "Lo que respondí como aprobador" de Consultar respuestas.
+
+    Más recientes primero, `limit` por página; para la siguiente se manda el
+    `next_cursor` recibido como `cursor`.
     """
-    participations = response_scope.include_approver_responses(
-        db.query(Response)
-        .options(
-            joinedload(Response.form),
-            joinedload(Response.parent_response).joinedload(Response.user),
-        )
-        .filter(
-            Response.user_id == current_user.id,
-            Response.parent_response_id.isnot(None),
-        )
-        .order_by(Response.submitted_at.desc())
-        .limit(max(1, min(limit, 500)))
-    ).all()
+    participations, next_cursor = keyset.keyset_page(
+        response_scope.include_approver_responses(
+            db.query(Response)
+            .options(
+                joinedload(Response.form),
+                joinedload(Response.parent_response).joinedload(Response.user),
+            )
+            .filter(
+                Response.user_id == current_user.id,
+                Response.parent_response_id.isnot(None),
+            )
+        ),
+        Response.submitted_at, Response.id, max(1, min(limit, 500)),
+        lambda r: (r.submitted_at, r.id), cursor=cursor,
+    )
     if not participations:
-        return {"participations": []}
+        return {"participations": [], "next_cursor": None}
 
     # Mis answers de todas esas respuestas, de una sola consulta.
     my_answers = (
@@ -2593,7 +2598,7 @@ def get_my_approver_participations(
             "answers": items,
         })
 
-    return {"participations": result}
+    return {"participations": result, "next_cursor": next_cursor}
 
 
 @router.get("/received-from-me")
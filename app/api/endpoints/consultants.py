@@ -22,6 +22,7 @@ from sqlalchemy.orm import Session, joinedload
 
 from app.database import get_db
 from app.core.security import get_current_user, require_roles
+from app.core import keyset
 from app.core.permissions import (
     _consultant_visibility_conditions,
     can_consultant_view_response,
@@ -552,21 +553,26 @@ def me_list_responses(
     date_to: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=200),
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    """Respuestas visibles para el consultor, más recientes primero.
+
+    Con `cursor` (el `next_cursor` de la página anterior) se pagina sin OFFSET;
+    `total` solo se cuenta sin cursor o con `include_total=true`.
+    """
     q = _query_responses_for_consultant(
         current_user.id, db, form_id, target_user_id, category_id, date_from, date_to
     )
     if q is None:
         raise HTTPException(403, "No tiene asignaciones de consultor")
 
-    total = q.count()
-    rows = (
-        q.order_by(Response.submitted_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
+    total = q.count() if keyset.wants_total(include_total, cursor) else None
+    rows, next_cursor = keyset.keyset_page(
+        q, Response.submitted_at, Response.id, page_size,
+        lambda r: (r.submitted_at, r.id), cursor=cursor, page=page,
     )
     items = [
         ConsultantResponseRow(
@@ -582,7 +588,7 @@ def me_list_responses(
         for r in rows
     ]
     return ConsultantResponsesPage(
-        items=items, total=total, page=page, page_size=page_size
+        items=items, total=total, page=page, page_size=page_size, next_cursor=next_cursor
     )
 
 
@@ -57,7 +57,7 @@ class DownloadTemplateResponse(BaseModel):
 # ========== ENDPOINTS ==========
 
 @router.post("/templates", response_model=DownloadTemplateResponse)
-async def create_template(
+def create_template(
     template: DownloadTemplateCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -109,7 +109,7 @@ async def create_template(
 
 
 @router.get("/templates", response_model=List[DownloadTemplateResponse])
-async def get_templates(
+def get_templates(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     is_active: Optional[bool] = None
@@ -150,7 +150,7 @@ async def get_templates(
 
 
 @router.get("/templates/{template_id}", response_model=DownloadTemplateResponse)
-async def get_template(
+def get_template(
     template_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -190,7 +190,7 @@ async def get_template(
 
 
 @router.put("/templates/{template_id}", response_model=DownloadTemplateResponse)
-async def update_template(
+def update_template(
     template_id: int,
     template_update: DownloadTemplateUpdate,
     db: Session = Depends(get_db),
@@ -234,7 +234,7 @@ async def update_template(
     )
 
 @router.delete("/templates/{template_id}")
-async def delete_template(
+def delete_template(
     template_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -257,7 +257,7 @@ async def delete_template(
 
 
 @router.post("/templates/{template_id}/duplicate")
-async def duplicate_template(
+def duplicate_template(
     template_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -11,17 +11,16 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, Query, File,
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session, joinedload, defer
 from typing import List, Optional
-from app.api.controllers.excel_form_exporter import generate_form_excel
 from app.api.controllers.mail import send_response_answers_email
 from app.redis_client import redis_client
 from app.database import get_db
-from app.models import Answer, AnswerHistory, ApprovalStatus, CategoryApproval, FormatType, Form, FormAnswer, FormAnswerEditor, FormApproval, FormApprovalNotification, FormCategory, FormCloseConfig, FormModerators, FormMovimientos, FormQuestion, FormSchedule, FormTemplate, GenericActivity, GenericActivityForm, PalabrasClave, Profile, ProfileCategory, ProfileForm, ProfileUser, Question, QuestionTableRelation, QuestionType, RelationQuestionRule, Response, ResponseApproval, ResponseStatus, TemplateScope, User, UserType
+from app.models import answer_value_num, Answer, AnswerHistory, ApprovalStatus, CategoryApproval, FormatType, Form, FormAnswer, FormAnswerEditor, FormApproval, FormApprovalNotification, FormCategory, FormCloseConfig, FormModerators, FormMovimientos, FormQuestion, FormSchedule, FormTemplate, GenericActivity, GenericActivityForm, PalabrasClave, Profile, ProfileCategory, ProfileForm, ProfileUser, Question, QuestionTableRelation, QuestionType, RelationQuestionRule, Response, ResponseApproval, ResponseStatus, TemplateScope, User, UserType
 from app.crud import  _extract_style_config, _serialize_answers, add_category_approver, analyze_form_relations, apply_template_service, bulk_save_category_approvers, check_form_data, create_form, add_questions_to_form, create_form_category, create_form_movimiento, create_form_schedule, create_response_approval, create_template_service, delete_form, delete_form_category, delete_template_service, fetch_completed_forms_by_user, fetch_completed_forms_with_all_responses, fetch_form_questions, fetch_form_users, generate_excel_with_repeaters, get_all_categories_with_approvers, get_all_form_movimientos_basic, get_all_forms, get_all_forms_paginated, get_all_user_responses_by_form_id_improved, get_categories_by_parent, get_category_approvals, get_category_path, get_category_tree, get_form, get_form_id_users, get_form_responses_data, get_form_with_full_responses, get_forms, get_forms_by_approver, get_forms_by_user, get_forms_by_user_summary, get_forms_pending_approval_for_user, get_moderated_forms_by_answers, get_next_mandatory_approver, get_notifications_for_form, get_questions_and_answers_by_form_id, get_questions_and_answers_by_form_id_and_user, get_response_approval_status, get_response_details_logic, get_template_detail_service, get_unanswered_forms_by_user, get_user_responses_data, invalidate_form_cache, link_moderator_to_form, link_question_to_form, list_templates_service, move_category, process_regisfacial_answer, remove_category_approver, remove_moderator_from_form, remove_question_from_form, save_form_approvals, search_forms_by_user, send_rejection_email_to_all, sync_form_approvals_from_category, toggle_form_status, update_category_approver, update_form_category_1, update_form_design_service, update_notification_status, update_response_approval_status, update_template_service, update_form_movimiento
 from app.schemas import AlertMessageRequest, AnswerEditorsConfigOut, AnswerEditorsConfigUpdate, AnswerEditorUserOut, CategoryApprovalBulkSave, CategoryApprovalCreate, CategoryApprovalResponse, CategoryApprovalUpdate, FormAnswerCreate, FormBaseUser, FormCategoryCreate, FormCategoryMove, FormCategoryResponse, FormCategoryTreeResponse, FormCategoryUpdate, FormCategoryWithFormsResponse, FormCloseConfigCreate, FormCloseConfigOut, FormCreate, FormDesignUpdate, FormDraftUpdate, FormMovimientoBase, FormMovimientoResponse, FormResponse, FormResponseBitacora, FormScheduleCreate, FormScheduleOut, FormStatusUpdate, FormTemplateCreate, FormTemplateDetail, FormTemplateResponse, FormTemplateUpdate, NotificationCreate, NotificationsByFormResponse_schema, QuestionAdd, FormBase, QuestionIdsRequest, RelatedAnswerRequest, ResponseApprovalCreate, SendResponseEmailRequest, UpdateFormBasicInfo, UpdateFormCategory, UpdateNotifyOnSchema, UpdateResponseApprovalRequest
+from app.core.read_replica import get_export_db, get_export_user, get_read_db
 from app.core.security import get_current_user, require_roles
 from app.core import field_access, response_scope
 from io import BytesIO
-import pandas as pd
 from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
 router = APIRouter()
@@ -1143,7 +1142,7 @@ def can_edit_answers(
 
 
 @router.put("/{form_id}/questions")
-async def update_form_questions(
+def update_form_questions(
     form_id: int,
     request: QuestionIdsRequest,  # { "question_ids": [1, 2, 3] }
     current_user: User = Depends(get_current_user),
@@ -1692,6 +1691,8 @@ def get_user_forms(
     page_size: int = 30,  # Cantidad de registros por página
     profile_id: Optional[int] = None,  # Si se pasa, filtra a los formatos de ese perfil
     activity_id: Optional[int] = None,  # Si se pasa, filtra a los formatos del usuario en esa actividad
+    cursor: Optional[str] = None,  # `next_cursor` de la página anterior (reemplaza a page)
+    include_total: Optional[bool] = None,  # Contar el total (por defecto solo sin cursor)
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1703,6 +1704,10 @@ def get_user_forms(
     - **profile_id**: opcional, restringe el resultado a los formatos del perfil
       indicado. Solo aplica si el usuario es miembro activo de ese perfil; si no,
       devuelve lista vacía.
+    - **cursor**: opcional, el `next_cursor` de la respuesta anterior. Cada
+      página cuesta lo mismo a cualquier profundidad (scroll infinito).
+    - **include_total**: contar `total`/`total_pages`. Por defecto solo sin
+      cursor; con cursor vienen en null.
     - **Requiere autenticación.**
     - **Código 200**: Lista de formularios paginados.
     - **Código 403**: Usuario sin permisos.
@@ -1716,7 +1721,10 @@ def get_user_forms(
             page_size = 100
 
         # Obtener formularios paginados
-        forms_data = get_forms_by_user(db, current_user.id, page, page_size, profile_id=profile_id, activity_id=activity_id)
+        forms_data = get_forms_by_user(
+            db, current_user.id, page, page_size, profile_id=profile_id, activity_id=activity_id,
+            cursor=cursor, include_total=include_total,
+        )
 
         if not forms_data["items"]:
             raise HTTPException(
@@ -1770,6 +1778,8 @@ def get_completed_forms_for_user(
     activity_id: int = None,
     date_from: str = None,
     date_to: str = None,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1780,6 +1790,8 @@ def get_completed_forms_for_user(
     - **page_size**: Cantidad de registros por página (por defecto 30, máximo 100)
     - **date_from**: Fecha/hora inicio (ISO 8601, ej: 2026-01-01T00:00:00)
     - **date_to**: Fecha/hora fin (ISO 8601, ej: 2026-12-31T23:59:59)
+    - **cursor**: opcional, el `next_cursor` de la respuesta anterior (en vez de page)
+    - **include_total**: contar el total; por defecto solo sin cursor
     - **Autenticación requerida**
     - **Código 200**: Lista paginada de formularios completados
     - **Código 403**: Usuario no autenticado o sin permisos
@@ -1794,7 +1806,10 @@ def get_completed_forms_for_user(
     if page < 1:
         page = 1
 
-    completed_forms_data = fetch_completed_forms_by_user(db, current_user.id, page, page_size, activity_id, date_from, date_to)
+    completed_forms_data = fetch_completed_forms_by_user(
+        db, current_user.id, page, page_size, activity_id, date_from, date_to,
+        cursor=cursor, include_total=include_total,
+    )
 
     if not completed_forms_data["items"]:
         raise HTTPException(status_code=404, detail="No completed forms found for this user")
@@ -2026,6 +2041,7 @@ def download_questions_answers_excel(
     if not data:
         raise HTTPException(status_code=404, detail="Formulario no encontrado")
 
+    import pandas as pd
     df = pd.DataFrame(data["data"])
     output = BytesIO()
     df.to_excel(output, index=False, sheet_name="Respuestas")
@@ -2040,8 +2056,8 @@ def download_questions_answers_excel(
 
 @router.get("/export/list-excel")
 def download_forms_list_excel(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles([UserType.admin])),
+    db: Session = Depends(get_export_db),
+    current_user: User = Depends(require_roles([UserType.admin], user_dependency=get_export_user)),
 ):
     """
     Listado en Excel de TODOS los formatos creados. Solo administradores.
@@ -2073,6 +2089,7 @@ def download_forms_list_excel(
         for fid, title, uname, created, enabled in rows
     ]
 
+    import pandas as pd
     df = pd.DataFrame(
         data,
         columns=[
@@ -2114,6 +2131,7 @@ def download_questions_answers_excel_all_users(
     if not data:
         raise HTTPException(status_code=404, detail="Formulario no encontrado")
 
+    import pandas as pd
     df = pd.DataFrame(data["data"])
     output = BytesIO()
     df.to_excel(output, index=False, sheet_name="Respuestas")
@@ -2186,6 +2204,7 @@ def download_user_responses_excel(
 
         style_config = _extract_style_config(form_design)
 
+        from app.api.controllers.excel_form_exporter import generate_form_excel
         output = generate_form_excel(
             form_design=form_design,
             answers=answers,
@@ -2210,6 +2229,7 @@ def download_user_responses_excel(
             detail="No se encontraron respuestas para este usuario en el formulario"
         )
 
+    import pandas as pd
     df = pd.DataFrame(data["data"])
     output = BytesIO()
     df.to_excel(output, index=False, sheet_name="Respuestas del Usuario")
@@ -2376,6 +2396,7 @@ def download_user_responses_excel(
                     "form_design_element_id":  getattr(ans, "form_design_element_id", None),
                 })
 
+            from app.api.controllers.excel_form_exporter import generate_form_excel
             output = generate_form_excel(
                 form_design=form_design,
                 answers=answers,
@@ -2419,6 +2440,7 @@ def download_user_responses_excel(
                     "form_design_element_id":  getattr(ans, "form_design_element_id", None),
                 })
 
+            from app.api.controllers.excel_form_exporter import generate_form_excel
             single_output = generate_form_excel(
                 form_design=form_design,
                 answers=answers,
@@ -2483,6 +2505,7 @@ def download_user_responses_excel(
             detail="No se encontraron respuestas para este usuario en el formulario"
         )
 
+    import pandas as pd
     df = pd.DataFrame(data["data"])
     output = BytesIO()
     df.to_excel(output, index=False, sheet_name="Respuestas del Usuario")
@@ -2533,8 +2556,8 @@ def get_form_schedules(form_id: int, user_id: int, db: Session = Depends(get_db)
 @router.get("/{form_id}/questions-answers/excel/all-users")
 def download_all_user_responses_excel(
     form_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
+    db: Session = Depends(get_export_db),
+    current_user: User = Depends(require_roles([UserType.admin, UserType.creator], user_dependency=get_export_user)),
 ):
     """
     Descarga TODAS las respuestas de TODOS los usuarios para un formulario.
@@ -2600,6 +2623,7 @@ def download_all_user_responses_excel(
             answers = _serialize_answers(answers_orm, db, form_id, form_design)
 
             # Generar Excel individual
+            from app.api.controllers.excel_form_exporter import generate_form_excel
             single_output = generate_form_excel(
                 form_design=form_design,
                 answers=answers,
@@ -2780,7 +2804,12 @@ def create_response_approval_endpoint(
     
 
 @router.get("/user/assigned-forms-with-responses")
-def get_forms_to_approve( db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_forms_to_approve(
+    page: Optional[int] = Query(None, ge=1, description="Sin page se devuelve la bandeja completa"),
+    page_size: int = Query(30, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     """
     Obtiene los formularios asignados al usuario actual que tienen respuestas pendientes de aprobación.
 
@@ -2790,6 +2819,11 @@ def get_forms_to_approve( db: Session = Depends(get_db), current_user: User = De
 
     Parámetros:
     ----------
+    page : Optional[int]
+        Página de la bandeja (más recientes primero). Opcional: sin ella se
+        devuelve completa, como antes.
+    page_size : int
+        Respuestas por página.
     db : Session
         Sesión activa de la base de datos (inyectada por FastAPI).
     current_user : User
@@ -2801,7 +2835,7 @@ def get_forms_to_approve( db: Session = Depends(get_db), current_user: User = De
         Lista de formularios con información detallada de las respuestas, 
         aprobaciones y el estado de cada aprobador.
     """
-    return get_forms_pending_approval_for_user(current_user.id, db)
+    return get_forms_pending_approval_for_user(current_user.id, db, page=page, page_size=page_size)
 
 @router.post("/create_notification")
 def create_notification(notification: NotificationCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -3418,11 +3452,11 @@ def _resolve_logo_path():
 
 
 @router.post("/upload-logo/")
-async def upload_logo(file: UploadFile = File(...),current_user: User = Depends(get_current_user)):
+def upload_logo(file: UploadFile = File(...),current_user: User = Depends(get_current_user)):
     # H-BW-015: usar `is None` en lugar de `== None`
 
     # H-BW-001: Validar tamaño antes de procesar
-    head = await file.read(MAX_LOGO_SIZE + 1)
+    head = file.file.read(MAX_LOGO_SIZE + 1)
     if len(head) > MAX_LOGO_SIZE:
         raise HTTPException(status_code=413, detail="El logo no debe exceder 2 MB")
 
@@ -4003,7 +4037,7 @@ def get_user_completed_forms_by_category_endpoint(
     }
     
 @router.get("/api/forms/{form_id}/response/{response_id}/details")
-async def get_response_details_json(
+def get_response_details_json(
     form_id: int,
     response_id: int,
     db: Session = Depends(get_db),
@@ -4326,7 +4360,7 @@ os.makedirs(INSTRUCTIVOS_FOLDER, exist_ok=True)
 ALLOWED_UPLOAD_DIR = os.path.realpath(INSTRUCTIVOS_FOLDER)
 # ==================== SUBIR INSTRUCTIVO ====================
 @router.put("/{form_id}/upload-instructivos")
-async def upload_form_instructivos(
+def upload_form_instructivos(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -4410,7 +4444,7 @@ async def upload_form_instructivos(
                 file_path = os.path.join(INSTRUCTIVOS_FOLDER, unique_filename)
                 
                 # Guardar el archivo
-                content = await file.read()
+                content = file.file.read()
                 with open(file_path, "wb") as f:
                     f.write(content)
                 
@@ -4465,7 +4499,7 @@ async def upload_form_instructivos(
 # ==================== OBTENER INSTRUCTIVOS ====================
 
 @router.get("/{form_id}/instructivos")
-async def get_form_instructivos(
+def get_form_instructivos(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -4512,7 +4546,7 @@ async def get_form_instructivos(
 # ==================== ENDPOINT 2: GUARDAR MENSAJE DE ALERTA ====================
 
 @router.put("/{form_id}/update-alert-message")
-async def update_form_alert_message(
+def update_form_alert_message(
     form_id: int,
     request: AlertMessageRequest,
     db: Session = Depends(get_db),
@@ -4572,7 +4606,7 @@ async def update_form_alert_message(
         )
 
 @router.get("/files/download-instructivo")
-async def download_instructivo(
+def download_instructivo(
     file_path: str = Query(..., description="Ruta o nombre del archivo instructivo"),
     current_user: User = Depends(get_current_user)
 ):
@@ -4663,7 +4697,7 @@ async def download_instructivo(
         )
         
 @router.get("/{form_id}/alert-message")
-async def get_form_alert_message(
+def get_form_alert_message(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -4703,7 +4737,7 @@ async def get_form_alert_message(
 # ==================== OBTENER UN FORMULARIO (para ver detalles) ====================
 
 @router.get("/get_form_details/{form_id}")
-async def get_form_details(
+def get_form_details(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -4756,7 +4790,7 @@ async def get_form_details(
 # ==================== ELIMINAR UN INSTRUCTIVO ESPECÍFICO ====================
 
 @router.delete("/{form_id}/instructivos/{instructivo_index}")
-async def delete_instructivo(
+def delete_instructivo(
     form_id: int,
     instructivo_index: int,
     db: Session = Depends(get_db),
@@ -4847,7 +4881,7 @@ async def delete_instructivo(
 # ==================== ELIMINAR MENSAJE DE ALERTA ====================
 
 @router.delete("/{form_id}/alert-message")
-async def delete_alert_message(
+def delete_alert_message(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -4947,7 +4981,7 @@ def _user_can_view_movimiento(user: User, mov) -> bool:
 
 @router.get("/movimientos/all", response_model=List[dict])
 def get_form_movimientos_endpoint(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -5021,21 +5055,10 @@ def _movimiento_to_number(value):
 
     Tolera símbolos de moneda y separadores de miles/decimales comunes en
     Colombia. Devuelve None si el valor no es numérico (se ignora en la suma).
+    Es el mismo criterio con el que se llena `Answer.value_num`.
     """
-    if value is None:
-        return None
-    s = str(value).strip().replace("$", "").replace(" ", "")
-    if s == "":
-        return None
-    if "," in s and "." in s:
-        # 1.234,56 -> coma decimal, punto miles
-        s = s.replace(".", "").replace(",", ".")
-    elif "," in s and "." not in s:
-        s = s.replace(",", ".")
-    try:
-        return float(s)
-    except (TypeError, ValueError):
-        return None
+    number = answer_value_num(value)
+    return float(number) if number is not None else None
 
 
 def _build_movimiento_consolidado(result, page, page_size, date_from, date_to,
@@ -5327,7 +5350,7 @@ def get_answers_by_movement(
     alias: Optional[str] = Query(None, description="Filtrar por un alias específico"),
     last_only: bool = Query(False, description="Solo el registro más reciente"),
     column_filters: Optional[str] = Query(None, description="Filtro por columna estilo Excel: JSON {col_key: [valores...]}"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Respuestas consolidadas de un movimiento.
@@ -5406,8 +5429,8 @@ def export_movimiento_excel(
     alias: Optional[str] = Query(None),
     last_only: bool = Query(False),
     column_filters: Optional[str] = Query(None, description="Filtro por columna estilo Excel: JSON {col_key: [valores...]}"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_export_db),
+    current_user: User = Depends(get_export_user),
 ):
     """Exporta la tabla COMPLETA del movimiento a Excel (todas las filas que
     pasan los filtros, sin paginar) más una fila de totales."""
@@ -6277,13 +6300,16 @@ def _build_movimiento_consolidado(result, page, page_size, date_from, date_to,
         acc = 0.0
         any_num = False
         for row in filtered:
-            amap = {a["question_id"]: a.get("answer_text") for a in row["answers"]}
-            val = None
+            amap = {a["question_id"]: a for a in row["answers"]}
+            num = None
             for qid in col["question_ids"]:
                 if qid in amap:
-                    val = amap[qid]
+                    # value_num ya viene calculado de la BD; el texto solo se
+                    # interpreta si la fila aún no tiene la copia tipada.
+                    num = amap[qid].get("value_num")
+                    if num is None:
+                        num = _movimiento_to_number(amap[qid].get("answer_text"))
                     break
-            num = _movimiento_to_number(val)
             if num is not None:
                 acc += num
                 any_num = True
@@ -6391,6 +6417,7 @@ def _collect_movimiento_result(db: Session, movimiento):
                         "question_type": getattr(a.question.question_type, "value", a.question.question_type),
                         "alias": alias_by_question.get(a.question.id),
                         "answer_text": a.answer_text,
+                        "value_num": float(a.value_num) if a.value_num is not None else None,
                         "file_path": a.file_path,
                     }
                     for a in answers
@@ -11,231 +11,24 @@ Todos derivan de FormSchedule (modelo ya existente, no requiere migración).
 Convención de auth seguida de forms.py.
 """
 
-import calendar
-import json
 import logging
-from datetime import date, datetime, timedelta
-from typing import List, Optional
+from datetime import date, timedelta
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
+from app.core import schedule_expansion
+from app.core.read_replica import get_read_db
 from app.core.security import get_current_user
 from app.database import get_db
-from app.models import ApprovalStatus, BitacoraLogsSimple, EstadoEvento, Form, FormSchedule, Response, ResponseApproval, ResponseStatus, User, UserType
+from app.models import ApprovalStatus, BitacoraLogsSimple, EstadoEvento, Form, FormSchedule, Response, ResponseApproval, User, UserType
 from sqlalchemy import and_, func, or_
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-# ────────────────────────────────────────────────────────────────────────────
-# Helpers de cálculo sobre FormSchedule
-# ────────────────────────────────────────────────────────────────────────────
-
-# repeat_days viene como JSON serializado en BD. Admite inglés y español
-# porque el frontend actual mezcla ambos en distintas pantallas.
-_WEEKDAY_MAP = {
-    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-    "friday": 4, "saturday": 5, "sunday": 6,
-    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2,
-    "jueves": 3, "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6,
-}
-
-
-def _to_date(value) -> Optional[date]:
-    if value is None:
-        return None
-    if isinstance(value, datetime):
-        return value.date()
-    if isinstance(value, date):
-        return value
-    return None
-
-
-def _parse_repeat_days(raw: Optional[str]) -> set[int]:
-    if not raw:
-        return set()
-    try:
-        items = json.loads(raw)
-    except (ValueError, TypeError):
-        return set()
-    if not isinstance(items, list):
-        return set()
-    out = set()
-    for item in items:
-        if isinstance(item, str):
-            idx = _WEEKDAY_MAP.get(item.strip().lower())
-            if idx is not None:
-                out.add(idx)
-        elif isinstance(item, int) and 0 <= item <= 6:
-            out.add(item)
-    return out
-
-
-def _add_months(d: date, n: int) -> date:
-    total = d.month - 1 + n
-    year = d.year + total // 12
-    month = total % 12 + 1
-    last_day = calendar.monthrange(year, month)[1]
-    return date(year, month, min(d.day, last_day))
-
-
-def _compute_next_due_date(sch: FormSchedule, today: date) -> Optional[date]:
-    """Próxima fecha en la que el formato debe diligenciarse según el schedule."""
-    freq = (sch.frequency_type or "").lower()
-    specific = _to_date(sch.specific_date)
-
-    if freq in ("specific", "once") and specific:
-        return specific
-
-    if freq == "daily":
-        return today
-
-    if freq == "weekly":
-        targets = _parse_repeat_days(sch.repeat_days)
-        if not targets:
-            return None
-        for offset in range(0, 7):
-            candidate = today + timedelta(days=offset)
-            if candidate.weekday() in targets:
-                return candidate
-        return None
-
-    if freq == "monthly":
-        target_day = specific.day if specific else 1
-        last_day_this = calendar.monthrange(today.year, today.month)[1]
-        this_month = date(today.year, today.month, min(target_day, last_day_this))
-        if this_month >= today:
-            return this_month
-        return _add_months(this_month, 1)
-
-    if freq in ("interval", "custom") and sch.interval_days and specific:
-        if specific >= today:
-            return specific
-        delta = (today - specific).days
-        remainder = delta % sch.interval_days
-        if remainder == 0:
-            return today
-        return today + timedelta(days=sch.interval_days - remainder)
-
-    return None
-
-
-def _is_done_in_current_period(
-    sch: FormSchedule, last_submitted_at: Optional[datetime], today: date
-) -> bool:
-    """¿El usuario ya envió respuesta en el período que cubre el schedule actual?"""
-    if not last_submitted_at:
-        return False
-    submitted = _to_date(last_submitted_at)
-    if not submitted:
-        return False
-
-    freq = (sch.frequency_type or "").lower()
-
-    if freq == "daily":
-        return submitted == today
-    if freq == "weekly":
-        return (submitted.isocalendar()[0], submitted.isocalendar()[1]) == (
-            today.isocalendar()[0],
-            today.isocalendar()[1],
-        )
-    if freq == "monthly":
-        return submitted.year == today.year and submitted.month == today.month
-    if freq in ("specific", "once"):
-        specific = _to_date(sch.specific_date)
-        return bool(specific and submitted >= specific)
-    if freq in ("interval", "custom") and sch.interval_days:
-        return (today - submitted).days < sch.interval_days
-    return False
-
-
-def _expand_schedule_in_range(
-    sch: FormSchedule, range_start: date, range_end: date
-) -> List[date]:
-    """Lista de fechas concretas en [range_start, range_end] generadas por el schedule."""
-    freq = (sch.frequency_type or "").lower()
-    specific = _to_date(sch.specific_date)
-    out: List[date] = []
-
-    if freq in ("specific", "once"):
-        if specific and range_start <= specific <= range_end:
-            out.append(specific)
-        return out
-
-    if freq == "daily":
-        cursor = range_start
-        while cursor <= range_end:
-            out.append(cursor)
-            cursor += timedelta(days=1)
-        return out
-
-    if freq == "weekly":
-        targets = _parse_repeat_days(sch.repeat_days)
-        if not targets:
-            return out
-        cursor = range_start
-        while cursor <= range_end:
-            if cursor.weekday() in targets:
-                out.append(cursor)
-            cursor += timedelta(days=1)
-        return out
-
-    if freq == "monthly":
-        target_day = specific.day if specific else 1
-        month_cursor = date(range_start.year, range_start.month, 1)
-        while month_cursor <= range_end:
-            last_day = calendar.monthrange(month_cursor.year, month_cursor.month)[1]
-            candidate = date(
-                month_cursor.year, month_cursor.month, min(target_day, last_day)
-            )
-            if range_start <= candidate <= range_end:
-                out.append(candidate)
-            month_cursor = _add_months(month_cursor, 1).replace(day=1)
-        return out
-
-    if freq in ("interval", "custom") and sch.interval_days and specific:
-        if specific > range_end:
-            return out
-        cursor = specific
-        while cursor < range_start:
-            cursor += timedelta(days=sch.interval_days)
-        while cursor <= range_end:
-            out.append(cursor)
-            cursor += timedelta(days=sch.interval_days)
-        return out
-
-    return out
-
-
-def _event_period(sch: FormSchedule, event_date: date) -> tuple[date, date]:
-    """
-    Período de "validez" de un evento. Si el usuario envía una Response
-    cuya fecha cae en [start, end], el evento se considera completado.
-    """
-    freq = (sch.frequency_type or "").lower()
-    if freq == "daily":
-        return (event_date, event_date)
-    if freq == "weekly":
-        weekday = event_date.weekday()  # 0=lun, 6=dom
-        start = event_date - timedelta(days=weekday)
-        end = start + timedelta(days=6)
-        return (start, end)
-    if freq == "monthly":
-        last_day = calendar.monthrange(event_date.year, event_date.month)[1]
-        return (
-            date(event_date.year, event_date.month, 1),
-            date(event_date.year, event_date.month, last_day),
-        )
-    if freq in ("specific", "specific_date", "once"):
-        # Cualquier respuesta desde la fecha del evento en adelante cuenta.
-        return (event_date, date(9999, 12, 31))
-    if freq in ("interval", "periodic", "custom") and sch.interval_days:
-        return (event_date, event_date + timedelta(days=sch.interval_days - 1))
-    return (event_date, event_date)
-
-
 # ────────────────────────────────────────────────────────────────────────────
 # Endpoints
 # ────────────────────────────────────────────────────────────────────────────
@@ -256,6 +49,9 @@ def get_user_pending_forms(
         False,
         description="Si True, incluye también las tareas completadas en el período actual (urgency='hecha').",
     ),
+    # Primario, no réplica: el resultado se guarda en caché con la versión
+    # vigente del usuario, y uno leído de una réplica atrasada quedaría ahí
+    # hasta CACHE_TTL aunque la escritura ya esté confirmada.
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -279,57 +75,27 @@ def get_user_pending_forms(
     """
 
     today = date.today()
-    schedules = (
-        db.query(FormSchedule)
-        .filter(
-            FormSchedule.user_id == current_user.id,
-            FormSchedule.status.is_(True),
-        )
-        .all()
-    )
-    if not schedules:
-        return []
-
-    form_ids = [s.form_id for s in schedules]
-    forms_by_id = {
-        f.id: f
-        for f in db.query(Form)
-        .filter(Form.id.in_(form_ids), Form.is_enabled.is_(True))
-        .all()
-    }
 
-    last_submitted_by_form = {}
-    last_rows = (
-        db.query(Response.form_id, Response.submitted_at)
-        .filter(
-            Response.user_id == current_user.id,
-            Response.form_id.in_(form_ids),
-            Response.status.in_([ResponseStatus.submitted, ResponseStatus.approved]),
+    def _build() -> list:
+        plan, forms_by_id = schedule_expansion.active_schedules(db, current_user.id)
+        if not len(plan):
+            return []
+        last_by_form = schedule_expansion.last_submissions(db, current_user.id, forms_by_id)
+        last_days = np.array(
+            [schedule_expansion.to_date(last_by_form.get(f)) or "NaT" for f in plan.form_id],
+            dtype="datetime64[D]",
         )
-        .order_by(Response.submitted_at.desc())
-        .all()
-    )
-    for form_id, submitted_at in last_rows:
-        # se queda con la primera ocurrencia (la más reciente por el order_by)
-        last_submitted_by_form.setdefault(form_id, submitted_at)
-
-    pending = []
-    for sch in schedules:
-        form = forms_by_id.get(sch.form_id)
-        if form is None:
-            continue
-
-        last_submitted_at = last_submitted_by_form.get(form.id)
-        is_done = _is_done_in_current_period(sch, last_submitted_at, today)
-
-        if is_done:
-            if not include_completed:
-                continue
-            urgency = "hecha"
-            next_due = _compute_next_due_date(sch, today)
-        else:
-            next_due = _compute_next_due_date(sch, today)
-            if next_due is None:
+        done = plan.is_done(today, last_days)
+        due_dates = plan.next_due_dates(today).astype(object)
+
+        items = []
+        for i, sch in enumerate(plan.schedules):
+            form = forms_by_id[sch.form_id]
+            last_submitted_at = last_by_form.get(form.id)
+            next_due = due_dates[i]
+            if done[i]:
+                urgency = "hecha"
+            elif next_due is None:
                 urgency = "indefinido"
             elif next_due < today:
                 urgency = "vencido"
@@ -340,20 +106,25 @@ def get_user_pending_forms(
             else:
                 urgency = "proximo"
 
-        pending.append({
-            "form_id": form.id,
-            "title": form.title,
-            "description": form.description,
-            "category_id": form.id_category,
-            "frequency_type": sch.frequency_type,
-            "next_due_date": next_due.isoformat() if next_due else None,
-            "urgency": urgency,
-            "last_submitted_at": (
-                last_submitted_at.isoformat() if last_submitted_at else None
-            ),
-            "schedule_id": sch.id,
-            "completed": is_done,
-        })
+            items.append({
+                "form_id": form.id,
+                "title": form.title,
+                "description": form.description,
+                "category_id": form.id_category,
+                "frequency_type": sch.frequency_type,
+                "next_due_date": next_due.isoformat() if next_due else None,
+                "urgency": urgency,
+                "last_submitted_at": (
+                    last_submitted_at.isoformat() if last_submitted_at else None
+                ),
+                "schedule_id": sch.id,
+                "completed": bool(done[i]),
+            })
+        return items
+
+    # Se guarda la lista completa (con las hechas) y se filtra al responder.
+    items = schedule_expansion.cached("pending", current_user.id, today, _build)
+    pending = [p for p in items if include_completed or not p["completed"]]
 
     pending.sort(
         key=lambda p: (
@@ -369,7 +140,7 @@ def get_user_pending_forms(
 def get_user_upcoming_events(
     start_date: date = Query(..., description="Inicio del rango (ISO YYYY-MM-DD)"),
     end_date: date = Query(..., description="Fin del rango (ISO YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db),  # primario: se guarda en caché (ver pending-forms)
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -384,7 +155,7 @@ def get_user_upcoming_events(
         ]
 
     `completed` es true si el usuario envió respuesta dentro del período del
-    evento (definido por _event_period según frequency_type).
+    evento (ver ScheduleSet.event_periods en app/core/schedule_expansion.py).
     """
     if end_date < start_date:
         raise HTTPException(
@@ -396,57 +167,22 @@ def get_user_upcoming_events(
             detail="Rango máximo 366 días para evitar explosión de eventos",
         )
 
-    schedules = (
-        db.query(FormSchedule)
-        .filter(
-            FormSchedule.user_id == current_user.id,
-            FormSchedule.status.is_(True),
+    def _build() -> list:
+        plan, forms_by_id = schedule_expansion.active_schedules(db, current_user.id)
+        if not len(plan):
+            return []
+        sch_idx, dates = plan.expand(start_date, end_date)
+        # El período de un evento puede empezar hasta un mes antes del rango
+        # (mensual, semanal); los envíos más viejos no completan nada.
+        submissions = schedule_expansion.submission_dates(
+            db, current_user.id, forms_by_id, start_date - timedelta(days=31)
         )
-        .all()
-    )
-    if not schedules:
-        return []
-
-    form_ids = [s.form_id for s in schedules]
-    forms_by_id = {
-        f.id: f
-        for f in db.query(Form)
-        .filter(Form.id.in_(form_ids), Form.is_enabled.is_(True))
-        .all()
-    }
+        completed = plan.completed_events(sch_idx, dates, submissions)
 
-    # Precarga respuestas del usuario en un rango ampliado para cubrir los
-    # períodos que se extienden más allá de end_date (ej. specific_date).
-    response_rows = (
-        db.query(Response.form_id, Response.submitted_at)
-        .filter(
-            Response.user_id == current_user.id,
-            Response.form_id.in_(form_ids),
-            Response.status.in_([ResponseStatus.submitted, ResponseStatus.approved]),
-        )
-        .all()
-    )
-    # Índice: form_id -> lista de submitted_dates (orden no importa)
-    completions_by_form: dict[int, list[date]] = {}
-    for r_form_id, submitted_at in response_rows:
-        d = _to_date(submitted_at)
-        if d is None:
-            continue
-        completions_by_form.setdefault(r_form_id, []).append(d)
-
-    def _is_event_done(sch: FormSchedule, event_date: date) -> bool:
-        dates = completions_by_form.get(sch.form_id, [])
-        if not dates:
-            return False
-        p_start, p_end = _event_period(sch, event_date)
-        return any(p_start <= rd <= p_end for rd in dates)
-
-    events = []
-    for sch in schedules:
-        form = forms_by_id.get(sch.form_id)
-        if form is None:
-            continue
-        for d in _expand_schedule_in_range(sch, start_date, end_date):
+        events = []
+        for i, d, done in zip(sch_idx.tolist(), dates.astype(object), completed.tolist()):
+            sch = plan.schedules[i]
+            form = forms_by_id[sch.form_id]
             events.append({
                 "form_id": form.id,
                 "title": form.title,
@@ -454,9 +190,13 @@ def get_user_upcoming_events(
                 "frequency_type": sch.frequency_type,
                 "schedule_id": sch.id,
                 "category_id": form.id_category,
-                "completed": _is_event_done(sch, d),
+                "completed": done,
             })
+        return events
 
+    events = schedule_expansion.cached(
+        "events", current_user.id, date.today(), _build, start_date.isoformat(), end_date.isoformat()
+    )
     events.sort(key=lambda e: (e["date"], e["title"].lower()))
     return events
 
@@ -513,6 +253,8 @@ def delete_form_schedule_by_form_user(
         .delete(synchronize_session=False)
     )
     db.commit()
+    # El borrado en bloque no pasa por el listener del caché del Home.
+    schedule_expansion.invalidate([user_id])
     logger.info(
         "delete_form_schedule_by_form_user: form_id=%s user_id=%s deleted=%s",
         form_id, user_id, deleted,
@@ -559,7 +301,7 @@ def delete_form_schedule(
 @router.get("/recent-activity")
 def get_recent_activity(
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """Eventos recientes sobre los formatos que el usuario actual sometió a
@@ -606,7 +348,7 @@ def get_recent_activity(
 
 @router.get("/pending-bitacora-events")
 def list_pending_bitacora_events_for_me(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """Eventos de bitácora pendientes para el usuario: o los creó él, o lo
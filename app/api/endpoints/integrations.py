@@ -331,7 +331,7 @@ def _build_answer(response_id: int, field: FieldInfo, value, element_id: Optiona
 # ────────────────────────────────────────────────────────────────────────────
 
 @router.post("/answers", response_model=IntegrationAnswerResult)
-async def submit_integration_answer(
+def submit_integration_answer(
     payload: IntegrationAnswerPayload = Body(...),
     request: Request = None,
     db: Session = Depends(get_db),
@@ -405,7 +405,7 @@ async def submit_integration_answer(
                 break
 
     # 5. Crear el Response (reusa toda la lógica existente: aprobaciones + emails)
-    result = await post_create_response(
+    result = post_create_response(
         db=db,
         form_id=payload.format_id,
         user_id=current_user.id,
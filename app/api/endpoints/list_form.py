@@ -1,22 +1,20 @@
 from enum import Enum
 import io
+import operator
 from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import StreamingResponse
-import pandas as pd
 from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import and_, func, or_
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
-from starlette.concurrency import run_in_threadpool
-from app.api.controllers.excel_form_exporter import generate_form_excel
 from app.api.controllers.pdf_form_exporter import FormPdfExporter
+from app.core.read_replica import get_export_db, get_export_user
 from app.core.security import get_current_user, require_roles
 from app.crud import _serialize_answers
 from app.database import get_db
-from app.models import Answer, Form, FormAnswer, FormApproval, FormApprovalNotification, FormCloseConfig, FormModerators, FormQuestion, FormSchedule, Question, QuestionFilterCondition, QuestionLocationRelation, QuestionTableRelation, QuestionType, Response, ResponseApproval, User, UserType
+from app.models import answer_value_date, answer_value_num, Answer, Form, FormAnswer, FormApproval, FormApprovalNotification, FormCloseConfig, FormModerators, FormQuestion, FormSchedule, Question, QuestionFilterCondition, QuestionLocationRelation, QuestionTableRelation, QuestionType, Response, ResponseApproval, User, UserType
 from app.schemas import DownloadRequest, FilterCondition
-from reportlab.lib.pagesizes import A4
 
 router = APIRouter()
 
@@ -182,7 +180,7 @@ class FormCompleteInfo(BaseModel):
     form_answers: List[Dict[str, Any]] = []
 
 @router.get("/forms/{form_id}/complete-info", response_model=FormCompleteInfo)
-async def get_form_complete_info(form_id: int, db: Session = Depends(get_db),current_user: User = Depends(get_current_user)):
+def get_form_complete_info(form_id: int, db: Session = Depends(get_db),current_user: User = Depends(get_current_user)):
     
     """
     Obtiene toda la información relacionada con un formulario específico
@@ -451,7 +449,7 @@ async def get_form_complete_info(form_id: int, db: Session = Depends(get_db),cur
 
 
 @router.get("/forms/available")
-async def get_available_forms(
+def get_available_forms(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -474,7 +472,7 @@ async def get_available_forms(
     ]
     
 @router.get("/forms/{form_id}/fields")
-async def get_form_fields(
+def get_form_fields(
     form_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -538,7 +536,7 @@ async def get_form_fields(
 # REEMPLAZAR COMPLETAMENTE la función preview_download_data:
 
 @router.post("/download/preview")
-async def preview_download_data(
+def preview_download_data(
     request: DownloadRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
@@ -663,7 +661,7 @@ def get_conditions_summary(conditions: List[FilterCondition], form_ids: List[int
 
 
 @router.get("/forms/fields-analysis")
-async def analyze_form_fields(
+def analyze_form_fields(
     form_ids: List[int] = Query(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
@@ -928,6 +926,7 @@ table {{ border-collapse: collapse; }} img {{ max-width: 100%; }}
         # _serialize_answers recibe form_design COMPLETO
         answers = _serialize_answers(answers_orm, db, the_form.id, form_design)
 
+        from app.api.controllers.excel_form_exporter import generate_form_excel
         buf = generate_form_excel(
             form_design=filtered_design,  # ← filtrado
             answers=answers,
@@ -946,10 +945,10 @@ table {{ border-collapse: collapse; }} img {{ max-width: 100%; }}
     return None, "Formato no soportado"
 
 @router.post("/download/generate")
-async def generate_download(
+def generate_download(
     request: FinalDownloadRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
+    db: Session = Depends(get_export_db),
+    current_user: User = Depends(require_roles([UserType.admin, UserType.creator], user_dependency=get_export_user)),
 ):
     import json
 
@@ -987,8 +986,7 @@ async def generate_download(
 
     # ═══ RUTA A: Exportación visual (PDF / Excel con diseño del formulario) ═══
     if use_visual_export and form_design and the_form:
-        result, error_msg = await run_in_threadpool(
-            _generate_visual_export,
+        result, error_msg = _generate_visual_export(
             db,
             the_form,
             form_design,
@@ -1008,7 +1006,7 @@ async def generate_download(
         )
 
     # ═══ RUTA B: Exportación simple (CSV / Word / formularios sin diseño) ════
-    data = await get_filtered_data(request, db, limit=None)
+    data = get_filtered_data(request, db, limit=None)
 
     if request.format == DownloadFormat.excel:
         return generate_excel_response(data)
@@ -1021,7 +1019,7 @@ async def generate_download(
     
     
     
-async def get_filtered_data(request: FinalDownloadRequest, db: Session, limit: Optional[int] = None):
+def get_filtered_data(request: FinalDownloadRequest, db: Session, limit: Optional[int] = None):
     """Función auxiliar que obtiene los datos filtrados con lógica inteligente"""
     # Construir query base
     query = db.query(Response).filter(Response.form_id.in_(request.form_ids))
@@ -1079,6 +1077,30 @@ async def get_filtered_data(request: FinalDownloadRequest, db: Session, limit: O
     }
     
 
+_ORDER_OPERATORS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+
+def _order_comparison(op: str, value):
+    """Comparación de orden contra el valor del filtro, con el tipo que tenga.
+
+    Fecha ISO → `Answer.value_date`; número → `Answer.value_num` (así "100" > "20");
+    cualquier otra cosa → texto, como siempre.
+    """
+    compare = _ORDER_OPERATORS[op]
+    as_date = answer_value_date(value)
+    if as_date is not None:
+        return compare(Answer.value_date, as_date)
+    as_num = answer_value_num(value)
+    if as_num is not None:
+        return compare(Answer.value_num, as_num)
+    return compare(Answer.answer_text, value)
+
+
 def apply_smart_conditions(query, conditions: List[FilterCondition], form_ids: List[int], db: Session):
     """
     Aplica condiciones de filtrado de forma inteligente.
@@ -1117,14 +1139,8 @@ def apply_smart_conditions(query, conditions: List[FilterCondition], form_ids: L
             subquery = subquery.filter(Answer.answer_text.startswith(condition.value))
         elif condition.operator == "ends_with":
             subquery = subquery.filter(Answer.answer_text.endswith(condition.value))
-        elif condition.operator == ">":
-            subquery = subquery.filter(Answer.answer_text > condition.value)
-        elif condition.operator == "<":
-            subquery = subquery.filter(Answer.answer_text < condition.value)
-        elif condition.operator == ">=":
-            subquery = subquery.filter(Answer.answer_text >= condition.value)
-        elif condition.operator == "<=":
-            subquery = subquery.filter(Answer.answer_text <= condition.value)
+        elif condition.operator in _ORDER_OPERATORS:
+            subquery = subquery.filter(_order_comparison(condition.operator, condition.value))
         
         # Aplicar filtro inteligente:
         # - Si la respuesta es de un formulario que tiene la pregunta, debe cumplir la condición
@@ -1145,6 +1161,7 @@ def apply_smart_conditions(query, conditions: List[FilterCondition], form_ids: L
 
 def generate_excel_response(data: Dict):
     """Genera archivo Excel"""
+    import pandas as pd
     output = io.BytesIO()
 
     # Crear DataFrame y sanear datos para evitar TypeError con None.
@@ -1190,6 +1207,7 @@ def generate_excel_response(data: Dict):
 
 def generate_csv_response(data: Dict):
     """Genera archivo CSV"""
+    import pandas as pd
     output = io.StringIO()
     df = pd.DataFrame(data['data'])
     df.to_csv(output, index=False, encoding='utf-8', sep=',')
@@ -7,6 +7,7 @@ from typing import List, Optional
 
 from app.database import get_db
 from app.models import Form, Question, QuestionRequest, QuestionRequestField, User, UserType
+from app.core.question_text import find_duplicate_question
 from app.core.security import get_current_user
 
 router = APIRouter()
@@ -35,22 +36,7 @@ def _build_final_question_text(original_text: str, form_id: int | None) -> str:
 
 
 def _find_duplicate_question(db: Session, text: str, exclude_id: int | None = None):
-    def _norm(t: str) -> str:
-        if not t:
-            return ""
-        t2 = unicodedata.normalize("NFKD", t)
-        t2 = "".join(c for c in t2 if not unicodedata.combining(c))
-        return " ".join(t2.lower().split())
-    norm = _norm(text)
-    if not norm:
-        return None
-    q = db.query(Question.id, Question.question_text)
-    if exclude_id is not None:
-        q = q.filter(Question.id != exclude_id)
-    for qid, qtext in q.all():
-        if _norm(qtext) == norm:
-            return (qid, qtext)
-    return None
+    return find_duplicate_question(db, text, exclude_id)
 
 
 # ── Schemas ──────────────────────────────────────────────────────────────────
@@ -3,7 +3,6 @@
 #
 
 import logging
-import unicodedata
 from collections import defaultdict
 import hashlib
 from datetime import datetime
@@ -16,10 +15,12 @@ from pymysql import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from app.database import get_db
-from app.models import Answer, Response, Form, FormQuestion, Question, QuestionCategory, QuestionFilterCondition, QuestionLocationRelation, QuestionTableRelation, QuestionType, RelationQuestionRule, User, UserType
+from app.models import Answer, Response, Form, FormQuestion, Question, QuestionCategory, QuestionFilterCondition, QuestionLocationRelation, QuestionTableRelation, QuestionType, RelationQuestionRule, User, UserType, question_text_key
 from app.crud import  create_question_table_relation_logic, delete_question_from_db, get_answers_by_question, get_answers_by_question_id, get_filtered_questions, get_question_by_id_with_category, get_questions_by_category_id, get_related_or_filtered_answers_optimized, get_related_or_filtered_answers_with_forms, get_unrelated_questions, update_question, get_questions, get_question_by_id, create_options, get_options_by_question_id
 from app.schemas import AnswerByQuestionResponse, AnswerSchema, DetectSelectRelationsRequest, QuestionCategoryCreate, QuestionCategoryOut, QuestionCreate, QuestionLocationRelationCreate, QuestionLocationRelationOut, QuestionTableRelationCreate, QuestionUpdate, QuestionResponse, OptionResponse, OptionCreate, QuestionUpdatePayload, QuestionWithCategory, RelationQuestionRuleCreate, RelationQuestionRuleResponse, UpdateQuestionCategory
 from app.core.security import get_current_user, require_roles
+from app.core import unique_answers
+from app.core.question_text import find_duplicate_question, similar_questions
 
 router = APIRouter()
 
@@ -31,56 +32,34 @@ router = APIRouter()
 # colisiones a nivel de aplicación.
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _normalize_question_text(text: Optional[str]) -> str:
-    """Normaliza para comparar unicidad: minúsculas, sin acentos, espacios
-    colapsados/recortados."""
-    if not text:
-        return ""
-    t = unicodedata.normalize("NFKD", text)
-    t = "".join(c for c in t if not unicodedata.combining(c))
-    return " ".join(t.lower().split())
-
-
 def _find_duplicate_question(db: Session, text: str, exclude_id: Optional[int] = None):
     """Devuelve (id, texto) de la primera pregunta con texto normalizado idéntico,
-    o None. Compara en Python para honrar la insensibilidad a acentos sin depender
-    de extensiones de Postgres."""
-    norm = _normalize_question_text(text)
-    if not norm:
-        return None
-    q = db.query(Question.id, Question.question_text)
-    if exclude_id is not None:
-        q = q.filter(Question.id != exclude_id)
-    for qid, qtext in q.all():
-        if _normalize_question_text(qtext) == norm:
-            return (qid, qtext)
-    return None
+    o None. Búsqueda por índice sobre `Question.text_normalized`."""
+    return find_duplicate_question(db, text, exclude_id)
 
 
 @router.get("/check-text")
 def check_question_text(
     question_text: str = Query(..., min_length=1),
     exclude_id: Optional[int] = Query(None),
+    similar: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Indica si ya existe una pregunta con el mismo texto (comparación insensible
     a mayúsculas, acentos y espacios). Para validación en vivo en el frontend.
-    `exclude_id` excluye la propia pregunta al editar. Debe ir ANTES de cualquier
-    ruta GET `/{question_id}` para no colisionar con el parámetro de ruta."""
+    `exclude_id` excluye la propia pregunta al editar. Con `similar=true` agrega
+    `similar`: preguntas de texto parecido (posibles duplicados), solo como
+    sugerencia. Debe ir ANTES de cualquier ruta GET `/{question_id}` para no
+    colisionar con el parámetro de ruta."""
     dup = _find_duplicate_question(db, question_text, exclude_id)
-    if dup:
-        return {"exists": True, "existing_id": dup[0], "existing_text": dup[1]}
-    return {"exists": False}
-
-
-def _normalize_answer_value(value: Optional[str]) -> str:
-    """Normaliza un valor de respuesta para comparar unicidad: recorta y colapsa
-    espacios y pasa a minúsculas. No quita acentos (valores como teléfonos/correos
-    rara vez los usan y preferimos no fusionar valores legítimamente distintos)."""
-    if value is None:
-        return ""
-    return " ".join(str(value).strip().lower().split())
+    result = {"exists": True, "existing_id": dup[0], "existing_text": dup[1]} if dup else {"exists": False}
+    if similar:
+        result["similar"] = [
+            s for s in similar_questions(db, question_text, exclude_id)
+            if not dup or s["id"] != dup[0]
+        ]
+    return result
 
 
 @router.get("/{question_id}/answer-exists")
@@ -94,16 +73,12 @@ def check_answer_exists(
     """Indica si `value` ya fue registrado para esta pregunta en CUALQUIER
     respuesta (alcance global por pregunta). Alimenta la validación de
     "respuestas no repetidas" al diligenciar. `exclude_response_id` ignora la
-    propia respuesta al editar."""
-    norm = _normalize_answer_value(value)
-    if not norm:
-        return {"exists": False}
-    rows = get_answers_by_question_id(db, question_id)
-    for r in rows:
-        if exclude_response_id is not None and r.response_id == exclude_response_id:
-            continue
-        if _normalize_answer_value(r.answer_text) == norm:
-            return {"exists": True, "response_id": r.response_id}
+    propia respuesta al editar. La comparación ignora mayúsculas y espacios
+    sobrantes (ver `answer_value_key`) y es una búsqueda por llave en
+    `unique_answer_values`."""
+    response_id = unique_answers.value_taken(db, question_id, value, exclude_response_id)
+    if response_id is not None:
+        return {"exists": True, "response_id": response_id}
     return {"exists": False}
 
 
@@ -273,8 +248,8 @@ def update_question_endpoint(
     # igual (incluido un duplicado histórico), se permite guardar sin tocarlo.
     if (
         question.question_text is not None
-        and _normalize_question_text(question.question_text)
-        != _normalize_question_text(db_question.question_text)
+        and question_text_key(question.question_text)
+        != question_text_key(db_question.question_text)
     ):
         dup = _find_duplicate_question(db, question.question_text, exclude_id=question_id)
         if dup:
@@ -860,6 +835,9 @@ def get_file_answers(
 @router.get("/question-table-relation/answers/{question_id}")
 def get_related_answers(
     question_id: int,
+    q: Optional[str] = Query(None, max_length=255),
+    page: Optional[int] = Query(None, ge=1),
+    page_size: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db), 
     current_user: User = Depends(get_current_user)
 ):
@@ -869,15 +847,22 @@ def get_related_answers(
     OPTIMIZACIÓN: Solo retorna data esencial (respuestas únicas + correlaciones).
     NO incluye formularios completos para reducir el payload drásticamente.
 
+    Parámetros opcionales (solo para opciones que salen de respuestas):
+    - `q`: búsqueda por prefijo del valor.
+    - `page` / `page_size`: paginación; sin `page` se devuelven todas.
+
     Retorna:
     --------
     dict:
         - `source`: origen de los datos
         - `data`: lista de respuestas únicas con el campo `name`
         - `correlations`: mapeo de correlaciones entre respuestas
+        - `value_pagination`: solo si se pidió `page`
     """
     
-    return get_related_or_filtered_answers_optimized(db, question_id)
+    return get_related_or_filtered_answers_optimized(
+        db, question_id, q=q, value_page=page, value_page_size=page_size
+    )
 
 
 
@@ -1653,8 +1638,8 @@ def update_question_endpoint(
     # igual (incluido un duplicado histórico) se permite sin tocarlo.
     if (
         payload.question_text is not None
-        and _normalize_question_text(payload.question_text)
-        != _normalize_question_text(question.question_text)
+        and question_text_key(payload.question_text)
+        != question_text_key(question.question_text)
     ):
         dup = _find_duplicate_question(db, payload.question_text, exclude_id=question_id)
         if dup:
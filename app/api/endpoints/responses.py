@@ -14,8 +14,10 @@ from app.api.controllers.pdf_form_exporter import generate_form_pdf
 from app.database import get_db
 from app.schemas import UpdateMathOperationRequest, AnswerHistoryChangeSchema, AnswerHistoryCreate, BitacoraLogsSimpleAnswer, BitacoraLogsSimpleCreate, BitacoraResponse, FileSerialCreate, FilteredAnswersResponse, GetQuestionTextsRequest, GetQuestionTextsResponse, PalabrasClaveCreate, PalabrasClaveOut, PalabrasClaveUpdate, PostCreate, QuestionAnswerDetailSchema, QuestionFilterConditionCreate, QuestionTextValue, RegisfacialAnswerResponse, RelationOperationMathCreate, RelationOperationMathOut, ResponseItem, ResponseWithAnswersAndHistorySchema, UpdateAnswerText, UpdateAnswertHistory
 from app.models import Answer, AnswerFileSerial, AnswerHistory, ApprovalStatus, BitacoraLogsSimple, ClasificacionBitacoraRelacion, Form, FormAnswerEditor, FormApproval, FormCategory, FormQuestion, FormatType, PalabrasClave, Question, QuestionFilterCondition, QuestionType, RelationBitacora, RelationOperationMath, Response, ResponseApproval, ResponseApprovalRequirement, ResponseStatus, UploadedFile, User, UserType
+from app.core.db_pools import statement_timeout
+from app.core.read_replica import get_read_db
 from app.core.security import get_current_user, require_roles
-from app.core import field_access, response_scope
+from app.core import change_feed, field_access, response_rollups, response_scope
 from typing import Dict
 from sqlalchemy import delete, cast, Text as SAText
 from app.redis_client import redis_client
@@ -34,7 +36,7 @@ def extract_repeated_id(responses: List[ResponseItem]) -> Optional[str]:
     return None
 
 @router.post("/save-response/{form_id}")
-async def save_response(  # 🆕 Ahora es async
+def save_response(  # 🆕 Ahora es async
     form_id: int,
     responses: List[ResponseItem] = Body(...),
     mode: str = Query("online", enum=["online", "offline"]),
@@ -85,8 +87,8 @@ async def save_response(  # 🆕 Ahora es async
 
     repeated_id = extract_repeated_id(responses)
     
-    # 🆕 Ahora llamamos con await y pasamos current_user y request
-    result = await post_create_response(
+    # 🆕 Pasamos current_user y request
+    result = post_create_response(
         db=db,
         form_id=form_id,
         user_id=current_user.id,
@@ -156,7 +158,7 @@ def _enforce_edit_permission(response: Response, form: Form, current_user: User,
 
 
 @router.post("/save-answers/")
-async def create_answer(
+def create_answer(
     request: Request,
     payload: Union[PostCreate, List[PostCreate]] = Body(...),
     action: str = Query("send", enum=["send", "send_and_close"]),
@@ -230,7 +232,7 @@ async def create_answer(
             )
 
         # Pasar id_relation_bitacora
-        await create_answer_in_db(
+        create_answer_in_db(
             answer,
             db,
             current_user,
@@ -264,7 +266,7 @@ async def create_answer(
         return {"message": "Answer created", "answer": payload}
 
 @router.post("/close-response/{response_id}")
-async def close_response(
+def close_response(
     response_id: int,
     request: Request,
     db: Session = Depends(get_db),
@@ -343,7 +345,7 @@ async def close_response(
 
     # Enviar notificaciones
     send_mails_to_next_supporters(response_id, db)
-    await send_form_action_emails(form.id, db, current_user, request)
+    send_form_action_emails(form.id, db, current_user, request)
 
     return {
         "message": "Response submitted for approval successfully", 
@@ -413,7 +415,7 @@ def _detect_upload_type(head: bytes, original_name: str) -> Optional[tuple]:
 
 
 @router.post("/upload-file/")
-async def upload_file(
+def upload_file(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -436,7 +438,7 @@ async def upload_file(
     - 500: error al guardar o registrar el archivo.
     """
     # 1. Leer cabecera y validar tipo
-    head = await file.read(UPLOAD_HEAD)
+    head = file.file.read(UPLOAD_HEAD)
     detected = _detect_upload_type(head, file.filename or "")
     if detected is None:
         raise HTTPException(status_code=415, detail="Tipo de archivo no permitido")
@@ -455,7 +457,7 @@ async def upload_file(
         with open(file_path, "wb") as out:
             out.write(head)
             while True:
-                chunk = await file.read(UPLOAD_CHUNK)
+                chunk = file.file.read(UPLOAD_CHUNK)
                 if not chunk:
                     break
                 size += len(chunk)
@@ -503,7 +505,7 @@ async def upload_file(
 
 
 @router.get("/download-file/{file_name}")
-async def download_file(
+def download_file(
     file_name: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -1243,7 +1245,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 @router.post("/create-answers", status_code=status.HTTP_201_CREATED)
-async def create_answers(
+def create_answers(
     response_id: int,
     question_id: int,
     answer_text: Optional[str] = None,
@@ -1326,6 +1328,10 @@ async def create_answers(
             "form_design_element_id": form_design_element_id
         }
         
+    except HTTPException:
+        # p. ej. 409 de un valor ya registrado en una pregunta "no repetida"
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"❌ Error creando respuesta: {str(e)}")
@@ -1380,7 +1386,7 @@ def update_answer_text(data: UpdateAnswertHistory, db: Session = Depends(get_db)
 
 
 @router.delete("/answers/{answer_id}", status_code=status.HTTP_200_OK)
-async def delete_answer(
+def delete_answer(
     answer_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -1423,7 +1429,7 @@ async def delete_answer(
     return {"message": f"Answer {answer_id} deleted successfully"}
 
 @router.get("/{response_id}/answers_and_history", response_model=ResponseWithAnswersAndHistorySchema)
-async def get_response_with_complete_answers_and_history(
+def get_response_with_complete_answers_and_history(
     response_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -1770,7 +1776,7 @@ def get_responses_with_answers(
 
     return result
 @router.delete("/responses_delete/{response_id}")
-async def delete_response(
+def delete_response(
     response_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -1806,6 +1812,9 @@ async def delete_response(
         # seguían apuntándolas y la FK reventaba. Quien diligenció no podía
         # eliminar una respuesta en cuanto un aprobador escribía algo en ella.
         tree_ids = response_scope.response_tree_ids(db, response_id)
+        # Día de los rollups que hay que rehacer al final (los borrados de
+        # abajo van directo a la BD, sin pasar por el listener).
+        rollup_keys = response_rollups.keys_of(db.connection(), tree_ids)
 
         # 1. Obtener IDs de las respuestas (Answer)
         answer_ids = db.query(Answer.id).filter(Answer.response_id.in_(tree_ids)).all()
@@ -1850,6 +1859,8 @@ async def delete_response(
         db.execute(
             delete(Response).where(Response.id == response_id)
         )
+        response_rollups.refresh_keys(db.connection(), rollup_keys)
+        change_feed.record(db.connection(), "response", "delete", tree_ids)
 
         # Confirmar cambios
         db.commit()
@@ -1894,7 +1905,7 @@ def reset_reconsideration_requested(
 
 
 @router.get("/answers/regisfacial", response_model=List[RegisfacialAnswerResponse])
-async def get_regisfacial_answers(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_regisfacial_answers(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Obtiene todas las respuestas de preguntas tipo 'regisfacial' sin duplicar person_id
     y genera un hash encriptado con la información específica.
@@ -2719,7 +2730,7 @@ def crear_operacion_matematica(
 
 
 @router.put("/update-answer/{answer_id}", status_code=status.HTTP_200_OK)
-async def update_answer(
+def update_answer(
     answer_id: int,
     answer_text: str = Body(..., embed=True),
     db: Session = Depends(get_db),
@@ -2795,6 +2806,9 @@ async def update_answer(
         }
         
     except HTTPException:
+        # 404/403 de arriba, o 409 de un valor ya registrado en una pregunta
+        # "no repetida" al confirmar.
+        db.rollback()
         raise
     except Exception as e:
         db.rollback()
@@ -3063,7 +3077,9 @@ def editar_operacion_matematica(
 # aprobador o respondiente. Misma lógica IDOR que el resto del módulo.
 # ═══════════════════════════════════════════════════════════════════════════════
 
-from sqlalchemy import and_, or_, func as sa_func
+from sqlalchemy import and_, or_, func as sa_func, select, union
+from app.core import answer_search, keyset
+from types import SimpleNamespace
 
 class ResponseSearchRequest(__import__("pydantic").BaseModel):
     form_id: Optional[int] = None
@@ -3072,30 +3088,38 @@ class ResponseSearchRequest(__import__("pydantic").BaseModel):
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
     text_match: Optional[str] = None  # buscar texto en answer_text
+    # Con text_match: ordenar por relevancia y devolver el fragmento encontrado.
+    ranked: bool = False
     limit: int = 50
     offset: int = 0
+    # Paginación por cursor: el `next_cursor` de la página anterior.
+    cursor: Optional[str] = None
+    include_total: bool = True
 
 
-def _user_visible_form_ids(db: Session, user: User) -> List[int]:
-    """Calcula qué form_ids puede ver el user: propios, moderador, aprobador, respondiente.
-    Simplificado para el endpoint search; suficiente para casos comunes."""
-    own_q = db.query(Form.id).filter(Form.user_id == user.id)
-    moderator_q = db.query(FormQuestion.form_id).filter(False)  # placeholder
-    # Aprobador
-    approver_q = db.query(FormApproval.form_id).filter(FormApproval.user_id == user.id)
-    # Respondiente: forms donde tenga respuestas
-    responder_q = db.query(Response.form_id).filter(Response.user_id == user.id)
-    ids = set()
-    for q in (own_q, approver_q, responder_q):
-        for (fid,) in q.all():
-            ids.add(fid)
+def _user_visible_form_ids(db: Session, user: User):
+    """Subconsulta de los form_ids que puede ver el user: propios, aprobador,
+    respondiente. Simplificado para el endpoint search; suficiente para casos comunes.
+
+    Se usa como semi-join (`Response.form_id.in_(visible)`): Postgres la
+    resuelve junto con la búsqueda en vez de traer las listas a Python.
+    """
     # admin/creator ven todo
     if str(getattr(user, "user_type", "") or "").lower() in ("admin", "creator"):
         return None  # marker para sin filtro
-    return list(ids)
+    own_q = select(Form.id).where(Form.user_id == user.id)
+    # Aprobador
+    approver_q = select(FormApproval.form_id).where(FormApproval.user_id == user.id)
+    # Respondiente: forms donde tenga respuestas
+    responder_q = select(Response.form_id).where(
+        Response.user_id == user.id, response_scope.IS_SUBMISSION
+    )
+    return union(own_q, approver_q, responder_q).scalar_subquery()
 
 
-@router.post("/search")
+# Búsqueda interactiva: un texto que no acota nada no debe retener una
+# conexión del pool por el minuto completo del statement_timeout general.
+@router.post("/search", dependencies=[statement_timeout(15000)])
 def search_responses(
     payload: ResponseSearchRequest,
     db: Session = Depends(get_db),
@@ -3105,13 +3129,18 @@ def search_responses(
     (usar GET /responses/{id} para el detalle).
 
     Filtros disponibles: form_id, user_id, status (draft|submitted|approved|rejected),
-    date_from, date_to (rango sobre submitted_at), text_match (LIKE en answer_text).
+    date_from, date_to (rango sobre submitted_at), text_match (texto en answer_text,
+    sin distinguir mayúsculas ni tildes).
+
+    Con `ranked` (y text_match) el orden es por relevancia: cada item trae
+    `score` y el `snippet` donde aparecen las palabras; pagina con offset.
+    Sin `ranked` el orden es por fecha y se puede paginar con `cursor`
+    (el `next_cursor` de la página anterior) en vez de offset.
+    `include_total=false` se salta el conteo total.
     """
     visible = _user_visible_form_ids(db, current_user)
     q = db.query(Response)
     if visible is not None:  # no es admin/creator
-        if not visible:
-            return {"total": 0, "items": []}
         q = q.filter(Response.form_id.in_(visible))
 
     if payload.form_id is not None:
@@ -3131,22 +3160,46 @@ def search_responses(
         q = q.filter(Response.submitted_at >= payload.date_from)
     if payload.date_to:
         q = q.filter(Response.submitted_at <= payload.date_to)
-    if payload.text_match:
-        match_ids = (
-            db.query(Answer.response_id)
-            .filter(Answer.answer_text.ilike(f"%{payload.text_match}%"))
-            .distinct()
-            .subquery()
+
+    ranked = bool(payload.ranked and payload.text_match)
+    if ranked:
+        matches = answer_search.ranked_matches(payload.text_match)
+        q = (
+            q.join(matches, matches.c.response_id == Response.id)
+            .add_columns(matches.c.score, matches.c.answer_id)
+        )
+    elif payload.text_match:
+        q = q.filter(
+            select(Answer.id)
+            .where(
+                Answer.response_id == Response.id,
+                answer_search.text_match_clause(payload.text_match),
+            )
+            .exists()
         )
-        q = q.filter(Response.id.in_(match_ids))
 
-    total = q.count()
-    items = (
-        q.order_by(Response.submitted_at.desc())
-        .offset(max(0, payload.offset))
-        .limit(min(200, max(1, payload.limit)))
-        .all()
-    )
+    total = q.count() if payload.include_total else None
+    limit = min(200, max(1, payload.limit))
+    next_cursor = None
+    if ranked:
+        rows = (
+            q.order_by(matches.c.score.desc(), Response.id.desc())
+            .offset(max(0, payload.offset))
+            .limit(limit)
+            .all()
+        )
+        items = [row[0] for row in rows]
+        scores = {row[0].id: (row.score, row.answer_id) for row in rows}
+        found = answer_search.snippets(db, [answer_id for _, answer_id in scores.values()], payload.text_match)
+    else:
+        q = q.order_by(*keyset.newest_first(Response.submitted_at, Response.id))
+        if payload.cursor:
+            q = keyset.after_cursor(q, Response.submitted_at, Response.id, payload.cursor)
+        else:
+            q = q.offset(max(0, payload.offset))
+        items, next_cursor = keyset.page_of(
+            q.limit(limit + 1).all(), limit, lambda r: (r.submitted_at, r.id)
+        )
     # Cargar títulos de formato + usuario en batch
     form_ids = {r.form_id for r in items}
     user_ids = {r.user_id for r in items}
@@ -3159,7 +3212,7 @@ def search_responses(
 
     out = []
     for r in items:
-        out.append({
+        item = {
             "response_id": r.id,
             "form_id": r.form_id,
             "form_title": forms_map.get(r.form_id),
@@ -3168,30 +3221,30 @@ def search_responses(
             "status": r.status.value if hasattr(r.status, "value") else str(r.status),
             "mode": r.mode,
             "submitted_at": r.submitted_at.isoformat() if r.submitted_at else None,
-        })
-    return {"total": total, "items": out}
+        }
+        if ranked:
+            score, answer_id = scores[r.id]
+            item["score"] = round(float(score or 0), 4)
+            item["snippet"] = found.get(answer_id)
+        out.append(item)
+    return {"total": total, "items": out, "next_cursor": next_cursor}
 
 
 class ResponseAggregateRequest(__import__("pydantic").BaseModel):
     form_id: Optional[int] = None
     group_by: str  # "status" | "user" | "month" | "day" | "form"
-    metric: str = "count"  # "count" | "avg_approval_hours"
+    metric: str = "count"  # "count" | "avg_approval_hours" | "sum" | "avg"
+    # Para sum/avg: la pregunta numérica que se suma (Answer.value_num).
+    question_id: Optional[int] = None
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
 
 
-@router.post("/aggregate")
-def aggregate_responses(
-    payload: ResponseAggregateRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    """Agregaciones sobre respuestas. group_by determina la dimensión y metric el valor."""
-    visible = _user_visible_form_ids(db, current_user)
+def _aggregate_raw(db: Session, payload: "ResponseAggregateRequest", visible):
+    """Agregación directa sobre `responses`: lo que no sale de los rollups
+    (sum/avg de una pregunta) o cuando piden una agrupación desconocida."""
     base = db.query(Response)
     if visible is not None:
-        if not visible:
-            return {"group_by": payload.group_by, "metric": payload.metric, "buckets": []}
         base = base.filter(Response.form_id.in_(visible))
     if payload.form_id is not None:
         base = base.filter(Response.form_id == payload.form_id)
@@ -3203,17 +3256,13 @@ def aggregate_responses(
     # Group by
     if payload.group_by == "status":
         key_col = Response.status
-        key_label = "status"
     elif payload.group_by == "user":
         key_col = Response.user_id
-        key_label = "user_id"
     elif payload.group_by == "form":
         key_col = Response.form_id
-        key_label = "form_id"
     elif payload.group_by in ("month", "day"):
         trunc = "month" if payload.group_by == "month" else "day"
         key_col = sa_func.date_trunc(trunc, Response.submitted_at)
-        key_label = payload.group_by
     else:
         raise HTTPException(
             status_code=422,
@@ -3242,13 +3291,51 @@ def aggregate_responses(
             joined.with_entities(key_col.label("key"), (sa_func.avg(delta_seconds) / 3600.0).label("value"))
             .group_by(key_col)
         )
+    elif payload.metric in ("sum", "avg"):
+        if payload.question_id is None:
+            raise HTTPException(status_code=422, detail="sum/avg requieren question_id")
+        agg = sa_func.sum if payload.metric == "sum" else sa_func.avg
+        q = (
+            base.join(Answer, and_(
+                Answer.response_id == Response.id,
+                Answer.question_id == payload.question_id,
+            ))
+            .with_entities(key_col.label("key"), agg(Answer.value_num).label("value"))
+            .group_by(key_col)
+        )
     else:
         raise HTTPException(
             status_code=422,
-            detail="metric inválido. Valores: count | avg_approval_hours",
+            detail="metric inválido. Valores: count | avg_approval_hours | sum | avg",
         )
 
-    rows = q.all()
+    return q.all()
+
+
+@router.post("/aggregate")
+def aggregate_responses(
+    payload: ResponseAggregateRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Agregaciones sobre respuestas. group_by determina la dimensión y metric el valor.
+
+    sum/avg suman en la BD la copia numérica (`Answer.value_num`) de la
+    respuesta a `question_id`; las que no son número no cuentan.
+
+    count y avg_approval_hours salen de los rollups diarios
+    (`app.core.response_rollups`); sum/avg van directo a las respuestas.
+    """
+    visible = _user_visible_form_ids(db, current_user)
+    key_label = {"status": "status", "user": "user_id", "form": "form_id"}.get(payload.group_by, payload.group_by)
+    rolled = response_rollups.aggregate(
+        db, payload.group_by, payload.metric, form_ids=visible, form_id=payload.form_id,
+        date_from=payload.date_from, date_to=payload.date_to,
+    )
+    if rolled is not None:
+        rows = [SimpleNamespace(key=key, value=value) for key, value in rolled]
+    else:
+        rows = _aggregate_raw(db, payload, visible)
     buckets = []
     for row in rows:
         k = row.key
@@ -3296,32 +3383,27 @@ def aggregate_responses(
 @router.get("/aggregate")
 def aggregate_responses_global(
     since: Optional[str] = Query(None, description="ISO8601 — solo respuestas desde esta fecha"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    primary_db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """SM-CARGO-04 · Conteo global de respuestas por formulario y semana ISO.
     Lo consume el Cargo 3 (Analista) para tendencias de volumen sin iterar form
     por form. ArIA solo LEE. Requiere admin/creator."""
-    from sqlalchemy import func
     if current_user.user_type not in (UserType.admin, UserType.creator):
         raise HTTPException(status_code=403, detail="Requiere rol admin/creator")
 
-    week = func.to_char(func.date_trunc('week', Response.submitted_at), 'IYYY-"W"IW')
-    q = (
-        db.query(
-            Response.form_id, Form.title,
-            week.label("period"), func.count(Response.id).label("count"),
-        )
-        .join(Form, Response.form_id == Form.id)
-    )
+    dt = None
     if since:
         try:
             dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
         except ValueError:
             raise HTTPException(status_code=422, detail="`since` debe ser ISO8601")
-        q = q.filter(Response.submitted_at >= dt)
 
-    rows = q.group_by(Response.form_id, Form.title, week).order_by(week).all()
+    # Desde los rollups diarios (app.core.response_rollups). Ponerlos al día
+    # escribe, así que va al primario; el conteo se lee de la réplica.
+    response_rollups.ensure_rollups(primary_db)
+    rows = response_rollups.weekly_counts(db, since=dt, ensure=False)
     return {
         "data": [
             {"form_id": fid, "form_name": title, "period": period, "count": cnt}
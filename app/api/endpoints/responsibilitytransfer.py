@@ -1,7 +1,7 @@
 from typing import Any, Dict, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from requests import Session
+from sqlalchemy.orm import Session
 
 from app.api.controllers.responsibility_service import ResponsibilityTransferService
 from app.core.security import get_current_user, require_roles
@@ -25,7 +25,7 @@ class BatchTransferRequest(BaseModel):
 router = APIRouter()
 
 @router.post("/transfer-responsibilities")
-async def transfer_responsibilities(
+def transfer_responsibilities(
     request: TransferRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -50,7 +50,7 @@ async def transfer_responsibilities(
         raise HTTPException(status_code=400, detail="No se pudo procesar la solicitud")
 
 @router.post("/transfer-specific-responsibilities")
-async def transfer_specific_responsibilities(
+def transfer_specific_responsibilities(
     request: SpecificTransferRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin])),
@@ -81,7 +81,7 @@ async def transfer_specific_responsibilities(
         raise HTTPException(status_code=400, detail="No se pudo procesar la solicitud")
 
 @router.get("/user-responsibilities/{user_id}")
-async def get_user_responsibilities(
+def get_user_responsibilities(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
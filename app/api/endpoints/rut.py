@@ -102,7 +102,7 @@ def delete_rut_config(
 # ── 2. Subir RUT (desde diligenciamiento) ───────────────────
 
 @router.post("/upload/{form_id}")
-async def upload_rut(
+def upload_rut(
     form_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -114,7 +114,7 @@ async def upload_rut(
     file_path = os.path.join(UPLOAD_FOLDER, unique_name)
 
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    content = await file.read()
+    content = file.file.read()
     if len(content) > 25 * 1024 * 1024:
         raise HTTPException(status_code=413, detail="Archivo excede 25 MB")
 
@@ -3,13 +3,21 @@ Endpoints de seguridad (solo lectura) para Los Cargos de ArIA.
 
 SM-CARGO-01: expone los eventos de autenticación que vigila el Cargo 7
 (Seguridad): logins fallidos, accesos, etc. ArIA solo LEE.
+
+/changes es el feed de cambios (respuestas, aprobaciones, autenticación y
+usuarios) para sincronizar por cursor en vez de releer todo.
+
+/profile-token y /profiles/{id}: perfilado bajo demanda de un request lento
+(ver app/core/profiling.py).
 """
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
+from app.core import change_feed, profiling
 from app.database import get_db
 from app.core.security import get_current_user
 from app.models import User, UserType, AuthEvent
@@ -56,3 +64,64 @@ def get_auth_events(
             for e in rows
         ]
     }
+
+
+@router.get("/changes")
+def get_changes(
+    after: int = Query(0, ge=0, description="cursor: `next_cursor` de la lectura anterior (0 = desde el inicio)"),
+    limit: int = Query(change_feed.DEFAULT_BATCH, ge=1, le=change_feed.MAX_BATCH),
+    topics: Optional[List[str]] = Query(None, description="response | approval | auth | user"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Feed de cambios posteriores a `after`, en orden. Solo admin.
+
+    Se lee en bucle: mientras `has_more` sea true, pedir de inmediato con
+    `after=next_cursor`; si es false, esperar `retry_after_seconds`. Si el
+    cursor guardado es menor que `oldest_cursor`, hubo eventos purgados: toca
+    resincronizar completo.
+    """
+    if current_user.user_type != UserType.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Requiere rol de administrador",
+        )
+    unknown = sorted(set(topics or []) - set(change_feed.TOPICS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Temas desconocidos: {', '.join(unknown)}")
+
+    return change_feed.events_after(db, after=after, limit=limit, topics=topics)
+
+
+def _require_admin(current_user: User) -> None:
+    if current_user.user_type != UserType.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Requiere rol de administrador",
+        )
+
+
+@router.post("/profile-token")
+def create_profile_token(current_user: User = Depends(get_current_user)):
+    """Token para perfilar requests durante 10 minutos. Solo admin.
+
+    Se manda en la cabecera `X-Profile` (o `?__profile=`) del request a
+    perfilar; la respuesta trae `X-Profile-Id` para ver el reporte.
+    """
+    _require_admin(current_user)
+    return profiling.make_token()
+
+
+@router.get("/profiles/{report_id}")
+def get_profile_report(
+    report_id: str,
+    kind: str = Query("html", description="html (árbol + SQL) | folded (para flamegraph/speedscope)"),
+    current_user: User = Depends(get_current_user),
+):
+    """Reporte de un request perfilado. Solo admin."""
+    _require_admin(current_user)
+    path = profiling.report_path(report_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Reporte no encontrado")
+    media_type = "text/html" if kind == "html" else "text/plain"
+    return FileResponse(path, media_type=media_type)
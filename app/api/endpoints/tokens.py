@@ -7,8 +7,10 @@ y para poder calibrar los precios con datos reales antes de activar el cobro.
 
 Modelo: los tokens son CAPACIDAD OCUPADA, no consumo. Lo que existe ocupa; lo
 que se borra libera. No hay "gasto histórico" que perseguir, así que el ocupado
-se CALCULA EN VIVO contando lo que hay. Es siempre correcto por construcción:
-no puede desincronizarse como un contador incremental.
+sale de contar lo que hay. Para no recorrer cuatro tablas en cada llamada, los
+conteos vienen de contadores que mantienen triggers de la BD en la misma
+transacción de cada alta o baja, y que se reconcilian con un conteo real cada
+noche (app/core/token_counters.py). Siguen siendo exactos.
 
 Ver el diseño completo en DISENO_tokens_licenciamiento.md (raíz del proyecto).
 """
@@ -18,6 +20,7 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.core import token_counters
 from app.core.security import require_roles
 from app.database import get_db
 from app.models import User, UserType
@@ -38,14 +41,8 @@ _ADMIN = require_roles([UserType.admin])
 
 
 def _ocupacion(db: Session) -> dict:
-    """Cuenta la capacidad ocupada ahora mismo, en una sola consulta."""
-    fila = db.execute(text("""
-        SELECT
-            (SELECT count(*) FROM users)             AS usuarios,
-            (SELECT count(*) FROM forms)             AS formatos,
-            (SELECT count(*) FROM forms_movimientos) AS movimientos,
-            (SELECT count(*) FROM form_questions)    AS vinculos
-    """)).mappings().one()
+    """La capacidad ocupada ahora mismo, desde los contadores."""
+    fila = token_counters.contadores(db)
 
     desglose = [
         {"concepto": "Usuarios",    "cantidad": fila["usuarios"],
@@ -102,19 +99,29 @@ def por_formato(
     """Qué formatos ocupan más tokens. El coste de un formato es su tarifa base
     más 2 por cada campo vinculado, así que los formatos con muchos campos
     dominan la factura aunque nadie lo note."""
+    # Los campos se cuentan en UN agrupado sobre form_questions y se cruzan con
+    # forms por id; el creador se busca solo para los `limite` que se devuelven.
     filas = db.execute(text("""
-        SELECT f.id,
-               f.title,
-               f.is_enabled,
-               u.name                            AS creador,
-               count(fq.id)                      AS campos,
-               :base + count(fq.id) * :vinc      AS tokens
-        FROM forms f
-        LEFT JOIN form_questions fq ON fq.form_id = f.id
-        LEFT JOIN users u           ON u.id = f.user_id
-        GROUP BY f.id, f.title, f.is_enabled, u.name
-        ORDER BY tokens DESC
-        LIMIT :limite
+        WITH top AS (
+            SELECT f.id,
+                   f.title,
+                   f.is_enabled,
+                   f.user_id,
+                   coalesce(fq.campos, 0)                 AS campos,
+                   :base + coalesce(fq.campos, 0) * :vinc AS tokens
+            FROM forms f
+            LEFT JOIN (
+                SELECT form_id, count(*) AS campos
+                FROM form_questions
+                GROUP BY form_id
+            ) fq ON fq.form_id = f.id
+            ORDER BY tokens DESC, f.id
+            LIMIT :limite
+        )
+        SELECT top.id, top.title, top.is_enabled, u.name AS creador, top.campos, top.tokens
+        FROM top
+        LEFT JOIN users u ON u.id = top.user_id
+        ORDER BY top.tokens DESC, top.id
     """), {"base": TOKENS_FORMATO, "vinc": TOKENS_VINCULO, "limite": limite}).mappings().all()
 
     return {"items": [dict(f) for f in filas]}
@@ -19,6 +19,7 @@ from app.models import (Answer, EmailConfig, Form, FormApproval, FormModerators,
                         Response, ResponseApproval, User, UserCategory, UserType)
 from app.crud import _extract_style_config, _serialize_answers, create_email_config, create_user, create_user_category, create_user_with_random_password, delete_user_category_by_id, fetch_all_users, fetch_users_selectable, generate_random_password, get_all_email_configs, get_all_user_categories, get_user, get_user_by_document, prepare_and_send_file_to_emails, update_user, get_user_by_email, get_users, update_user_info_in_db
 from app.schemas import EmailConfigCreate, EmailConfigResponse, EmailConfigUpdate, EmailStatusUpdate, UpdateRecognitionId, UpdateUserCategory, UserAdminUpdate, UserBaseCreate, UserCategoryCreate, UserCategoryResponse, UserCreate, UserResponse, UserSelfUpdate, UserUpdate, UserUpdateInfo
+from app.core.read_replica import get_export_db, get_export_user
 from app.core.security import get_current_user, hash_password, require_roles
 from app.api.controllers.password_reset_mail import send_password_reset_email
 
@@ -329,8 +330,8 @@ def download_user_responses_pdf_by_admin(
 @router.get("/{form_id}/questions-answers/pdf/all-users")
 def download_all_responses_pdf(
     form_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
+    db: Session = Depends(get_export_db),
+    current_user: User = Depends(require_roles([UserType.admin, UserType.creator], user_dependency=get_export_user)),
 ):
     """
     Genera un PDF con TODAS las respuestas de todos los usuarios.
@@ -841,7 +842,7 @@ def admin_reset_user_password(
     }
 
 @router.post("/send-file-emails")
-async def send_file_to_emails(
+def send_file_to_emails(
     file: UploadFile = File(...),
     emails: List[str] = FastAPIForm(...),
     name_form: str = FastAPIForm(...),
@@ -973,7 +974,7 @@ def create_user_auto_password(
     return create_user_with_random_password(db, user)
 
 @router.put("/users/update_user_type")
-async def update_user_type(
+def update_user_type(
     num_document: str, 
     user_type: str, 
     db: Session = Depends(get_db), 
@@ -1474,7 +1475,7 @@ def get_element_uuid_by_question(form_design, question_id):
 
 
 @router.post("/migrate/form-design-elements", response_model=MigrationResponse)
-async def migrate_form_design_elements(
+def migrate_form_design_elements(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator]))
 ):
@@ -1597,7 +1598,7 @@ async def migrate_form_design_elements(
 # 🆕 ENDPOINT ADICIONAL: Ver estadísticas de migración
 # H-BW-003: Solo admin/creator pueden acceder
 @router.get("/migrate/stats")
-async def get_migration_stats(
+def get_migration_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator]))
 ):
@@ -1626,7 +1627,7 @@ async def get_migration_stats(
 # 🆕 ENDPOINT ADICIONAL: Ver answers problemáticos
 # H-BW-003: Solo admin/creator pueden acceder
 @router.get("/migrate/problematic")
-async def get_problematic_answers(
+def get_problematic_answers(
     limit: int = 50,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_roles([UserType.admin, UserType.creator]))
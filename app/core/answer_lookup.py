@@ -0,0 +1,517 @@
+"""Autocompletado desde respuestas de otros formatos, ya indexado.
+
+Hay dos clases de campo que ofrecen como opciones lo que se respondió en otro
+formato:
+
+  · relación de tabla (`QuestionTableRelation.related_question_id`): los
+    valores de la pregunta relacionada, en todos los formatos que la tienen;
+  · condición de filtro (`QuestionFilterCondition`): los valores de la
+    pregunta fuente en las filas donde se cumple la condición.
+
+Cada opción trae además los demás campos de SU fila (correlaciones) para
+autollenar. Armarlas obligaba a cargar todas las respuestas de los formatos de
+origen y reconstruir sus filas en cada apertura del campo.
+
+Aquí quedan armadas en `answer_lookup_entries`, una fila por opción:
+
+  · se arma completo la primera vez que alguien lee el campo;
+  · cada vez que se escriben answers de un formato de origen se rehacen las
+    opciones de ESAS respuestas, en la misma transacción;
+  · lo que llega por otro backend (respuestas nuevas) se indexa al leer, desde
+    la última respuesta indexada;
+  · si cambia la relación, la condición o los formatos que tienen la pregunta
+    relacionada, el índice de esa pregunta se descarta y se vuelve a armar;
+  · cada noche se rehacen los ya armados (`refresh_answer_lookup`), que recoge
+    lo que ese otro backend haya EDITADO. No se descartan: se siguen leyendo
+    mientras tanto.
+
+Armar o ponerse al día al leer va en una sesión propia del pool de lotes: no
+confirma ni deshace la sesión de la petición.
+
+    values, correlations, total, responses = lookup_page(db, source, q="ped", page=1)
+    python -m app.core.answer_lookup       # lo mismo que la tarea nocturna
+"""
+
+import logging
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, distinct, event, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.response_scope import IS_SUBMISSION
+from app.database import BatchSessionLocal
+from app.models import (
+    Answer, AnswerLookupEntry, AnswerLookupSource, FormQuestion,
+    QuestionFilterCondition, QuestionTableRelation, Response,
+)
+
+logger = logging.getLogger(__name__)
+
+# Respuestas por lote al armar el índice de una pregunta.
+_BUILD_BATCH = 500
+
+
+def answer_rows(answers):
+    """
+    Reconstruye las FILAS de una respuesta a partir de sus answers, para que el
+    autocompletado empareje los campos de UNA MISMA fila de repetidor
+    (ej. cédula ↔ nombre ↔ apellido de la fila i) y no mezcle filas.
+
+    - Si los answers traen `repeater_row_index`, ordena/empareja por él.
+    - Si no, reconstruye por POSICIÓN dentro de cada columna (mismo criterio que
+      los exportadores PDF/Excel).
+    - Un campo con un solo valor (top-level, fuera del repetidor) se comparte en
+      todas las filas.
+    - Un ARCHIVO sin descripción cuenta como respuesta y se identifica por el
+      nombre del archivo (ver nota abajo).
+
+    Devuelve una lista de dicts { question_id: answer_text }, una por fila.
+    """
+    from collections import defaultdict
+    cols = defaultdict(list)
+    for a in answers:
+        texto = a.answer_text
+        # Un adjunto es una respuesta válida aunque no traiga descripción: el
+        # archivo se guarda con `answer_text` = descripción y `file_path` aparte,
+        # y la descripción casi nunca se llena. Descartarlo aquí lo dejaba fuera
+        # de la fila, así que no llegaba a las correlaciones y el autocompletado
+        # dejaba el campo vacío — y sin valor tampoco aparece el enlace de
+        # descarga, que se activa cuando el valor coincide con el nombre listado.
+        #
+        # Se usa el MISMO criterio que la lista de opciones (get_file_answers,
+        # `display_name = answer_text or file_name`) para que ambos lados hablen
+        # de la misma etiqueta.
+        if (texto is None or texto == '') and a.file_path:
+            texto = a.file_path.split("/")[-1].split("\\")[-1]
+        if texto is None or texto == '':
+            continue
+        order = a.repeater_row_index if a.repeater_row_index is not None else (a.id or 0)
+        cols[a.question_id].append((order, texto))
+    for qid in cols:
+        cols[qid].sort(key=lambda t: t[0])
+        cols[qid] = [t[1] for t in cols[qid]]
+
+    n_rows = max((len(v) for v in cols.values()), default=0)
+    rows = []
+    for i in range(n_rows):
+        row = {}
+        for qid, vals in cols.items():
+            if i < len(vals):
+                row[qid] = vals[i]
+            elif len(vals) == 1:
+                row[qid] = vals[0]  # campo compartido por todas las filas
+        rows.append(row)
+    return rows
+
+
+def condition_met(operator: str, value, expected) -> bool:
+    """Evalúa una `QuestionFilterCondition` sobre un valor: numérico si ambos
+    lados lo son, texto si no."""
+    try:
+        value = float(value)
+        expected = float(expected)
+    except ValueError:
+        value = str(value)
+        expected = str(expected)
+
+    if operator == '==':
+        return value == expected
+    if operator == '!=':
+        return value != expected
+    if operator == '>':
+        return value > expected
+    if operator == '<':
+        return value < expected
+    if operator == '>=':
+        return value >= expected
+    if operator == '<=':
+        return value <= expected
+    return False
+
+
+def lookup_source(connection, question_id: int):
+    """De dónde salen las opciones de `question_id`, o None si no salen de
+    respuestas (tabla externa, seriales, usuario logueado...).
+
+    La condición de filtro manda sobre la relación de tabla, igual que siempre.
+    """
+    condition = connection.execute(
+        select(QuestionFilterCondition)
+        .where(QuestionFilterCondition.filtered_question_id == question_id)
+        .order_by(QuestionFilterCondition.id)
+        .limit(1)
+    ).first()
+    if condition:
+        return SimpleNamespace(
+            question_id=question_id,
+            kind="condicion_filtrada",
+            form_ids=[condition.form_id],
+            value_question_id=condition.source_question_id,
+            condition=condition,
+        )
+
+    relation = connection.execute(
+        select(QuestionTableRelation.related_question_id, QuestionTableRelation.logged_user_part)
+        .where(QuestionTableRelation.question_id == question_id)
+    ).first()
+    if not relation or not relation.related_question_id or relation.logged_user_part:
+        return None
+    form_ids = connection.execute(
+        select(distinct(FormQuestion.form_id))
+        .where(FormQuestion.question_id == relation.related_question_id)
+    ).scalars().all()
+    return SimpleNamespace(
+        question_id=question_id,
+        kind="pregunta_relacionada",
+        form_ids=list(form_ids),
+        value_question_id=relation.related_question_id,
+        condition=None,
+    )
+
+
+def lookup_entries(source, response_id: int, answers) -> List[dict]:
+    """Opciones que aporta una respuesta de origen, una por fila válida."""
+    condition = source.condition
+    entries = []
+    for row_index, row in enumerate(answer_rows(answers)):
+        value = row.get(source.value_question_id)
+        if not value:
+            continue
+        if condition is not None:
+            condition_value = row.get(condition.condition_question_id)
+            if not condition_value or not condition_met(
+                condition.operator, condition_value, condition.expected_value
+            ):
+                continue
+        entries.append({
+            "question_id": source.question_id,
+            "response_id": response_id,
+            "row_index": row_index,
+            "value": value,
+            "correlations": {
+                q_id: text for q_id, text in row.items() if q_id != source.value_question_id
+            },
+        })
+    return entries
+
+
+def _answers_by_response(connection, response_ids: List[int]):
+    rows = connection.execute(
+        select(
+            Answer.id, Answer.response_id, Answer.question_id, Answer.answer_text,
+            Answer.file_path, Answer.repeater_row_index,
+        )
+        .where(Answer.response_id.in_(response_ids))
+        .order_by(Answer.response_id)
+    )
+    current_id, answers = None, []
+    for row in rows:
+        if row.response_id != current_id and answers:
+            yield current_id, answers
+            answers = []
+        current_id = row.response_id
+        answers.append(row)
+    if answers:
+        yield current_id, answers
+
+
+def _index_responses(connection, source, response_ids: List[int]) -> int:
+    """Rehace las opciones de `source` que salen de esas respuestas.
+
+    Dos transacciones pueden indexar la misma respuesta a la vez (un guardado y
+    una lectura que se pone al día): la segunda espera a la primera y pisa sus
+    filas en vez de fallar por uq_answer_lookup_entry.
+    """
+    connection.execute(
+        delete(AnswerLookupEntry).where(
+            AnswerLookupEntry.question_id == source.question_id,
+            AnswerLookupEntry.response_id.in_(response_ids),
+        )
+    )
+    entries = [
+        entry
+        for response_id, answers in _answers_by_response(connection, response_ids)
+        for entry in lookup_entries(source, response_id, answers)
+    ]
+    if entries:
+        stmt = insert(AnswerLookupEntry)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["question_id", "response_id", "row_index"],
+                set_={"value": stmt.excluded.value, "correlations": stmt.excluded.correlations},
+            ),
+            entries,
+        )
+    return len(entries)
+
+
+def _index_in_batches(connection, source, response_ids: List[int]) -> int:
+    total = 0
+    for start in range(0, len(response_ids), _BUILD_BATCH):
+        total += _index_responses(connection, source, response_ids[start:start + _BUILD_BATCH])
+    return total
+
+
+def _source_responses(source, after_id: int = 0):
+    return (
+        select(Response.id)
+        .where(Response.form_id.in_(source.form_ids), IS_SUBMISSION, Response.id > after_id)
+    )
+
+
+def _source_response_ids(connection, source, after_id: int = 0) -> List[int]:
+    return connection.execute(_source_responses(source, after_id).order_by(Response.id)).scalars().all()
+
+
+def _lock_source(connection, question_id: int, shared: bool = False) -> Optional[int]:
+    """Toma la fila de `answer_lookup_sources` hasta el commit; None si no hay.
+
+    Todo el que toca opciones de una pregunta armada la toma ANTES que sus
+    entradas, así nadie espera entradas de otro mientras el otro espera esta
+    fila. Los guardados (`_sync_answer_lookup`) la toman compartida y no se
+    esperan entre sí; ponerse al día y la tarea nocturna, exclusiva. Descartar
+    el índice (`invalidate_lookup`) borra la fila antes que las entradas.
+    """
+    return connection.execute(
+        select(AnswerLookupSource.last_response_id)
+        .where(AnswerLookupSource.question_id == question_id)
+        .with_for_update(read=shared)
+    ).scalar()
+
+
+def ensure_lookup(db: Session, source) -> None:
+    """Deja al día el índice de `source`: lo arma si no existe y agrega las
+    respuestas que llegaron después de la última indexada.
+
+    Si hay algo que hacer, se hace en una sesión propia del pool de lotes y se
+    confirma ahí: la sesión `db` de la petición solo lee. Si otra petición lo
+    está armando a la vez, esta espera a que termine y lee lo suyo.
+
+    `last_response_id` supone que las respuestas se confirman en orden de id.
+    Una que se confirme después de otra con id mayor ya indexada (una
+    transacción larga de otro backend) queda fuera hasta la tarea nocturna; las
+    que escribe este backend se indexan al guardar y no dependen de esto.
+    """
+    connection = db.connection()
+    last_id = connection.execute(
+        select(AnswerLookupSource.last_response_id)
+        .where(AnswerLookupSource.question_id == source.question_id)
+    ).scalar()
+    if last_id is not None and not _source_response_ids(connection, source, after_id=last_id):
+        return
+
+    with BatchSessionLocal() as batch:
+        try:
+            _catch_up(batch.connection(), source, last_id)
+            batch.commit()
+        except IntegrityError:
+            # Una respuesta borrada mientras se indexaba: la próxima lectura
+            # vuelve a intentar.
+            batch.rollback()
+
+
+def _catch_up(connection, source, last_id: Optional[int]) -> None:
+    if last_id is None:
+        created = connection.execute(
+            insert(AnswerLookupSource)
+            .values(question_id=source.question_id, last_response_id=0)
+            .on_conflict_do_nothing()
+            .returning(AnswerLookupSource.question_id)
+        ).first()
+        if created is None:
+            # Otra petición lo armó mientras tanto (esperamos su commit).
+            return
+    elif _lock_source(connection, source.question_id) != last_id:
+        return
+
+    new_ids = _source_response_ids(connection, source, after_id=last_id or 0)
+    total = _index_in_batches(connection, source, new_ids)
+    if new_ids:
+        connection.execute(
+            update(AnswerLookupSource)
+            .where(AnswerLookupSource.question_id == source.question_id)
+            .values(last_response_id=new_ids[-1])
+        )
+    if last_id is None:
+        logger.info("Autocompletado de la pregunta %s armado: %s opciones", source.question_id, total)
+
+
+def lookup_page(
+    db: Session,
+    source,
+    q: Optional[str] = None,
+    page: Optional[int] = None,
+    page_size: int = 100,
+):
+    """Opciones de `source` ya al día.
+
+    `q` filtra por prefijo (sin distinguir mayúsculas). Sin `page` devuelve
+    todas. Devuelve (valores, correlaciones por valor, total de opciones,
+    respuestas distintas).
+    """
+    ensure_lookup(db, source)
+
+    filters = [AnswerLookupEntry.question_id == source.question_id]
+    if q:
+        # Patrón armado aquí (no `startswith`) para que llegue como constante
+        # y el índice por prefijo sirva.
+        prefix = q.lower().replace("/", "//").replace("%", "/%").replace("_", "/_")
+        filters.append(func.lower(AnswerLookupEntry.value).like(prefix + "%", escape="/"))
+
+    stmt = (
+        select(AnswerLookupEntry.value, AnswerLookupEntry.correlations)
+        .where(*filters)
+        .order_by(AnswerLookupEntry.response_id, AnswerLookupEntry.row_index)
+    )
+    if page is not None:
+        stmt = stmt.offset((page - 1) * page_size).limit(page_size)
+
+    values = []
+    correlations: Dict[str, dict] = {}
+    for value, row_correlations in db.execute(stmt):
+        values.append(value)
+        merged = correlations.setdefault(value, {})
+        for q_id, text in (row_correlations or {}).items():
+            merged.setdefault(q_id, text)
+
+    total, responses = db.execute(
+        select(func.count(), func.count(distinct(AnswerLookupEntry.response_id))).where(*filters)
+    ).one()
+    return values, correlations, total, responses
+
+
+def invalidate_lookup(connection, question_ids: Iterable[int]) -> None:
+    """Descarta el índice de esas preguntas: se vuelve a armar al leerlas."""
+    question_ids = list(set(question_ids))
+    if not question_ids:
+        return
+    connection.execute(delete(AnswerLookupSource).where(AnswerLookupSource.question_id.in_(question_ids)))
+    connection.execute(delete(AnswerLookupEntry).where(AnswerLookupEntry.question_id.in_(question_ids)))
+
+
+def refresh_answer_lookup(db: Session) -> int:
+    """Rehace los índices ya armados (tarea nocturna). Devuelve cuántos.
+
+    Recoge lo que otro backend haya editado en respuestas ya indexadas y las
+    que se confirmaron fuera de orden (ver `ensure_lookup`). Cada pregunta va
+    en su propia transacción: mientras se rehace se sigue leyendo la anterior,
+    nunca queda vacía. Las que ya no salen de respuestas se descartan.
+    """
+    question_ids = db.execute(
+        select(AnswerLookupSource.question_id).order_by(AnswerLookupSource.question_id)
+    ).scalars().all()
+    db.commit()
+
+    refreshed = 0
+    for question_id in question_ids:
+        connection = db.connection()
+        source = lookup_source(connection, question_id)
+        if source is None:
+            invalidate_lookup(connection, [question_id])
+        elif _lock_source(connection, question_id) is not None:
+            response_ids = _source_response_ids(connection, source)
+            _index_in_batches(connection, source, response_ids)
+            connection.execute(
+                delete(AnswerLookupEntry).where(
+                    AnswerLookupEntry.question_id == question_id,
+                    AnswerLookupEntry.response_id.not_in(_source_responses(source)),
+                )
+            )
+            connection.execute(
+                update(AnswerLookupSource)
+                .where(AnswerLookupSource.question_id == question_id)
+                .values(
+                    last_response_id=func.greatest(
+                        AnswerLookupSource.last_response_id, response_ids[-1] if response_ids else 0,
+                    ),
+                    built_at=func.now(),
+                )
+            )
+            refreshed += 1
+        db.commit()
+    logger.info("Autocompletado: %s índices rehechos", refreshed)
+    return refreshed
+
+
+def _built_sources_for_forms(connection, form_ids) -> List:
+    """Fuentes ya armadas que leen de esos formatos."""
+    by_condition = (
+        select(QuestionFilterCondition.filtered_question_id)
+        .join(AnswerLookupSource, AnswerLookupSource.question_id == QuestionFilterCondition.filtered_question_id)
+        .where(QuestionFilterCondition.form_id.in_(form_ids))
+    )
+    by_relation = (
+        select(QuestionTableRelation.question_id)
+        .join(FormQuestion, FormQuestion.question_id == QuestionTableRelation.related_question_id)
+        .join(AnswerLookupSource, AnswerLookupSource.question_id == QuestionTableRelation.question_id)
+        .where(FormQuestion.form_id.in_(form_ids))
+    )
+    candidates = set(connection.execute(by_condition).scalars()) | set(connection.execute(by_relation).scalars())
+    sources = []
+    for question_id in sorted(candidates):
+        source = lookup_source(connection, question_id)
+        if source and set(source.form_ids) & form_ids:
+            sources.append(source)
+    return sources
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_answer_lookup(session, flush_context):
+    """Mantiene el índice al día con lo que se acaba de escribir.
+
+    Answers escritas → se rehacen las opciones de esas respuestas en las
+    fuentes ya armadas que leen de su formato. Cambió una relación, una
+    condición o los formatos de una pregunta → se descarta el índice de las
+    preguntas afectadas. Corre dentro de la transacción.
+    """
+    response_ids = set()
+    invalidated = set()
+    related_question_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Answer):
+            if obj.response_id is not None:
+                response_ids.add(obj.response_id)
+        elif isinstance(obj, QuestionTableRelation):
+            invalidated.add(obj.question_id)
+        elif isinstance(obj, QuestionFilterCondition):
+            invalidated.add(obj.filtered_question_id)
+        elif isinstance(obj, FormQuestion):
+            related_question_ids.add(obj.question_id)
+
+    if not response_ids and not invalidated and not related_question_ids:
+        return
+
+    connection = session.connection()
+    if related_question_ids:
+        invalidated.update(
+            connection.execute(
+                select(QuestionTableRelation.question_id)
+                .where(QuestionTableRelation.related_question_id.in_(related_question_ids))
+            ).scalars()
+        )
+    invalidate_lookup(connection, (qid for qid in invalidated if qid is not None))
+
+    if not response_ids:
+        return
+    forms = dict(
+        connection.execute(
+            select(Response.id, Response.form_id)
+            .where(Response.id.in_(response_ids), IS_SUBMISSION)
+        ).all()
+    )
+    if not forms:
+        return
+    for source in _built_sources_for_forms(connection, set(forms.values())):
+        if _lock_source(connection, source.question_id, shared=True) is None:
+            continue  # se descartó mientras tanto: se arma completo al leer
+        ids = [rid for rid, form_id in forms.items() if form_id in source.form_ids]
+        _index_responses(connection, source, ids)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with BatchSessionLocal() as _db:
+        print(f"answer_lookup: {refresh_answer_lookup(_db)} índices rehechos")
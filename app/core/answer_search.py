@@ -0,0 +1,90 @@
+"""Búsqueda de texto en las respuestas (`answers.answer_text`).
+
+Todo se compara NORMALIZADO: minúsculas y sin tildes (`f_unaccent(lower(...))`),
+que es exactamente la expresión del índice trigram de
+migrations/2026-10-19_answer_text_search.sql. Con ese índice un
+`LIKE '%texto%'` deja de recorrer la tabla completa.
+
+Dos modos:
+
+  · `text_match_clause(term)`: la frase tal cual, en cualquier parte de la
+    respuesta (lo de siempre, ahora sin distinguir tildes).
+  · `ranked_matches(term)`: todas las palabras en una misma respuesta, en
+    cualquier orden, con puntaje de texto en español (`ts_rank`) y el
+    fragmento donde aparecen (`snippets`, con `ts_headline`).
+
+El puntaje y el fragmento también van sobre el texto normalizado, para que
+resalten lo mismo que encontró la búsqueda (buscar "nunez" resalta
+"Núñez"); por eso el fragmento sale en minúsculas y sin tildes.
+"""
+
+from sqlalchemy import and_, func, literal, select
+
+from app.models import Answer
+
+# Configuración de texto de Postgres para el puntaje y el fragmento.
+TS_CONFIG = "spanish"
+
+_HEADLINE_OPTIONS = "MaxWords=18, MinWords=6, MaxFragments=1"
+
+
+def normalized(expr):
+    """minúsculas + sin tildes, igual que el índice."""
+    return func.f_unaccent(func.lower(expr))
+
+
+def _contains(term: str):
+    escaped = term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return normalized(Answer.answer_text).like(
+        normalized(literal("%" + escaped + "%")), escape="/"
+    )
+
+
+def _tsquery(term: str):
+    return func.websearch_to_tsquery(TS_CONFIG, normalized(literal(term)))
+
+
+def text_match_clause(term: str):
+    """Condición sobre `Answer`: la frase aparece en la respuesta."""
+    return _contains(term)
+
+
+def ranked_matches(term: str):
+    """La mejor respuesta de cada respuesta de formato que contiene TODAS las
+    palabras de `term`: subconsulta (response_id, answer_id, score).
+
+    El puntaje se calcula solo sobre las coincidencias, que ya filtró el índice.
+    """
+    words = term.split() or [term]
+    score = func.ts_rank(func.to_tsvector(TS_CONFIG, normalized(Answer.answer_text)), _tsquery(term))
+    best = (
+        select(
+            Answer.response_id,
+            Answer.id.label("answer_id"),
+            score.label("score"),
+            func.row_number().over(
+                partition_by=Answer.response_id,
+                order_by=(score.desc(), Answer.id),
+            ).label("rank"),
+        )
+        .where(and_(*(_contains(w) for w in words)))
+        .subquery()
+    )
+    return (
+        select(best.c.response_id, best.c.answer_id, best.c.score)
+        .where(best.c.rank == 1)
+        .subquery()
+    )
+
+
+def headline(term: str):
+    """Fragmento de `Answer.answer_text` (normalizado) con las palabras de
+    `term` resaltadas."""
+    return func.ts_headline(TS_CONFIG, normalized(Answer.answer_text), _tsquery(term), _HEADLINE_OPTIONS)
+
+
+def snippets(db, answer_ids, term: str) -> dict:
+    """{answer_id: fragmento con las palabras resaltadas} de esas respuestas."""
+    if not answer_ids:
+        return {}
+    return dict(db.execute(select(Answer.id, headline(term)).where(Answer.id.in_(answer_ids))).all())
@@ -0,0 +1,73 @@
+"""Relleno de las copias tipadas de las respuestas (`value_num`, `value_date`).
+
+Las answers nuevas o editadas las traen desde que se escriben (ver
+`app.models._set_answer_typed_values`). Las que ya existían se rellenan aquí,
+por lotes de id para no bloquear la tabla, con las MISMAS reglas:
+
+    python -m app.core.answer_values
+
+Se puede cortar y volver a correr: retoma desde donde iba. Lo que escriba
+otro backend sin pasar por el ORM tampoco trae las copias; volver a correrlo
+las completa.
+"""
+
+import logging
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Answer, answer_value_date, answer_value_num
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 5000
+
+
+def backfill_typed_values(db: Session, batch: int = _BATCH) -> int:
+    """Rellena las answers con texto que aún no tienen copia tipada.
+
+    Devuelve cuántas quedaron con número o fecha.
+    """
+    connection = db.connection()
+    stmt = (
+        update(Answer.__table__)
+        .where(Answer.__table__.c.id == bindparam("b_id"))
+        .values(value_num=bindparam("b_num"), value_date=bindparam("b_date"))
+    )
+    last_id, filled = 0, 0
+    while True:
+        rows = connection.execute(
+            select(Answer.id, Answer.answer_text)
+            .where(
+                Answer.id > last_id,
+                Answer.answer_text.isnot(None),
+                Answer.value_num.is_(None),
+                Answer.value_date.is_(None),
+            )
+            .order_by(Answer.id)
+            .limit(batch)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        params = []
+        for row in rows:
+            number = answer_value_num(row.answer_text)
+            moment = answer_value_date(row.answer_text)
+            if number is not None or moment is not None:
+                params.append({"b_id": row.id, "b_num": number, "b_date": moment})
+        if params:
+            connection.execute(stmt, params)
+            filled += len(params)
+        db.commit()
+        connection = db.connection()
+        logger.info("answers tipadas: hasta id %s, %s rellenadas", last_id, filled)
+    return filled
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        print(f"answer_values: {backfill_typed_values(_db)} answers rellenadas")
@@ -0,0 +1,402 @@
+"""Bandeja de aprobación: a quién ya le llegó cada respuesta.
+
+Decidir si una respuesta ya le llegó a un aprobador obliga a mirar toda su
+cadena (modo del formato, obligatorios anteriores, de quién recibe cada
+recibidor). Hacerlo al abrir la bandeja significaba recorrer TODAS las
+respuestas de TODOS los formatos del aprobador en cada visita.
+
+Aquí se hace al escribir: cada vez que cambia una fila de
+`response_approvals` (envío de la respuesta, aprobación, rechazo,
+reconsideración, participante dinámico...) se recalcula la cadena de ESA
+respuesta y se reescriben sus filas de `approval_inbox`, en la misma
+transacción. La bandeja queda en una consulta por índice y paginable.
+
+    filas = db.query(ApprovalInbox).filter(ApprovalInbox.user_id == user_id)
+
+En la misma pasada se guarda el estado de la cadena
+(`response_approval_states`): paso actual, a quién le toca, si terminó o si
+quedó rechazada. Quien necesite saberlo lo lee de ahí en vez de volver a
+recorrer la plantilla y las aprobaciones.
+
+Lo que escriba otro backend sobre la misma BD no pasa por aquí:
+`rebuild_approval_inbox` rehace ambas tablas por lotes, sin vaciarlas
+(tarea nocturna y `python -m app.core.approval_inbox`), y
+`check_approval_states` dice qué estados guardados ya no coinciden con la
+cadena (`python -m app.core.approval_inbox --check`).
+"""
+
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import (
+    ApprovalInbox, ApprovalStatus, Form, Response, ResponseApproval, ResponseApprovalState,
+)
+
+logger = logging.getLogger(__name__)
+
+# Respuestas por lote al reconstruir la bandeja completa.
+_REBUILD_BATCH = 500
+
+
+def _role(ra) -> str:
+    return getattr(ra, "participant_role", None) or "approver"
+
+
+def current_approval_of(approvals: List, user_id: int):
+    """La aprobación de `user_id` que manda en la respuesta.
+
+    La primera que no está aprobada o, si ya aprobó todas, la última.
+    `approvals` debe venir ordenada por `sequence_number`.
+    """
+    mine = [ra for ra in approvals if ra.user_id == user_id]
+    return next(
+        (ra for ra in mine if ra.status != ApprovalStatus.aprobado),
+        mine[-1] if mine else None,
+    )
+
+
+def is_turn_of(approval, approvals: List, approval_mode: Optional[str]) -> bool:
+    """¿Ya le llegó la respuesta a quien tiene `approval`?
+
+    RECIBIDOR: cuelga de uno o varios aprobadores concretos
+    (`receives_from_user_ids`). Espera a ESOS y a nadie más —da igual el modo
+    del formato y da igual quién más haya en la cadena: dos recibidores del
+    mismo aprobador reciben a la vez, no en fila—. Si alguno de sus
+    aprobadores rechaza, no hay nada que recibir y el pendiente no le aparece
+    nunca.
+
+    RECIBIDOR SUELTO (sin `receives_from_user_ids`): no cuelga de un aprobador
+    sino del DILIGENCIADOR, así que no hace fila con nadie. Su
+    `receive_timing` decide a qué espera:
+      'on_submit'       → a nada: le llega al enviarse la respuesta.
+      'after_approvals' → a todos los APROBADORES obligatorios (no a los otros
+                          recibidores: dos sueltos reciben a la vez, y si el
+                          formato no tiene aprobadores le llega al enviarse
+                          igual que con 'on_submit').
+
+    APROBADOR: en modo SECUENCIAL espera a todos los obligatorios que van
+    antes. En modo PARALELO no hay turno y ve su pendiente desde el inicio.
+    """
+    recibe_de = getattr(approval, "receives_from_user_ids", None) or []
+
+    if recibe_de:
+        previos = [ra for ra in approvals if ra.user_id in recibe_de]
+    elif _role(approval) == "receiver":
+        espera = getattr(approval, "receive_timing", None) or "after_approvals"
+        if espera == "on_submit":
+            previos = []
+        else:
+            previos = [
+                ra for ra in approvals
+                if ra.is_mandatory and _role(ra) == "approver"
+            ]
+    elif (approval_mode or "sequential") != "parallel":
+        previos = [
+            ra for ra in approvals
+            if ra.sequence_number < approval.sequence_number and ra.is_mandatory
+        ]
+    else:
+        previos = []
+
+    return all(pa.status == ApprovalStatus.aprobado for pa in previos)
+
+
+def _turns(approvals: List, approval_mode: Optional[str]):
+    """(user_id, aprobación que manda) de cada participante al que ya le llegó."""
+    for user_id in dict.fromkeys(ra.user_id for ra in approvals):
+        approval = current_approval_of(approvals, user_id)
+        if approval is not None and is_turn_of(approval, approvals, approval_mode):
+            yield user_id, approval
+
+
+def inbox_entries(response_id: int, form_id: int, submitted_at, approval_mode, approvals: List) -> List[dict]:
+    """Filas de bandeja de una respuesta: una por participante al que ya le llegó."""
+    approvals = sorted(approvals, key=lambda a: (a.sequence_number, a.id))
+    return [
+        {
+            "response_id": response_id,
+            "user_id": user_id,
+            "response_approval_id": approval.id,
+            "form_id": form_id,
+            "submitted_at": submitted_at,
+            "approval_status": approval.status,
+            "participant_role": _role(approval),
+        }
+        for user_id, approval in _turns(approvals, approval_mode)
+    ]
+
+
+def chain_state(response_id: int, approval_mode, approvals: List) -> dict:
+    """Estado de la cadena de una respuesta (fila de `response_approval_states`).
+
+    `next_user_ids` son los que ya tienen turno y siguen pendientes, por
+    secuencia; `current_step` la menor de sus secuencias. La cadena está
+    completa cuando aprobaron todos los obligatorios y rechazada cuando alguno
+    de ellos rechazó —un opcional que rechaza no la detiene—.
+    """
+    approvals = sorted(approvals, key=lambda a: (a.sequence_number, a.id))
+    pending = sorted(
+        (approval for _, approval in _turns(approvals, approval_mode)
+         if approval.status == ApprovalStatus.pendiente),
+        key=lambda a: (a.sequence_number, a.id),
+    )
+    mandatory = [ra for ra in approvals if ra.is_mandatory]
+    return {
+        "response_id": response_id,
+        "current_step": pending[0].sequence_number if pending else None,
+        "next_user_ids": [ra.user_id for ra in pending],
+        "total_approvers": len(approvals),
+        "approved_count": sum(1 for ra in approvals if ra.status == ApprovalStatus.aprobado),
+        "is_complete": all(ra.status == ApprovalStatus.aprobado for ra in mandatory),
+        "is_rejected": any(ra.status == ApprovalStatus.rechazado for ra in mandatory),
+    }
+
+
+def _chain_rows(connection, response_ids: Optional[Iterable[int]] = None):
+    stmt = (
+        select(
+            ResponseApproval.id,
+            ResponseApproval.response_id,
+            ResponseApproval.user_id,
+            ResponseApproval.sequence_number,
+            ResponseApproval.is_mandatory,
+            ResponseApproval.status,
+            ResponseApproval.participant_role,
+            ResponseApproval.receives_from_user_ids,
+            ResponseApproval.receive_timing,
+            Response.form_id,
+            Response.submitted_at,
+            Form.approval_mode,
+        )
+        .join(Response, Response.id == ResponseApproval.response_id)
+        .join(Form, Form.id == Response.form_id)
+        .where(Response.parent_response_id.is_(None))
+        .order_by(ResponseApproval.response_id, ResponseApproval.sequence_number, ResponseApproval.id)
+    )
+    if response_ids is not None:
+        stmt = stmt.where(ResponseApproval.response_id.in_(list(response_ids)))
+    return connection.execute(stmt.execution_options(yield_per=2000))
+
+
+def _chains(rows):
+    """Agrupa las filas de `_chain_rows` (ordenadas) por respuesta.
+
+    Devuelve (response_id, filas de bandeja, estado de la cadena).
+    """
+    def close(response_id, chain):
+        head = chain[0]
+        return (
+            response_id,
+            inbox_entries(response_id, head.form_id, head.submitted_at, head.approval_mode, chain),
+            chain_state(response_id, head.approval_mode, chain),
+        )
+
+    current_id, chain = None, []
+    for row in rows:
+        if row.response_id != current_id and chain:
+            yield close(current_id, chain)
+            chain = []
+        current_id = row.response_id
+        chain.append(row)
+    if chain:
+        yield close(current_id, chain)
+
+
+_STATE_FIELDS = (
+    "current_step", "next_user_ids", "total_approvers", "approved_count",
+    "is_complete", "is_rejected",
+)
+
+
+def refresh_approval_inbox(connection, response_ids: Iterable[int]) -> int:
+    """Reescribe bandeja y estado de esas respuestas. Devuelve las filas de bandeja.
+
+    Si otra transacción reescribe la misma respuesta a la vez (la
+    reconstrucción nocturna, otra aprobación), la segunda espera a la primera
+    y pisa sus filas en vez de chocar con las llaves únicas.
+    """
+    response_ids = sorted(set(response_ids))
+    if not response_ids:
+        return 0
+    entries, states = [], []
+    for _, response_entries, state in _chains(_chain_rows(connection, response_ids)):
+        entries.extend(response_entries)
+        states.append(state)
+    connection.execute(delete(ApprovalInbox).where(ApprovalInbox.response_id.in_(response_ids)))
+    connection.execute(
+        delete(ResponseApprovalState).where(ResponseApprovalState.response_id.in_(response_ids))
+    )
+    if entries:
+        stmt = insert(ApprovalInbox)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_approval_inbox_response_user",
+                set_={
+                    field: stmt.excluded[field]
+                    for field in ("response_approval_id", "form_id", "submitted_at",
+                                  "approval_status", "participant_role")
+                },
+            ),
+            entries,
+        )
+    if states:
+        stmt = insert(ResponseApprovalState)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["response_id"],
+                set_={**{field: stmt.excluded[field] for field in _STATE_FIELDS}, "updated_at": func.now()},
+            ),
+            states,
+        )
+    return len(entries)
+
+
+def _with_chain(response_ids=None):
+    """Respuestas (diligenciamientos) que tienen cadena de aprobación."""
+    stmt = (
+        select(ResponseApproval.response_id)
+        .join(Response, Response.id == ResponseApproval.response_id)
+        .where(Response.parent_response_id.is_(None))
+    )
+    if response_ids is not None:
+        stmt = stmt.where(ResponseApproval.response_id.in_(response_ids))
+    return stmt
+
+
+def _lock_chains(connection, response_ids: List[int]) -> List[int]:
+    """Toma (FOR SHARE) las cadenas de esas respuestas hasta el commit.
+
+    Devuelve solo las que se pudieron tomar enteras: una con alguna
+    aprobación bloqueada la está escribiendo otra transacción, que al
+    confirmar deja su bandeja al día. Así nadie aprueba entre que se lee la
+    cadena y se escribe su bandeja, y la reconstrucción no espera a nadie.
+    """
+    locked = Counter(
+        connection.execute(
+            _with_chain(response_ids).with_for_update(read=True, skip_locked=True, of=ResponseApproval)
+        ).scalars()
+    )
+    totals = Counter(connection.execute(_with_chain(response_ids)).scalars())
+    return [rid for rid in response_ids if locked[rid] == totals[rid]]
+
+
+def rebuild_approval_inbox(db: Session) -> int:
+    """Rehace bandeja y estados completos. Devuelve las filas de bandeja.
+
+    No vacía las tablas: va por lotes de respuestas, cada uno en su
+    transacción (`refresh_approval_inbox`), y al final borra las filas de
+    respuestas que ya no tienen cadena. La bandeja se sigue leyendo y
+    aprobando mientras tanto.
+    """
+    total, skipped, last_id = 0, 0, 0
+    while True:
+        connection = db.connection()
+        response_ids = connection.execute(
+            _with_chain()
+            .where(ResponseApproval.response_id > last_id)
+            .group_by(ResponseApproval.response_id)
+            .order_by(ResponseApproval.response_id)
+            .limit(_REBUILD_BATCH)
+        ).scalars().all()
+        if not response_ids:
+            break
+        last_id = response_ids[-1]
+        ready = _lock_chains(connection, response_ids)
+        skipped += len(response_ids) - len(ready)
+        total += refresh_approval_inbox(connection, ready)
+        db.commit()
+
+    connection = db.connection()
+    orphans = connection.execute(
+        delete(ApprovalInbox).where(ApprovalInbox.response_id.not_in(_with_chain()))
+    ).rowcount
+    orphans += connection.execute(
+        delete(ResponseApprovalState).where(ResponseApprovalState.response_id.not_in(_with_chain()))
+    ).rowcount
+    db.commit()
+    logger.info(
+        "Bandeja de aprobación reconstruida: %s filas, %s huérfanas borradas, %s en uso saltadas",
+        total, orphans, skipped,
+    )
+    return total
+
+
+def check_approval_states(db: Session) -> Dict[int, dict]:
+    """Compara los estados guardados con la cadena real, sin tocar nada.
+
+    Devuelve {response_id: {campo: (guardado, real)}} de los que no coinciden;
+    un estado que falta o sobra sale con guardado/real en None.
+    """
+    connection = db.connection()
+    stored = {
+        row.response_id: row._mapping
+        for row in connection.execute(select(ResponseApprovalState))
+    }
+    mismatches = {}
+    for response_id, _, state in _chains(_chain_rows(connection)):
+        saved = stored.pop(response_id, None)
+        diff = {
+            field: (saved[field] if saved else None, state[field])
+            for field in _STATE_FIELDS
+            if saved is None or saved[field] != state[field]
+        }
+        if diff:
+            mismatches[response_id] = diff
+    for response_id, saved in stored.items():
+        mismatches[response_id] = {field: (saved[field], None) for field in _STATE_FIELDS}
+    return mismatches
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_approval_inbox(session, flush_context):
+    """Mantiene bandeja y estados al día con lo que se acaba de escribir.
+
+    Se dispara en cada flush, pero solo hace algo si en él hubo filas de
+    `response_approvals` o cambió el modo de aprobación de un formato. Corre
+    dentro de la transacción: si luego hay rollback, todo vuelve con él.
+    """
+    response_ids = set()
+    form_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ResponseApproval):
+            if obj.response_id is not None:
+                response_ids.add(obj.response_id)
+        elif isinstance(obj, Form) and obj in session.dirty:
+            if inspect(obj).attrs.approval_mode.history.has_changes():
+                form_ids.add(obj.id)
+
+    if not response_ids and not form_ids:
+        return
+
+    connection = session.connection()
+    if form_ids:
+        response_ids.update(
+            connection.execute(
+                select(ResponseApproval.response_id)
+                .join(Response, Response.id == ResponseApproval.response_id)
+                .where(Response.form_id.in_(form_ids))
+                .distinct()
+            ).scalars()
+        )
+    refresh_approval_inbox(connection, response_ids)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        if "--check" in sys.argv:
+            _mismatches = check_approval_states(_db)
+            for _response_id, _diff in sorted(_mismatches.items()):
+                print(f"respuesta {_response_id}: {_diff}")
+            print(f"response_approval_states: {len(_mismatches)} desalineados")
+            sys.exit(1 if _mismatches else 0)
+        print(f"approval_inbox: {rebuild_approval_inbox(_db)} filas")
@@ -0,0 +1,224 @@
+"""Feed de cambios (outbox) con cursor para los consumidores de ArIA.
+
+Los Cargos de ArIA (Analista, Seguridad) sondeaban /responses/aggregate,
+/security/auth-events y /tokens/* y releían todo en cada vuelta. Ahora cada
+respuesta, aprobación, evento de autenticación o usuario que se crea, edita o
+borra deja una fila en `change_events`, en la misma transacción que el cambio,
+y GET /security/changes entrega los eventos posteriores a un cursor, por
+lotes.
+
+El cursor es `seq`, no el id. Un id de secuencia se toma al insertar pero se
+hace visible al hacer commit, y dos transacciones pueden hacer commit en
+desorden: un consumidor que ya leyó el id 11 nunca vería un id 10 que hizo
+commit después. Por eso `seq` se asigna después del commit, en orden de id,
+por un solo secuenciador a la vez (advisory lock de transacción): lo que ya
+tiene `seq` es un prefijo estable y lo que haga commit después recibe uno
+mayor. El secuenciador corre al leer el feed; no hace falta otro proceso.
+
+Contrapresión: cada lectura devuelve a lo sumo `MAX_BATCH` eventos con
+`has_more`; al quedar al día sugiere cuántos segundos esperar. Los eventos
+ya entregados se purgan a los `RETENTION_DAYS` días
+(`change_events_prune_task`); un consumidor cuyo cursor quedó por debajo de
+`oldest_cursor` perdió eventos y debe resincronizar completo.
+
+    python -m app.core.change_feed        # secuencia lo pendiente y purga
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, event, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models import AuthEvent, ChangeEvent, Response, ResponseApproval, User
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("response", "approval", "auth", "user")
+
+DEFAULT_BATCH = 500
+MAX_BATCH = 1000
+
+# Segundos sugeridos al consumidor antes de volver a preguntar si ya está al día.
+RETRY_AFTER_SECONDS = 5
+
+RETENTION_DAYS = 30
+
+# Llave del advisory lock del secuenciador (arbitraria, fija).
+_SEQUENCER_LOCK = 720_038
+_SEQUENCE_BATCH = 5000
+_PRUNE_BATCH = 10000
+
+_SEQUENCE_PENDING = text(
+    """
+    WITH pending AS (
+        SELECT id FROM change_events
+        WHERE seq IS NULL
+        ORDER BY id
+        LIMIT :batch
+    ), numbered AS (
+        SELECT id, nextval('change_events_cursor_seq') AS seq
+        FROM (SELECT id FROM pending ORDER BY id) p
+    )
+    UPDATE change_events c
+    SET seq = numbered.seq
+    FROM numbered
+    WHERE c.id = numbered.id
+    """
+)
+
+
+def _value(v):
+    return getattr(v, "value", v)
+
+
+def _snapshot(obj) -> Optional[tuple]:
+    """(topic, entity_id, payload) de un objeto que va al feed, o None.
+
+    El payload trae lo justo para que el consumidor decida si relee la
+    entidad; nunca contraseñas ni contenido de respuestas.
+    """
+    if isinstance(obj, Response):
+        return "response", obj.id, {
+            "form_id": obj.form_id,
+            "user_id": obj.user_id,
+            "status": _value(obj.status),
+            "parent_response_id": obj.parent_response_id,
+        }
+    if isinstance(obj, ResponseApproval):
+        return "approval", obj.id, {
+            "response_id": obj.response_id,
+            "user_id": obj.user_id,
+            "sequence_number": obj.sequence_number,
+            "status": _value(obj.status),
+        }
+    if isinstance(obj, AuthEvent):
+        return "auth", obj.id, {
+            "event_type": obj.event_type,
+            "user_id": obj.user_id,
+            "email": obj.email,
+            "ip": obj.ip,
+        }
+    if isinstance(obj, User):
+        return "user", obj.id, {
+            "user_type": _value(obj.user_type),
+            "is_active": obj.is_active,
+        }
+    return None
+
+
+def record(connection, topic: str, action: str, entity_ids: Iterable[int], payload: Optional[dict] = None) -> None:
+    """Agrega eventos a mano, para cambios que no pasan por el ORM (deletes en bloque)."""
+    rows = [
+        {"topic": topic, "action": action, "entity_id": entity_id, "payload": payload}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        connection.execute(insert(ChangeEvent), rows)
+
+
+def sequence_pending(db: Session, batch: int = _SEQUENCE_BATCH) -> int:
+    """Asigna `seq` a los eventos ya confirmados que no lo tienen.
+
+    Si otro secuenciador está corriendo no espera: devuelve 0 y ese otro se
+    encarga. Hay que hacer commit después para que los `seq` se vean.
+    """
+    connection = db.connection()
+    if not connection.execute(select(func.pg_try_advisory_xact_lock(_SEQUENCER_LOCK))).scalar():
+        return 0
+    return connection.execute(_SEQUENCE_PENDING, {"batch": batch}).rowcount or 0
+
+
+def events_after(db: Session, after: int = 0, limit: int = DEFAULT_BATCH,
+                 topics: Optional[List[str]] = None) -> dict:
+    """Hasta `limit` eventos con `seq` > `after`, en orden.
+
+    `next_cursor` es el `seq` del último evento entregado (o `after` si no hubo);
+    con `topics` se filtra, pero el cursor avanza igual sobre todo el feed.
+    """
+    limit = max(1, min(limit, MAX_BATCH))
+    sequence_pending(db, max(limit, _SEQUENCE_BATCH))
+    db.commit()
+
+    # Lo secuenciado antes de leer: si no quedan más, el cursor puede saltar
+    # hasta aquí aunque el filtro por tema haya dejado fuera los últimos.
+    oldest, head = db.execute(select(func.min(ChangeEvent.seq), func.max(ChangeEvent.seq))).one()
+
+    query = select(ChangeEvent).where(ChangeEvent.seq > after)
+    if topics:
+        query = query.where(ChangeEvent.topic.in_(topics))
+    rows = db.execute(query.order_by(ChangeEvent.seq).limit(limit + 1)).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = rows[-1].seq if rows else after
+    if not has_more and head is not None:
+        next_cursor = max(next_cursor, head)
+    return {
+        "events": [
+            {
+                "seq": e.seq,
+                "topic": e.topic,
+                "action": e.action,
+                "entity_id": e.entity_id,
+                "payload": e.payload,
+                "created_at": e.created_at.isoformat() if e.created_at else None,
+            }
+            for e in rows
+        ],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "retry_after_seconds": None if has_more else RETRY_AFTER_SECONDS,
+        "oldest_cursor": (oldest - 1) if oldest is not None else None,
+    }
+
+
+def prune_change_events(db: Session, keep_days: int = RETENTION_DAYS, batch: int = _PRUNE_BATCH) -> int:
+    """Borra por lotes los eventos ya secuenciados de hace más de `keep_days` días."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=keep_days)
+    removed = 0
+    while True:
+        ids = select(ChangeEvent.id).where(
+            ChangeEvent.seq.isnot(None), ChangeEvent.created_at < cutoff,
+        ).order_by(ChangeEvent.id).limit(batch).scalar_subquery()
+        count = db.execute(delete(ChangeEvent).where(ChangeEvent.id.in_(ids))).rowcount or 0
+        db.commit()
+        removed += count
+        if count < batch:
+            return removed
+
+
+@event.listens_for(Session, "after_flush")
+def _record_changes(session, flush_context):
+    """Escribe en el feed lo que el flush creó, editó o borró.
+
+    Corre dentro de la transacción: si el cambio se revierte, el evento también.
+    """
+    rows = []
+    for action, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if action == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            snap = _snapshot(obj)
+            if snap is None or snap[1] is None:
+                continue
+            topic, entity_id, payload = snap
+            rows.append({
+                "topic": topic,
+                "action": action,
+                "entity_id": entity_id,
+                "payload": None if action == "delete" else payload,
+            })
+    if rows:
+        session.connection().execute(insert(ChangeEvent), rows)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        sequenced = sequence_pending(_db)
+        _db.commit()
+        print(f"change_feed: {sequenced} eventos secuenciados, {prune_change_events(_db)} purgados")
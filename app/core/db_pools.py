@@ -0,0 +1,157 @@
+"""Quién tiene las conexiones cuando un pool se agota, y timeouts por ruta.
+
+Los pools (interactivo, de lotes y réplica) se configuran por variables de
+entorno en app/database.py. Aquí:
+
+  · cada conexión que sale del pool queda anotada con quién la pidió
+    (método y plantilla de ruta del request, o el hilo si es una tarea
+    programada) y desde cuándo. Si sacar una conexión tarda más de
+    DB_POOL_WAIT_WARN_S, o se agota el pool_timeout, se deja en el log
+    quién tiene las del pool:
+
+        pool forms_db agotado (30 s esperando): 30 en uso — 27× GET /forms/{form_id}/questions-answers/excel/all-users (la más vieja 212 s), 3× POST /responses/save-response/{form_id} (1 s)
+
+  · `statement_timeout(ms)`: dependencia de ruta que cambia el
+    statement_timeout del pool para las consultas de ese request:
+
+        @router.post("/search", dependencies=[statement_timeout(15000)])
+
+  · `db_timeout_handler`: una consulta cortada por statement_timeout o un
+    pool agotado responden 503 con un mensaje claro, no un 500.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, exc, text
+from sqlalchemy.orm import Session
+
+from app.database import all_engines, get_db
+
+logger = logging.getLogger(__name__)
+
+WAIT_WARN_S = float(os.getenv("DB_POOL_WAIT_WARN_S", "1"))
+# Como mucho un aviso de espera por pool cada tantos segundos.
+_WARN_EVERY_S = 10
+
+_QUERY_CANCELED = "57014"
+
+_request_scope: ContextVar[Optional[dict]] = ContextVar("db_pool_request_scope", default=None)
+
+
+class PoolWatchMiddleware:
+    """Middleware ASGI: deja el request a mano para anotar quién saca conexiones."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+def _holder() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return f"[{threading.current_thread().name}]"
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+
+
+def _summary(held: Dict[int, Tuple[str, float]]) -> str:
+    now = time.monotonic()
+    by_holder: Dict[str, list] = {}
+    for holder, since in list(held.values()):
+        by_holder.setdefault(holder, []).append(now - since)
+    parts = sorted(by_holder.items(), key=lambda kv: -len(kv[1]))
+    return f"{len(held)} en uso — " + ", ".join(
+        f"{len(ages)}× {holder} (la más vieja {max(ages):.0f} s)" for holder, ages in parts
+    )
+
+
+def watch_pool(engine) -> None:
+    """Anota quién tiene cada conexión y avisa cuando sacar una se demora."""
+    pool = engine.pool
+    name = engine.logging_name
+    held: Dict[int, Tuple[str, float]] = {}
+    last_warning = [0.0]
+
+    def _checkout(dbapi_connection, record, proxy):
+        held[id(record)] = (_holder(), time.monotonic())
+
+    def _checkin(dbapi_connection, record):
+        held.pop(id(record), None)
+
+    event.listen(pool, "checkout", _checkout)
+    event.listen(pool, "checkin", _checkin)
+
+    original = pool._do_get
+
+    @functools.wraps(original)
+    def _watched_do_get():
+        start = time.perf_counter()
+        try:
+            connection = original()
+        except exc.TimeoutError:
+            logger.error("pool %s agotado (%.0f s esperando): %s",
+                         name, time.perf_counter() - start, _summary(held))
+            raise
+        waited = time.perf_counter() - start
+        if waited > WAIT_WARN_S and time.monotonic() - last_warning[0] > _WARN_EVERY_S:
+            last_warning[0] = time.monotonic()
+            logger.warning("pool %s: %s esperó %.1f s por una conexión: %s",
+                           name, _holder(), waited, _summary(held))
+        return connection
+
+    pool._do_get = _watched_do_get
+
+
+for _engine in all_engines:
+    watch_pool(_engine)
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection):
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms is not None:
+        connection.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(timeout_ms)})
+
+
+def statement_timeout(ms: int):
+    """Dependencia de ruta: statement_timeout de `ms` para la sesión de get_db.
+
+    Se aplica con SET LOCAL a cada transacción de la sesión (también a la que
+    ya abrió get_current_user), y vuelve al del pool al devolver la conexión.
+    """
+    def dependency(db: Session = Depends(get_db)):
+        db.info["statement_timeout_ms"] = ms
+        if db.in_transaction():
+            _apply_statement_timeout(db, None, db.connection())
+
+    return Depends(dependency)
+
+
+async def db_timeout_handler(request, exception):
+    """503 para consultas cortadas por statement_timeout y pools agotados."""
+    if isinstance(exception, exc.TimeoutError):
+        detail = "El servidor está ocupado. Intente de nuevo en unos segundos."
+    elif getattr(getattr(exception, "orig", None), "pgcode", None) == _QUERY_CANCELED:
+        logger.warning("statement_timeout en %s %s", request.method, request.url.path)
+        detail = "La consulta tardó demasiado. Intente con filtros más acotados."
+    else:
+        logger.error("Error de base de datos en %s %s", request.method, request.url.path,
+                     exc_info=exception)
+        return JSONResponse(status_code=500, content={"detail": "Error interno del servidor."})
+    return JSONResponse(status_code=503, content={"detail": detail}, headers={"Retry-After": "5"})
@@ -0,0 +1,87 @@
+"""Paginación por cursor (keyset) para listados ordenados por fecha e id.
+
+Con OFFSET la página 500 obliga a Postgres a leer y descartar las 499
+anteriores. Con cursor se pide "lo que viene después de esta fila" y cada
+página cuesta lo mismo a cualquier profundidad:
+
+    query = query.order_by(*newest_first(Response.submitted_at, Response.id))
+    query = after_cursor(query, Response.submitted_at, Response.id, cursor)
+    rows = query.limit(page_size + 1).all()
+    rows, next_cursor = page_of(rows, page_size, lambda r: (r.submitted_at, r.id))
+
+El cursor es opaco para el cliente: lo recibe en `next_cursor` y lo devuelve
+tal cual para la página siguiente. `keyset_page` hace los cuatro pasos y, sin
+cursor, sigue aceptando `page` (OFFSET) para los clientes de siempre.
+
+El conteo total es una consulta aparte que recorre todo el filtro: los
+listados lo devuelven solo si se pide (`include_total`), y un scroll infinito
+no lo necesita.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(moment: Optional[datetime], row_id: int) -> str:
+    raw = json.dumps([moment.isoformat() if moment else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        moment, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(moment) if moment else None), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="cursor inválido")
+
+
+def newest_first(moment_col, id_col):
+    """Orden estable del listado: más reciente primero, sin fecha al final."""
+    return moment_col.desc().nulls_last(), id_col.desc()
+
+
+def after_cursor(query, moment_col, id_col, cursor: Optional[str]):
+    """Filtra `query` (ordenada con `newest_first`) a lo que va después del cursor."""
+    if not cursor:
+        return query
+    moment, row_id = decode_cursor(cursor)
+    if moment is None:
+        return query.filter(moment_col.is_(None), id_col < row_id)
+    return query.filter(or_(
+        moment_col < moment,
+        and_(moment_col == moment, id_col < row_id),
+        moment_col.is_(None),
+    ))
+
+
+def page_of(rows: List, page_size: int, key: Callable) -> Tuple[List, Optional[str]]:
+    """Recorta a `page_size` las `page_size + 1` filas pedidas y arma el cursor
+    de la siguiente página (None si no hay más)."""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def keyset_page(query, moment_col, id_col, page_size: int, key: Callable,
+                cursor: Optional[str] = None, page: int = 1) -> Tuple[List, Optional[str]]:
+    """Una página de `query` en orden `newest_first`: después de `cursor` si
+    viene, si no la página `page` por OFFSET. Devuelve (filas, next_cursor)."""
+    query = query.order_by(None).order_by(*newest_first(moment_col, id_col))
+    if cursor:
+        query = after_cursor(query, moment_col, id_col, cursor)
+    else:
+        query = query.offset((max(1, page) - 1) * page_size)
+    return page_of(query.limit(page_size + 1).all(), page_size, key)
+
+
+def wants_total(include_total: Optional[bool], cursor: Optional[str]) -> bool:
+    """Por defecto se cuenta en la paginación por número (como siempre) y no
+    con cursor."""
+    return (not cursor) if include_total is None else include_total
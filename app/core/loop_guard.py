@@ -0,0 +1,121 @@
+"""Consultas SQL que bloquean el event loop.
+
+Un endpoint `async def` corre en el event loop: si adentro usa la sesión
+síncrona de SQLAlchemy, mientras dura la consulta el worker no atiende a
+nadie más. Los endpoints con BD son `def` (FastAPI los corre en el
+threadpool) y esto vigila que siga así:
+
+  · en ejecución: cada consulta mira si corre en el hilo del event loop del
+    servidor (lo anota `LoopGuardMiddleware` en cada request). Si es así,
+    deja un WARNING con el lugar del código que la hizo (una vez por
+    lugar), o lanza RuntimeError con LOOP_GUARD=raise, para desarrollo y
+    pruebas. LOOP_GUARD=off lo apaga;
+  · sin ejecutar nada: `python -m app.core.loop_guard` lista los endpoints
+    `async def` que dependen de get_db (o de get_read_db) y sale con 1 si
+    hay alguno. test/test_loop_guard.py lo exige en las pruebas.
+
+Los correos que crud.py manda con `run_async_in_thread` corren en un event
+loop propio de otro hilo: no bloquean al servidor y no se marcan.
+"""
+
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from app.database import all_engines
+
+logger = logging.getLogger(__name__)
+
+MODE = os.getenv("LOOP_GUARD", "warn")
+
+_ROOT = str(Path(__file__).resolve().parents[2]) + os.sep
+_THIS = os.path.abspath(__file__)
+# SQLAlchemy, Starlette y la biblioteca estándar: el lugar que interesa es el
+# primero que no es de ellas.
+_LIBRARIES = tuple({os.path.dirname(os.__file__) + os.sep} | {
+    p + os.sep for p in sys.path if p.endswith("site-packages")
+})
+
+_loop_thread: Optional[int] = None
+_reported = set()
+
+
+class LoopGuardMiddleware:
+    """Middleware ASGI: anota cuál es el hilo del event loop del servidor."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _loop_thread
+        _loop_thread = threading.get_ident()
+        await self.app(scope, receive, send)
+
+
+def _caller() -> str:
+    """Primer lugar de la pila fuera de librerías y de este módulo."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_LIBRARIES) and filename != _THIS:
+            if filename.startswith(_ROOT):
+                filename = filename[len(_ROOT):]
+            return f"{filename}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "<desconocido>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _loop_thread is None or threading.get_ident() != _loop_thread:
+        return
+    where = _caller()
+    message = f"consulta SQL en el event loop desde {where}: {' '.join(statement.split())[:200]}"
+    if MODE == "raise":
+        raise RuntimeError(message)
+    if where not in _reported:
+        _reported.add(where)
+        logger.warning(message)
+
+
+if MODE != "off":
+    for _engine in all_engines:
+        event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def blocking_routes(app) -> List[str]:
+    """Endpoints `async def` que piden una sesión síncrona."""
+    import inspect
+
+    from fastapi.routing import APIRoute
+
+    from app.database import get_db
+
+    def calls(dependant):
+        for sub in dependant.dependencies:
+            yield sub.call
+            yield from calls(sub)
+
+    return [
+        f"{','.join(sorted(route.methods))} {route.path} → "
+        f"{route.endpoint.__module__}.{route.endpoint.__name__}"
+        for route in app.routes
+        if isinstance(route, APIRoute)
+        and inspect.iscoroutinefunction(route.endpoint)
+        and get_db in set(calls(route.dependant))
+    ]
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, _ROOT)
+    import main
+
+    _found = blocking_routes(main.app)
+    for _line in _found:
+        print(_line)
+    print(f"{len(_found)} endpoints async con sesión síncrona")
+    sys.exit(1 if _found else 0)
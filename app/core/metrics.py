@@ -0,0 +1,255 @@
+"""Métricas en formato Prometheus para GET /metrics.
+
+Antes solo había /health. Aquí quedan:
+
+  · HTTP: latencia por plantilla de ruta (/forms/{form_id}, no /forms/12),
+    método y estado; requests en curso;
+  · BD: conexiones en uso y de overflow de cada pool, y cuánto se espera
+    para sacar una conexión (`instrument_pool`, etiqueta `pool`: forms_db,
+    forms_db_batch, forms_db_replica); lecturas que fueron a la réplica
+    o al primario y por qué (`read_replica`);
+  · Redis: aciertos, fallos y errores del caché por prefijo de llave;
+  · tareas programadas: duración y resultado por job (`scheduler_listener`);
+  · correo: latencia de cada envío SMTP y fallos;
+  · exportes: duración de cada render de PDF o Excel (`timed_render`).
+
+Con varios procesos (gunicorn con varios workers) cada uno tiene sus
+contadores. Para que /metrics devuelva la suma de todos hay que arrancar con
+PROMETHEUS_MULTIPROC_DIR apuntando a un directorio vacío y escribible, y en
+el gunicorn.conf.py del despliegue:
+
+    from prometheus_client import multiprocess
+    def child_exit(server, worker):
+        multiprocess.mark_process_dead(worker.pid)
+
+Sin esa variable (un solo proceso, como uvicorn hoy) se usa el registro
+normal. Si METRICS_TOKEN está definida, /metrics exige
+`Authorization: Bearer <token>`.
+"""
+
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from sqlalchemy import event
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de los requests HTTP por plantilla de ruta.",
+    ["method", "route", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests HTTP en curso.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Conexiones del pool de SQLAlchemy en uso.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Conexiones abiertas por encima de pool_size (negativo: huecos libres del pool).",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Tiempo para obtener una conexión del pool.",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+DB_READ_ROUTING = Counter(
+    "db_read_routing_total",
+    "Sesiones de get_read_db por destino (replica|primary) y motivo.",
+    ["target", "reason"],
+)
+
+CACHE_REQUESTS = Counter(
+    "redis_cache_requests_total",
+    "Lecturas del caché Redis por prefijo de llave y resultado (hit|miss|error).",
+    ["prefix", "result"],
+)
+
+JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds",
+    "Duración de las tareas programadas.",
+    ["job", "outcome"],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+
+EMAIL_LATENCY = Histogram(
+    "email_send_duration_seconds",
+    "Latencia de los envíos SMTP (una conexión, uno o varios mensajes).",
+    ["kind"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+EMAIL_FAILURES = Counter(
+    "email_send_failures_total",
+    "Mensajes que no se pudieron enviar.",
+    ["kind"],
+)
+
+RENDER_DURATION = Histogram(
+    "export_render_duration_seconds",
+    "Duración del render de un exporte.",
+    ["format"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def key_prefix(key: str) -> str:
+    """`form_design:12` → `form_design`. Acota las etiquetas a los tipos de llave."""
+    return key.split(":", 1)[0]
+
+
+@contextmanager
+def track_request(method: str):
+    HTTP_IN_PROGRESS.labels(method).inc()
+    try:
+        yield
+    finally:
+        HTTP_IN_PROGRESS.labels(method).dec()
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    HTTP_LATENCY.labels(method, route, str(status)).observe(seconds)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia por plantilla de ruta y requests en curso.
+
+    El estado sale del mensaje `http.response.start` y la plantilla de
+    `scope["route"]`, que el router deja puesta. El tiempo llega hasta el
+    último pedazo del cuerpo: un exporte en streaming mide lo que de verdad
+    dura.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        with track_request(method):
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                # Rutas no encontradas van todas a una sola etiqueta.
+                observe_request(method, getattr(route, "path", "<sin ruta>"), status[0],
+                                time.perf_counter() - start)
+
+
+def instrument_pool(engine) -> None:
+    """Conexiones en uso/overflow en cada checkout/checkin y espera al sacar.
+
+    Etiquetadas con el nombre del engine (`logging_name`, ver app/database.py).
+    """
+    pool = engine.pool
+    checked_out = DB_POOL_CHECKED_OUT.labels(engine.logging_name)
+    overflow = DB_POOL_OVERFLOW.labels(engine.logging_name)
+    wait = DB_POOL_WAIT.labels(engine.logging_name)
+
+    def _refresh(*_):
+        checked_out.set(pool.checkedout())
+        overflow.set(pool.overflow())
+
+    event.listen(pool, "checkout", _refresh)
+    event.listen(pool, "checkin", _refresh)
+
+    # QueuePool no tiene evento "antes de esperar": se mide alrededor de la
+    # obtención interna, que es donde bloquea cuando el pool está lleno.
+    original = pool._do_get
+
+    @functools.wraps(original)
+    def _timed_do_get():
+        start = time.perf_counter()
+        try:
+            return original()
+        finally:
+            wait.observe(time.perf_counter() - start)
+
+    pool._do_get = _timed_do_get
+
+
+_job_starts = {}
+
+
+def scheduler_listener(job_event) -> None:
+    """Listener de APScheduler para EVENT_JOB_SUBMITTED | EXECUTED | ERROR.
+
+    La duración va de que el job se entrega al pool de hilos a que termina.
+    """
+    if job_event.code == EVENT_JOB_SUBMITTED:
+        for run_time in job_event.scheduled_run_times:
+            _job_starts[(job_event.job_id, run_time)] = time.perf_counter()
+        return
+    start = _job_starts.pop((job_event.job_id, job_event.scheduled_run_time), None)
+    if start is not None:
+        outcome = "error" if job_event.exception else "ok"
+        JOB_DURATION.labels(job_event.job_id, outcome).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def time_email(kind: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        EMAIL_LATENCY.labels(kind).observe(time.perf_counter() - start)
+
+
+def email_failed(kind: str, count: int = 1) -> None:
+    if count > 0:
+        EMAIL_FAILURES.labels(kind).inc(count)
+
+
+def timed_render(fmt: str):
+    """Decorador: mide el render de un exporte (pdf, excel)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                RENDER_DURATION.labels(fmt).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render_latest() -> bytes:
+    """El texto de /metrics (sumado entre procesos si hay PROMETHEUS_MULTIPROC_DIR)."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
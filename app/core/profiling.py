@@ -0,0 +1,240 @@
+"""Perfilado bajo demanda de un request puntual.
+
+Cuando un endpoint va lento en producción no había forma de ver en qué se
+iba el tiempo. Un administrador pide un token (POST /security/profile-token,
+vale unos minutos) y repite el request lento con la cabecera
+`X-Profile: <token>` o con `?__profile=<token>`. Solo ese request:
+
+  · se muestrea cada `PROFILE_INTERVAL_MS` la pila de los hilos ocupados
+    (el del event loop y los del threadpool donde corren los endpoints
+    síncronos), al estilo pyinstrument;
+  · se anota cada consulta SQL con su inicio y duración (`query_stats`);
+  · se guarda un reporte HTML (árbol de llamadas con % de muestras + línea
+    de tiempo SQL) y las pilas en formato "folded" para flamegraph.pl o
+    speedscope, en PROFILE_DIR. La respuesta trae `X-Profile-Id` y el
+    reporte se ve en GET /security/profiles/{id}.
+
+Los requests sin la marca solo pagan buscar una cabecera y un parámetro en
+bytes: el middleware es ASGI puro y no envuelve nada más.
+
+Ojo: se muestrean todos los hilos ocupados del proceso, así que un request
+concurrente puede colarse en el reporte (aparece con su hilo).
+"""
+
+import hashlib
+import hmac
+import html
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from app.core import query_stats
+from app.core.security import SECRET_KEY
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/forms_profiles"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+TOKEN_TTL = 600
+# Reportes que se conservan; los más viejos se borran.
+KEEP_REPORTS = 50
+
+_HEADER = b"x-profile"
+_QUERY_FLAG = b"__profile="
+_MAX_DEPTH = 200
+# Un nodo con menos de esta fracción de las muestras no se dibuja.
+_MIN_SHARE = 0.005
+
+# Hilos esperando trabajo: no son parte del request.
+_IDLE_FUNCS = {"wait", "select", "poll", "_worker", "get", "accept", "sleep", "_wait_for_tstate_lock"}
+
+_REPORT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def make_token(ttl: int = TOKEN_TTL) -> dict:
+    """Token firmado para perfilar requests durante `ttl` segundos."""
+    expires = int(time.time()) + ttl
+    return {"token": f"{expires}.{_sign(expires)}", "expires_at": expires}
+
+
+def _sign(expires: int) -> str:
+    return hmac.new(SECRET_KEY.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def _valid_token(token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _sign(int(expires)))
+
+
+def _token_of(scope) -> Optional[str]:
+    """El token de la cabecera o del query string, o None (el caso normal)."""
+    for name, value in scope.get("headers", ()):
+        if name == _HEADER:
+            return value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    pos = query.find(_QUERY_FLAG)
+    if pos == -1:
+        return None
+    value = query[pos + len(_QUERY_FLAG):].split(b"&", 1)[0]
+    return value.decode("latin-1")
+
+
+class _Sampler(threading.Thread):
+    """Cuenta pilas de los hilos ocupados hasta que se le pide parar."""
+
+    def __init__(self):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(INTERVAL):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_name in _IDLE_FUNCS:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < _MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                stack.append(f"[{names.get(ident, ident)}]")
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+_ROOT = os.getcwd() + os.sep
+
+
+def _short(filename: str) -> str:
+    """Ruta legible: relativa al proyecto o a site-packages."""
+    if filename.startswith(_ROOT):
+        return filename[len(_ROOT):]
+    pos = filename.rfind("site-packages" + os.sep)
+    return filename[pos + len("site-packages") + 1:] if pos != -1 else filename
+
+
+def _tree(stacks: Counter) -> dict:
+    root = {"count": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["count"] += count
+        node = root
+        for frame in stack:
+            node = node["children"].setdefault(frame, {"count": 0, "children": {}})
+            node["count"] += count
+    return root
+
+
+def _render_node(name: str, node: dict, total: int, depth: int, out: list) -> None:
+    if node["count"] / total < _MIN_SHARE:
+        return
+    pct = 100.0 * node["count"] / total
+    children = sorted(node["children"].items(), key=lambda kv: -kv[1]["count"])
+    label = f"{pct:5.1f}%  {html.escape(name)}"
+    if not children:
+        out.append(f'<div class="leaf">{label}</div>')
+        return
+    out.append(f'<details{" open" if depth < 12 else ""}><summary>{label}</summary>')
+    for child_name, child in children:
+        _render_node(child_name, child, total, depth + 1, out)
+    out.append("</details>")
+
+
+def _report_html(meta: dict, sampler: _Sampler, stats: query_stats.QueryStats) -> str:
+    total = sum(sampler.stacks.values()) or 1
+    tree_html: list = []
+    for name, node in sorted(_tree(sampler.stacks)["children"].items(), key=lambda kv: -kv[1]["count"]):
+        _render_node(name, node, total, 0, tree_html)
+    sql_rows = "".join(
+        f"<tr><td>{start * 1000:.1f}</td><td>{elapsed * 1000:.1f}</td>"
+        f"<td><code>{html.escape(' '.join(statement.split())[:500])}</code></td></tr>"
+        for start, elapsed, statement in (stats.timeline or [])
+    )
+    return f"""<!doctype html><html><head><meta charset="utf-8"><title>Perfil {meta['id']}</title>
+<style>body{{font:13px monospace;margin:1em}}details{{margin-left:1.2em}}.leaf{{margin-left:2.4em}}
+table{{border-collapse:collapse}}td{{border:1px solid #ccc;padding:2px 6px;vertical-align:top}}</style></head><body>
+<h3>{html.escape(meta['method'])} {html.escape(meta['path'])} → {meta['status']}</h3>
+<p>{meta['elapsed_ms']:.1f} ms · {sampler.samples} muestras cada {INTERVAL * 1000:g} ms ·
+{stats.count} consultas SQL, {stats.milliseconds:.1f} ms en BD</p>
+<h4>Llamadas (% de muestras)</h4>{''.join(tree_html) or '<p>Sin muestras.</p>'}
+<h4>Línea de tiempo SQL</h4><table><tr><td>inicio ms</td><td>duración ms</td><td>sentencia</td></tr>{sql_rows}</table>
+</body></html>"""
+
+
+def _save(meta: dict, sampler: _Sampler, stats: query_stats.QueryStats) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{meta['id']}.html").write_text(_report_html(meta, sampler, stats), encoding="utf-8")
+    (PROFILE_DIR / f"{meta['id']}.folded").write_text(
+        "".join(f"{';'.join(stack)} {count}\n" for stack, count in sampler.stacks.items()),
+        encoding="utf-8",
+    )
+    reports = sorted(PROFILE_DIR.glob("*.html"), key=lambda p: p.stat().st_mtime)
+    for old in reports[:-KEEP_REPORTS]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def report_path(report_id: str, kind: str = "html") -> Optional[Path]:
+    """Ruta del reporte guardado, o None si el id no es válido o ya no existe."""
+    if not _REPORT_ID.match(report_id) or kind not in ("html", "folded"):
+        return None
+    path = PROFILE_DIR / f"{report_id}.{kind}"
+    return path if path.exists() else None
+
+
+class ProfilerMiddleware:
+    """Middleware ASGI: perfila solo los requests con un token válido."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _token_of(scope)
+        if token is None:
+            return await self.app(scope, receive, send)
+        if not _valid_token(token):
+            logger.warning("perfilado: token inválido o vencido en %s", scope.get("path"))
+            return await self.app(scope, receive, send)
+
+        meta = {"id": uuid.uuid4().hex, "method": scope["method"], "path": scope["path"], "status": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                meta["status"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", meta["id"].encode())]
+            await send(message)
+
+        sampler = _Sampler()
+        start = time.perf_counter()
+        with query_stats.collect(timeline=True) as stats:
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                sampler.stop()
+                meta["elapsed_ms"] = (time.perf_counter() - start) * 1000
+                try:
+                    _save(meta, sampler, stats)
+                    logger.info("perfilado: %s %s → reporte %s", meta["method"], meta["path"], meta["id"])
+                except Exception:
+                    logger.exception("perfilado: no se pudo guardar el reporte %s", meta["id"])
@@ -0,0 +1,194 @@
+"""Cuántas consultas hace cada request, cuánto tardan y cuáles se repiten.
+
+La mayoría de la latencia viene de bucles N+1 escondidos en crud.py y en los
+endpoints, y nada decía qué ruta hace 3 consultas y cuál 3.000. Con los
+eventos `before_cursor_execute` / `after_cursor_execute` del engine, cada
+request lleva la cuenta de:
+
+  · consultas y milisegundos en BD;
+  · sentencias idénticas repetidas (la firma de un N+1: el mismo SELECT con
+    distintos parámetros, una vez por fila).
+
+`QueryStatsMiddleware` la abre por request y al final:
+
+  · fuera de producción, la devuelve en cabeceras X-DB-Queries, X-DB-Time-ms
+    y X-DB-Repeated (veces que se repitió la sentencia más repetida);
+  · la deja en el log como una línea clave=valor (DEBUG; WARNING si pasa los
+    umbrales DB_QUERY_WARN, DB_TIME_WARN_MS o DB_REPEAT_WARN, con la
+    sentencia repetida).
+
+Fuera de un request (tareas programadas, scripts) no cuenta nada.
+
+Para fijar un techo de consultas en pruebas está el fixture `max_queries`
+de test/conftest.py (por debajo, el `max_queries` de aquí):
+
+    def test_pending_forms(bench, max_queries):
+        headers = bench.headers(bench.filler)
+        with max_queries(2):
+            bench.client.get("/home/pending-forms", headers=headers)
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.database import all_engines
+
+logger = logging.getLogger(__name__)
+
+QUERY_WARN = int(os.getenv("DB_QUERY_WARN", "50"))
+TIME_WARN_MS = float(os.getenv("DB_TIME_WARN_MS", "500"))
+REPEAT_WARN = int(os.getenv("DB_REPEAT_WARN", "10"))
+
+# En producción no se exponen cabeceras internas al cliente.
+EXPOSE_HEADERS = os.getenv("ENV") == "development"
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """Cuenta de un request (o de un bloque `max_queries`)."""
+
+    __slots__ = ("count", "seconds", "statements", "timeline", "started")
+
+    def __init__(self, timeline: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+        # (inicio relativo, duración, sentencia) de cada consulta, solo si se pide.
+        self.timeline: Optional[list] = [] if timeline else None
+        self.started = time.perf_counter()
+
+    def record(self, statement: str, started: float, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+        self.statements[statement] += 1
+        if self.timeline is not None:
+            self.timeline.append((started - self.started, elapsed, statement))
+
+    @property
+    def milliseconds(self) -> float:
+        return self.seconds * 1000
+
+    def most_repeated(self):
+        """(sentencia, veces) de la más repetida, o (None, 0)."""
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def collect(timeline: bool = False, reuse: bool = False):
+    """Cuenta las consultas del bloque (y de lo que llame, aun en otro hilo
+    del threadpool: el contexto se copia con la misma cuenta).
+
+    Con `reuse`, si ya hay una cuenta abierta (el perfilador) se suma a esa.
+    """
+    if reuse and _current.get() is not None:
+        yield _current.get()
+        return
+    stats = QueryStats(timeline=timeline)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def max_queries(limit: int):
+    """Falla con AssertionError si el bloque hace más de `limit` consultas."""
+    with collect() as stats:
+        yield stats
+    if stats.count > limit:
+        statement, times = stats.most_repeated()
+        raise AssertionError(
+            f"{stats.count} consultas (máximo {limit}); la más repetida ({times} veces): {statement}"
+        )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("query_stats_start")
+    if stats is None or not starts:
+        return
+    started = starts.pop()
+    stats.record(statement, started, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # La consulta falló: no hay after_cursor_execute que saque su inicio.
+    connection = exception_context.connection
+    starts = connection.info.get("query_stats_start") if connection is not None else None
+    if starts:
+        starts.pop()
+
+
+# Todos los pools (interactivo, lotes, réplica): una lectura en la réplica cuenta igual.
+for _engine in all_engines:
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_engine, "handle_error", _handle_error)
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope["path"]
+
+
+class QueryStatsMiddleware:
+    """Middleware ASGI: abre la cuenta del request y la reporta al terminar.
+
+    Las cabeceras X-DB-* llevan lo contado hasta que la app empezó a responder;
+    el log, lo del request entero (con el cuerpo en streaming incluido).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+        with collect(reuse=True) as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    status[0] = message["status"]
+                    if EXPOSE_HEADERS:
+                        message["headers"] = list(message.get("headers", ())) + [
+                            (b"x-db-queries", str(stats.count).encode()),
+                            (b"x-db-time-ms", f"{stats.milliseconds:.1f}".encode()),
+                            (b"x-db-repeated", str(stats.most_repeated()[1]).encode()),
+                        ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                _log(scope, status[0], stats)
+
+
+def _log(scope, status: int, stats: QueryStats) -> None:
+    statement, repeated = stats.most_repeated()
+    line = "db_stats method=%s route=%s status=%s queries=%d db_ms=%.1f repeated=%d"
+    args = (scope["method"], _route_of(scope), status, stats.count, stats.milliseconds, repeated)
+    if stats.count > QUERY_WARN or stats.milliseconds > TIME_WARN_MS or repeated > REPEAT_WARN:
+        logger.warning(line + " statement=%r", *args, " ".join((statement or "").split())[:300])
+    else:
+        logger.debug(line, *args)
@@ -0,0 +1,106 @@
+"""Duplicados de question_text, con índice.
+
+Cada pregunta guarda su texto normalizado (`Question.text_normalized`: sin
+acentos, minúsculas, espacios colapsados; ver `app.models.question_text_key`).
+Así la validación en vivo de /questions/check-text y la de crear/editar no
+recorren toda la tabla en Python en cada tecla:
+
+  · `find_duplicate_question`: texto idéntico, una búsqueda por índice;
+  · `similar_questions`: textos parecidos (similitud trigram de pg_trgm) para
+    sugerir posibles duplicados. Es opcional y solo orienta; no bloquea.
+
+Las preguntas nuevas o editadas lo traen desde que se escriben. Las que ya
+existían se rellenan aquí, por lotes de id:
+
+    python -m app.core.question_text
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Question, question_text_key
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 5000
+
+# Similitud trigram mínima (0..1) para sugerir una pregunta parecida.
+SIMILARITY_THRESHOLD = 0.45
+
+
+def find_duplicate_question(db: Session, text: str, exclude_id: Optional[int] = None) -> Optional[Tuple[int, str]]:
+    """(id, texto) de la primera pregunta con texto normalizado idéntico, o None."""
+    norm = question_text_key(text)
+    if not norm:
+        return None
+    query = select(Question.id, Question.question_text).where(Question.text_normalized == norm[:255])
+    if exclude_id is not None:
+        query = query.where(Question.id != exclude_id)
+    row = db.execute(query.order_by(Question.id).limit(1)).first()
+    return (row.id, row.question_text) if row else None
+
+
+def similar_questions(db: Session, text: str, exclude_id: Optional[int] = None,
+                      limit: int = 5, threshold: float = SIMILARITY_THRESHOLD) -> List[dict]:
+    """Las preguntas más parecidas a `text`, de mayor a menor similitud.
+
+    Usa el índice trigram de migrations/2026-10-19_question_text_normalized.sql.
+    """
+    norm = question_text_key(text)
+    if not norm:
+        return []
+    score = func.similarity(Question.text_normalized, norm)
+    query = (
+        select(Question.id, Question.question_text, score.label("score"))
+        .where(Question.text_normalized.op("%")(norm), score >= threshold)
+    )
+    if exclude_id is not None:
+        query = query.where(Question.id != exclude_id)
+    rows = db.execute(query.order_by(score.desc(), Question.id).limit(limit)).all()
+    return [{"id": r.id, "text": r.question_text, "score": round(float(r.score), 3)} for r in rows]
+
+
+def backfill_text_normalized(db: Session, batch: int = _BATCH) -> int:
+    """Rellena `text_normalized` de las preguntas que no lo tienen.
+
+    Devuelve cuántas quedaron rellenadas.
+    """
+    connection = db.connection()
+    stmt = (
+        update(Question.__table__)
+        .where(Question.__table__.c.id == bindparam("b_id"))
+        .values(text_normalized=bindparam("b_norm"))
+    )
+    last_id, filled = 0, 0
+    while True:
+        rows = connection.execute(
+            select(Question.id, Question.question_text)
+            .where(Question.id > last_id, Question.text_normalized.is_(None))
+            .order_by(Question.id)
+            .limit(batch)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        params = [
+            {"b_id": row.id, "b_norm": question_text_key(row.question_text)[:255]}
+            for row in rows if question_text_key(row.question_text)
+        ]
+        if params:
+            connection.execute(stmt, params)
+            filled += len(params)
+        db.commit()
+        connection = db.connection()
+        logger.info("preguntas normalizadas: hasta id %s, %s rellenadas", last_id, filled)
+    return filled
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        print(f"question_text: {backfill_text_normalized(_db)} preguntas rellenadas")
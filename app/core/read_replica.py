@@ -0,0 +1,276 @@
+"""Lecturas pesadas a la réplica, con vuelta al primario cuando hace falta.
+
+Exportes, tableros, /responses/aggregate y el consolidado de movimientos
+leían del primario y competían con los envíos de respuestas. Con
+DATABASE_REPLICA_URL definida (ver app/database.py), los endpoints de solo
+lectura que piden `Depends(get_read_db)` en lugar de `get_db` leen de la
+réplica, salvo que:
+
+  · el cliente escribió hace poco (leer lo propio): tras un POST, PUT, PATCH
+    o DELETE exitoso, ese cliente (su cabecera Authorization) lee del
+    primario durante READ_YOUR_WRITES_SECONDS. Así, quien acaba de enviar
+    una respuesta la ve en su exporte aunque la réplica no la tenga aún.
+    La marca vive en Redis (sirve entre workers, con timeout de
+    REDIS_MARK_TIMEOUT_SECONDS) y en memoria del proceso;
+  · la réplica va atrasada más de REPLICA_MAX_LAG_SECONDS, o no responde:
+    todo el mundo lee del primario. El atraso se consulta cada
+    REPLICA_LAG_CHECK_SECONDS, no por request.
+
+READ_YOUR_WRITES_SECONDS debe ser mayor que REPLICA_MAX_LAG_SECONDS: si la
+réplica va dentro del margen, al vencer la marca ya tiene lo que el cliente
+escribió.
+
+Sin Redis la marca solo la ve el worker que atendió la escritura.
+Sin réplica configurada, `get_read_db` devuelve la sesión de `get_db` y no
+se agrega el middleware.
+
+Los exportes piden `get_export_db`: igual, pero cuando no van a la réplica
+usan el pool de lotes (app/database.py) en vez del interactivo. Autentican
+con `get_export_user`, sobre esa misma sesión.
+
+Solo deben pedir `get_read_db` o `get_export_db` endpoints que no escriben
+nada: la réplica rechaza cualquier INSERT/UPDATE.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import redis
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.security import get_current_user, oauth2_scheme
+from app.database import BatchSessionLocal, ReplicaSessionLocal, get_db, replica_engine
+from app.models import User
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_S = int(os.getenv("READ_YOUR_WRITES_SECONDS", "15"))
+MAX_LAG_S = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+LAG_CHECK_S = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5"))
+REDIS_MARK_TIMEOUT_S = float(os.getenv("REDIS_MARK_TIMEOUT_SECONDS", "0.2"))
+
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+_REDIS_PREFIX = "rw:"
+_AUTHORIZATION = b"authorization"
+
+# En un standby sin nada pendiente de aplicar el atraso es 0 aunque la última
+# transacción sea vieja (primario sin escrituras). Fuera de un standby
+# (p. ej. la réplica apunta al mismo primario) las funciones dan NULL → 0.
+_LAG_SQL = text("""
+    SELECT COALESCE(CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END, 0)
+""")
+
+# Clave del cliente → hasta cuándo lee del primario.
+_recent_writes: Dict[str, float] = {}
+_MAX_LOCAL_MARKS = 10000
+
+_REDIS_RETRY_S = 10
+_redis_state = {"client": None, "retry_at": 0.0}
+
+_lag_lock = threading.Lock()
+_lag_state = {"checked": 0.0, "lag": None}
+
+
+def _client_key(scope) -> Optional[str]:
+    """Huella corta de la cabecera Authorization; None si no viene."""
+    for name, value in scope.get("headers", ()):
+        if name == _AUTHORIZATION:
+            return hashlib.sha256(value).hexdigest()[:32]
+    return None
+
+
+def _redis():
+    """Cliente propio para las marcas, con timeouts cortos.
+
+    Marcar y leer la marca no puede esperar lo que espera el caché: si Redis
+    no responde en REDIS_MARK_TIMEOUT_S se sigue sin él, y tras un error no
+    se vuelve a intentar hasta pasados _REDIS_RETRY_S (solo marca local).
+    """
+    if time.monotonic() < _redis_state["retry_at"]:
+        return None
+    if _redis_state["client"] is None:
+        _redis_state["client"] = redis.Redis(
+            host=redis_client.host, port=redis_client.port, password=redis_client.password,
+            socket_timeout=REDIS_MARK_TIMEOUT_S, socket_connect_timeout=REDIS_MARK_TIMEOUT_S,
+        )
+    return _redis_state["client"]
+
+
+def _redis_failed(action: str, e: Exception) -> None:
+    _redis_state["retry_at"] = time.monotonic() + _REDIS_RETRY_S
+    logger.warning("read_replica: no se pudo %s en Redis (se reintenta en %d s): %s",
+                   action, _REDIS_RETRY_S, e)
+
+
+def _mark_local(key: str) -> None:
+    now = time.monotonic()
+    if len(_recent_writes) > _MAX_LOCAL_MARKS:
+        for old in [k for k, until in _recent_writes.items() if until < now]:
+            _recent_writes.pop(old, None)
+    _recent_writes[key] = now + READ_YOUR_WRITES_S
+
+
+def _mark_redis(key: str) -> None:
+    client = _redis()
+    if client is None:
+        return
+    try:
+        client.setex(_REDIS_PREFIX + key, READ_YOUR_WRITES_S, 1)
+    except Exception as e:
+        _redis_failed("marcar la escritura", e)
+
+
+def mark_write(key: str) -> None:
+    """El cliente `key` lee del primario durante READ_YOUR_WRITES_SECONDS.
+
+    Bloquea hasta REDIS_MARK_TIMEOUT_S: desde el event loop, usar
+    `mark_write_async`.
+    """
+    _mark_local(key)
+    _mark_redis(key)
+
+
+async def mark_write_async(key: str) -> None:
+    """`mark_write` sin bloquear el event loop: Redis va en el threadpool."""
+    _mark_local(key)
+    if time.monotonic() >= _redis_state["retry_at"]:
+        await run_in_threadpool(_mark_redis, key)
+
+
+def wrote_recently(key: str) -> bool:
+    if _recent_writes.get(key, 0) > time.monotonic():
+        return True
+    client = _redis()
+    if client is None:
+        return False
+    try:
+        return bool(client.exists(_REDIS_PREFIX + key))
+    except Exception as e:
+        _redis_failed("leer la marca", e)
+        return False
+
+
+def replica_lag() -> Optional[float]:
+    """Atraso de la réplica en segundos (cacheado); None si no responde."""
+    now = time.monotonic()
+    if now - _lag_state["checked"] < LAG_CHECK_S or not _lag_lock.acquire(blocking=False):
+        return _lag_state["lag"]
+    try:
+        with replica_engine.connect() as conn:
+            lag = float(conn.execute(_LAG_SQL).scalar())
+    except Exception as e:
+        logger.warning("read_replica: la réplica no responde, se lee del primario: %s", e)
+        lag = None
+    finally:
+        _lag_state["checked"] = time.monotonic()
+        _lag_lock.release()
+    if lag is not None and lag > MAX_LAG_S:
+        logger.warning("read_replica: réplica atrasada %.1f s, se lee del primario", lag)
+    _lag_state["lag"] = lag
+    return lag
+
+
+def _route(scope) -> str:
+    """Motivo de la decisión: 'replica' o por qué se va al primario."""
+    key = _client_key(scope)
+    if key is not None and wrote_recently(key):
+        return "recent_write"
+    lag = replica_lag()
+    if lag is None:
+        return "unavailable"
+    if lag > MAX_LAG_S:
+        return "lag"
+    return "replica"
+
+
+def get_read_db(request: Request, primary: Session = Depends(get_db)):
+    """Como `get_db`, pero de la réplica cuando se puede.
+
+    Si se lee del primario es la misma sesión de `get_db` del request (la de
+    get_current_user): no se saca una segunda conexión.
+    """
+    if ReplicaSessionLocal is None:
+        yield primary
+        return
+    reason = _route(request.scope)
+    metrics.DB_READ_ROUTING.labels("replica" if reason == "replica" else "primary", reason).inc()
+    if reason != "replica":
+        yield primary
+        return
+    db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_export_db(request: Request):
+    """Para exportes: la réplica cuando se puede y, si no, el pool de lotes.
+
+    Un exporte largo no ocupa conexiones del pool interactivo, siempre que
+    autentique con `get_export_user` y no con `get_current_user`.
+    """
+    factory = BatchSessionLocal
+    if ReplicaSessionLocal is not None:
+        reason = _route(request.scope)
+        metrics.DB_READ_ROUTING.labels("replica" if reason == "replica" else "primary", reason).inc()
+        if reason == "replica":
+            factory = ReplicaSessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_export_user(db: Session = Depends(get_export_db), token: str = Depends(oauth2_scheme)) -> User:
+    """`get_current_user` sobre la sesión del exporte.
+
+    Con `get_current_user`, el usuario se buscaba en la sesión de `get_db`, y
+    esa conexión del pool interactivo quedaba con la transacción abierta y
+    ociosa mientras duraba el exporte. Así el exporte usa una sola conexión,
+    de lotes o de la réplica. En la réplica, un usuario desactivado puede
+    exportar como mucho REPLICA_MAX_LAG_SECONDS más.
+
+        current_user: User = Depends(get_export_user)
+        current_user: User = Depends(require_roles([...], user_dependency=get_export_user))
+    """
+    return get_current_user(db, token)
+
+
+class ReadYourWritesMiddleware:
+    """Middleware ASGI: marca al cliente cuando una escritura suya sale bien.
+
+    La marca se pone al empezar la respuesta, antes de que el cliente la
+    reciba y pueda pedir la siguiente lectura. La parte de Redis corre en el
+    threadpool, con timeout corto: un Redis lento no frena el event loop.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _WRITE_METHODS:
+            return await self.app(scope, receive, send)
+        key = _client_key(scope)
+        if key is None:
+            return await self.app(scope, receive, send)
+
+        async def send_marking(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                await mark_write_async(key)
+            await send(message)
+
+        await self.app(scope, receive, send_marking)
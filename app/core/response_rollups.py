@@ -0,0 +1,416 @@
+"""Rollups diarios de respuestas para /responses/aggregate.
+
+Las dos agregaciones de /responses/aggregate (la de ArIA por estado, usuario,
+formato, mes o día y el conteo semanal del Analista) agrupaban la tabla
+`responses` entera en cada llamada, y el promedio de horas de aprobación
+además agrupaba toda `response_approvals`. Aquí quedan ya sumadas por
+(formato, usuario, estado, día) en `response_daily_rollups`:
+
+  · se arman completas la primera vez que alguien las lee (o con el comando);
+  · al escribir respuestas o aprobaciones se rehacen los días tocados, en la
+    misma transacción;
+  · lo que llega por otro backend (respuestas nuevas) se suma al leer, desde
+    la última respuesta incluida;
+  · cada noche se rehacen completas (`response_rollups_rebuild_task`), que
+    recoge lo que ese otro backend haya EDITADO.
+
+Un rango de fechas que corta un día a la mitad se resuelve igual de exacto:
+los días completos salen de los rollups y los dos días de borde de
+`responses`, solo ese pedazo.
+
+    python -m app.core.response_rollups
+"""
+
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    TIMESTAMP, Date, and_, cast, delete, event, func, literal, or_, select, tuple_, update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.response_scope import IS_SUBMISSION
+from app.models import (
+    Form, Response, ResponseApproval, ResponseDailyRollup, ResponseRollupState,
+)
+
+logger = logging.getLogger(__name__)
+
+# Agrupaciones y métricas que salen de los rollups; el resto va a `responses`.
+GROUPINGS = ("status", "user", "form", "month", "day")
+METRICS = ("count", "avg_approval_hours")
+
+# Formato de la semana ISO del conteo semanal ("2026-W42").
+_WEEK_FORMAT = 'IYYY-"W"IW'
+
+_STATE_ID = 1
+
+
+def _day_of(col):
+    """Día de un timestamp, en la zona horaria de la sesión (igual que date_trunc)."""
+    return cast(func.date_trunc("day", col), Date)
+
+
+def _last_review():
+    return (
+        select(
+            ResponseApproval.response_id,
+            func.max(ResponseApproval.reviewed_at).label("last_rev"),
+        )
+        .where(ResponseApproval.reviewed_at.isnot(None))
+        .group_by(ResponseApproval.response_id)
+        .subquery()
+    )
+
+
+def _raw_source(*conditions):
+    """Respuestas de diligenciamiento con su última revisión, como subconsulta.
+
+    Columnas: form_id, user_id, status, submitted_at, seconds (NULL si nadie ha
+    revisado todavía).
+    """
+    last_rev = _last_review()
+    return (
+        select(
+            Response.form_id,
+            Response.user_id,
+            Response.status,
+            Response.submitted_at,
+            func.extract("epoch", last_rev.c.last_rev - Response.submitted_at).label("seconds"),
+        )
+        .outerjoin(last_rev, last_rev.c.response_id == Response.id)
+        .where(IS_SUBMISSION, *conditions)
+        .subquery()
+    )
+
+
+def _rollup_rows(*conditions):
+    """SELECT con las filas de rollup de las respuestas que cumplen `conditions`."""
+    raw = _raw_source(*conditions)
+    day = _day_of(raw.c.submitted_at)
+    return (
+        select(
+            raw.c.form_id,
+            raw.c.user_id,
+            cast(raw.c.status, ResponseDailyRollup.status.type).label("status"),
+            day.label("day"),
+            func.count().label("responses"),
+            func.count(raw.c.seconds).label("reviewed_responses"),
+            func.coalesce(func.sum(raw.c.seconds), 0).label("approval_seconds"),
+        )
+        .group_by(raw.c.form_id, raw.c.user_id, raw.c.status, day)
+    )
+
+
+def _upsert(connection, rows_select) -> None:
+    stmt = insert(ResponseDailyRollup).from_select(
+        ["form_id", "user_id", "status", "day", "responses", "reviewed_responses", "approval_seconds"],
+        rows_select,
+    )
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["form_id", "user_id", "status", "day"],
+            set_={
+                "responses": stmt.excluded.responses,
+                "reviewed_responses": stmt.excluded.reviewed_responses,
+                "approval_seconds": stmt.excluded.approval_seconds,
+            },
+        )
+    )
+
+
+def keys_of(connection, response_ids: Iterable[int]) -> Set[Tuple[int, int, object]]:
+    """(form_id, user_id, día) de esas respuestas, para rehacerlos después."""
+    response_ids = list(set(response_ids))
+    if not response_ids:
+        return set()
+    return set(
+        connection.execute(
+            select(Response.form_id, Response.user_id, _day_of(Response.submitted_at))
+            .where(Response.id.in_(response_ids), IS_SUBMISSION)
+        ).all()
+    )
+
+
+def refresh_keys(connection, keys: Iterable[Tuple[int, int, object]]) -> None:
+    """Rehace los rollups de esos (form_id, user_id, día) desde `responses`."""
+    keys = list(set(keys))
+    if not keys:
+        return
+    days = [day for _, _, day in keys]
+    first = min(days)
+    last = max(days) + timedelta(days=1)
+    connection.execute(
+        delete(ResponseDailyRollup).where(
+            tuple_(ResponseDailyRollup.form_id, ResponseDailyRollup.user_id, ResponseDailyRollup.day).in_(keys)
+        )
+    )
+    _upsert(connection, _rollup_rows(
+        Response.form_id.in_({form_id for form_id, _, _ in keys}),
+        Response.user_id.in_({user_id for _, user_id, _ in keys}),
+        Response.submitted_at >= cast(literal(first), TIMESTAMP(timezone=True)),
+        Response.submitted_at < cast(literal(last), TIMESTAMP(timezone=True)),
+        tuple_(Response.form_id, Response.user_id, _day_of(Response.submitted_at)).in_(keys),
+    ))
+
+
+def _mark(connection, last_response_id: int) -> None:
+    connection.execute(
+        update(ResponseRollupState)
+        .where(ResponseRollupState.id == _STATE_ID)
+        .values(last_response_id=func.greatest(ResponseRollupState.last_response_id, last_response_id))
+    )
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Rehace los rollups completos. Devuelve cuántas filas quedaron."""
+    connection = db.connection()
+    last_id = connection.execute(select(func.coalesce(func.max(Response.id), 0))).scalar()
+    connection.execute(delete(ResponseDailyRollup))
+    _upsert(connection, _rollup_rows(Response.id <= last_id))
+    connection.execute(
+        insert(ResponseRollupState)
+        .values(id=_STATE_ID, last_response_id=last_id)
+        .on_conflict_do_update(
+            index_elements=["id"],
+            set_={"last_response_id": last_id, "built_at": func.now()},
+        )
+    )
+    rows = connection.execute(select(func.count()).select_from(ResponseDailyRollup)).scalar()
+    db.commit()
+    return rows
+
+
+def ensure_rollups(db: Session) -> None:
+    """Deja los rollups listos para leer: los arma si no existen y suma las
+    respuestas llegadas por otro backend desde la última incluida."""
+    connection = db.connection()
+    last_id = connection.execute(
+        select(ResponseRollupState.last_response_id).where(ResponseRollupState.id == _STATE_ID)
+    ).scalar()
+    if last_id is None:
+        rebuild_rollups(db)
+        return
+    newer = connection.execute(
+        select(Response.id).where(Response.id > last_id).order_by(Response.id)
+    ).scalars().all()
+    if not newer:
+        return
+    refresh_keys(connection, keys_of(connection, newer))
+    _mark(connection, newer[-1])
+    db.commit()
+
+
+def _boundaries(db: Session, date_from, date_to):
+    """Inicio del día de `date_from` y del día siguiente a `date_to`, en la zona
+    de la sesión. Entre los dos, los días completos salen de los rollups."""
+    start = func.date_trunc("day", cast(literal(date_from), TIMESTAMP(timezone=True))) if date_from else literal(None)
+    end = func.date_trunc("day", cast(literal(date_to), TIMESTAMP(timezone=True))) if date_to else literal(None)
+    row = db.execute(select(start, end)).one()
+    return row[0], row[1]
+
+
+def _split(db: Session, date_from, date_to):
+    """(condiciones sobre rollups, condiciones sobre respuestas de borde o None)."""
+    first_day, last_day = _boundaries(db, date_from, date_to)
+    rollup_conditions = []
+    edges = []
+    if date_from is not None:
+        rollup_conditions.append(ResponseDailyRollup.day > first_day.date())
+        edges.append(and_(
+            Response.submitted_at >= date_from,
+            Response.submitted_at < first_day + timedelta(days=1),
+        ))
+    if date_to is not None:
+        rollup_conditions.append(ResponseDailyRollup.day < last_day.date())
+        edges.append(and_(
+            Response.submitted_at >= last_day,
+            Response.submitted_at <= date_to,
+        ))
+    if not edges:
+        return rollup_conditions, None
+    raw_conditions = [or_(*edges)]
+    if date_from is not None:
+        raw_conditions.append(Response.submitted_at >= date_from)
+    if date_to is not None:
+        raw_conditions.append(Response.submitted_at <= date_to)
+    return rollup_conditions, raw_conditions
+
+
+def _key_expressions(group_by: str, rollups, raw):
+    """Expresión de la llave de grupo sobre rollups y sobre la subconsulta cruda.
+
+    Mes y día devuelven lo mismo que `date_trunc` sobre submitted_at, para que
+    la respuesta no cambie de forma.
+    """
+    if group_by == "status":
+        return rollups.status, cast(raw.c.status, ResponseDailyRollup.status.type)
+    if group_by == "user":
+        return rollups.user_id, raw.c.user_id
+    if group_by == "form":
+        return rollups.form_id, raw.c.form_id
+    trunc = "month" if group_by == "month" else "day"
+    return (
+        func.date_trunc(trunc, cast(rollups.day, TIMESTAMP(timezone=True))),
+        func.date_trunc(trunc, raw.c.submitted_at),
+    )
+
+
+def _merge(parts) -> Dict[object, List]:
+    """Suma por llave las filas (key, responses, reviewed, seconds) de varias fuentes."""
+    merged: Dict[object, List] = {}
+    for rows in parts:
+        for key, responses, reviewed, seconds in rows:
+            total = merged.setdefault(key, [0, 0, 0.0])
+            total[0] += responses or 0
+            total[1] += reviewed or 0
+            total[2] += float(seconds or 0)
+    return merged
+
+
+def aggregate(db: Session, group_by: str, metric: str, form_ids=None, form_id: Optional[int] = None,
+              date_from=None, date_to=None) -> Optional[List[Tuple[object, float]]]:
+    """[(llave, valor)] de /responses/aggregate desde los rollups.
+
+    `form_ids`: subconsulta de formatos visibles (None = todos). Devuelve None
+    si la agrupación o la métrica no salen de los rollups.
+    """
+    if group_by not in GROUPINGS or metric not in METRICS:
+        return None
+    ensure_rollups(db)
+    rollup_conditions, raw_conditions = _split(db, date_from, date_to)
+    scope = []
+    raw_scope = []
+    if form_ids is not None:
+        scope.append(ResponseDailyRollup.form_id.in_(form_ids))
+        raw_scope.append(Response.form_id.in_(form_ids))
+    if form_id is not None:
+        scope.append(ResponseDailyRollup.form_id == form_id)
+        raw_scope.append(Response.form_id == form_id)
+
+    raw = _raw_source(*raw_scope, *(raw_conditions or []))
+    key, raw_key = _key_expressions(group_by, ResponseDailyRollup, raw)
+    parts = [
+        db.execute(
+            select(
+                key,
+                func.sum(ResponseDailyRollup.responses),
+                func.sum(ResponseDailyRollup.reviewed_responses),
+                func.sum(ResponseDailyRollup.approval_seconds),
+            )
+            .where(*scope, *rollup_conditions)
+            .group_by(key)
+        ).all()
+    ]
+    if raw_conditions is not None:
+        parts.append(db.execute(
+            select(raw_key, func.count(), func.count(raw.c.seconds), func.sum(raw.c.seconds))
+            .group_by(raw_key)
+        ).all())
+
+    result = []
+    for k, (responses, reviewed, seconds) in _merge(parts).items():
+        if metric == "count":
+            if responses:
+                result.append((k, float(responses)))
+        elif reviewed:
+            result.append((k, seconds / reviewed / 3600.0))
+    return result
+
+
+def weekly_counts(db: Session, since=None, ensure: bool = True) -> List[Tuple[int, str, str, int]]:
+    """[(form_id, título, semana ISO, conteo)] del conteo semanal, por semana.
+
+    Con `ensure=False` no pone al día los rollups (quien llama ya lo hizo en
+    el primario y `db` es de la réplica).
+    """
+    if ensure:
+        ensure_rollups(db)
+    rollup_conditions, raw_conditions = _split(db, since, None)
+    week = func.to_char(
+        func.date_trunc("week", cast(ResponseDailyRollup.day, TIMESTAMP(timezone=True))), _WEEK_FORMAT
+    )
+    parts = [
+        db.execute(
+            select(ResponseDailyRollup.form_id, week, func.sum(ResponseDailyRollup.responses))
+            .where(*rollup_conditions)
+            .group_by(ResponseDailyRollup.form_id, week)
+        ).all()
+    ]
+    if raw_conditions is not None:
+        raw = _raw_source(*raw_conditions)
+        raw_week = func.to_char(func.date_trunc("week", raw.c.submitted_at), _WEEK_FORMAT)
+        parts.append(db.execute(
+            select(raw.c.form_id, raw_week, func.count()).group_by(raw.c.form_id, raw_week)
+        ).all())
+
+    counts: Dict[Tuple[int, str], int] = {}
+    for rows in parts:
+        for form_id, period, count in rows:
+            counts[(form_id, period)] = counts.get((form_id, period), 0) + int(count or 0)
+    titles = dict(
+        db.execute(select(Form.id, Form.title).where(Form.id.in_({f for f, _ in counts}))).all()
+    ) if counts else {}
+    return [
+        (form_id, titles.get(form_id), period, count)
+        for (form_id, period), count in sorted(counts.items(), key=lambda item: (item[0][1], item[0][0]))
+        if form_id in titles
+    ]
+
+
+def _built(connection) -> bool:
+    return connection.execute(
+        select(ResponseRollupState.id).where(ResponseRollupState.id == _STATE_ID)
+    ).first() is not None
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_previous_days(session, flush_context, instances):
+    """Guarda el día en que estaban las respuestas que se van a editar o borrar:
+    si cambian de formato, usuario o fecha (o desaparecen), ese día también
+    hay que rehacerlo."""
+    response_ids = {
+        obj.id for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, Response) and obj.id is not None
+    }
+    if not response_ids:
+        return
+    connection = session.connection()
+    if _built(connection):
+        session.info.setdefault("response_rollup_keys", set()).update(keys_of(connection, response_ids))
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_response_rollups(session, flush_context):
+    """Rehace los días tocados por las respuestas y aprobaciones recién escritas.
+
+    Corre dentro de la transacción. Mientras los rollups no se hayan armado no
+    hace nada: se arman completos en la primera lectura.
+    """
+    keys = session.info.pop("response_rollup_keys", set())
+    response_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Response):
+            if obj.id is not None:
+                response_ids.add(obj.id)
+        elif isinstance(obj, ResponseApproval):
+            if obj.response_id is not None:
+                response_ids.add(obj.response_id)
+
+    if not response_ids and not keys:
+        return
+    connection = session.connection()
+    if not _built(connection):
+        return
+    keys.update(keys_of(connection, response_ids))
+    refresh_keys(connection, keys)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        print(f"response_rollups: {rebuild_rollups(_db)} filas")
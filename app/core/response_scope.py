@@ -15,13 +15,17 @@ partes y sea fácil de encontrar.
 
 Para leer una respuesta COMPLETA (lo del diligenciador más lo que respondieron
 sus aprobadores) está `response_tree_ids`.
+
+Lo que agrega el filtro global por request: `python -m benchmarks.response_scope_bench`.
 """
 
-from typing import List
+import functools
+from typing import Dict, List
 
-from sqlalchemy import event
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session, with_loader_criteria
 
+from app.database import engine
 from app.models import Response
 
 # Expresión reutilizable para where()/filter().
@@ -46,6 +50,102 @@ def include_approver_responses(query):
     return query.execution_options(**{_OPT_IN: True})
 
 
+# El criterio se arma una sola vez: armarlo en cada SELECT (y analizar la
+# lambda) costaba la mitad de lo que cuesta preparar la consulta.
+_SOLO_DILIGENCIAMIENTOS = with_loader_criteria(
+    Response,
+    lambda cls: cls.parent_response_id.is_(None),
+    include_aliases=True,
+)
+
+# Forma de la sentencia (su cache key, sin los valores) → si el criterio la
+# cambia. Las formas son las de las consultas del código: pocos cientos.
+_aplica_por_forma: Dict[tuple, bool] = {}
+_MAX_FORMAS = 5000
+
+
+@functools.lru_cache(maxsize=None)
+def _mappers_con_respuestas() -> frozenset:
+    """Mappers desde los que se llega a `Response` siguiendo relaciones."""
+    alcanzan = {inspect(Response)}
+    mappers = list(inspect(Response).registry.mappers)
+    cambio = True
+    while cambio:
+        cambio = False
+        for mapper in mappers:
+            if mapper not in alcanzan and any(r.mapper in alcanzan for r in mapper.relationships):
+                alcanzan.add(mapper)
+                cambio = True
+    return frozenset(alcanzan)
+
+
+def _usa_respuestas(statement) -> bool:
+    """¿Selecciona o une Response, o selecciona objetos desde los que se llega a ella?
+
+    Lo último importa porque el criterio viaja con los objetos que carga la
+    consulta: cargar un Form con él hace que `form.responses`, aun perezoso,
+    filtre. A esas consultas se les pone aunque su SQL no toque `responses`.
+    """
+    alcanzan = _mappers_con_respuestas()
+    respuestas = inspect(Response)
+    for columna in statement._raw_columns:
+        entidad = columna._annotations.get("parententity")
+        if entidad is None:
+            continue
+        if entidad.mapper is respuestas or (columna.is_selectable and entidad.mapper in alcanzan):
+            return True
+    for destino, *_ in statement._setup_joins:
+        # join(Response, ...) / join(aliased(Response), ...) / join(Form.responses)
+        entidad = getattr(destino, "_annotations", {}).get("parententity")
+        if entidad is not None:
+            mapper = entidad.mapper
+        else:
+            mapper = getattr(getattr(destino, "property", None), "mapper", None)
+        if mapper is respuestas:
+            return True
+    return False
+
+
+def _sql_cambia(statement) -> bool:
+    """¿El criterio cambia el SQL? (joins, subconsultas o alias de Response)."""
+    dialect = engine.dialect
+    return str(statement.compile(dialect=dialect)) != str(
+        statement.options(_SOLO_DILIGENCIAMIENTOS).compile(dialect=dialect)
+    )
+
+
+def _criterio_aplica(statement) -> bool:
+    """¿Hace falta el filtro en esta sentencia?
+
+    No hace falta si no toca `responses` ni carga entidades relacionadas con
+    ella: ids, conteos y columnas sueltas de otras tablas, o entidades como
+    approval_inbox y los contadores.
+
+    Primero se mira lo que selecciona y une (casi gratis). Si no decide
+    eso, se busca la forma de la sentencia (su cache key): calcularla solo
+    cuesta cuando al final el filtro aplica; si no, la ejecución reutiliza la
+    que quedó memorizada en la sentencia. Con opciones de carga
+    (joinedload/selectinload...) siempre aplica. Ante la duda, aplica.
+    """
+    if getattr(statement, "_with_options", None) or not hasattr(statement, "_raw_columns"):
+        return True
+    if _usa_respuestas(statement):
+        return True
+    cache_key = statement._generate_cache_key()
+    if cache_key is None:
+        return True
+    aplica = _aplica_por_forma.get(cache_key.key)
+    if aplica is None:
+        try:
+            aplica = _sql_cambia(statement)
+        except Exception:
+            aplica = True
+        if len(_aplica_por_forma) >= _MAX_FORMAS:
+            _aplica_por_forma.clear()
+        _aplica_por_forma[cache_key.key] = aplica
+    return aplica
+
+
 @event.listens_for(Session, "do_orm_execute")
 def _excluir_respuestas_de_aprobador(execute_state):
     """Filtro global: una consulta de `Response` no ve las de aprobador.
@@ -53,7 +153,8 @@ def _excluir_respuestas_de_aprobador(execute_state):
     Hay ~80 consultas que listan o cuentan respuestas (listados, exports,
     movimientos, tableros, correos). Ir a ponerles el filtro a mano dejaría
     huecos —y cada hueco es un conteo mal en una pantalla— así que se aplica
-    aquí, una sola vez, a todo SELECT de la entidad.
+    aquí, una sola vez, a todo SELECT que involucre la entidad. Los que no la
+    tocan (ver `_criterio_aplica`) pasan sin cambios.
 
     Quien las necesite pide `include_approver_responses(query)`.
     """
@@ -65,14 +166,10 @@ def _excluir_respuestas_de_aprobador(execute_state):
         return
     if execute_state.execution_options.get(_OPT_IN):
         return
+    if not _criterio_aplica(execute_state.statement):
+        return
 
-    execute_state.statement = execute_state.statement.options(
-        with_loader_criteria(
-            Response,
-            lambda cls: cls.parent_response_id.is_(None),
-            include_aliases=True,
-        )
-    )
+    execute_state.statement = execute_state.statement.options(_SOLO_DILIGENCIAMIENTOS)
 
 
 def response_tree_ids(db, response_id: int) -> List[int]:
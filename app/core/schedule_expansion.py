@@ -0,0 +1,392 @@
+"""Motor de programaciones (FormSchedule) del Home, vectorizado con NumPy.
+
+/home/pending-forms y /home/upcoming-events recorrían los schedules del
+usuario uno por uno en Python: próxima fecha, ¿ya lo hizo en este período?,
+y para el calendario un bucle día por día por schedule, más un `any()` sobre
+TODAS las respuestas del usuario por cada evento. Un admin con muchos
+schedules que abría un rango de un año generaba miles de eventos así.
+
+Aquí todo se calcula para todos los schedules a la vez, con arreglos
+`datetime64[D]`:
+
+  · `ScheduleSet` pasa los schedules a arreglos (tipo, días de la semana,
+    día del mes, intervalo, fecha específica) una sola vez;
+  · `expand` arma la matriz schedules × días del rango y saca los eventos;
+  · `event_periods` + `completed_events` marcan completados con búsqueda
+    binaria sobre las fechas de envío ordenadas;
+  · `next_due_dates` e `is_done` son las reglas de la lista de pendientes.
+
+Las reglas son las mismas de antes (ver el historial de home_dashboard.py).
+Las fechas de envío salen de UNA consulta agrupada (`last_submissions`,
+`submission_dates`).
+
+El resultado de cada usuario se guarda en Redis por día (`cached`). La llave
+lleva una versión por usuario y otra de formatos que se cambian al confirmar
+una escritura de sus schedules o respuestas, o de cualquier formato. Lo que
+escriba otro backend se ve a más tardar en `CACHE_TTL`.
+"""
+
+import json
+import logging
+import uuid
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Date, cast, event, func
+from sqlalchemy.orm import Session
+
+from app.models import Form, FormSchedule, Response, ResponseStatus
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# repeat_days viene como JSON serializado en BD. Admite inglés y español
+# porque el frontend actual mezcla ambos en distintas pantallas.
+_WEEKDAY_MAP = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6,
+    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2,
+    "jueves": 3, "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6,
+}
+
+# Tipos de schedule, ya resueltos a partir de frequency_type.
+NONE, DAILY, WEEKLY, MONTHLY, SPECIFIC, INTERVAL = range(6)
+_KINDS = {
+    "daily": DAILY,
+    "weekly": WEEKLY,
+    "monthly": MONTHLY,
+    "specific": SPECIFIC,
+    "once": SPECIFIC,
+    "interval": INTERVAL,
+    "custom": INTERVAL,
+}
+
+# Estados de respuesta que cuentan como "ya diligenciado".
+DONE_STATUSES = (ResponseStatus.submitted, ResponseStatus.approved)
+
+_NAT = np.datetime64("NaT", "D")
+_FOREVER = np.datetime64("9999-12-31", "D")
+# 1970-01-01 fue jueves (lunes = 0).
+_EPOCH_WEEKDAY = 3
+# Más días que cualquier fecha (9999-12-31 ≈ 2.9M): separa formatos al
+# codificar (formato, día) en un solo entero ordenable.
+_FORM_STRIDE = 4_000_000
+
+CACHE_TTL = 600
+_CACHE_PREFIX = "home_schedules"
+
+
+def to_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+def parse_repeat_days(raw: Optional[str]) -> set:
+    if not raw:
+        return set()
+    try:
+        items = json.loads(raw)
+    except (ValueError, TypeError):
+        return set()
+    if not isinstance(items, list):
+        return set()
+    out = set()
+    for item in items:
+        if isinstance(item, str):
+            idx = _WEEKDAY_MAP.get(item.strip().lower())
+            if idx is not None:
+                out.add(idx)
+        elif isinstance(item, int) and 0 <= item <= 6:
+            out.add(item)
+    return out
+
+
+def _d64(value: Optional[date]):
+    return np.datetime64(value, "D") if value else _NAT
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    return (days.astype("int64") + _EPOCH_WEEKDAY) % 7
+
+
+def _month_start(days: np.ndarray) -> np.ndarray:
+    return days.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def _month_length(days: np.ndarray) -> np.ndarray:
+    months = days.astype("datetime64[M]")
+    return ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype("int64")
+
+
+class ScheduleSet:
+    """Los schedules como arreglos paralelos, en el orden recibido."""
+
+    def __init__(self, schedules: Sequence[FormSchedule]):
+        self.schedules = list(schedules)
+        n = len(self.schedules)
+        self.kind = np.full(n, NONE, dtype="int8")
+        self.weekdays = np.zeros((n, 7), dtype=bool)
+        self.month_day = np.ones(n, dtype="int64")
+        self.interval = np.zeros(n, dtype="int64")
+        self.specific = np.full(n, _NAT, dtype="datetime64[D]")
+        self.form_id = np.zeros(n, dtype="int64")
+
+        for i, sch in enumerate(self.schedules):
+            self.kind[i] = _KINDS.get((sch.frequency_type or "").lower(), NONE)
+            specific = to_date(sch.specific_date)
+            self.specific[i] = _d64(specific)
+            if specific:
+                self.month_day[i] = specific.day
+            for wd in parse_repeat_days(sch.repeat_days):
+                self.weekdays[i, wd] = True
+            # Un intervalo de 0 o negativo no genera fechas.
+            self.interval[i] = max(sch.interval_days or 0, 0)
+            self.form_id[i] = sch.form_id
+
+        self.has_specific = ~np.isnat(self.specific)
+        # Los tipos que necesitan fecha específica/intervalo y no la tienen no
+        # generan fechas (sí cuentan para "¿ya lo hizo?").
+        self.specific_ok = (self.kind == SPECIFIC) & self.has_specific
+        self.interval_ok = (self.kind == INTERVAL) & self.has_specific & (self.interval > 0)
+
+    def __len__(self):
+        return len(self.schedules)
+
+    def expand(self, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+        """(índice de schedule, fecha) de cada evento en [start, end], por fecha."""
+        days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+        hits = np.zeros((len(self), days.size), dtype=bool)
+
+        hits[self.kind == DAILY] = True
+
+        weekly = self.kind == WEEKLY
+        if weekly.any():
+            hits[weekly] = self.weekdays[weekly][:, _weekday(days)]
+
+        monthly = self.kind == MONTHLY
+        if monthly.any():
+            day_of_month = (days - _month_start(days)).astype("int64") + 1
+            target = np.minimum(self.month_day[monthly][:, None], _month_length(days)[None, :])
+            hits[monthly] = day_of_month[None, :] == target
+
+        if self.specific_ok.any():
+            hits[self.specific_ok] = days[None, :] == self.specific[self.specific_ok][:, None]
+
+        interval = self.interval_ok
+        if interval.any():
+            offset = (days[None, :] - self.specific[interval][:, None]).astype("int64")
+            hits[interval] = (offset >= 0) & (offset % self.interval[interval][:, None] == 0)
+
+        day_idx, sch_idx = np.nonzero(hits.T)
+        return sch_idx, days[day_idx]
+
+    def event_periods(self, sch_idx: np.ndarray, dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """[inicio, fin] del período de cada evento: una respuesta enviada dentro
+        lo completa."""
+        kind = self.kind[sch_idx]
+        start = dates.copy()
+        end = dates.copy()
+
+        weekly = kind == WEEKLY
+        start[weekly] = dates[weekly] - _weekday(dates[weekly]).astype("timedelta64[D]")
+        end[weekly] = start[weekly] + 6
+
+        monthly = kind == MONTHLY
+        start[monthly] = _month_start(dates[monthly])
+        end[monthly] = start[monthly] + (_month_length(dates[monthly]) - 1).astype("timedelta64[D]")
+
+        # Cualquier respuesta desde la fecha del evento en adelante cuenta.
+        end[kind == SPECIFIC] = _FOREVER
+
+        interval = kind == INTERVAL
+        end[interval] = dates[interval] + (self.interval[sch_idx][interval] - 1).astype("timedelta64[D]")
+        return start, end
+
+    def completed_events(self, sch_idx: np.ndarray, dates: np.ndarray,
+                         submissions: Dict[int, Iterable[date]]) -> np.ndarray:
+        """¿Hay alguna fecha de envío del formato dentro del período de cada evento?"""
+        if not submissions or sch_idx.size == 0:
+            return np.zeros(sch_idx.size, dtype=bool)
+        forms = np.array(sorted(submissions), dtype="int64")
+        keys = np.sort(np.concatenate([
+            np.searchsorted(forms, form_id) * _FORM_STRIDE
+            + np.array(list(days), dtype="datetime64[D]").astype("int64")
+            for form_id, days in submissions.items()
+        ]))
+
+        event_forms = self.form_id[sch_idx]
+        pos = np.searchsorted(forms, event_forms)
+        known = (pos < forms.size) & (forms[np.minimum(pos, forms.size - 1)] == event_forms)
+        start, end = self.event_periods(sch_idx, dates)
+        low = np.searchsorted(keys, pos * _FORM_STRIDE + start.astype("int64"), side="left")
+        high = np.searchsorted(keys, pos * _FORM_STRIDE + end.astype("int64"), side="right")
+        return known & (low < high)
+
+    def next_due_dates(self, today: date) -> np.ndarray:
+        """Próxima fecha en la que toca diligenciar cada schedule (NaT si no hay)."""
+        t = np.datetime64(today, "D")
+        out = np.full(len(self), _NAT, dtype="datetime64[D]")
+
+        out[self.specific_ok] = self.specific[self.specific_ok]
+        out[self.kind == DAILY] = t
+
+        weekly = self.kind == WEEKLY
+        if weekly.any():
+            offsets = (np.arange(7) - _weekday(np.array([t]))[0]) % 7
+            nearest = np.where(self.weekdays[weekly], offsets[None, :], 7).min(axis=1)
+            out[weekly] = np.where(nearest < 7, t + nearest.astype("timedelta64[D]"), _NAT)
+
+        monthly = self.kind == MONTHLY
+        if monthly.any():
+            month = _month_start(np.array([t]))[0]
+            length = _month_length(np.array([t]))[0]
+            day = np.minimum(self.month_day[monthly], length)
+            this_month = month + (day - 1).astype("timedelta64[D]")
+            # Ya pasó: el mismo día (ya recortado) del mes siguiente.
+            next_month = _month_start(np.array([month + 31]))[0]
+            next_length = _month_length(np.array([next_month]))[0]
+            following = next_month + (np.minimum(day, next_length) - 1).astype("timedelta64[D]")
+            out[monthly] = np.where(this_month >= t, this_month, following)
+
+        interval = self.interval_ok
+        if interval.any():
+            specific = self.specific[interval]
+            lag = (t - specific).astype("int64")
+            wait = (-lag) % self.interval[interval]
+            out[interval] = np.where(specific >= t, specific, t + wait.astype("timedelta64[D]"))
+        return out
+
+    def is_done(self, today: date, last_submitted: np.ndarray) -> np.ndarray:
+        """¿El usuario ya envió respuesta en el período actual de cada schedule?"""
+        t = np.datetime64(today, "D")
+        has = ~np.isnat(last_submitted)
+        out = np.zeros(len(self), dtype=bool)
+        kind = self.kind
+
+        out |= (kind == DAILY) & (last_submitted == t)
+        week_start = last_submitted - np.where(has, _weekday(last_submitted), 0).astype("timedelta64[D]")
+        this_week = t - _weekday(np.array([t]))[0].astype("timedelta64[D]")
+        out |= (kind == WEEKLY) & (week_start == this_week)
+        out |= (kind == MONTHLY) & (last_submitted.astype("datetime64[M]") == t.astype("datetime64[M]"))
+        out |= (kind == SPECIFIC) & self.has_specific & (last_submitted >= self.specific)
+        out |= (kind == INTERVAL) & (self.interval > 0) & ((t - last_submitted).astype("int64") < self.interval)
+        return out & has
+
+
+def active_schedules(db: Session, user_id: int) -> Tuple[ScheduleSet, Dict[int, Form]]:
+    """Schedules activos del usuario y sus formatos habilitados, por id."""
+    schedules = (
+        db.query(FormSchedule)
+        .filter(FormSchedule.user_id == user_id, FormSchedule.status.is_(True))
+        .all()
+    )
+    form_ids = {s.form_id for s in schedules}
+    forms = {
+        f.id: f
+        for f in db.query(Form).filter(Form.id.in_(form_ids), Form.is_enabled.is_(True)).all()
+    } if form_ids else {}
+    return ScheduleSet([s for s in schedules if s.form_id in forms]), forms
+
+
+def last_submissions(db: Session, user_id: int, form_ids: Iterable[int]) -> Dict[int, datetime]:
+    """{form_id: último envío} del usuario, en una consulta agrupada."""
+    form_ids = list(form_ids)
+    if not form_ids:
+        return {}
+    rows = (
+        db.query(Response.form_id, func.max(Response.submitted_at))
+        .filter(
+            Response.user_id == user_id,
+            Response.form_id.in_(form_ids),
+            Response.status.in_(DONE_STATUSES),
+        )
+        .group_by(Response.form_id)
+        .all()
+    )
+    return {form_id: submitted_at for form_id, submitted_at in rows}
+
+
+def submission_dates(db: Session, user_id: int, form_ids: Iterable[int], since: date) -> Dict[int, List[date]]:
+    """{form_id: [días con envío desde `since`]} del usuario, en una consulta."""
+    form_ids = list(form_ids)
+    if not form_ids:
+        return {}
+    day = cast(Response.submitted_at, Date)
+    rows = (
+        db.query(Response.form_id, day)
+        .filter(
+            Response.user_id == user_id,
+            Response.form_id.in_(form_ids),
+            Response.status.in_(DONE_STATUSES),
+            day >= since,
+        )
+        .distinct()
+        .all()
+    )
+    out: Dict[int, List[date]] = {}
+    for form_id, d in rows:
+        out.setdefault(form_id, []).append(d)
+    return out
+
+
+# ── Caché por usuario y día ──────────────────────────────────────────────────
+
+def _version_key(scope) -> str:
+    return f"{_CACHE_PREFIX}:v:{scope}"
+
+
+def cached(kind: str, user_id: int, today: date, compute: Callable[[], object], *extra) -> object:
+    """Lo que devuelve `compute()`, guardado en Redis para este usuario y día.
+
+    `compute()` debe leer del primario, no de la réplica: lo que calcule se
+    guarda con la versión vigente y una réplica atrasada dejaría en caché un
+    resultado viejo hasta CACHE_TTL. Sin Redis simplemente calcula.
+    """
+    user_version = redis_client.get(_version_key(user_id)) or "0"
+    forms_version = redis_client.get(_version_key("forms")) or "0"
+    key = ":".join(str(p) for p in (_CACHE_PREFIX, kind, user_id, today.isoformat(), *extra,
+                                    user_version, forms_version))
+    hit = redis_client.get(key)
+    if hit is not None:
+        return hit
+    value = compute()
+    redis_client.set(key, value, ttl=CACHE_TTL)
+    return value
+
+
+def invalidate(user_ids: Iterable[int] = (), forms: bool = False) -> None:
+    """Cambia la versión de esos usuarios (y de formatos): sus llaves viejas se
+    dejan de leer y expiran solas."""
+    scopes = [*set(user_ids), *(["forms"] if forms else [])]
+    for scope in scopes:
+        redis_client.set(_version_key(scope), uuid.uuid4().hex, ttl=CACHE_TTL * 2)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    """Anota qué usuarios (y si algún formato) cambiaron en esta transacción."""
+    pending = session.info.setdefault("home_schedules_changes", {"users": set(), "forms": False})
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (FormSchedule, Response)):
+            if obj.user_id is not None:
+                pending["users"].add(obj.user_id)
+        elif isinstance(obj, Form) and obj not in session.new:
+            pending["forms"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    pending = session.info.pop("home_schedules_changes", None)
+    if pending and (pending["users"] or pending["forms"]):
+        invalidate(pending["users"], pending["forms"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("home_schedules_changes", None)
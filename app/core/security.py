@@ -157,7 +157,7 @@ def get_integrator_or_user(
     return user
 
 
-def require_roles(allowed: Iterable[UserType]):
+def require_roles(allowed: Iterable[UserType], user_dependency=get_current_user):
     """Dependency factory: exige que current_user tenga uno de los roles `allowed`.
 
     SECURITY (ID-005): helper reusable para los endpoints administrativos.
@@ -170,10 +170,13 @@ def require_roles(allowed: Iterable[UserType]):
             current_user: User = Depends(require_roles([UserType.admin, UserType.creator])),
         ):
             ...
+
+    `user_dependency` cambia de dónde sale el usuario (p. ej. `get_export_user`
+    en los exportes, ver app/core/read_replica.py).
     """
     allowed_set = set(allowed)
 
-    def _checker(current_user: User = Depends(get_current_user)) -> User:
+    def _checker(current_user: User = Depends(user_dependency)) -> User:
         if current_user.user_type not in allowed_set:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
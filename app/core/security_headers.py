@@ -0,0 +1,95 @@
+"""Cabeceras de seguridad y Server-Timing en cada respuesta.
+
+Antes era un `@app.middleware("http")` (BaseHTTPMiddleware): por cada request
+crea una tarea, un stream intermedio y un objeto Response solo para agregar
+seis cabeceras, y corta las respuestas en streaming (StreamingResponse,
+FileResponse grandes) en pedazos que pasan por ese stream. Este es ASGI puro:
+las cabeceras están armadas en bytes al importar y solo se agregan al mensaje
+`http.response.start`; el cuerpo pasa sin tocarse.
+
+Además, fuera de producción (o con SERVER_TIMING=1), agrega
+
+    Server-Timing: app;dur=12.3, db;dur=4.5;desc="3 consultas"
+
+con el tiempo hasta que la app empezó a responder y el tiempo en BD de ese
+tramo (`query_stats`). Las devtools del navegador lo muestran en la pestaña
+de red. En producción no se expone, igual que las cabeceras X-DB-*.
+
+Microbenchmark antes/después: `python -m benchmarks.middleware_bench`.
+"""
+
+import os
+import time
+
+from app.core import query_stats
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1" if os.getenv("ENV") == "development" else "0") == "1"
+
+_SECURITY_HEADERS = [
+    # Forzar HTTPS en el navegador por 1 año
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    # Bloquear embedding en iframes (previene clickjacking)
+    (b"x-frame-options", b"DENY"),
+    # Evitar que el browser adivine el MIME type
+    (b"x-content-type-options", b"nosniff"),
+    # No enviar referrer a sitios externos
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    # H-BW-012: X-XSS-Protection deprecado — removido. CSP cubre este caso.
+    # No permitir acceso a cámara, micrófono, geolocation, etc.
+    (b"permissions-policy", b"camera=(), microphone=(), geolocation=()"),
+    # Content Security Policy — ajusta los dominios a los tuyos
+    (b"content-security-policy", (
+        b"default-src 'self'; "
+        b"script-src 'self'; "
+        b"style-src 'self'; "
+        b"img-src 'self' data: https:; "
+        b"font-src 'self'; "
+        b"connect-src 'self' https://app.safemetrics.co https://forms.sfisas.com.co; "
+        b"frame-ancestors 'none';"
+    )),
+]
+_SECURITY_NAMES = frozenset(name for name, _ in _SECURITY_HEADERS)
+
+
+def _with_security_headers(headers) -> list:
+    """Las de seguridad reemplazan a las que ya traiga la respuesta."""
+    return [h for h in headers if h[0].lower() not in _SECURITY_NAMES] + _SECURITY_HEADERS
+
+
+def _server_timing(started: float, stats: query_stats.QueryStats) -> tuple:
+    app_ms = (time.perf_counter() - started) * 1000
+    value = f'app;dur={app_ms:.1f}, db;dur={stats.milliseconds:.1f};desc="{stats.count} consultas"'
+    return (b"server-timing", value.encode("latin-1"))
+
+
+class SecurityHeadersMiddleware:
+    """Middleware ASGI: cabeceras de seguridad (y Server-Timing) en cada respuesta."""
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if not self.server_timing:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = _with_security_headers(message.get("headers", ()))
+                await send(message)
+
+            return await self.app(scope, receive, send_with_headers)
+
+        started = time.perf_counter()
+        # Se suma a la cuenta del perfilador si la hay; QueryStatsMiddleware
+        # (más adentro) se suma a esta.
+        with query_stats.collect(reuse=True) as stats:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    headers = _with_security_headers(message.get("headers", ()))
+                    headers.append(_server_timing(started, stats))
+                    message["headers"] = headers
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
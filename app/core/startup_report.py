@@ -0,0 +1,131 @@
+"""Cuánto tarda y cuánta memoria ocupa arrancar la app, y qué módulos pesan.
+
+Arranca `import main` en procesos nuevos (como un worker recién levantado) con
+`python -X importtime` y reporta:
+
+  · tiempo de arranque (mediana de `--runs` procesos) y RSS máximo;
+  · las librerías de exporte (pandas, openpyxl, reportlab, weasyprint...) que
+    quedaron cargadas al arrancar: deberían ser ninguna, se cargan en el
+    primer exporte;
+  · los módulos de la app y los paquetes de terceros que más tardan en
+    importarse (tiempo acumulado, con lo que importan).
+
+    python -m app.core.startup_report              # resumen
+    python -m app.core.startup_report --json r.json
+    python -m app.core.startup_report --check      # código 1 si algo pesado carga al arrancar
+
+Importar main arranca también el scheduler y, en desarrollo, el create_all:
+es lo que hace un worker real.
+"""
+
+import json
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Se usan solo al exportar o generar PDF; no deberían cargarse al arrancar.
+LAZY_MODULES = ("pandas", "openpyxl", "xlsxwriter", "reportlab", "qrcode", "docx", "weasyprint", "requests")
+
+_MARKER = "STARTUP_REPORT "
+_CHILD = f"""
+import json, os, resource, sys, time
+start = time.perf_counter()
+import main
+boot = time.perf_counter() - start
+print({_MARKER!r} + json.dumps({{
+    "boot_s": boot,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "lazy_loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules],
+}}), flush=True)
+os._exit(0)
+"""
+
+_IMPORTTIME = re.compile(r"^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)$")
+
+
+def _run_child(importtime: bool) -> dict:
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _CHILD]
+    proc = subprocess.run(args, cwd=ROOT, capture_output=True, text=True, timeout=300)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith(_MARKER)), None)
+    if line is None:
+        raise RuntimeError(f"import main falló:\n{proc.stderr[-2000:]}")
+    result = json.loads(line[len(_MARKER):])
+    if importtime:
+        result["importtime"] = proc.stderr
+    return result
+
+
+def _top_imports(importtime: str, top: int) -> Dict[str, List[dict]]:
+    """Tiempo acumulado de los módulos de la app y de los paquetes de terceros.
+
+    De cada paquete de terceros cuenta solo el import de más arriba (el que
+    incluye a los demás), para no sumar dos veces.
+    """
+    app_modules, packages = [], defaultdict(int)
+    for line in importtime.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        cumulative_us, name = int(match.group(1)), match.group(2)
+        if name == "main" or name.startswith("app."):
+            app_modules.append({"module": name, "ms": cumulative_us / 1000})
+            continue
+        top_level = name.split(".")[0]
+        if top_level.startswith("_") or top_level in sys.stdlib_module_names:
+            continue
+        packages[top_level] = max(packages[top_level], cumulative_us)
+    return {
+        "app": sorted(app_modules, key=lambda m: -m["ms"])[:top],
+        "third_party": [{"package": name, "ms": us / 1000}
+                        for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]],
+    }
+
+
+def report(runs: int = 3, top: int = 15) -> dict:
+    """Arranca `runs` procesos limpios (más uno con importtime) y resume."""
+    plain = [_run_child(importtime=False) for _ in range(runs)]
+    detailed = _run_child(importtime=True)
+    return {
+        "boot_s": statistics.median(r["boot_s"] for r in plain),
+        "rss_mb": statistics.median(r["rss_mb"] for r in plain),
+        "modules": plain[0]["modules"],
+        "lazy_loaded": plain[0]["lazy_loaded"],
+        "slowest": _top_imports(detailed["importtime"], top),
+    }
+
+
+def _print(result: dict) -> None:
+    print(f"arranque: {result['boot_s']:.2f} s · RSS {result['rss_mb']:.0f} MB · {result['modules']} módulos")
+    print(f"librerías de exporte cargadas al arrancar: {', '.join(result['lazy_loaded']) or 'ninguna'}")
+    print("módulos de la app (acumulado):")
+    for m in result["slowest"]["app"]:
+        print(f"  {m['ms']:8.1f} ms  {m['module']}")
+    print("paquetes de terceros (acumulado):")
+    for p in result["slowest"]["third_party"]:
+        print(f"  {p['ms']:8.1f} ms  {p['package']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tiempo, memoria e imports del arranque.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="guarda el resultado en este archivo")
+    parser.add_argument("--check", action="store_true",
+                        help="sale con 1 si alguna librería de exporte se carga al arrancar")
+    args = parser.parse_args()
+
+    _result = report(args.runs, args.top)
+    _print(_result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(_result, fh, indent=2)
+    sys.exit(1 if args.check and _result["lazy_loaded"] else 0)
@@ -0,0 +1,141 @@
+"""Contadores de capacidad ocupada para /tokens.
+
+/tokens/summary contaba en vivo users, forms, forms_movimientos y
+form_questions: cuatro `count(*)`, que en Postgres recorren la tabla entera,
+en cada llamada. Ahora lee contadores que siguen exactos:
+
+  · `token_counters` guarda, por entidad, la cantidad a la fecha de la última
+    reconciliación o compactación;
+  · triggers de la BD agregan a `token_counter_deltas` un +n / -n por cada
+    sentencia que inserta o borra en esas tablas, en la misma transacción
+    (migrations/2026-10-19_token_counters.sql). Al ser triggers cuentan
+    también los borrados en bloque, el SQL a mano y el otro backend; al ser
+    filas nuevas y no un UPDATE del contador, dos transacciones que crean
+    usuarios no se bloquean entre sí;
+  · cantidad + suma de deltas = conteo exacto, con lo que cada lectura ve
+    confirmado;
+  · `compactar` suma los deltas al contador cada pocos minutos, para que haya
+    pocos que sumar (`token_counters_compact_task`);
+  · `reconciliar` vuelve a contar de verdad, cada noche
+    (`token_counters_reconcile_task`), y registra si algo se había desviado.
+
+Sin contadores (recién migrado) la primera lectura reconcilia.
+
+    python -m app.core.token_counters        # reconcilia
+"""
+
+import logging
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# entidad → tabla contada. Las entidades son las de la migración.
+TABLAS = {
+    "usuarios": "users",
+    "formatos": "forms",
+    "movimientos": "forms_movimientos",
+    "vinculos": "form_questions",
+}
+
+_LEER = text("""
+    SELECT c.entidad,
+           c.cantidad + coalesce(d.suma, 0) AS cantidad
+    FROM token_counters c
+    LEFT JOIN (
+        SELECT entidad, sum(delta) AS suma
+        FROM token_counter_deltas
+        GROUP BY entidad
+    ) d ON d.entidad = c.entidad
+""")
+
+# Una sola sentencia, una sola foto: los deltas que borra son exactamente los
+# de los cambios que ya ve; los que hagan commit después se suman en la
+# próxima. Los de una entidad sin contador se dejan para la reconciliación.
+_COMPACTAR = text("""
+    WITH borrados AS (
+        DELETE FROM token_counter_deltas
+        WHERE entidad IN (SELECT entidad FROM token_counters)
+        RETURNING entidad, delta
+    ), sumas AS (
+        SELECT entidad, sum(delta) AS suma FROM borrados GROUP BY entidad
+    )
+    UPDATE token_counters c
+    SET cantidad = c.cantidad + sumas.suma
+    FROM sumas
+    WHERE c.entidad = sumas.entidad
+""")
+
+# Igual: el conteo real, lo que decían los contadores y los deltas que
+# descarta salen de la misma foto.
+_RECONCILIAR = text("""
+    WITH previos AS (
+        SELECT c.entidad,
+               c.cantidad + coalesce(
+                   (SELECT sum(d.delta) FROM token_counter_deltas d WHERE d.entidad = c.entidad), 0
+               ) AS cantidad
+        FROM token_counters c
+    ), borrados AS (
+        DELETE FROM token_counter_deltas RETURNING 1
+    ), reales (entidad, cantidad) AS (
+        VALUES ('usuarios',    (SELECT count(*) FROM users)),
+               ('formatos',    (SELECT count(*) FROM forms)),
+               ('movimientos', (SELECT count(*) FROM forms_movimientos)),
+               ('vinculos',    (SELECT count(*) FROM form_questions))
+    ), escritos AS (
+        INSERT INTO token_counters (entidad, cantidad, reconciliado_en)
+        SELECT entidad, cantidad, now() FROM reales
+        ON CONFLICT (entidad) DO UPDATE
+            SET cantidad = EXCLUDED.cantidad, reconciliado_en = EXCLUDED.reconciliado_en
+        RETURNING entidad, cantidad
+    )
+    SELECT e.entidad, e.cantidad, p.cantidad AS antes
+    FROM escritos e
+    LEFT JOIN previos p ON p.entidad = e.entidad
+""")
+
+
+def _leer(db: Session) -> Dict[str, int]:
+    return {fila.entidad: int(fila.cantidad) for fila in db.execute(_LEER)}
+
+
+def contadores(db: Session) -> Dict[str, int]:
+    """{entidad: cantidad} exactos, sin contar las tablas."""
+    actuales = _leer(db)
+    if set(actuales) != set(TABLAS):
+        reconciliar(db)
+        actuales = _leer(db)
+    return actuales
+
+
+def compactar(db: Session) -> None:
+    """Suma los deltas pendientes a los contadores y los borra."""
+    db.execute(_COMPACTAR)
+    db.commit()
+
+
+def reconciliar(db: Session) -> Dict[str, int]:
+    """Cuenta de verdad y deja los contadores en ese valor.
+
+    Devuelve los conteos reales. Si los contadores se habían desviado (un
+    trigger deshabilitado, un TRUNCATE) queda un warning con la diferencia.
+    """
+    filas = db.execute(_RECONCILIAR).all()
+    db.commit()
+    for fila in filas:
+        if fila.antes is not None and int(fila.antes) != int(fila.cantidad):
+            logger.warning(
+                "contador de tokens desviado: %s tenía %s y hay %s",
+                fila.entidad, fila.antes, fila.cantidad,
+            )
+    return {fila.entidad: int(fila.cantidad) for fila in filas}
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        print(f"token_counters: {reconciliar(_db)}")
@@ -0,0 +1,209 @@
+"""Respuestas no repetidas (`Question.unique_answer`), con índice.
+
+Cada valor ya registrado de una pregunta marcada queda en
+`unique_answer_values`, con llave (pregunta, `answer_value_key(valor)`):
+
+  · la validación en vivo al diligenciar es una sola búsqueda por llave
+    (`value_taken`), en vez de cargar todas las respuestas de la pregunta;
+  · al guardar, el listener de abajo reclama los valores de la respuesta en la
+    misma transacción. Si otra respuesta ya tiene uno —aunque se esté guardando
+    en este mismo instante— el guardado falla con 409.
+
+Solo se rechazan valores NUEVOS (answers nuevas o con texto cambiado): las
+respuestas viejas que ya se repetían antes de marcar la pregunta se pueden
+seguir editando sin tocar ese campo.
+
+Lo que escribe otro backend sin pasar por el ORM no entra solo; volver a armar
+la tabla lo incluye (gana la respuesta más antigua):
+
+    python -m app.core.unique_answers
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event, inspect, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.response_scope import IS_SUBMISSION
+from app.models import Answer, Question, Response, UniqueAnswerValue, answer_value_key
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 5000
+
+
+def value_taken(db, question_id: int, value, exclude_response_id: Optional[int] = None) -> Optional[int]:
+    """La respuesta que ya tiene `value` en esta pregunta, o None."""
+    key = answer_value_key(value)
+    if key is None:
+        return None
+    query = select(UniqueAnswerValue.response_id).where(
+        UniqueAnswerValue.question_id == question_id,
+        UniqueAnswerValue.value_key == key,
+    )
+    if exclude_response_id is not None:
+        query = query.where(UniqueAnswerValue.response_id != exclude_response_id)
+    return db.execute(query).scalar()
+
+
+def _claim(connection, rows) -> None:
+    """Inserta (question_id, value_key, response_id); el primero gana.
+
+    Con ON CONFLICT DO NOTHING, si otra transacción acaba de insertar la misma
+    llave y no ha terminado, esta espera a que confirme o revierta.
+    """
+    if rows:
+        connection.execute(
+            insert(UniqueAnswerValue).values(rows).on_conflict_do_nothing()
+        )
+
+
+def _sync_pairs(connection, pairs: Set[Tuple[int, int]], fresh: Dict[Tuple[int, int], Set[str]]) -> None:
+    """Rehace los valores de cada (response_id, question_id) y rechaza los
+    nuevos que ya tenga otra respuesta."""
+    response_ids = {rid for rid, _ in pairs}
+    question_ids = {qid for _, qid in pairs}
+    connection.execute(
+        delete(UniqueAnswerValue).where(
+            tuple_(UniqueAnswerValue.response_id, UniqueAnswerValue.question_id).in_(list(pairs))
+        )
+    )
+    current = connection.execute(
+        select(Answer.response_id, Answer.question_id, Answer.answer_text)
+        .where(Answer.response_id.in_(response_ids), Answer.question_id.in_(question_ids))
+        .order_by(Answer.id)
+    ).all()
+    wanted: Dict[Tuple[int, str], Set[int]] = {}
+    for row in current:
+        pair = (row.response_id, row.question_id)
+        key = answer_value_key(row.answer_text)
+        if pair in pairs and key is not None:
+            wanted.setdefault((row.question_id, key), set()).add(row.response_id)
+    if not wanted:
+        return
+    _claim(connection, [
+        {"question_id": qid, "value_key": key, "response_id": min(rids)}
+        for (qid, key), rids in wanted.items()
+    ])
+    holders = connection.execute(
+        select(UniqueAnswerValue.question_id, UniqueAnswerValue.value_key, UniqueAnswerValue.response_id)
+        .where(tuple_(UniqueAnswerValue.question_id, UniqueAnswerValue.value_key).in_(list(wanted)))
+    ).all()
+    for holder in holders:
+        for response_id in wanted[(holder.question_id, holder.value_key)]:
+            if response_id != holder.response_id and holder.value_key in fresh.get((response_id, holder.question_id), ()):
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "message": "Este valor ya fue registrado en otra respuesta.",
+                        "question_id": holder.question_id,
+                        "response_id": holder.response_id,
+                    },
+                )
+
+
+def _fill_questions(connection, question_ids: Iterable[int]) -> int:
+    """Arma desde cero los valores de estas preguntas, por lotes de id."""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return 0
+    connection.execute(delete(UniqueAnswerValue).where(UniqueAnswerValue.question_id.in_(question_ids)))
+    last_id, claimed = 0, 0
+    while True:
+        rows = connection.execute(
+            select(Answer.id, Answer.question_id, Answer.response_id, Answer.answer_text)
+            .join(Response, Response.id == Answer.response_id)
+            .where(Answer.question_id.in_(question_ids), Answer.id > last_id, IS_SUBMISSION)
+            .order_by(Answer.id)
+            .limit(_BATCH)
+        ).all()
+        if not rows:
+            return claimed
+        last_id = rows[-1].id
+        batch = {}
+        for row in rows:
+            key = answer_value_key(row.answer_text)
+            if key is not None:
+                batch.setdefault((row.question_id, key), row.response_id)
+        _claim(connection, [
+            {"question_id": qid, "value_key": key, "response_id": rid}
+            for (qid, key), rid in batch.items()
+        ])
+        claimed += len(batch)
+
+
+def rebuild_unique_values(db: Session) -> int:
+    """Vuelve a armar la tabla completa. Devuelve cuántos valores quedaron."""
+    question_ids = db.execute(select(Question.id).where(Question.unique_answer.is_(True))).scalars().all()
+    connection = db.connection()
+    connection.execute(delete(UniqueAnswerValue))
+    claimed = _fill_questions(connection, question_ids)
+    db.commit()
+    return claimed
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_unique_answers(session, flush_context):
+    """Reclama los valores de las answers recién escritas de preguntas marcadas.
+
+    Marcar una pregunta arma sus valores con lo ya registrado; desmarcarla los
+    descarta. Corre dentro de la transacción.
+    """
+    pairs = set()
+    fresh: Dict[Tuple[int, int], Set[str]] = {}
+    toggled_on, toggled_off = set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Answer):
+            if obj.response_id is None or obj.question_id is None:
+                continue
+            pair = (obj.response_id, obj.question_id)
+            pairs.add(pair)
+            if obj in session.deleted:
+                continue
+            if obj in session.new or inspect(obj).attrs.answer_text.history.has_changes():
+                key = answer_value_key(obj.answer_text)
+                if key is not None:
+                    fresh.setdefault(pair, set()).add(key)
+        elif isinstance(obj, Question) and obj not in session.deleted:
+            if inspect(obj).attrs.unique_answer.history.has_changes():
+                (toggled_on if obj.unique_answer else toggled_off).add(obj.id)
+
+    if not pairs and not toggled_on and not toggled_off:
+        return
+    connection = session.connection()
+    if toggled_off:
+        connection.execute(delete(UniqueAnswerValue).where(UniqueAnswerValue.question_id.in_(toggled_off)))
+    if toggled_on:
+        _fill_questions(connection, toggled_on)
+    if not pairs:
+        return
+
+    marked = set(
+        connection.execute(
+            select(Question.id).where(
+                Question.id.in_({qid for _, qid in pairs}),
+                Question.unique_answer.is_(True),
+            )
+        ).scalars()
+    ) - toggled_on
+    if not marked:
+        return
+    submissions = set(
+        connection.execute(
+            select(Response.id).where(Response.id.in_({rid for rid, _ in pairs}), IS_SUBMISSION)
+        ).scalars()
+    )
+    pairs = {(rid, qid) for rid, qid in pairs if qid in marked and rid in submissions}
+    if pairs:
+        _sync_pairs(connection, pairs, fresh)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as _db:
+        print(f"unique_answers: {rebuild_unique_values(_db)} valores registrados")
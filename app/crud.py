@@ -6,16 +6,21 @@ import json
 import math
 import os
 import threading
+from types import SimpleNamespace
 import pytz
-from sqlalchemy import and_, func, or_, select, text
-from sqlalchemy.orm import Session, joinedload, defer
+from sqlalchemy import and_, case, func, or_, select, text
+from sqlalchemy.orm import Session, aliased, joinedload, defer
 from sqlalchemy.exc import IntegrityError
 from app import models
-from app.api.controllers.mail import send_action_notification_email, send_email_daily_forms, send_email_plain_approval_status, send_email_plain_approval_status_vencidos, send_email_with_attachment, send_rejection_email, send_welcome_email
+from app.api.controllers.mail import send_action_notification_email, send_email_daily_forms, send_email_daily_forms_batch, send_email_plain_approval_status, send_email_plain_approval_status_vencidos, send_email_with_attachment, send_rejection_email, send_welcome_email
 # from app.api.endpoints.pdf_router import generate_pdf_from_form_id
 from app.core.security import hash_password
-from app.core import field_access, response_scope
-from app.models import  AnswerFileSerial, AnswerHistory, ApprovalRequirement, ApprovalStatus, BitacoraLogsSimple, CategoryApproval, EmailConfig, EstadoEvento, FormAnswer, FormApproval, FormApprovalNotification, FormCategory, FormCloseConfig, FormModerators, FormMovimientos, FormSchedule, FormTemplate, GenericActivity, GenericActivityForm, PalabrasClave, Profile, ProfileCategory, ProfileForm, ProfileUser, Project, QuestionAndAnswerBitacora, QuestionFilterCondition, QuestionLocationRelation, QuestionTableRelation, RelationBitacora, RelationOperationMath, RelationQuestionRule, ResponseApproval, ResponseApprovalRequirement, TemplateScope, User, UserType, Form, Question, Option, Response, Answer, FormQuestion, UserCategory
+from app.core import answer_lookup, field_access, keyset, response_scope
+from app.core import approval_inbox  # registra además el listener que mantiene bandeja y estados
+from app.core import unique_answers  # registra el listener que reclama los valores de preguntas "no repetidas"
+from app.core import response_rollups  # registra el listener que mantiene los rollups diarios de respuestas
+from app.core import change_feed  # registra el listener que escribe el feed de cambios
+from app.models import  AnswerFileSerial, AnswerHistory, ApprovalInbox, ApprovalRequirement, ApprovalStatus, BitacoraLogsSimple, CategoryApproval, EmailConfig, EstadoEvento, FormAnswer, FormApproval, FormApprovalNotification, FormCategory, FormCloseConfig, FormModerators, FormMovimientos, FormSchedule, FormTemplate, GenericActivity, GenericActivityForm, PalabrasClave, Profile, ProfileCategory, ProfileForm, ProfileUser, Project, QuestionAndAnswerBitacora, QuestionFilterCondition, QuestionLocationRelation, QuestionTableRelation, RelationBitacora, RelationOperationMath, RelationQuestionRule, ResponseApproval, ResponseApprovalRequirement, ResponseApprovalState, TemplateScope, User, UserType, Form, Question, Option, Response, Answer, FormQuestion, UserCategory
 from app.schemas import BitacoraLogsSimpleCreate, EmailConfigCreate, FormApprovalCreateSchema, FormBaseUser, FormCategoryCreate, FormCategoryMove, FormCategoryResponse, FormCategoryTreeResponse, FormCategoryUpdate, FormMovimientoBase, NotificationResponse, PalabrasClaveCreate, ProjectCreate, ResponseApprovalCreate, UpdateResponseApprovalRequest, UserBase, UserBaseCreate, UserCategoryCreate, UserCreate, OptionCreate, ResponseCreate, AnswerCreate, UserUpdate, QuestionUpdate, UserUpdateInfo
 from fastapi import HTTPException, UploadFile, status
 from typing import Any, Dict, List, Optional
@@ -29,9 +34,6 @@ import string
 import copy
 import random
 from uuid import uuid4
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 
 import logging
 logger = logging.getLogger(__name__)
@@ -1008,7 +1010,7 @@ def delete_question_from_db(db: Session, question_id: int):
     db.commit()
 
 
-async def post_create_response(
+def post_create_response(
     db,
     form_id: int,
     user_id: int,
@@ -1151,7 +1153,7 @@ async def post_create_response(
     }
 
 
-async def create_answer_in_db(answer, db: Session, current_user: User, request, send_emails: bool = True, id_relation_bitacora: int = None):
+def create_answer_in_db(answer, db: Session, current_user: User, request, send_emails: bool = True, id_relation_bitacora: int = None):
     """
     ✅ MODIFICADO: Ya NO envía correos aquí, eso se hace en post_create_response
     """
@@ -1204,6 +1206,10 @@ async def create_answer_in_db(answer, db: Session, current_user: User, request,
             for ans in created_answers:
                 db.refresh(ans)
 
+        except HTTPException:
+            # p. ej. 409 de un valor ya registrado en una pregunta "no repetida"
+            db.rollback()
+            raise
         except Exception as e:
             db.rollback()
             raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
@@ -1630,7 +1636,7 @@ def get_all_forms(db: Session):
         for form in forms
     ]
     
-def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int = 30, profile_id: Optional[int] = None, activity_id: Optional[int] = None):
+def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int = 30, profile_id: Optional[int] = None, activity_id: Optional[int] = None, cursor: Optional[str] = None, include_total: Optional[bool] = None):
     """
     Obtiene los formularios paginados sin form_design.
 
@@ -1647,12 +1653,34 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
         page: Numero de pagina (empieza en 1)
         page_size: Cantidad de registros por pagina
         profile_id: opcional, filtra a un perfil especifico
+        cursor: opcional, `next_cursor` de la página anterior; reemplaza a `page`
+        include_total: contar el total (por defecto solo sin cursor)
 
     Returns:
-        Dict con items, total, page, page_size, total_pages
+        Dict con items, total, page, page_size, total_pages, next_cursor
+        (total y total_pages en None si no se contó)
+
+    Orden estable: más recientes primero (created_at, id).
     """
-    # Calcular offset
-    offset = (page - 1) * page_size
+    with_total = keyset.wants_total(include_total, cursor)
+
+    def _page(base_query):
+        total_count = base_query.count() if with_total else None
+        forms, next_cursor = keyset.keyset_page(
+            base_query, Form.created_at, Form.id, page_size,
+            lambda f: (f.created_at, f.id), cursor=cursor, page=page,
+        )
+        return forms, total_count, next_cursor
+
+    def _envelope(items, total_count, next_cursor):
+        return {
+            "items": items,
+            "total": total_count,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total_count + page_size - 1) // page_size if total_count is not None else None,
+            "next_cursor": next_cursor,
+        }
 
     # Admin ve TODOS los formatos habilitados
     user = db.get(User, user_id)
@@ -1663,8 +1691,7 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
             .filter(Form.is_enabled.is_(True))
             .distinct()
         )
-        total_count = base_query.count()
-        forms = base_query.offset(offset).limit(page_size).all()
+        forms, total_count, next_cursor = _page(base_query)
         result = []
         for form in forms:
             try:
@@ -1681,13 +1708,7 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
                 })
             except Exception:
                 continue
-        return {
-            "items": result,
-            "total": total_count,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total_count + page_size - 1) // page_size,
-        }
+        return _envelope(result, total_count, next_cursor)
 
     if profile_id is not None:
         # Validar que el usuario es miembro de ese perfil activo
@@ -1702,13 +1723,7 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
             .first()
         )
         if not is_member:
-            return {
-                "items": [],
-                "total": 0,
-                "page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-            }
+            return _envelope([], 0 if with_total else None, None)
 
         # Formatos efectivos del perfil = directos UNION (formatos con categoria asignada al perfil)
         direct_form_ids = select(ProfileForm.form_id).where(
@@ -1742,13 +1757,7 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
             .first()
         )
         if not is_assigned:
-            return {
-                "items": [],
-                "total": 0,
-                "page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-            }
+            return _envelope([], 0 if with_total else None, None)
         activity_form_ids = select(GenericActivityForm.form_id).where(
             GenericActivityForm.activity_id == activity_id,
             GenericActivityForm.user_id == user_id,
@@ -1809,16 +1818,8 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
             .distinct()
         )
     
-    # Contar total de registros
-    total_count = base_query.count()
-    
-    # Obtener registros paginados
-    forms = (
-        base_query
-        .offset(offset)
-        .limit(page_size)
-        .all()
-    )
+    # Página pedida (y total, si se pidió)
+    forms, total_count, next_cursor = _page(base_query)
     
     # Convertir a diccionarios
     result = []
@@ -1847,16 +1848,7 @@ def get_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int =
         }
         result.append(form_dict)
     
-    # Calcular total de páginas
-    total_pages = (total_count + page_size - 1) // page_size
-    
-    return {
-        "items": result,
-        "total": total_count,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": total_pages
-    }
+    return _envelope(result, total_count, next_cursor)
     
 
 def get_forms_by_user_summary(db: Session, user_id: int):
@@ -2055,7 +2047,7 @@ def get_unrelated_questions(db: Session, form_id: int):
     return unrelated_questions
 
 
-def fetch_completed_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int = 30, activity_id: int = None, date_from: str = None, date_to: str = None):
+def fetch_completed_forms_by_user(db: Session, user_id: int, page: int = 1, page_size: int = 30, activity_id: int = None, date_from: str = None, date_to: str = None, cursor: str = None, include_total: bool = None):
     """
     Recupera los formularios que el usuario ha completado con paginación.
 
@@ -2067,13 +2059,13 @@ def fetch_completed_forms_by_user(db: Session, user_id: int, page: int = 1, page
         en esa actividad genérica (mismo criterio que el filtro de diligenciar).
     :param date_from: Fecha/hora inicio para filtrar respuestas (ISO 8601).
     :param date_to: Fecha/hora fin para filtrar respuestas (ISO 8601).
-    :return: Diccionario con items paginados y metadata.
+    :param cursor: `next_cursor` de la página anterior; reemplaza a `page`.
+    :param include_total: contar el total (por defecto solo sin cursor).
+    :return: Diccionario con items paginados y metadata (total y total_pages
+        en None si no se contó). Orden estable: formatos más recientes primero.
     """
     from datetime import datetime
 
-    # Calcular offset
-    offset = (page - 1) * page_size
-
     # Query base
     base_query = (
         db.query(Form)
@@ -2108,15 +2100,13 @@ def fetch_completed_forms_by_user(db: Session, user_id: int, page: int = 1, page
 
     base_query = base_query.distinct()  # Evitar duplicados si hay múltiples respuestas
     
-    # Contar total de registros
-    total_count = base_query.count()
+    # Contar total de registros (solo si se pidió)
+    total_count = base_query.count() if keyset.wants_total(include_total, cursor) else None
     
-    # Obtener registros paginados
-    completed_forms = (
-        base_query
-        .offset(offset)
-        .limit(page_size)
-        .all()
+    # Página pedida: por cursor o por número
+    completed_forms, next_cursor = keyset.keyset_page(
+        base_query, Form.created_at, Form.id, page_size,
+        lambda f: (f.created_at, f.id), cursor=cursor, page=page,
     )
     
     # Convertir a diccionarios
@@ -2140,14 +2130,15 @@ def fetch_completed_forms_by_user(db: Session, user_id: int, page: int = 1, page
             continue
     
     # Calcular total de páginas
-    total_pages = (total_count + page_size - 1) // page_size
+    total_pages = (total_count + page_size - 1) // page_size if total_count is not None else None
     
     return {
         "items": items,
         "total": total_count,
         "page": page,
         "page_size": page_size,
-        "total_pages": total_pages
+        "total_pages": total_pages,
+        "next_cursor": next_cursor,
     }
 
 
@@ -2483,120 +2474,100 @@ DIAS_SEMANA = {
 }
 
 
-def get_schedules_by_frequency(db: Session) -> List[dict]:
-    schedules = db.query(FormSchedule).filter(FormSchedule.status == True).all()
-    users_forms = {}
-    logs = []  # Lista para almacenar los registros de cumplimiento
+# Lote de correos del resumen diario que comparten una conexión SMTP.
+DAILY_FORMS_EMAIL_BATCH = 50
 
-    # Obtener la fecha actual
-    today_english = datetime.today().strftime('%A').lower()
-    today_spanish = DIAS_SEMANA.get(today_english, "lunes")  # Default a lunes si hay error
-    today_date = datetime.today().date()
 
-    for schedule in schedules:
-        frequency_type = schedule.frequency_type
-        repeat_days = json.loads(schedule.repeat_days) if schedule.repeat_days else []
-        interval_days = schedule.interval_days
-        specific_date = schedule.specific_date
-
-        # Lógica según el tipo de frecuencia
-        if frequency_type == "daily":
-            # Enviar todos los días
-            user = db.query(User).filter(User.id == schedule.user_id).first()
-            form = db.query(Form).filter(Form.id == schedule.form_id).first()
-            if user and form:
-                if user.email not in users_forms:
-                    users_forms[user.email] = {"user_name": user.name, "forms": []}
-                users_forms[user.email]["forms"].append({
-                    "title": form.title,
-                    "description": form.description or "Sin descripción"
-                })
-                logs.append(f"Frecuencia diaria: Correo enviado a {user.email}.")
-            else:
-                logs.append(f"Frecuencia diaria: No se pudo encontrar el usuario o el formulario para el ID de programación {schedule.id}.")
-
-        elif frequency_type == "weekly":
-            if today_english in repeat_days:
-                user = db.query(User).filter(User.id == schedule.user_id).first()
-                form = db.query(Form).filter(Form.id == schedule.form_id).first()
-                if user and form:
-                    if user.email not in users_forms:
-                        users_forms[user.email] = {"user_name": user.name, "forms": []}
-                    users_forms[user.email]["forms"].append({
-                        "title": form.title,
-                        "description": form.description or "Sin descripción"
-                    })
-                    logs.append(f"Frecuencia semanal: Correo enviado a {user.email} el día {today_english}.")
-                else:
-                    logs.append(f"Frecuencia semanal: No se pudo encontrar el usuario o el formulario para el ID de programación {schedule.id}.")
-            else:
-                logger.error("❌ Hoy no está en repeat_days, no se enviará correo.")
-
-        elif frequency_type == "monthly":
-            if today_date.day == 1:
-                user = db.query(User).filter(User.id == schedule.user_id).first()
-                form = db.query(Form).filter(Form.id == schedule.form_id).first()
-                if user and form:
-                    if user.email not in users_forms:
-                        users_forms[user.email] = {"user_name": user.name, "forms": []}
-                    users_forms[user.email]["forms"].append({
-                        "title": form.title,
-                        "description": form.description or "Sin descripción"
-                    })
-                    logs.append(f"Frecuencia mensual: Correo enviado a {user.email}.")
-                else:
-                    logs.append(f"Frecuencia mensual: No se pudo encontrar el usuario o el formulario para el ID de programación {schedule.id}.")
-            else:
-                logger.info("🛑 No es el primer día del mes, no se enviará.")
+def _schedules_due_today_filter(today_date):
+    """Condición SQL con las reglas de frecuencia evaluadas para `today_date`.
 
-        elif frequency_type == "periodic":
-            if interval_days and today_date.day % interval_days == 0:
-                
-                user = db.query(User).filter(User.id == schedule.user_id).first()
-                form = db.query(Form).filter(Form.id == schedule.form_id).first()
-                if user and form:
-                    if user.email not in users_forms:
-                        users_forms[user.email] = {"user_name": user.name, "forms": []}
-                    users_forms[user.email]["forms"].append({
-                        "title": form.title,
-                        "description": form.description or "Sin descripción"
-                    })
-                    logs.append(f"Frecuencia periódica: Correo enviado a {user.email} (intervalo {interval_days} días).")
-                else:
-                    logs.append(f"Frecuencia periódica: No se pudo encontrar el usuario o el formulario para el ID de programación {schedule.id}.")
-            else:
-                logger.info("🛑 No cumple el intervalo, no se enviará.")
+    Las partes que solo dependen de la fecha (¿es día 1?, ¿qué día de la
+    semana es?) se resuelven aquí, en Python, y llegan a la BD como
+    constantes; el resto se compara columna a columna en el mismo WHERE.
+    """
+    today_english = today_date.strftime('%A').lower()
+    condiciones = [
+        FormSchedule.frequency_type == "daily",
+        # repeat_days se guarda con json.dumps: '["monday", "friday"]'.
+        and_(
+            FormSchedule.frequency_type == "weekly",
+            FormSchedule.repeat_days.like(f'%"{today_english}"%'),
+        ),
+        # NULLIF: un intervalo 0 no debe dividir por cero, simplemente no aplica.
+        and_(
+            FormSchedule.frequency_type == "periodic",
+            today_date.day % func.nullif(FormSchedule.interval_days, 0) == 0,
+        ),
+        and_(
+            FormSchedule.frequency_type == "specific_date",
+            func.date(FormSchedule.specific_date) == today_date,
+        ),
+    ]
+    if today_date.day == 1:
+        condiciones.append(FormSchedule.frequency_type == "monthly")
+    return or_(*condiciones)
 
-        elif frequency_type == "specific_date" and specific_date.date() == today_date:
-            
-            user = db.query(User).filter(User.id == schedule.user_id).first()
-            form = db.query(Form).filter(Form.id == schedule.form_id).first()
-            if user and form:
-                if user.email not in users_forms:
-                    users_forms[user.email] = {"user_name": user.name, "forms": []}
-                users_forms[user.email]["forms"].append({
-                    "title": form.title,
-                    "description": form.description or "Sin descripción"
-                })
-                logs.append(f"Frecuencia por fecha específica: Correo enviado a {user.email}.")
-            else:
-                logs.append(f"Frecuencia por fecha específica: No se pudo encontrar el usuario o el formulario para el ID de programación {schedule.id}.")
-        else:
-            logger.info("🛑 No cumple ninguna condición para enviar.")
 
-    # Enviar correos a los usuarios
-    for email, data in users_forms.items():
-        send_email_daily_forms(
-            user_email=email,
-            user_name=data["user_name"],
-            forms=data["forms"]
+def get_schedules_by_frequency(db: Session) -> List[dict]:
+    """Envía el resumen diario de formularios programados.
+
+    Una sola consulta trae las programaciones activas que tocan hoy, ya unidas
+    con su usuario y su formato; se agrupan por destinatario y los correos
+    salen por lotes. Devuelve una entrada por programación enviada.
+    """
+    today_date = datetime.today().date()
+
+    rows = db.execute(
+        select(
+            FormSchedule.id,
+            FormSchedule.frequency_type,
+            User.email,
+            User.name,
+            Form.title,
+            Form.description,
         )
+        .join(User, User.id == FormSchedule.user_id)
+        .join(Form, Form.id == FormSchedule.form_id)
+        .where(FormSchedule.status == True, _schedules_due_today_filter(today_date))
+        .order_by(User.email, FormSchedule.id)
+    ).all()
 
-    # Imprimir los logs para ver cuál frecuencia se cumplió
-    for log in logs:
-        logger.info(log)
+    users_forms = {}
+    por_frecuencia = defaultdict(int)
+    enviados = []
+
+    for row in rows:
+        digest = users_forms.setdefault(row.email, {"user_name": row.name, "forms": []})
+        digest["forms"].append({
+            "title": row.title,
+            "description": row.description or "Sin descripción"
+        })
+        por_frecuencia[row.frequency_type] += 1
+        enviados.append({
+            "schedule_id": row.id,
+            "frequency_type": row.frequency_type,
+            "user_email": row.email,
+            "form_title": row.title,
+        })
+
+    digests = [
+        {"user_email": email, "user_name": data["user_name"], "forms": data["forms"]}
+        for email, data in users_forms.items()
+    ]
+    correos_ok = 0
+    for i in range(0, len(digests), DAILY_FORMS_EMAIL_BATCH):
+        correos_ok += send_email_daily_forms_batch(digests[i:i + DAILY_FORMS_EMAIL_BATCH])
+
+    logger.info(
+        "Programaciones de hoy por frecuencia: %s",
+        dict(por_frecuencia) or "ninguna",
+    )
+    logger.info(
+        "Resumen diario: %s programaciones, %s destinatarios, %s correos enviados",
+        len(enviados), len(digests), correos_ok,
+    )
 
-    return schedules
+    return enviados
 
 
 def prepare_and_send_file_to_emails(
@@ -3038,57 +3009,13 @@ def get_related_or_filtered_answers_with_forms(db: Session, question_id: int):
 
 
 
-def _reconstruct_answer_rows(answers):
-    """
-    Reconstruye las FILAS de una respuesta a partir de sus answers, para que el
-    autocompletado empareje los campos de UNA MISMA fila de repetidor
-    (ej. cédula ↔ nombre ↔ apellido de la fila i) y no mezcle filas.
-
-    - Si los answers traen `repeater_row_index`, ordena/empareja por él.
-    - Si no, reconstruye por POSICIÓN dentro de cada columna (mismo criterio que
-      los exportadores PDF/Excel).
-    - Un campo con un solo valor (top-level, fuera del repetidor) se comparte en
-      todas las filas.
-    - Un ARCHIVO sin descripción cuenta como respuesta y se identifica por el
-      nombre del archivo (ver nota abajo).
-
-    Devuelve una lista de dicts { question_id: answer_text }, una por fila.
-    """
-    from collections import defaultdict
-    cols = defaultdict(list)
-    for a in answers:
-        texto = a.answer_text
-        # Un adjunto es una respuesta válida aunque no traiga descripción: el
-        # archivo se guarda con `answer_text` = descripción y `file_path` aparte,
-        # y la descripción casi nunca se llena. Descartarlo aquí lo dejaba fuera
-        # de la fila, así que no llegaba a las correlaciones y el autocompletado
-        # dejaba el campo vacío — y sin valor tampoco aparece el enlace de
-        # descarga, que se activa cuando el valor coincide con el nombre listado.
-        #
-        # Se usa el MISMO criterio que la lista de opciones (get_file_answers,
-        # `display_name = answer_text or file_name`) para que ambos lados hablen
-        # de la misma etiqueta.
-        if (texto is None or texto == '') and a.file_path:
-            texto = a.file_path.split("/")[-1].split("\\")[-1]
-        if texto is None or texto == '':
-            continue
-        order = a.repeater_row_index if a.repeater_row_index is not None else (a.id or 0)
-        cols[a.question_id].append((order, texto))
-    for qid in cols:
-        cols[qid].sort(key=lambda t: t[0])
-        cols[qid] = [t[1] for t in cols[qid]]
-
-    n_rows = max((len(v) for v in cols.values()), default=0)
-    rows = []
-    for i in range(n_rows):
-        row = {}
-        for qid, vals in cols.items():
-            if i < len(vals):
-                row[qid] = vals[i]
-            elif len(vals) == 1:
-                row[qid] = vals[0]  # campo compartido por todas las filas
-        rows.append(row)
-    return rows
+def _lookup_pagination(page: int, page_size: int, total: int) -> dict:
+    return {
+        "page": page,
+        "page_size": page_size,
+        "total_items": total,
+        "total_pages": (total + page_size - 1) // page_size
+    }
 
 
 def get_related_or_filtered_answers_optimized(
@@ -3097,80 +3024,39 @@ def get_related_or_filtered_answers_optimized(
     include_forms: bool = False,
     page: int = 1,
     page_size: int = 50,
-    only_unique_answers: bool = False  # ✅ Cambiado a False por defecto para traer TODO
+    only_unique_answers: bool = False,  # ✅ Cambiado a False por defecto para traer TODO
+    q: Optional[str] = None,
+    value_page: Optional[int] = None,
+    value_page_size: int = 100
 ):
     """
     Versión optimizada que trae TODOS los datos incluyendo duplicados.
     ✅ AHORA: Muestra todas las respuestas sin eliminar duplicados
+
+    Las opciones que salen de respuestas (condición de filtro y pregunta
+    relacionada) se leen del índice de `app.core.answer_lookup`. `q` las filtra
+    por prefijo y `value_page`/`value_page_size` las paginan; sin `value_page`
+    se devuelven todas, como siempre.
     """
     # Verificar condición de filtro
     condition = db.query(QuestionFilterCondition).filter_by(filtered_question_id=question_id).first()
 
     if condition:
-        responses = db.query(Response).filter_by(form_id=condition.form_id).all()
-        valid_answers = []  # Lista para mantener duplicados
-        correlations_map = {}
-        response_ids_matched = set()
-
-        for response in responses:
-            answers = db.query(Answer).filter_by(response_id=response.id).all()
-
-            response_matched = False
-            # Reconstruir por fila: cada fila del repetidor empareja su condición,
-            # su valor fuente y sus correlaciones sin mezclarse con otras filas.
-            for row in _reconstruct_answer_rows(answers):
-                condition_val = row.get(condition.condition_question_id)
-                source_val = row.get(condition.source_question_id)
-                if not condition_val or not source_val:
-                    continue
-
-                try:
-                    condition_val_converted = float(condition_val)
-                    expected_val = float(condition.expected_value)
-                except ValueError:
-                    condition_val_converted = str(condition_val)
-                    expected_val = str(condition.expected_value)
-
-                condition_met = False
-                if condition.operator == '==':
-                    condition_met = condition_val_converted == expected_val
-                elif condition.operator == '!=':
-                    condition_met = condition_val_converted != expected_val
-                elif condition.operator == '>':
-                    condition_met = condition_val_converted > expected_val
-                elif condition.operator == '<':
-                    condition_met = condition_val_converted < expected_val
-                elif condition.operator == '>=':
-                    condition_met = condition_val_converted >= expected_val
-                elif condition.operator == '<=':
-                    condition_met = condition_val_converted <= expected_val
-
-                if not condition_met:
-                    continue
-
-                response_matched = True
-                valid_answers.append(source_val)  # ✅ Mantiene duplicados
-
-                if source_val not in correlations_map:
-                    correlations_map[source_val] = {}
-
-                for q_id, answer_text in row.items():
-                    if q_id != condition.source_question_id:
-                        if q_id not in correlations_map[source_val]:
-                            correlations_map[source_val][q_id] = answer_text
-
-            if response_matched:
-                response_ids_matched.add(response.id)
-
-        # ✅ Sin filtrar duplicados
-        filtered = list(filter(None, valid_answers))
-        
-        return {
+        # Las filas que cumplen la condición ya están indexadas
+        # (app.core.answer_lookup), con sus correlaciones.
+        source = answer_lookup.lookup_source(db.connection(), question_id)
+        values, correlations_map, total, matched = answer_lookup.lookup_page(
+            db, source, q=q, page=value_page, page_size=value_page_size
+        )
+        result = {
             "source": "condicion_filtrada",
-            "data": [{"name": val} for val in filtered],
+            "data": [{"name": val} for val in values],  # ✅ Mantiene duplicados
             "correlations": correlations_map,
-            "matched_response_count": len(response_ids_matched)
+            "matched_response_count": matched
         }
+        if value_page is not None:
+            result["value_pagination"] = _lookup_pagination(value_page, value_page_size, total)
+        return result
 
     # Si no hay condición, usar relación de tabla
     relation = db.query(QuestionTableRelation).filter_by(question_id=question_id).first()
@@ -3206,43 +3092,13 @@ def get_related_or_filtered_answers_optimized(
                 "correlations": {}
             }
 
-        all_unique_answers = []  # ✅ Lista para mantener TODO incluyendo duplicados
-        correlations_map = {}
-        form_ids_to_search = [fq.form_id for fq in form_questions]
-
-        all_responses_with_related_question = db.query(Response).filter(
-            Response.form_id.in_(form_ids_to_search)
-        ).all()
-
-        response_map = {r.id: r for r in all_responses_with_related_question}
-
-        all_answers = db.query(Answer).filter(
-            Answer.response_id.in_(list(response_map.keys()))
-        ).all()
-
-        answers_by_response = {}
-        for answer in all_answers:
-            if answer.response_id not in answers_by_response:
-                answers_by_response[answer.response_id] = []
-            answers_by_response[answer.response_id].append(answer)
-
-        for response_id, answers in answers_by_response.items():
-            # Reconstruir por fila para emparejar los campos de la misma fila del
-            # repetidor (evita que todas las opciones traigan el valor de la última fila).
-            for row in _reconstruct_answer_rows(answers):
-                related_answer_text = row.get(relation.related_question_id)
-                if not related_answer_text:
-                    continue
-
-                all_unique_answers.append(related_answer_text)  # ✅ Agrega TODO
-
-                if related_answer_text not in correlations_map:
-                    correlations_map[related_answer_text] = {}
-
-                for q_id, answer_text in row.items():
-                    if q_id != relation.related_question_id:
-                        if q_id not in correlations_map[related_answer_text]:
-                            correlations_map[related_answer_text][q_id] = answer_text
+        # Las opciones ya están indexadas (app.core.answer_lookup): valor de
+        # la pregunta relacionada por cada fila de repetidor, con los demás
+        # campos de ESA fila como correlaciones.
+        source = answer_lookup.lookup_source(db.connection(), question_id)
+        values, correlations_map, total, _ = answer_lookup.lookup_page(
+            db, source, q=q, page=value_page, page_size=value_page_size
+        )
 
         # ✅ Devuelve TODO sin eliminar duplicados
         result = {
@@ -3253,9 +3109,11 @@ def get_related_or_filtered_answers_optimized(
                 "type": related_question.question_type.value,
             },
             
-            "data": [{"name": answer} for answer in all_unique_answers if answer],
+            "data": [{"name": answer} for answer in values],
             "correlations": correlations_map
         }
+        if value_page is not None:
+            result["value_pagination"] = _lookup_pagination(value_page, value_page_size, total)
 
         # 📦 SOLO SI SE SOLICITA: Agregar formularios completos con paginación
         if include_forms:
@@ -4239,70 +4097,105 @@ def create_response_approval(db: Session, approval_data: ResponseApprovalCreate)
     db.commit()
     db.refresh(new_approval)
     return new_approval
-def get_forms_pending_approval_for_user(user_id: int, db: Session):
+def get_forms_pending_approval_for_user(
+    user_id: int, db: Session, page: Optional[int] = None, page_size: int = 30
+):
     """
     Recupera los formularios y respuestas que requieren aprobación por parte de un usuario específico.
     INCLUYE VALIDACIÓN de requisitos de aprobadores anteriores con línea de aprobación.
 
-    Esta función consulta las aprobaciones asignadas al usuario, valida que sea su turno 
-    (es decir, que los aprobadores anteriores obligatorios ya hayan aprobado) 
-    y ADEMÁS valida que todos los aprobadores anteriores hayan cumplido sus requisitos
-    de formularios requeridos con línea de aprobación completada.
+    Qué respuestas le llegaron al usuario (es decir, que los aprobadores
+    anteriores obligatorios ya hayan aprobado) ya no se calcula aquí: lo
+    guarda `approval_inbox` al escribir cada aprobación, así que la bandeja
+    es una consulta por índice. Aquí solo se arma el detalle de las filas
+    pedidas y se valida que los aprobadores anteriores hayan cumplido sus
+    requisitos de formularios requeridos con línea de aprobación completada.
+
+    Con `page` la bandeja se pagina (más recientes primero); sin él se
+    devuelve completa, como antes. Las respuestas bloqueadas por requisitos
+    se omiten, así que una página puede traer menos de `page_size`.
     """
     results = []
 
-    form_approvals = (
+    # El usuario sigue siendo participante del formato (plantilla activa) o
+    # entró a la cadena como participante dinámico: el "recibidor aleatorio"
+    # lo elige alguien en un campo y nunca tuvo fila en `form_approvals`.
+    plantilla_activa = (
+        select(FormApproval.id)
+        .where(
+            FormApproval.form_id == ApprovalInbox.form_id,
+            FormApproval.user_id == user_id,
+            FormApproval.is_active == True,
+        )
+        .exists()
+    )
+    query = (
+        db.query(ApprovalInbox)
+        .join(ResponseApproval, ResponseApproval.id == ApprovalInbox.response_approval_id)
+        .filter(
+            ApprovalInbox.user_id == user_id,
+            or_(plantilla_activa, ResponseApproval.dynamic_source_element_id.isnot(None)),
+        )
+        .order_by(ApprovalInbox.submitted_at.desc(), ApprovalInbox.id.desc())
+    )
+    if page is not None:
+        query = query.offset((max(page, 1) - 1) * page_size).limit(page_size)
+    entries = query.all()
+    if not entries:
+        return results
+
+    # Respuestas de la página con su autor y todas sus aprobaciones (con el
+    # usuario de cada aprobación) cargados de forma anticipada. Esto evita
+    # varias consultas por respuesta más abajo (patrón N+1).
+    responses_by_id = {
+        r.id: r
+        for r in db.query(Response)
+        .options(
+            joinedload(Response.form),
+            joinedload(Response.user),
+            joinedload(Response.approvals).joinedload(ResponseApproval.user),
+        )
+        .filter(Response.id.in_({e.response_id for e in entries}))
+        .all()
+    }
+
+    # Lo que depende solo del formato se carga una vez por formato de la página.
+    form_ids = {e.form_id for e in entries}
+    # El plazo sale de la plantilla del formato, también para los
+    # participantes dinámicos (no tienen una propia).
+    deadline_by_form = {}
+    for fa in (
         db.query(FormApproval)
-        .options(joinedload(FormApproval.form))
-        .filter(FormApproval.user_id == user_id, FormApproval.is_active == True)
+        .filter(FormApproval.form_id.in_(form_ids), FormApproval.is_active == True)
+        .order_by(FormApproval.user_id != user_id, FormApproval.id)
         .all()
-    )
+    ):
+        deadline_by_form.setdefault(fa.form_id, fa.deadline_days)
 
-    # ── Participaciones que NO están en la plantilla del formato ─────────────
-    # El "recibidor aleatorio" entra a la cadena en marcha: alguien lo elige en
-    # un campo mientras se diligencia o se aprueba, así que nunca tuvo fila en
-    # `form_approvals`. Mirando solo la plantilla, su pendiente no existía para
-    # él y el formato no le llegaba nunca.
-    dinamicas = (
-        db.query(ResponseApproval)
+    requirements_by_form = defaultdict(list)
+    for req in (
+        db.query(ApprovalRequirement)
+        .options(
+            joinedload(ApprovalRequirement.required_form),
+            joinedload(ApprovalRequirement.approver)
+        )
         .filter(
-            ResponseApproval.user_id == user_id,
-            ResponseApproval.dynamic_source_element_id.isnot(None),
+            ApprovalRequirement.form_id.in_(form_ids),
+            ApprovalRequirement.approver_id == user_id
         )
         .all()
-    )
-    if dinamicas:
-        from types import SimpleNamespace
-
-        ya_cubiertos = {fa.form.id for fa in form_approvals if fa.form}
-        formatos_de_respuesta = {
-            r.id: r.form_id
-            for r in db.query(Response)
-            .filter(Response.id.in_([ra.response_id for ra in dinamicas]))
-            .all()
-        }
-        for ra in dinamicas:
-            form_id_dinamico = formatos_de_respuesta.get(ra.response_id)
-            if not form_id_dinamico or form_id_dinamico in ya_cubiertos:
-                continue
-            form_obj = db.query(Form).filter(Form.id == form_id_dinamico).first()
-            if not form_obj:
-                continue
-            ya_cubiertos.add(form_id_dinamico)
-            # El plazo se hereda de la plantilla del formato, que es de donde
-            # sale para todos los demás participantes.
-            plantilla = (
-                db.query(FormApproval)
-                .filter(FormApproval.form_id == form_id_dinamico, FormApproval.is_active == True)
-                .first()
-            )
-            form_approvals.append(SimpleNamespace(
-                form=form_obj,
-                deadline_days=plantilla.deadline_days if plantilla else None,
-            ))
+    ):
+        requirements_by_form[req.form_id].append(req)
 
-    for form_approval in form_approvals:
-        form = form_approval.form
+    field_access_by_form = {}
+
+    for entry in entries:
+        response = responses_by_id.get(entry.response_id)
+        if response is None or response.form is None:
+            continue
+        form = response.form
+        deadline_days = deadline_by_form.get(form.id)
+        approval_requirements = requirements_by_form.get(form.id, [])
 
         # Config de campos/filas de ESTE aprobador en ESTE formato. Decide qué
         # answers se le envían y qué filas del repetidor le llegan.
@@ -4311,396 +4204,308 @@ def get_forms_pending_approval_for_user(user_id: int, db: Session):
         # Se resuelve por FORMATO; más abajo, ya dentro de cada respuesta, se
         # sustituye por la del participante dinámico cuando toca (ese no tiene
         # config propia: la suya va contra el campo que lo eligió).
-        fa_config_formato = field_access.load_field_access(db, form.id).get(user_id)
-        fa_design_formato = field_access.collect_design(form.form_design)
-        fa_config = fa_config_formato
-        fa_design = fa_design_formato if fa_config else None
-
-        # Obtener requisitos de aprobación para este formulario y usuario
-        approval_requirements = (
-            db.query(ApprovalRequirement)
-            .options(
-                joinedload(ApprovalRequirement.required_form),
-                joinedload(ApprovalRequirement.approver)
+        if form.id not in field_access_by_form:
+            field_access_by_form[form.id] = (
+                field_access.load_field_access(db, form.id).get(user_id),
+                field_access.collect_design(form.form_design),
             )
-            .filter(
-                ApprovalRequirement.form_id == form.id,
-                ApprovalRequirement.approver_id == user_id
-            )
-            .all()
+        fa_config_formato, fa_design_formato = field_access_by_form[form.id]
+
+        # Todas las aprobaciones de esta respuesta, ordenadas por secuencia
+        # (ya vienen cargadas vía joinedload; sin consultas adicionales).
+        all_ra_sorted = sorted(response.approvals, key=lambda a: (a.sequence_number, a.id))
+        response_approval = next(
+            (ra for ra in all_ra_sorted if ra.id == entry.response_approval_id), None
         )
+        if response_approval is None:
+            continue
 
-        # Respuestas del formulario con su autor y todas sus aprobaciones (con
-        # el usuario de cada aprobación) cargados de forma anticipada. Esto evita
-        # varias consultas por respuesta más abajo (patrón N+1).
-        responses = (
-            db.query(Response)
+        # 🔥 NUEVA VALIDACIÓN: Verificar requisitos de aprobadores anteriores
+        validation_result = validate_approver_requirements_with_approval_line(
+            response.id, user_id, db
+        )
+        
+        # Si no puede aprobar por requisitos bloqueantes, continuar con la siguiente respuesta
+        # O incluir la respuesta pero marcada como bloqueada (según prefieras)
+        if not validation_result["can_approve"]:
+            # OPCIÓN 1: Saltar esta respuesta completamente
+            continue
+            
+            # OPCIÓN 2: Incluir pero marcada como bloqueada (descomenta lo siguiente)
+            # response_blocked = True
+            # blocking_reasons = validation_result["blocking_requirements"]
+
+        # Obtener el estado de requisitos específicos para esta respuesta
+        response_requirements_status = (
+            db.query(ResponseApprovalRequirement)
             .options(
-                joinedload(Response.user),
-                joinedload(Response.approvals).joinedload(ResponseApproval.user),
+                joinedload(ResponseApprovalRequirement.approval_requirement)
+                .joinedload(ApprovalRequirement.required_form),
+                joinedload(ResponseApprovalRequirement.fulfilling_response)
             )
-            # Solo diligenciamientos: las respuestas de los aprobadores cuelgan
-            # de estas y se leen junto con ellas, no como respuestas aparte.
-            .filter(Response.form_id == form.id, Response.parent_response_id.is_(None))
+            .filter(ResponseApprovalRequirement.response_id == response.id)
             .all()
         )
 
-        for response in responses:
-            # Todas las aprobaciones de esta respuesta, ordenadas por secuencia
-            # (ya vienen cargadas vía joinedload; sin consultas adicionales).
-            all_ra_sorted = sorted(response.approvals, key=lambda a: a.sequence_number)
-
-            # Filtramos todas las aprobaciones del usuario para esta respuesta
-            response_approvals = [ra for ra in all_ra_sorted if ra.user_id == user_id]
-
-            # Identificamos cuál está pendiente o cuál está en el turno actual
-            response_approval = next(
-                (ra for ra in response_approvals if ra.status != ApprovalStatus.aprobado),
-                response_approvals[-1] if response_approvals else None
-            )
-
-            if not response_approval:
-                continue  # Este usuario no debe aprobar esta respuesta
-
-            sequence = response_approval.sequence_number
-
-            # ¿Ya es su turno?
-            #
-            # RECIBIDOR: cuelga de uno o varios aprobadores concretos
-            # (`receives_from_user_ids`). Espera a ESOS y a nadie más —da igual
-            # el modo del formato y da igual quién más haya en la cadena: dos
-            # recibidores del mismo aprobador reciben a la vez, no en fila—.
-            # Si alguno de sus aprobadores rechaza, no hay nada que recibir y
-            # el pendiente no le aparece nunca.
-            #
-            # RECIBIDOR SUELTO (sin `receives_from_user_ids`): no cuelga de un
-            # aprobador sino del DILIGENCIADOR, así que no hace fila con nadie.
-            # Su `receive_timing` decide a qué espera:
-            #   'on_submit'       → a nada: le llega al enviarse la respuesta.
-            #   'after_approvals' → a todos los APROBADORES obligatorios (no a
-            #                       los otros recibidores: dos sueltos reciben a
-            #                       la vez, y si el formato no tiene aprobadores
-            #                       le llega al enviarse igual que con
-            #                       'on_submit').
-            #
-            # APROBADOR: en modo SECUENCIAL espera a todos los obligatorios que
-            # van antes. En modo PARALELO no hay turno y ve su pendiente desde
-            # el inicio.
-            recibe_de = getattr(response_approval, "receives_from_user_ids", None) or []
-            approval_mode = getattr(form, "approval_mode", "sequential")
-            soy_recibidor = (
-                getattr(response_approval, "participant_role", None) or "approver"
-            ) == "receiver"
-
-            if recibe_de:
-                previos = [ra for ra in all_ra_sorted if ra.user_id in recibe_de]
-            elif soy_recibidor:
-                espera = getattr(response_approval, "receive_timing", None) or "after_approvals"
-                if espera == "on_submit":
-                    previos = []
-                else:
-                    previos = [
-                        ra for ra in all_ra_sorted
-                        if ra.is_mandatory
-                        and (getattr(ra, "participant_role", None) or "approver") == "approver"
-                    ]
-            elif approval_mode != "parallel":
-                previos = [
-                    ra for ra in all_ra_sorted
-                    if ra.sequence_number < sequence and ra.is_mandatory
-                ]
-            else:
-                previos = []
-
-            if not all(pa.status == ApprovalStatus.aprobado for pa in previos):
-                continue  # Todavía no le toca
-
-            # 🔥 NUEVA VALIDACIÓN: Verificar requisitos de aprobadores anteriores
-            validation_result = validate_approver_requirements_with_approval_line(
-                response.id, user_id, db
-            )
-            
-            # Si no puede aprobar por requisitos bloqueantes, continuar con la siguiente respuesta
-            # O incluir la respuesta pero marcada como bloqueada (según prefieras)
-            if not validation_result["can_approve"]:
-                # OPCIÓN 1: Saltar esta respuesta completamente
-                continue
-                
-                # OPCIÓN 2: Incluir pero marcada como bloqueada (descomenta lo siguiente)
-                # response_blocked = True
-                # blocking_reasons = validation_result["blocking_requirements"]
-
-            # Obtener el estado de requisitos específicos para esta respuesta
-            response_requirements_status = (
-                db.query(ResponseApprovalRequirement)
-                .options(
-                    joinedload(ResponseApprovalRequirement.approval_requirement)
-                    .joinedload(ApprovalRequirement.required_form),
-                    joinedload(ResponseApprovalRequirement.fulfilling_response)
-                )
-                .filter(ResponseApprovalRequirement.response_id == response.id)
+        # Obtener historial de respuestas para esta response
+        histories = db.query(AnswerHistory).filter(AnswerHistory.response_id == response.id).all()
+        
+        # Obtener todos los IDs de respuestas (previous y current) del historial
+        all_answer_ids = set()
+        for history in histories:
+            if history.previous_answer_id:
+                all_answer_ids.add(history.previous_answer_id)
+            all_answer_ids.add(history.current_answer_id)
+        
+        # Obtener todas las respuestas del historial con sus preguntas
+        historical_answers = {}
+        if all_answer_ids:
+            historical_answer_list = (
+                db.query(Answer)
+                .options(joinedload(Answer.question))
+                .filter(Answer.id.in_(all_answer_ids))
                 .all()
             )
-
-            # Obtener historial de respuestas para esta response
-            histories = db.query(AnswerHistory).filter(AnswerHistory.response_id == response.id).all()
             
-            # Obtener todos los IDs de respuestas (previous y current) del historial
-            all_answer_ids = set()
-            for history in histories:
-                if history.previous_answer_id:
-                    all_answer_ids.add(history.previous_answer_id)
-                all_answer_ids.add(history.current_answer_id)
-            
-            # Obtener todas las respuestas del historial con sus preguntas
-            historical_answers = {}
-            if all_answer_ids:
-                historical_answer_list = (
-                    db.query(Answer)
-                    .options(joinedload(Answer.question))
-                    .filter(Answer.id.in_(all_answer_ids))
-                    .all()
-                )
-                
-                # Crear mapeo de answer_id -> Answer
-                for answer in historical_answer_list:
-                    historical_answers[answer.id] = answer
-            
-            # Crear mapeo de current_answer_id -> history
-            history_map = {}
-            # Crear conjunto de previous_answer_ids para saber cuáles no mostrar individualmente
-            previous_answer_ids = set()
-            
-            for history in histories:
-                history_map[history.current_answer_id] = history
-                if history.previous_answer_id:
-                    previous_answer_ids.add(history.previous_answer_id)
-
-            # Mostrar estado de cada aprobador de esta respuesta
-            # (reutilizamos la lista ya ordenada y precargada).
-            response_approvals_all = all_ra_sorted
-
-            # Obtener respuestas actuales (excluyendo las que son previous_answer_ids).
-            # Se lee la respuesta COMPLETA: la del diligenciador más las de sus
-            # aprobadores, que son responses propias colgadas de esta. Cada dato
-            # llega con su autor (answered_by_user_id).
-            answers = db.query(Answer, Question).join(Question).filter(
-                Answer.response_id.in_(response_scope.response_tree_ids(db, response.id)),
-                ~Answer.id.in_(previous_answer_ids) if previous_answer_ids else True
-            ).all()
+            # Crear mapeo de answer_id -> Answer
+            for answer in historical_answer_list:
+                historical_answers[answer.id] = answer
+        
+        # Crear mapeo de current_answer_id -> history
+        history_map = {}
+        # Crear conjunto de previous_answer_ids para saber cuáles no mostrar individualmente
+        previous_answer_ids = set()
+        
+        for history in histories:
+            history_map[history.current_answer_id] = history
+            if history.previous_answer_id:
+                previous_answer_ids.add(history.previous_answer_id)
+
+        # Mostrar estado de cada aprobador de esta respuesta
+        # (reutilizamos la lista ya ordenada y precargada).
+        response_approvals_all = all_ra_sorted
+
+        # Obtener respuestas actuales (excluyendo las que son previous_answer_ids).
+        # Se lee la respuesta COMPLETA: la del diligenciador más las de sus
+        # aprobadores, que son responses propias colgadas de esta. Cada dato
+        # llega con su autor (answered_by_user_id).
+        answers = db.query(Answer, Question).join(Question).filter(
+            Answer.response_id.in_(response_scope.response_tree_ids(db, response.id)),
+            ~Answer.id.in_(previous_answer_ids) if previous_answer_ids else True
+        ).all()
 
-            # Nombre de los posibles autores distintos al diligenciador: solo
-            # los aprobadores escriben answers con answered_by_user_id.
-            approver_names = {ra.user_id: ra.user.name for ra in all_ra_sorted if ra.user}
-
-            answers_data = []
-            for a, q in answers:
-                answer_data = {
-                    "question_id": q.id,
-                    "question_text": q.question_text,
-                    "question_type": q.question_type,
-                    "answer_text": a.answer_text,
-                    "file_path": a.file_path,
-                    "answer_id": a.id,
-                    "has_history": a.id in history_map,
-                    # Ubicación en el diseño y en el repetidor. El renderer ya
-                    # sabía leerlos; antes no se enviaban y caía al fallback
-                    # posicional. Son necesarios para filtrar filas por aprobador.
-                    "form_design_element_id": a.form_design_element_id,
-                    "repeated_id": a.repeated_id,
-                    "repeater_row_index": a.repeater_row_index,
-                    "parent_repeated_id": a.parent_repeated_id,
-                    # Autoría: NULL = lo escribió quien diligenció el formato.
-                    "answered_by_user_id": a.answered_by_user_id,
-                    "answered_by_name": approver_names.get(a.answered_by_user_id),
-                    # Cuándo lo escribió el aprobador (NULL en lo del diligenciador,
-                    # que se fecha por Response.submitted_at).
-                    "answered_at": a.answered_at.isoformat() if a.answered_at else None,
-                }
+        # Nombre de los posibles autores distintos al diligenciador: solo
+        # los aprobadores escriben answers con answered_by_user_id.
+        approver_names = {ra.user_id: ra.user.name for ra in all_ra_sorted if ra.user}
+
+        answers_data = []
+        for a, q in answers:
+            answer_data = {
+                "question_id": q.id,
+                "question_text": q.question_text,
+                "question_type": q.question_type,
+                "answer_text": a.answer_text,
+                "file_path": a.file_path,
+                "answer_id": a.id,
+                "has_history": a.id in history_map,
+                # Ubicación en el diseño y en el repetidor. El renderer ya
+                # sabía leerlos; antes no se enviaban y caía al fallback
+                # posicional. Son necesarios para filtrar filas por aprobador.
+                "form_design_element_id": a.form_design_element_id,
+                "repeated_id": a.repeated_id,
+                "repeater_row_index": a.repeater_row_index,
+                "parent_repeated_id": a.parent_repeated_id,
+                # Autoría: NULL = lo escribió quien diligenció el formato.
+                "answered_by_user_id": a.answered_by_user_id,
+                "answered_by_name": approver_names.get(a.answered_by_user_id),
+                # Cuándo lo escribió el aprobador (NULL en lo del diligenciador,
+                # que se fecha por Response.submitted_at).
+                "answered_at": a.answered_at.isoformat() if a.answered_at else None,
+            }
 
-                # Agregar información del historial si existe
-                if a.id in history_map:
-                    history = history_map[a.id]
-                    previous_answer = historical_answers.get(history.previous_answer_id) if history.previous_answer_id else None
-                    
-                    answer_data["history"] = {
-                        "previous_answer": {
-                            "answer_text": previous_answer.answer_text if previous_answer else None,
-                            "file_path": previous_answer.file_path if previous_answer else None,
-                        } if previous_answer else None,
-                        "was_modified": True
-                    }
-                else:
-                    answer_data["history"] = {
-                        "previous_answer": None,
-                        "was_modified": False
-                    }
+            # Agregar información del historial si existe
+            if a.id in history_map:
+                history = history_map[a.id]
+                previous_answer = historical_answers.get(history.previous_answer_id) if history.previous_answer_id else None
                 
-                answers_data.append(answer_data)
-
-            # Si a este usuario lo eligieron en un campo, su configuración no es
-            # la del formato —no tiene una— sino la del participante dinámico,
-            # la que se ve en "Editar formato" como "Recibidor aleatorio".
-            if getattr(response_approval, "dynamic_source_element_id", None):
-                fa_config = field_access.load_dynamic_field_access(db, form.id).get(
-                    response_approval.dynamic_source_element_id
-                )
-                fa_design = fa_design_formato if fa_config else None
+                answer_data["history"] = {
+                    "previous_answer": {
+                        "answer_text": previous_answer.answer_text if previous_answer else None,
+                        "file_path": previous_answer.file_path if previous_answer else None,
+                    } if previous_answer else None,
+                    "was_modified": True
+                }
             else:
-                fa_config = fa_config_formato
-                fa_design = fa_design_formato if fa_config else None
-
-            # Recorte por aprobador: fuera los campos que no debe ver y fuera
-            # las filas del repetidor que no pasan su filtro. Se hace aquí, en
-            # el servidor, no en el cliente.
-            condition_visibility = {}
-            if fa_config and fa_design is not None:
-                visible_answers = field_access.filter_answers_for_approver(
-                    answers_data, fa_config, fa_design
-                )
-                # Los campos condicionales se evalúan contra la pregunta que los
-                # condiciona; si a este aprobador se le ocultó ESA pregunta, el
-                # cliente ya no puede resolverlo y los borraría de la vista. El
-                # veredicto se calcula aquí, con las respuestas completas, y se
-                # manda resuelto (el valor oculto no sale del servidor).
-                condition_visibility = field_access.condition_visibility_for_approver(
-                    form.form_design, fa_design, answers_data, visible_answers, fa_config
-                )
-                answers_data = visible_answers
-
-            all_approvals = [{
-                "user_id": ra.user_id,
-                "sequence_number": ra.sequence_number,
-                "is_mandatory": ra.is_mandatory,
-                "status": ra.status.value,
-                "reconsideration_requested": ra.reconsideration_requested,
-                "reviewed_at": ra.reviewed_at.isoformat() if ra.reviewed_at else None,
-                "message": ra.message,
-                # Método de firma heredado al enviar la respuesta.
-                # Default 'button' para retrocompat con ResponseApproval antiguas.
-                "firm_mode": getattr(ra, "firm_mode", "button") or "button",
-                # Aprobador o recibidor, para poder etiquetar a cada quien.
-                "participant_role": getattr(ra, "participant_role", None) or "approver",
-                # Evidencia: id de la Answer regisfacial usada al firmar
-                # (NULL si aún no firmó o si firmó solo con botón).
-                "firm_answer_id": getattr(ra, "firm_answer_id", None),
-                # Pregunta regisfacial fuente configurada por el admin.
-                "firm_source_question_id": getattr(ra, "firm_source_question_id", None),
-                "user": {
-                    "name": ra.user.name,
-                    "email": ra.user.email,
-                    "num_document": ra.user.num_document
+                answer_data["history"] = {
+                    "previous_answer": None,
+                    "was_modified": False
                 }
-            } for ra in response_approvals_all]
-
-            user_response = response.user
-
-            # Construir información de requisitos de aprobación con estado de diligenciamiento
-            requirements_data = []
             
-            # Crear un mapeo de approval_requirement_id -> ResponseApprovalRequirement para búsqueda rápida
-            requirement_status_map = {
-                req_status.approval_requirement_id: req_status 
-                for req_status in response_requirements_status
+            answers_data.append(answer_data)
+
+        # Si a este usuario lo eligieron en un campo, su configuración no es
+        # la del formato —no tiene una— sino la del participante dinámico,
+        # la que se ve en "Editar formato" como "Recibidor aleatorio".
+        if getattr(response_approval, "dynamic_source_element_id", None):
+            fa_config = field_access.load_dynamic_field_access(db, form.id).get(
+                response_approval.dynamic_source_element_id
+            )
+            fa_design = fa_design_formato if fa_config else None
+        else:
+            fa_config = fa_config_formato
+            fa_design = fa_design_formato if fa_config else None
+
+        # Recorte por aprobador: fuera los campos que no debe ver y fuera
+        # las filas del repetidor que no pasan su filtro. Se hace aquí, en
+        # el servidor, no en el cliente.
+        condition_visibility = {}
+        if fa_config and fa_design is not None:
+            visible_answers = field_access.filter_answers_for_approver(
+                answers_data, fa_config, fa_design
+            )
+            # Los campos condicionales se evalúan contra la pregunta que los
+            # condiciona; si a este aprobador se le ocultó ESA pregunta, el
+            # cliente ya no puede resolverlo y los borraría de la vista. El
+            # veredicto se calcula aquí, con las respuestas completas, y se
+            # manda resuelto (el valor oculto no sale del servidor).
+            condition_visibility = field_access.condition_visibility_for_approver(
+                form.form_design, fa_design, answers_data, visible_answers, fa_config
+            )
+            answers_data = visible_answers
+
+        all_approvals = [{
+            "user_id": ra.user_id,
+            "sequence_number": ra.sequence_number,
+            "is_mandatory": ra.is_mandatory,
+            "status": ra.status.value,
+            "reconsideration_requested": ra.reconsideration_requested,
+            "reviewed_at": ra.reviewed_at.isoformat() if ra.reviewed_at else None,
+            "message": ra.message,
+            # Método de firma heredado al enviar la respuesta.
+            # Default 'button' para retrocompat con ResponseApproval antiguas.
+            "firm_mode": getattr(ra, "firm_mode", "button") or "button",
+            # Aprobador o recibidor, para poder etiquetar a cada quien.
+            "participant_role": getattr(ra, "participant_role", None) or "approver",
+            # Evidencia: id de la Answer regisfacial usada al firmar
+            # (NULL si aún no firmó o si firmó solo con botón).
+            "firm_answer_id": getattr(ra, "firm_answer_id", None),
+            # Pregunta regisfacial fuente configurada por el admin.
+            "firm_source_question_id": getattr(ra, "firm_source_question_id", None),
+            "user": {
+                "name": ra.user.name,
+                "email": ra.user.email,
+                "num_document": ra.user.num_document
             }
-            
-            for req in approval_requirements:
-                # Obtener el estado específico de este requisito para esta respuesta
-                req_status = requirement_status_map.get(req.id)
-                
-                requirement_info = {
-                    "requirement_id": req.id,
-                    "required_form": {
-                        "form_id": req.required_form_id,
-                        "form_title": req.required_form.title,
-                        "form_description": req.required_form.description
-                    },
-                    "linea_aprobacion": req.linea_aprobacion,
-                    "approver": {
-                        "user_id": req.approver.id,
-                        "name": req.approver.name,
-                        "email": req.approver.email,
-                        "num_document": req.approver.num_document
-                    },
-                    # Estado de diligenciamiento del requisito
-                    "fulfillment_status": {
-                        "is_fulfilled": req_status.is_fulfilled if req_status else False,
-                        "fulfilling_response_id": req_status.fulfilling_response_id if req_status else None,
-                        "fulfilling_response_submitted_at": req_status.fulfilling_response.submitted_at.isoformat() if req_status and req_status.fulfilling_response else None,
-                        "updated_at": req_status.updated_at.isoformat() if req_status else None,
-                        "needs_completion": not (req_status and req_status.is_fulfilled),
-                        "completion_status": "completed" if req_status and req_status.is_fulfilled else "pending"
-                    }
-                }
-                requirements_data.append(requirement_info)
+        } for ra in response_approvals_all]
 
-            # Calcular estadísticas de requisitos
-            total_requirements = len(requirements_data)
-            fulfilled_requirements = sum(1 for req in requirements_data if req["fulfillment_status"]["is_fulfilled"])
-            pending_requirements = total_requirements - fulfilled_requirements
-            all_requirements_fulfilled = fulfilled_requirements == total_requirements if total_requirements > 0 else True
+        user_response = response.user
 
-            # Construir la respuesta final con información de validación
-            response_data = {
-                "deadline_days": form_approval.deadline_days,
-                "form_id": form.id,
-                "form_title": form.title,
-                "form_description": form.description,
-                "submitted_by": {
-                    "user_id": user_response.id,
-                    "name": user_response.name,
-                    "email": user_response.email,
-                    "num_document": user_response.num_document
-                },
-                "response_id": response.id,
-                "submitted_at": response.submitted_at.isoformat(),
-                "answers": answers_data,
-                # Condiciones ya resueltas por el servidor (solo las que este
-                # aprobador no puede evaluar con lo que se le envía). Vacío =
-                # las evalúa el cliente como siempre.
-                "condition_visibility": condition_visibility,
-                "your_approval_status": {
-                    "status": response_approval.status.value,
-                    "reviewed_at": response_approval.reviewed_at.isoformat() if response_approval.reviewed_at else None,
-                    "message": response_approval.message,
-                    "sequence_number": response_approval.sequence_number
-                },
-                # Qué papel cumplo YO en esta respuesta: 'approver' (aprobar o
-                # rechazar) o 'receiver' (recibir lo que otro aprobó). El cliente
-                # usa esto para mandar cada pendiente a su sección.
-                "my_participant_role": (
-                    getattr(response_approval, "participant_role", None) or "approver"
-                ),
-                "all_approvers": all_approvals,
-                "response_history": {
-                    "has_modifications": len(histories) > 0,
-                    "total_changes": len(histories),
-                    "modified_answers_count": len([a for a in answers_data if a["has_history"]])
+        # Construir información de requisitos de aprobación con estado de diligenciamiento
+        requirements_data = []
+        
+        # Crear un mapeo de approval_requirement_id -> ResponseApprovalRequirement para búsqueda rápida
+        requirement_status_map = {
+            req_status.approval_requirement_id: req_status 
+            for req_status in response_requirements_status
+        }
+        
+        for req in approval_requirements:
+            # Obtener el estado específico de este requisito para esta respuesta
+            req_status = requirement_status_map.get(req.id)
+            
+            requirement_info = {
+                "requirement_id": req.id,
+                "required_form": {
+                    "form_id": req.required_form_id,
+                    "form_title": req.required_form.title,
+                    "form_description": req.required_form.description
                 },
-                "approval_requirements": {
-                    "has_requirements": len(requirements_data) > 0,
-                    "total_requirements": total_requirements,
-                    "fulfilled_requirements": fulfilled_requirements,
-                    "pending_requirements": pending_requirements,
-                    "all_requirements_fulfilled": all_requirements_fulfilled,
-                    "completion_percentage": round((fulfilled_requirements / total_requirements) * 100, 2) if total_requirements > 0 else 100,
-                    "requirements": requirements_data
+                "linea_aprobacion": req.linea_aprobacion,
+                "approver": {
+                    "user_id": req.approver.id,
+                    "name": req.approver.name,
+                    "email": req.approver.email,
+                    "num_document": req.approver.num_document
                 },
-                # 🔥 NUEVA SECCIÓN: Información de validación de requisitos anteriores
-                "previous_approvers_validation": {
-                    "can_approve": validation_result["can_approve"],
-                    "has_blocking_requirements": len(validation_result["blocking_requirements"]) > 0,
-                    "blocking_requirements": validation_result["blocking_requirements"],
-                    "validation_details": validation_result["validation_details"]
+                # Estado de diligenciamiento del requisito
+                "fulfillment_status": {
+                    "is_fulfilled": req_status.is_fulfilled if req_status else False,
+                    "fulfilling_response_id": req_status.fulfilling_response_id if req_status else None,
+                    "fulfilling_response_submitted_at": req_status.fulfilling_response.submitted_at.isoformat() if req_status and req_status.fulfilling_response else None,
+                    "updated_at": req_status.updated_at.isoformat() if req_status else None,
+                    "needs_completion": not (req_status and req_status.is_fulfilled),
+                    "completion_status": "completed" if req_status and req_status.is_fulfilled else "pending"
                 }
             }
+            requirements_data.append(requirement_info)
+
+        # Calcular estadísticas de requisitos
+        total_requirements = len(requirements_data)
+        fulfilled_requirements = sum(1 for req in requirements_data if req["fulfillment_status"]["is_fulfilled"])
+        pending_requirements = total_requirements - fulfilled_requirements
+        all_requirements_fulfilled = fulfilled_requirements == total_requirements if total_requirements > 0 else True
+
+        # Construir la respuesta final con información de validación
+        response_data = {
+            "deadline_days": deadline_days,
+            "form_id": form.id,
+            "form_title": form.title,
+            "form_description": form.description,
+            "submitted_by": {
+                "user_id": user_response.id,
+                "name": user_response.name,
+                "email": user_response.email,
+                "num_document": user_response.num_document
+            },
+            "response_id": response.id,
+            "submitted_at": response.submitted_at.isoformat(),
+            "answers": answers_data,
+            # Condiciones ya resueltas por el servidor (solo las que este
+            # aprobador no puede evaluar con lo que se le envía). Vacío =
+            # las evalúa el cliente como siempre.
+            "condition_visibility": condition_visibility,
+            "your_approval_status": {
+                "status": response_approval.status.value,
+                "reviewed_at": response_approval.reviewed_at.isoformat() if response_approval.reviewed_at else None,
+                "message": response_approval.message,
+                "sequence_number": response_approval.sequence_number
+            },
+            # Qué papel cumplo YO en esta respuesta: 'approver' (aprobar o
+            # rechazar) o 'receiver' (recibir lo que otro aprobó). El cliente
+            # usa esto para mandar cada pendiente a su sección.
+            "my_participant_role": (
+                getattr(response_approval, "participant_role", None) or "approver"
+            ),
+            "all_approvers": all_approvals,
+            "response_history": {
+                "has_modifications": len(histories) > 0,
+                "total_changes": len(histories),
+                "modified_answers_count": len([a for a in answers_data if a["has_history"]])
+            },
+            "approval_requirements": {
+                "has_requirements": len(requirements_data) > 0,
+                "total_requirements": total_requirements,
+                "fulfilled_requirements": fulfilled_requirements,
+                "pending_requirements": pending_requirements,
+                "all_requirements_fulfilled": all_requirements_fulfilled,
+                "completion_percentage": round((fulfilled_requirements / total_requirements) * 100, 2) if total_requirements > 0 else 100,
+                "requirements": requirements_data
+            },
+            # 🔥 NUEVA SECCIÓN: Información de validación de requisitos anteriores
+            "previous_approvers_validation": {
+                "can_approve": validation_result["can_approve"],
+                "has_blocking_requirements": len(validation_result["blocking_requirements"]) > 0,
+                "blocking_requirements": validation_result["blocking_requirements"],
+                "validation_details": validation_result["validation_details"]
+            }
+        }
 
-            # Si quisieras incluir respuestas bloqueadas (OPCIÓN 2), descomenta:
-            # if 'response_blocked' in locals() and response_blocked:
-            #     response_data["approval_blocked"] = True
-            #     response_data["blocking_reasons"] = blocking_reasons
+        # Si quisieras incluir respuestas bloqueadas (OPCIÓN 2), descomenta:
+        # if 'response_blocked' in locals() and response_blocked:
+        #     response_data["approval_blocked"] = True
+        #     response_data["blocking_reasons"] = blocking_reasons
 
-            results.append(response_data)
+        results.append(response_data)
 
     return results
 
@@ -4721,8 +4526,13 @@ def validate_approver_requirements_with_approval_line(response_id: int, approver
     # En modo 'parallel' todos los aprobadores trabajan en paralelo, así que
     # no se requiere verificar que los anteriores hayan aprobado primero.
     # ═══════════════════════════════════════════════════════════════════════
-    response = db.query(Response).filter(Response.id == response_id).first()
-    if response and response.form and getattr(response.form, "approval_mode", "sequential") == "parallel":
+    approval_mode = (
+        db.query(Form.approval_mode)
+        .join(Response, Response.form_id == Form.id)
+        .filter(Response.id == response_id)
+        .scalar()
+    )
+    if approval_mode == "parallel":
         # Igual validamos que el usuario SÍ sea aprobador de esta respuesta
         is_approver = db.query(ResponseApproval).filter(
             ResponseApproval.response_id == response_id,
@@ -4784,24 +4594,29 @@ def validate_approver_requirements_with_approval_line(response_id: int, approver
     blocking_requirements = []
     validation_details = []
     
+    # Requisitos de todos los aprobadores anteriores en una sola consulta
+    requirements_by_approver = defaultdict(list)
+    for req_status in (
+        db.query(ResponseApprovalRequirement)
+        .join(ApprovalRequirement, ResponseApprovalRequirement.approval_requirement_id == ApprovalRequirement.id)
+        .options(
+            joinedload(ResponseApprovalRequirement.approval_requirement)
+            .joinedload(ApprovalRequirement.required_form),
+            joinedload(ResponseApprovalRequirement.approval_requirement)
+            .joinedload(ApprovalRequirement.approver),
+            joinedload(ResponseApprovalRequirement.fulfilling_response)
+        )
+        .filter(
+            ResponseApprovalRequirement.response_id == response_id,
+            ApprovalRequirement.approver_id.in_({pa.user_id for pa in previous_approvers})
+        )
+        .all()
+    ):
+        requirements_by_approver[req_status.approval_requirement.approver_id].append(req_status)
+
     # Verificar requisitos de cada aprobador anterior
     for prev_approver in previous_approvers:
-        prev_approver_requirements = (
-            db.query(ResponseApprovalRequirement)
-            .join(ApprovalRequirement, ResponseApprovalRequirement.approval_requirement_id == ApprovalRequirement.id)
-            .options(
-                joinedload(ResponseApprovalRequirement.approval_requirement)
-                .joinedload(ApprovalRequirement.required_form),
-                joinedload(ResponseApprovalRequirement.approval_requirement)
-                .joinedload(ApprovalRequirement.approver),
-                joinedload(ResponseApprovalRequirement.fulfilling_response)
-            )
-            .filter(
-                ResponseApprovalRequirement.response_id == response_id,
-                ApprovalRequirement.approver_id == prev_approver.user_id
-            )
-            .all()
-        )
+        prev_approver_requirements = requirements_by_approver[prev_approver.user_id]
         
         approver_detail = {
             "approver_user_id": prev_approver.user_id,
@@ -4886,7 +4701,11 @@ def validate_approver_requirements_with_approval_line(response_id: int, approver
 
 
 def validate_approval_line_completion(response_id: int, db: Session):
-    """Verifica si todos los aprobadores obligatorios de una respuesta ya aprobaron."""
+    """Verifica si todos los aprobadores obligatorios de una respuesta ya aprobaron.
+
+    Devuelve siempre el detalle por aprobador (`approval_status`), también con
+    la línea completa: el endpoint lo muestra en `approval_line_validation`.
+    """
     response_approvals = (
         db.query(ResponseApproval)
         .options(joinedload(ResponseApproval.user))
@@ -4964,23 +4783,6 @@ def get_next_mandatory_approver(response_id: int, db: Session):
     # ✅ NUEVO: detectar modo de aprobación
     approval_mode = getattr(form, "approval_mode", "sequential")
  
-    # Obtener la plantilla de aprobadores activa.
-    #
-    # Solo APROBADORES: a los recibidores se les avisa en el bloque de más abajo,
-    # que sabe a qué espera cada uno y les pone su propio asunto. Colados aquí,
-    # un recibidor recibía el correo de "Pendiente aprobación" y, en el modo
-    # secuencial, el `break` del primer obligatorio se comía a los que venían
-    # detrás.
-    form_approval_template = [
-        fa for fa in (
-            db.query(FormApproval)
-            .filter(FormApproval.form_id == form.id, FormApproval.is_active == True)
-            .order_by(FormApproval.sequence_number)
-            .all()
-        )
-        if (getattr(fa, "participant_role", None) or "approver") == "approver"
-    ]
-
     # Obtener aprobaciones realizadas
     response_approvals = (
         db.query(ResponseApproval)
@@ -4988,112 +4790,56 @@ def get_next_mandatory_approver(response_id: int, db: Session):
         .order_by(ResponseApproval.sequence_number)
         .all()
     )
- 
-    # ═══════════════════════════════════════════════════════════════════════
-    # ✅ Inicializar variables usadas por el return final
-    # Así ambos branches (sequential/parallel) las tienen definidas.
-    # ═══════════════════════════════════════════════════════════════════════
+
     ultima_aprobacion = next(
         (ra for ra in reversed(response_approvals) if ra.status == ApprovalStatus.aprobado),
         None
     )
-    siguientes_aprobadores = []
-    encontrado_obligatorio = False
- 
-    if approval_mode == "parallel":
-        # ═══════════════════════════════════════════════════════════════════
-        # ✅ MODO PARALELO
-        # Todos los aprobadores que aún no aprobaron son "siguientes",
-        # sin importar el sequence_number. El orden de notificación no
-        # bloquea a nadie — cualquiera puede aprobar.
-        # ═══════════════════════════════════════════════════════════════════
-        aprobadores_que_ya_aprobaron = {
-            ra.user_id for ra in response_approvals
-            if ra.status == ApprovalStatus.aprobado
-        }
-        for fa in form_approval_template:
-            if fa.user_id not in aprobadores_que_ya_aprobaron:
-                siguientes_aprobadores.append({
-                    "nombre": fa.user.name,
-                    "email": fa.user.email,
-                    "telefono": fa.user.telephone,
-                    "secuencia": fa.sequence_number,
-                    "es_obligatorio": fa.is_mandatory
-                })
-                # En paralelo, si hay al menos uno obligatorio en la lista,
-                # marcamos la flag (no hacemos break — notificamos a todos).
-                if fa.is_mandatory:
-                    encontrado_obligatorio = True
-    else:
-        # ═══════════════════════════════════════════════════════════════════
-        # MODO SECUENCIAL (original) — sin cambios
-        # ═══════════════════════════════════════════════════════════════════
-        for fa in form_approval_template:
-            if not ultima_aprobacion or fa.sequence_number > ultima_aprobacion.sequence_number:
-                siguientes_aprobadores.append({
-                    "nombre": fa.user.name,
-                    "email": fa.user.email,
-                    "telefono": fa.user.telephone,
-                    "secuencia": fa.sequence_number,
-                    "es_obligatorio": fa.is_mandatory
-                })
-                if not encontrado_obligatorio and fa.is_mandatory:
-                    encontrado_obligatorio = True
-                    break
- 
+
     # ═══════════════════════════════════════════════════════════════════════
-    # Recibidores a los que ya les toca.
-    #
-    # Van aparte del recorrido de arriba: un recibidor no hace fila con los
-    # demás, espera solo a SUS aprobadores (`receives_from_user_ids`). Dos
-    # recibidores del mismo aprobador se enteran a la vez —el `break` del modo
-    # secuencial se comía al segundo—. Se avisa una sola vez por persona.
+    # A quién le toca ahora: sale del estado guardado de la cadena, el mismo
+    # que alimenta la bandeja (`app.core.approval_inbox`). Ahí ya están las
+    # reglas de turno de cada modo y de cada clase de recibidor; aquí solo se
+    # decide a quién de ellos avisar. Si la respuesta todavía no tiene estado
+    # (p. ej. antes de la primera reconstrucción) se calcula al vuelo.
     # ═══════════════════════════════════════════════════════════════════════
-    ya_aprobaron = {
-        ra.user_id for ra in response_approvals if ra.status == ApprovalStatus.aprobado
-    }
-    ya_en_lista = {s["email"] for s in siguientes_aprobadores}
-
-    # Los aprobadores obligatorios de la cadena: a ellos espera el recibidor
-    # suelto que no recibe al enviarse.
-    obligatorios_pendientes = [
-        ra for ra in response_approvals
-        if (getattr(ra, "participant_role", None) or "approver") == "approver"
-        and ra.is_mandatory
-        and ra.status != ApprovalStatus.aprobado
-    ]
+    state = db.get(ResponseApprovalState, response_id, populate_existing=True)
+    next_user_ids = (
+        state.next_user_ids if state is not None
+        else approval_inbox.chain_state(response_id, approval_mode, response_approvals)["next_user_ids"]
+    )
 
-    for ra in response_approvals:
-        if (getattr(ra, "participant_role", None) or "approver") != "receiver":
+    siguientes_aprobadores = []
+    encontrado_obligatorio = False
+    for next_user_id in dict.fromkeys(next_user_ids):
+        ra = approval_inbox.current_approval_of(response_approvals, next_user_id)
+        if ra is None or not ra.user:
             continue
-        if ra.status != ApprovalStatus.pendiente or not ra.user:
+        es_recibidor = (getattr(ra, "participant_role", None) or "approver") == "receiver"
+        # En secuencial solo se avisa a los que vienen DESPUÉS de la última
+        # aprobación: un opcional anterior que sigue pendiente ya fue avisado.
+        if (
+            not es_recibidor
+            and approval_mode != "parallel"
+            and ultima_aprobacion
+            and ra.sequence_number <= ultima_aprobacion.sequence_number
+        ):
             continue
-        recibe_de = getattr(ra, "receives_from_user_ids", None) or []
-        if recibe_de:
-            if not all(uid in ya_aprobaron for uid in recibe_de):
-                continue  # todavía falta que alguno de sus aprobadores apruebe
-        else:
-            # Recibidor SUELTO: cuelga del diligenciador. Le toca al enviarse la
-            # respuesta, o cuando ya no quede ningún aprobador obligatorio
-            # pendiente —que en un formato sin aprobadores es lo mismo—.
-            espera = getattr(ra, "receive_timing", None) or "after_approvals"
-            if espera != "on_submit" and obligatorios_pendientes:
-                continue
-        if ra.user.email in ya_en_lista:
-            continue
-        siguientes_aprobadores.append({
+        siguiente = {
             "nombre": ra.user.name,
             "email": ra.user.email,
             "telefono": ra.user.telephone,
             "secuencia": ra.sequence_number,
-            "es_obligatorio": ra.is_mandatory,
-            "es_recibidor": True,
-        })
-        ya_en_lista.add(ra.user.email)
+            "es_obligatorio": ra.is_mandatory
+        }
+        if es_recibidor:
+            siguiente["es_recibidor"] = True
+        elif ra.is_mandatory:
+            encontrado_obligatorio = True
+        siguientes_aprobadores.append(siguiente)
 
     # ═══════════════════════════════════════════════════════════════════════
-    # Parte final ORIGINAL — sin cambios. Ahora funciona en ambos modos
-    # porque ultima_aprobacion / encontrado_obligatorio ya están definidas.
+    # Parte final ORIGINAL — sin cambios.
     # ═══════════════════════════════════════════════════════════════════════
 
     # Agregar todos los aprobadores del formato
@@ -5485,7 +5231,7 @@ def run_async_in_thread(async_func, db_session_factory, form_id, current_user_id
     thread.start()
 
 
-async def send_form_action_emails(form_id: int, db, current_user, request):
+def send_form_action_emails(form_id: int, db, current_user, request):
     """
     Envía correos según las acciones activas configuradas para un formulario.
     Soporta múltiples destinatarios por acción.
@@ -5542,7 +5288,7 @@ async def send_form_action_emails(form_id: int, db, current_user, request):
 
             for recipient in recipients:
                 try:
-                    email_sent = await send_action_notification_email(
+                    email_sent = send_action_notification_email(
                         action=action,
                         recipient=recipient,
                         form=form,
@@ -5656,7 +5402,7 @@ async def send_form_action_emails_background(form_id: int, current_user_id: int,
 
             for recipient in recipients:
                 try:
-                    email_sent = await send_action_notification_email(
+                    email_sent = send_action_notification_email(
                         action=action,
                         recipient=recipient,
                         form=form,
@@ -5725,7 +5471,7 @@ async def send_form_action_emails_background(form_id: int, current_user_id: int,
     except Exception as e:
         logger.error(f"❌ Error al procesar acciones del formulario {form_id}: {str(e)}")
 
-async def update_response_approval_status(
+def update_response_approval_status(
     response_id: int,
     update_data: UpdateResponseApprovalRequest,
     user_id: int,
@@ -5902,66 +5648,39 @@ async def update_response_approval_status(
     response = db.query(Response).filter(Response.id == response_id).first()
     form = db.query(Form).filter(Form.id == response.form_id).first()
 
-    form_approval_template = (
-        db.query(FormApproval)
-        .filter(
-            FormApproval.form_id == form.id,
-            FormApproval.is_active == True
-        )
-        .order_by(FormApproval.sequence_number)
-        .all()
-    )
-
-    response_approvals = db.query(ResponseApproval).filter(
-        ResponseApproval.response_id == response_id
-    ).all()
-
-    detener_proceso = False
-
-    for fa in form_approval_template:
-        ra = next((r for r in response_approvals if r.user_id == fa.user_id), None)
-        status = ra.status.value if ra else "pendiente"
-        logger.info(f"  [{fa.sequence_number}] {fa.user.name} - {status}")
-
-        if ra and ra.status == ApprovalStatus.rechazado and fa.is_mandatory:
-            logger.info(f"\n⛔ El aprobador '{fa.user.name}' rechazó y su aprobación es obligatoria. El proceso se detiene.")
-            detener_proceso = True
-            break
-
-    # 4. Verificar si todos los aprobadores han aprobado
-    if not detener_proceso and update_data.status == "aprobado":
-        # Verificar si todos los aprobadores obligatorios han aprobado
-        todos_aprobadores_completados = all(
-            any(ra.user_id == fa.user_id and ra.status == ApprovalStatus.aprobado 
-                for ra in response_approvals)
-            for fa in form_approval_template if fa.is_mandatory
-        )
-        
-        # Verificar si todos los aprobadores (obligatorios y opcionales) han dado respuesta
-        todos_han_respondido = all(
-            any(ra.user_id == fa.user_id for ra in response_approvals)
-            for fa in form_approval_template
+    # El commit de arriba ya recalculó el estado de la cadena
+    # (`app.core.approval_inbox`): de ahí salen rechazo y cierre.
+    state = db.get(ResponseApprovalState, response_id, populate_existing=True)
+    if state is None:
+        response_approvals = db.query(ResponseApproval).filter(
+            ResponseApproval.response_id == response_id
+        ).all()
+        state = SimpleNamespace(**approval_inbox.chain_state(
+            response_id, getattr(form, "approval_mode", "sequential"), response_approvals
+        ))
+
+    detener_proceso = state.is_rejected
+    if detener_proceso:
+        logger.info("\n⛔ Un aprobador obligatorio rechazó. El proceso se detiene.")
+
+    # 4. Verificar si todos los aprobadores obligatorios han aprobado
+    if not detener_proceso and update_data.status == "aprobado" and state.is_complete:
+        # El proceso está completamente finalizado
+        send_final_approval_email_to_original_user(response_id, db)
+
+        # 🔥 EJECUTAR EN THREAD SEPARADO - NO ESPERA
+        run_async_in_thread(
+            send_form_action_emails_background,
+            SessionLocal,
+            form_id=form.id,
+            current_user_id=current_user.id,
+            request=request
         )
-        
-        if todos_aprobadores_completados and todos_han_respondido:
-            # El proceso está completamente finalizado
-            send_final_approval_email_to_original_user(response_id, db)
-            
-            # 🔥 EJECUTAR EN THREAD SEPARADO - NO ESPERA
-            run_async_in_thread(
-                send_form_action_emails_background,
-                SessionLocal,
-                form_id=form.id,
-                current_user_id=current_user.id,
-                request=request
-            )
-            logger.info("✅ Correos de cierre iniciados en background (en thread separado)")
+        logger.info("✅ Correos de cierre iniciados en background (en thread separado)")
 
     if not detener_proceso:
-        faltantes = [fa.user.name for fa in form_approval_template 
-                     if not any(ra.user_id == fa.user_id for ra in response_approvals)]
-        if faltantes:
-            logger.info(f"\n🕓 Aún deben aprobar: {', '.join(faltantes)}")
+        if state.next_user_ids:
+            logger.info(f"\n🕓 Aún deben actuar los usuarios: {state.next_user_ids}")
         else:
             logger.info("\n✅ Todos los aprobadores han completado su revisión.")
 
@@ -5970,6 +5689,21 @@ async def update_response_approval_status(
         FormApprovalNotification.form_id == form.id
     ).all()
 
+    if notifications:
+        form_approval_template = (
+            db.query(FormApproval)
+            .options(joinedload(FormApproval.user))
+            .filter(
+                FormApproval.form_id == form.id,
+                FormApproval.is_active == True
+            )
+            .order_by(FormApproval.sequence_number)
+            .all()
+        )
+        response_approvals = db.query(ResponseApproval).filter(
+            ResponseApproval.response_id == response_id
+        ).all()
+
     for notification in notifications:
         should_notify = False
 
@@ -6954,6 +6688,7 @@ def delete_form(db: Session, form_id: int):
             db.query(ResponseApprovalRequirement).filter(ResponseApprovalRequirement.response_id.in_(response_ids)).delete(synchronize_session=False)
             db.query(Answer).filter(Answer.response_id.in_(response_ids)).delete(synchronize_session=False)
             db.query(Response).filter(Response.id.in_(response_ids)).delete(synchronize_session=False)
+            change_feed.record(db.connection(), "response", "delete", response_ids)
 
         # 2. ⚠️ CRÍTICO: Eliminar relation_operation_math ANTES de otras cosas
         db.query(RelationOperationMath).filter(
@@ -7171,110 +6906,147 @@ def analyze_form_relations(db: Session, form_id: int):
 
 
 def get_response_details_logic(db: Session):
-    responses = db.query(Response).all()
-
-    if not responses:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No se encontraron respuestas pendientes."
-        )
+    """Aprobaciones pendientes que vencieron AYER, en una sola consulta.
 
-    fecha_actual = datetime.now()
-    resultados = []
+    El plazo de cada paso se acumula a lo largo de la cadena de la respuesta
+    (orden `sequence_number`): el paso N vence cuando los días desde el envío
+    superan la suma de `deadline_days` de los pasos 1..N. Antes esto se
+    recorría respuesta por respuesta (todas las de la tabla, con consultas por
+    aprobación y por usuario); ahora la suma corre en una función de ventana y
+    la BD solo entrega las filas que cumplen.
 
-    # Diccionario para acumular aprobaciones vencidas por formulario
-    aprobaciones_globales = defaultdict(list)
-
-    for response in responses:
-        dias_transcurridos = (fecha_actual - response.submitted_at).days
+    Un rechazo corta la cadena: ni él ni los pasos posteriores se reportan.
 
-        response_approvals = (
-            db.query(ResponseApproval)
-            .filter(ResponseApproval.response_id == response.id)
-            .order_by(ResponseApproval.sequence_number)
-            .all()
+    Las filas se leen por lotes (`yield_per`) y van directo al correo
+    consolidado. Devuelve una entrada por respuesta con aprobaciones vencidas.
+    """
+    # Plazo del paso según la plantilla del formato. Subconsulta escalar (y no
+    # JOIN) para que una plantilla duplicada no duplique el paso en la ventana.
+    deadline_paso = (
+        select(FormApproval.deadline_days)
+        .where(
+            FormApproval.form_id == Response.form_id,
+            FormApproval.user_id == ResponseApproval.user_id,
+            FormApproval.sequence_number == ResponseApproval.sequence_number,
+            FormApproval.is_active == True,
         )
+        .limit(1)
+        .scalar_subquery()
+    )
+    ventana = {
+        "partition_by": ResponseApproval.response_id,
+        "order_by": (ResponseApproval.sequence_number, ResponseApproval.id),
+    }
 
-        result = {
-            "response_id": response.id,
-            "dias_transcurridos": dias_transcurridos,
-            "formato": {
-                "nombre": response.form.title if response.form else None,
-                "descripcion": response.form.description if response.form else None
-            },
-            "aprobaciones": []
-        }
-
-        acumulado_deadline = 0
-        rechazo_encontrado = False
-
-        # Obtener info del usuario creador
-        user_creator_info = db.query(User).filter(User.id == response.user_id).first()
+    # Solo las cadenas que todavía tienen algo pendiente pueden vencer.
+    con_pendientes = (
+        select(ResponseApproval.response_id)
+        .where(ResponseApproval.status == ApprovalStatus.pendiente)
+        .distinct()
+    )
 
-        for approval in response_approvals:
-            if approval.status == ApprovalStatus.rechazado:
-                rechazo_encontrado = True
+    cadena = (
+        select(
+            ResponseApproval.id.label("approval_id"),
+            ResponseApproval.response_id,
+            ResponseApproval.user_id,
+            ResponseApproval.sequence_number,
+            ResponseApproval.status,
+            ResponseApproval.reviewed_at,
+            ResponseApproval.is_mandatory,
+            ResponseApproval.message,
+            deadline_paso.label("deadline_days"),
+            func.sum(func.coalesce(deadline_paso, 0)).over(**ventana).label("deadline_acumulado"),
+            func.count(
+                case((ResponseApproval.status == ApprovalStatus.rechazado, 1))
+            ).over(**ventana).label("rechazos"),
+        )
+        .join(Response, Response.id == ResponseApproval.response_id)
+        .where(ResponseApproval.response_id.in_(con_pendientes))
+        .subquery("cadena")
+    )
 
-            form_approval = (
-                db.query(FormApproval)
-                .filter(
-                    FormApproval.form_id == response.form_id,
-                    FormApproval.user_id == approval.user_id,
-                    FormApproval.sequence_number == approval.sequence_number,
-                    FormApproval.is_active == True
-                )
-                .first()
-            )
+    Creador = aliased(User)
+    Aprobador = aliased(User)
+    dias_transcurridos = func.date_part("day", func.now() - Response.submitted_at)
 
-            if form_approval:
-                acumulado_deadline += form_approval.deadline_days
+    stmt = (
+        select(
+            cadena,
+            dias_transcurridos.label("dias_transcurridos"),
+            Form.title.label("form_title"),
+            Form.description.label("form_description"),
+            Creador.id.label("creador_id"),
+            Creador.num_document.label("creador_num_document"),
+            Creador.name.label("creador_name"),
+            Creador.email.label("creador_email"),
+            Creador.telephone.label("creador_telephone"),
+            Creador.nickname.label("creador_nickname"),
+            Aprobador.id.label("aprobador_id"),
+            Aprobador.num_document.label("aprobador_num_document"),
+            Aprobador.name.label("aprobador_name"),
+            Aprobador.email.label("aprobador_email"),
+            Aprobador.telephone.label("aprobador_telephone"),
+            Aprobador.nickname.label("aprobador_nickname"),
+        )
+        .join(Response, Response.id == cadena.c.response_id)
+        .outerjoin(Form, Form.id == Response.form_id)
+        .outerjoin(Creador, Creador.id == Response.user_id)
+        .outerjoin(Aprobador, Aprobador.id == cadena.c.user_id)
+        .where(
+            cadena.c.status == ApprovalStatus.pendiente,
+            cadena.c.rechazos == 0,
+            # Venció ayer: exactamente un día más que el plazo acumulado.
+            dias_transcurridos == cadena.c.deadline_acumulado + 1,
+        )
+        .order_by(cadena.c.response_id, cadena.c.sequence_number, cadena.c.approval_id)
+        .execution_options(yield_per=500)
+    )
 
-            if rechazo_encontrado or approval.status != ApprovalStatus.pendiente:
-                continue
+    def _persona(row, prefijo):
+        if getattr(row, f"{prefijo}_id") is None:
+            return None
+        return {
+            campo: getattr(row, f"{prefijo}_{campo}")
+            for campo in ("id", "num_document", "name", "email", "telephone", "nickname")
+        }
 
-            # Info del aprobador
-            user_approver_info = db.query(User).filter(User.id == approval.user_id).first()
+    resultados = {}
+    aprobaciones_globales = defaultdict(list)
 
-            plazo_vencido = dias_transcurridos > acumulado_deadline
-            
-            # Solo añadir si venció ayer (exactamente un día)
-            if plazo_vencido and (dias_transcurridos - acumulado_deadline) == 1:
-                data = {
-                    "id": approval.id,
-                    "sequence_number": approval.sequence_number,
-                    "status": approval.status,
-                    "reviewed_at": approval.reviewed_at,
-                    "is_mandatory": approval.is_mandatory,
-                    "message": approval.message,
-                    "deadline_days": form_approval.deadline_days if form_approval else None,
-                    "deadline_acumulado": acumulado_deadline,
-                    "plazo_vencido": plazo_vencido,
-                    "creador": {
-                        "id": user_creator_info.id,
-                        "num_document": user_creator_info.num_document,
-                        "name": user_creator_info.name,
-                        "email": user_creator_info.email,
-                        "telephone": user_creator_info.telephone,
-                        "nickname": user_creator_info.nickname
-                    } if user_creator_info else None,
-                    "aprobador": {
-                        "id": user_approver_info.id,
-                        "num_document": user_approver_info.num_document,
-                        "name": user_approver_info.name,
-                        "email": user_approver_info.email,
-                        "telephone": user_approver_info.telephone,
-                        "nickname": user_approver_info.nickname
-                    } if user_approver_info else None
-                }
-                result["aprobaciones"].append(data)
-                aprobaciones_globales[response.form.title].append(data)
+    for row in db.execute(stmt):
+        result = resultados.get(row.response_id)
+        if result is None:
+            result = resultados[row.response_id] = {
+                "response_id": row.response_id,
+                "dias_transcurridos": int(row.dias_transcurridos),
+                "formato": {
+                    "nombre": row.form_title,
+                    "descripcion": row.form_description,
+                },
+                "aprobaciones": [],
+            }
 
-        resultados.append(result)
+        data = {
+            "id": row.approval_id,
+            "sequence_number": row.sequence_number,
+            "status": row.status,
+            "reviewed_at": row.reviewed_at,
+            "is_mandatory": row.is_mandatory,
+            "message": row.message,
+            "deadline_days": row.deadline_days,
+            "deadline_acumulado": int(row.deadline_acumulado),
+            "plazo_vencido": True,
+            "creador": _persona(row, "creador"),
+            "aprobador": _persona(row, "aprobador"),
+        }
+        result["aprobaciones"].append(data)
+        aprobaciones_globales[row.form_title].append(data)
 
     if aprobaciones_globales:
         enviar_correo_aprobaciones_vencidas_consolidado(aprobaciones_globales, db)
 
-    return resultados
+    return list(resultados.values())
 
 
 def enviar_correo_aprobaciones_vencidas_consolidado(aprobaciones_globales: dict, db: Session):
@@ -8492,6 +8264,9 @@ def generate_excel_with_repeaters(data: dict) -> BytesIO:
     
     ✅ MANTIENE EL MISMO NOMBRE DE ENDPOINT
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     
     # ===== FUNCIÓN HELPER PARA LIMPIAR NOMBRES DE HOJAS =====
     def clean_sheet_name(name: str) -> str:
@@ -9019,126 +8794,108 @@ def get_pending_notification_rules(db: Session) -> List[Dict]:
 
     Lógica:
     1. Busca reglas habilitadas (enabled = True)
-    2. Calcula: fecha_notificacion = date_notification - time_alert (días)
-    3. Si fecha_notificacion == HOY, debe enviarse
-    4. ✅ NUEVO: Si la regla tiene `notification_email` (campos email_notification),
+    2. La fecha de envío (date_notification - time_alert días) ya viene
+       en `notify_on`, que mantiene un trigger de la BD: se piden solo las de
+       HOY, por índice. "Hoy" y las fechas del correo se cuentan en
+       models.RULE_TIMEZONE, la misma zona del trigger.
+    3. ✅ NUEVO: Si la regla tiene `notification_email` (campos email_notification),
        el destinatario del correo es ese email. Si no, se usa `user.email`
        del response, como siempre.
 
     Returns:
         List[Dict]: Lista de diccionarios con la información para enviar emails
     """
-    today = datetime.now().date()
+    rule_tz = pytz.timezone(models.RULE_TIMEZONE)
+    today = datetime.now(rule_tz).date()
     notifications_to_send = []
 
-    # Obtener todas las reglas habilitadas con sus relaciones
     rules = db.query(RelationQuestionRule).filter(
         RelationQuestionRule.enabled == True,
-        RelationQuestionRule.date_notification.isnot(None),
-        RelationQuestionRule.time_alert.isnot(None),
-        RelationQuestionRule.id_response.isnot(None)
+        RelationQuestionRule.id_response.isnot(None),
+        RelationQuestionRule.notify_on == today,
     ).options(
         joinedload(RelationQuestionRule.related_response).joinedload(Response.user),
         joinedload(RelationQuestionRule.related_response).joinedload(Response.form),
         joinedload(RelationQuestionRule.question)
     ).all()
 
-    logger.info(f"📊 Total de reglas habilitadas encontradas: {len(rules)}")
-
     for rule in rules:
         try:
-            # Convertir time_alert a entero (días antes de notificar)
             days_before = int(rule.time_alert)
+            date_limit = rule.date_notification.astimezone(rule_tz).date()
+            response = rule.related_response
 
-            # Calcular la fecha en que debe enviarse la notificación
-            notification_date = rule.date_notification.date() - timedelta(days=days_before)
-
-            logger.info(f"  🔍 Regla ID {rule.id}:")
-            logger.info(f"      - Fecha límite: {rule.date_notification.date()}")
-            logger.info(f"      - Días antes: {days_before}")
-            logger.info(f"      - Fecha notificación: {notification_date}")
-            logger.info(f"      - Hoy: {today}")
+            if not response:
+                logger.warning(f"⚠️ Regla ID {rule.id}: no se encontró la respuesta asociada")
+                continue
 
-            # Verificar si hoy es el día de enviar la notificación
-            if notification_date == today:
-                response = rule.related_response
+            user = response.user
+            form = response.form
 
-                if not response:
-                    logger.warning(f"      ⚠️ No se encontró la respuesta asociada")
-                    continue
+            if not user or not form:
+                logger.warning(f"⚠️ Regla ID {rule.id}: no se encontró el usuario o formulario asociado")
+                continue
 
-                user = response.user
-                form = response.form
+            # ═══════════════════════════════════════════════════════════════
+            # ✅ NUEVO: Decidir el destinatario del correo
+            # ───────────────────────────────────────────────────────────────
+            # - Si la regla tiene `notification_email` → usarlo como destino
+            #   (campo email_notification del formato)
+            # - Si no → usar el `user.email` del response (comportamiento viejo)
+            # ═══════════════════════════════════════════════════════════════
+            custom_email = getattr(rule, "notification_email", None)
+            if custom_email and str(custom_email).strip():
+                recipient_email = str(custom_email).strip()
+                is_custom_recipient = True
+            else:
+                recipient_email = user.email
+                is_custom_recipient = False
+
+            # Calcular días restantes hasta la fecha límite
+            days_remaining = (date_limit - today).days
+
+            notification_data = {
+                'rule_id': rule.id,
+                'response_id': response.id,
+                'form_id': form.id,
+                'form_title': form.title,
+                'form_description': form.description or 'Sin descripción',
+                'user_id': user.id,
+                'user_name': user.name,
+
+                # ✅ Destinatario resuelto (custom o fallback al user del response)
+                'user_email': recipient_email,
+                'is_custom_recipient': is_custom_recipient,
+
+                # Datos de contacto del user que diligenció (siguen disponibles
+                # para el template del correo — nombre de quien debe responder)
+                'user_telephone': user.telephone,
+                'user_document': user.num_document,
+
+                'date_limit': date_limit,
+                'days_remaining': days_remaining,
+                'days_before_alert': days_before,
+                'question_text': (
+                    rule.question.question_text
+                    if rule.question else 'Pregunta no disponible'
+                ),
 
-                if not user or not form:
-                    logger.warning(f"      ⚠️ No se encontró el usuario o formulario asociado")
-                    continue
+                # ✅ Mensaje personalizado opcional que viene del frontend
+                'notification_message': getattr(rule, "notification_message", None),
 
-                # ═══════════════════════════════════════════════════════════════
-                # ✅ NUEVO: Decidir el destinatario del correo
-                # ───────────────────────────────────────────────────────────────
-                # - Si la regla tiene `notification_email` → usarlo como destino
-                #   (campo email_notification del formato)
-                # - Si no → usar el `user.email` del response (comportamiento viejo)
-                # ═══════════════════════════════════════════════════════════════
-                custom_email = getattr(rule, "notification_email", None)
-                if custom_email and str(custom_email).strip():
-                    recipient_email = str(custom_email).strip()
-                    is_custom_recipient = True
-                    logger.info(f"      📮 Destinatario CUSTOM (email_notification): {recipient_email}")
-                else:
-                    recipient_email = user.email
-                    is_custom_recipient = False
-                    logger.info(f"      📮 Destinatario por defecto (user del response): {recipient_email}")
-
-                # Calcular días restantes hasta la fecha límite
-                days_remaining = (rule.date_notification.date() - today).days
-
-                notification_data = {
-                    'rule_id': rule.id,
-                    'response_id': response.id,
-                    'form_id': form.id,
-                    'form_title': form.title,
-                    'form_description': form.description or 'Sin descripción',
-                    'user_id': user.id,
-                    'user_name': user.name,
-
-                    # ✅ Destinatario resuelto (custom o fallback al user del response)
-                    'user_email': recipient_email,
-                    'is_custom_recipient': is_custom_recipient,
-
-                    # Datos de contacto del user que diligenció (siguen disponibles
-                    # para el template del correo — nombre de quien debe responder)
-                    'user_telephone': user.telephone,
-                    'user_document': user.num_document,
-
-                    'date_limit': rule.date_notification.date(),
-                    'days_remaining': days_remaining,
-                    'days_before_alert': days_before,
-                    'question_text': (
-                        rule.question.question_text
-                        if rule.question else 'Pregunta no disponible'
-                    ),
-
-                    # ✅ Mensaje personalizado opcional que viene del frontend
-                    'notification_message': getattr(rule, "notification_message", None),
-
-                    'created_at': response.submitted_at
-                }
+                'created_at': response.submitted_at
+            }
 
-                notifications_to_send.append(notification_data)
-                logger.info(f"      ✅ Notificación agregada para {recipient_email}")
-            else:
-                logger.info(f"      ⏭️ No es el día de notificar (será: {notification_date})")
+            notifications_to_send.append(notification_data)
 
-        except ValueError as e:
-            logger.error(f"      ❌ Error al convertir time_alert '{rule.time_alert}' a entero: {e}")
-            continue
         except Exception as e:
-            logger.error(f"      ❌ Error procesando regla {rule.id}: {str(e)}")
+            logger.error(f"❌ Error procesando regla {rule.id}: {str(e)}")
             continue
 
-    logger.info(f"\n📧 Total de notificaciones a enviar: {len(notifications_to_send)}")
+    logger.info(
+        f"📧 Notificaciones a enviar hoy: {len(notifications_to_send)} "
+        f"(reglas leídas: {len(rules)})"
+    )
     return notifications_to_send
 
 def disable_notification_rule(db: Session, rule_id: int) -> bool:
@@ -12,19 +12,69 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL no está configurada en variables de entorno. La app no puede iniciar.")
-# Crear el engine de SQLAlchemy
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True, 
-    pool_size=10,
-    max_overflow=20,
-    pool_timeout=30,
-    pool_recycle=1800,
-)
+def _engine_options(prefix: str, pool_size: int, max_overflow: int, pool_timeout: int,
+                    statement_timeout_ms: int) -> dict:
+    """Opciones de create_engine de un pool, ajustables con <prefix>_POOL_SIZE,
+    <prefix>_MAX_OVERFLOW, <prefix>_POOL_TIMEOUT, <prefix>_POOL_RECYCLE y
+    <prefix>_STATEMENT_TIMEOUT_MS (0 = sin límite).
+
+    El statement_timeout por defecto va en la conexión (opción de arranque de
+    Postgres): no cuesta una consulta por transacción. application_name deja
+    ver en pg_stat_activity de qué pool es cada conexión; el mismo nombre
+    sale en los logs de app/core/db_pools.py.
+    """
+    name = f"forms_{prefix.lower()}"
+    timeout_ms = int(os.getenv(f"{prefix}_STATEMENT_TIMEOUT_MS", statement_timeout_ms))
+    options = f"-c application_name={name}"
+    if timeout_ms > 0:
+        options += f" -c statement_timeout={timeout_ms}"
+    return dict(
+        logging_name=name,
+        pool_pre_ping=True,
+        pool_size=int(os.getenv(f"{prefix}_POOL_SIZE", pool_size)),
+        max_overflow=int(os.getenv(f"{prefix}_MAX_OVERFLOW", max_overflow)),
+        pool_timeout=int(os.getenv(f"{prefix}_POOL_TIMEOUT", pool_timeout)),
+        pool_recycle=int(os.getenv(f"{prefix}_POOL_RECYCLE", 1800)),
+        connect_args={"options": options},
+    )
+
+
+# Pool interactivo: requests normales (envíos, formularios, bandejas). Sin
+# statement_timeout por defecto: lo usan también los `python -m` de
+# reconstrucción y las reconstrucciones en la primera lectura, que en
+# clientes grandes tardan. Las rutas que lo necesitan lo fijan con
+# `statement_timeout(ms)` (app/core/db_pools.py); DB_STATEMENT_TIMEOUT_MS
+# pone uno para todo el pool.
+engine = create_engine(DATABASE_URL, **_engine_options(
+    "DB", pool_size=10, max_overflow=20, pool_timeout=30, statement_timeout_ms=0,
+))
 
 # Crear una sesión de SQLAlchemy
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Pool de lotes: exportes y tareas programadas. Pocas conexiones y consultas
+# largas permitidas; un exporte lento espera aquí sin dejar a los envíos sin
+# conexión en el pool interactivo.
+batch_engine = create_engine(DATABASE_URL, **_engine_options(
+    "DB_BATCH", pool_size=3, max_overflow=2, pool_timeout=120, statement_timeout_ms=600000,
+))
+BatchSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=batch_engine)
+
+# Réplica de solo lectura (opcional). Sin DATABASE_REPLICA_URL no hay tercer
+# engine y `get_read_db` (app/core/read_replica.py) usa el primario. Atiende
+# exportes, así que admite consultas largas como el pool de lotes.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+replica_engine = create_engine(DATABASE_REPLICA_URL, **_engine_options(
+    "DB_REPLICA", pool_size=10, max_overflow=20, pool_timeout=30, statement_timeout_ms=600000,
+)) if DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None else None
+)
+
+# Para instrumentar todos los pools por igual (query_stats, loop_guard, db_pools).
+all_engines = tuple(e for e in (engine, batch_engine, replica_engine) if e is not None)
+
 # Base declarativa común
 Base = declarative_base()
 
@@ -34,4 +84,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
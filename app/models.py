@@ -1,12 +1,17 @@
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from hashlib import md5
+from typing import Optional
 from sqlalchemy import (
-    Boolean, Column, BigInteger, DateTime, Integer, SmallInteger, String, Text,
-    ForeignKey, TIMESTAMP, Enum, UniqueConstraint, Index, func, text
+    Boolean, Column, BigInteger, Date, DateTime, Integer, Numeric, SmallInteger, String, Text,
+    ForeignKey, TIMESTAMP, Enum, UniqueConstraint, Index, FetchedValue, event, func, text
 )
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
 import json
+import re
+import unicodedata
 from sqlalchemy import TypeDecorator
 
 # ====== DEFINIR EL TIPO AUTOJSON ======
@@ -259,6 +264,9 @@ class Question(Base):
     # alinear los dos esquemas.
     id_alias = Column(Integer, ForeignKey("alias.id", ondelete="SET NULL"), nullable=True, index=True)
     id_form = Column(BigInteger, ForeignKey('forms.id', ondelete='SET NULL'), nullable=True, index=True)
+    # question_text normalizado (`question_text_key`) para detectar duplicados
+    # con el índice. Lo llena `_set_question_text_normalized` al escribir.
+    text_normalized = Column(String(255), nullable=True, index=True)
 
     category = relationship('QuestionCategory', back_populates='questions')
     forms = relationship('Form', secondary='form_questions', back_populates='questions')
@@ -268,6 +276,22 @@ class Question(Base):
     alias = relationship('Alias', backref='questions')
     default_form = relationship('Form', foreign_keys=[id_form])
 
+
+def question_text_key(value: Optional[str]) -> str:
+    """Normaliza un question_text para comparar unicidad: minúsculas, sin
+    acentos, espacios colapsados/recortados."""
+    if not value:
+        return ""
+    t = unicodedata.normalize("NFKD", value)
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    return " ".join(t.lower().split())
+
+
+@event.listens_for(Question, "before_insert")
+@event.listens_for(Question, "before_update")
+def _set_question_text_normalized(mapper, connection, target):
+    target.text_normalized = question_text_key(target.question_text)[:255] or None
+
 class QuestionCategory(Base):
     __tablename__ = 'question_categories'
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -297,7 +321,7 @@ class Response(Base):
     mode = Column(String(20), nullable=False)
     mode_sequence = Column(Integer, nullable=False)
     repeated_id = Column(String(80), nullable=True)
-    submitted_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    submitted_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, index=True)
     status = Column(Enum(ResponseStatus), default=ResponseStatus.draft, nullable=False)
     sync_pendiente = Column(Boolean, default=False, nullable=False)
     # Respuesta que ESTA responde. NULL = diligenciamiento normal.
@@ -325,6 +349,16 @@ class Response(Base):
         cascade="all, delete-orphan"    
     )
 
+    # Listados y conteos por formato o por usuario ya vienen con
+    # `parent_response_id IS NULL` (filtro global de app/core/response_scope.py):
+    # índices parciales con ese mismo predicado, así el filtro no cuesta nada.
+    __table_args__ = (
+        Index('ix_responses_form_submissions', 'form_id', 'id',
+              postgresql_where=text('parent_response_id IS NULL')),
+        Index('ix_responses_user_submissions', 'user_id', 'id',
+              postgresql_where=text('parent_response_id IS NULL')),
+    )
+
 
 class Answer(Base):
     __tablename__ = 'answers'
@@ -350,12 +384,92 @@ class Answer(Base):
     # Cuándo se escribió. Solo se llena en las answers de aprobador: las del
     # diligenciador se fechan por Response.submitted_at, como siempre.
     answered_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # Copias tipadas de answer_text para comparar y sumar en la BD ("100" > "20").
+    # Las llena `_set_answer_typed_values` al escribir; NULL si no es número/fecha.
+    value_num = Column(Numeric, nullable=True)
+    value_date = Column(Date, nullable=True)
+
+    __table_args__ = (
+        Index('ix_answers_question_value_num', 'question_id', 'value_num',
+              postgresql_where=text('value_num IS NOT NULL')),
+        Index('ix_answers_question_value_date', 'question_id', 'value_date',
+              postgresql_where=text('value_date IS NOT NULL')),
+    )
 
     response = relationship('Response', back_populates='answers')
     answered_by = relationship('User', foreign_keys=[answered_by_user_id])
     question = relationship('Question', back_populates='answers')
     file_serial = relationship('AnswerFileSerial', back_populates='answer', uselist=False, cascade='all, delete-orphan')
 
+_ISO_DATE = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:$|[T ])")
+# Dígitos que se aceptan en value_num, a cada lado de la coma. "1e999999" es un
+# Decimal válido pero no cabe en un numeric de Postgres, y el flush fallaría
+# con todo el guardado de la respuesta. Más allá de esto no es una cantidad.
+_MAX_NUM_DIGITS = 1000
+
+
+def answer_value_num(value) -> Optional[Decimal]:
+    """Valor numérico de un answer_text, o None si no es número.
+
+    Tolera símbolos de moneda y separadores de miles/decimales comunes en
+    Colombia (1.234,56), igual que los totales del consolidado de movimientos.
+    """
+    if value is None:
+        return None
+    s = str(value).strip().replace("$", "").replace(" ", "")
+    if s == "":
+        return None
+    if "," in s and "." in s:
+        # 1.234,56 -> coma decimal, punto miles
+        s = s.replace(".", "").replace(",", ".")
+    elif "," in s and "." not in s:
+        s = s.replace(",", ".")
+    try:
+        number = Decimal(s)
+    except InvalidOperation:
+        return None
+    if not number.is_finite():
+        return None
+    if abs(number.adjusted()) > _MAX_NUM_DIGITS or -number.as_tuple().exponent > _MAX_NUM_DIGITS:
+        return None
+    return number
+
+
+def answer_value_date(value) -> Optional[date]:
+    """Fecha de un answer_text ISO ('2026-10-19' o con hora), o None."""
+    if not value:
+        return None
+    match = _ISO_DATE.match(str(value).strip())
+    if not match:
+        return None
+    try:
+        return date.fromisoformat(match.group(1))
+    except ValueError:
+        return None
+
+
+def answer_value_key(value) -> Optional[str]:
+    """Clave de unicidad de un answer_text ("respuestas no repetidas").
+
+    Recorta y colapsa espacios y pasa a minúsculas; NO quita acentos (valores
+    como teléfonos/correos rara vez los usan y preferimos no fusionar valores
+    legítimamente distintos). md5 del resultado; None si queda vacío.
+    """
+    if value is None:
+        return None
+    normalized = " ".join(str(value).strip().lower().split())
+    if not normalized:
+        return None
+    return md5(normalized.encode("utf-8")).hexdigest()
+
+
+@event.listens_for(Answer, "before_insert")
+@event.listens_for(Answer, "before_update")
+def _set_answer_typed_values(mapper, connection, target):
+    target.value_num = answer_value_num(target.answer_text)
+    target.value_date = answer_value_date(target.answer_text)
+
+
 class Project(Base):
     __tablename__ = 'projects'
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -431,6 +545,57 @@ class QuestionTableRelation(Base):
     related_question = relationship('Question', foreign_keys=[related_question_id], backref='related_table_relations', uselist=False)
     related_form = relationship('Form', foreign_keys=[related_form_id], backref='related_form_serial', uselist=False)
 
+class AnswerLookupEntry(Base):
+    """Una opción ya armada del autocompletado de una pregunta.
+
+    Sale de una fila (de repetidor o única) de una respuesta de otro formato:
+    el valor que se ofrece y los demás campos de esa misma fila. La mantiene
+    `app.core.answer_lookup`; nadie más escribe aquí.
+    """
+    __tablename__ = 'answer_lookup_entries'
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # La pregunta que se autocompleta (no la de origen).
+    question_id = Column(BigInteger, ForeignKey('questions.id', ondelete='CASCADE'), nullable=False)
+    response_id = Column(BigInteger, ForeignKey('responses.id', ondelete='CASCADE'), nullable=False)
+    row_index = Column(Integer, nullable=False)
+    value = Column(Text, nullable=False)
+    # {question_id: texto} de los demás campos de la fila.
+    correlations = Column(AutoJSON, nullable=False, default=dict)
+
+    __table_args__ = (
+        UniqueConstraint('question_id', 'response_id', 'row_index', name='uq_answer_lookup_entry'),
+        Index('ix_answer_lookup_prefix', 'question_id', text('lower(value) text_pattern_ops')),
+    )
+
+
+class AnswerLookupSource(Base):
+    """Hasta dónde está armado el autocompletado de una pregunta.
+
+    Sin fila, el índice de esa pregunta no existe todavía (o se invalidó) y se
+    arma completo en la próxima lectura. `last_response_id` es la respuesta más
+    nueva ya indexada: lo que llegue después por otro backend se indexa al leer.
+    """
+    __tablename__ = 'answer_lookup_sources'
+    question_id = Column(BigInteger, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    last_response_id = Column(BigInteger, nullable=False, default=0)
+    built_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+
+class UniqueAnswerValue(Base):
+    """Un valor ya tomado de una pregunta con `unique_answer`.
+
+    La llave primaria (pregunta, clave) es el índice único: la consulta en vivo
+    es una sola búsqueda por llave y dos guardados simultáneos del mismo valor
+    no pueden quedar ambos. Solo tiene filas de las preguntas marcadas y de
+    respuestas de diligenciamiento. La mantiene `app.core.unique_answers`.
+    """
+    __tablename__ = 'unique_answer_values'
+    question_id = Column(BigInteger, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    # `answer_value_key(answer_text)`.
+    value_key = Column(String(32), primary_key=True)
+    response_id = Column(BigInteger, ForeignKey('responses.id', ondelete='CASCADE'), nullable=False, index=True)
+
+
 class AnswerFileSerial(Base):
     __tablename__ = 'answer_file_serials'
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -614,11 +779,104 @@ class ResponseApproval(Base):
     # no tiene una suya) y no volver a crearlo si el paso se guarda dos veces.
     # NULL = participante fijo, venido de la plantilla del formato.
     dynamic_source_element_id = Column(String(100), nullable=True)
+
+    # Los pasos pendientes son pocos: índice parcial para que la tarea de
+    # vencimientos encuentre sus cadenas sin recorrer la tabla entera.
+    __table_args__ = (
+        Index(
+            'ix_response_approvals_pendientes',
+            'response_id',
+            postgresql_where=text("status = 'pendiente'"),
+        ),
+    )
+
     response = relationship("Response", back_populates="approvals")
     user = relationship("User", foreign_keys=[user_id])
     firm_answer = relationship("Answer", foreign_keys=[firm_answer_id])
     firm_source_question = relationship("Question", foreign_keys=[firm_source_question_id])
 
+class ApprovalInbox(Base):
+    """Bandeja de aprobación ya resuelta: qué respuestas le llegaron a quién.
+
+    Una fila por (respuesta, participante) cuando ya es su turno, con la
+    aprobación que manda para él en esa respuesta. La mantiene
+    `app.core.approval_inbox` en la misma transacción que cambia
+    `response_approvals`; nadie más escribe aquí.
+    """
+    __tablename__ = 'approval_inbox'
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    response_id = Column(BigInteger, ForeignKey('responses.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(BigInteger, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    response_approval_id = Column(
+        BigInteger, ForeignKey('response_approvals.id', ondelete='CASCADE'), nullable=False
+    )
+    form_id = Column(BigInteger, ForeignKey('forms.id', ondelete='CASCADE'), nullable=False)
+    # Copia de Response.submitted_at: es el orden de la bandeja.
+    submitted_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    # Estado de SU aprobación ('pendiente' mientras no actúe).
+    approval_status = Column(Enum(ApprovalStatus), nullable=False)
+    participant_role = Column(String(20), nullable=False, default='approver')
+
+    __table_args__ = (
+        UniqueConstraint('response_id', 'user_id', name='uq_approval_inbox_response_user'),
+        Index('ix_approval_inbox_user_submitted', 'user_id', 'submitted_at', 'id'),
+    )
+
+
+class ResponseApprovalState(Base):
+    """Estado ya calculado de la cadena de aprobación de una respuesta.
+
+    Una fila por respuesta con aprobaciones: en qué paso va, a quién le toca
+    actuar ahora y si la cadena ya terminó o quedó rechazada. La mantiene
+    `app.core.approval_inbox` junto con la bandeja; nadie más escribe aquí.
+    """
+    __tablename__ = 'response_approval_states'
+    response_id = Column(BigInteger, ForeignKey('responses.id', ondelete='CASCADE'), primary_key=True)
+    # Menor secuencia entre los que ya tienen turno y siguen pendientes.
+    current_step = Column(Integer, nullable=True)
+    # Los que tienen turno y siguen pendientes, en orden de secuencia.
+    next_user_ids = Column(AutoJSON, nullable=False, default=list)
+    total_approvers = Column(Integer, nullable=False, default=0)
+    approved_count = Column(Integer, nullable=False, default=0)
+    # Todos los obligatorios aprobaron.
+    is_complete = Column(Boolean, nullable=False, default=False)
+    # Algún obligatorio rechazó: la cadena no sigue.
+    is_rejected = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class ResponseDailyRollup(Base):
+    """Conteos de respuestas ya agregados por día.
+
+    Una fila por (formato, usuario, estado, día de `submitted_at`): cuántas
+    respuestas de diligenciamiento hay y, de las que ya tienen alguna
+    aprobación revisada, la suma de segundos entre el envío y la última
+    revisión. Con eso salen los conteos y el promedio de horas de aprobación
+    de /responses/aggregate sin recorrer `responses`. La mantiene
+    `app.core.response_rollups`; nadie más escribe aquí.
+    """
+    __tablename__ = 'response_daily_rollups'
+    form_id = Column(BigInteger, ForeignKey('forms.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(BigInteger, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    responses = Column(Integer, nullable=False, default=0)
+    reviewed_responses = Column(Integer, nullable=False, default=0)
+    approval_seconds = Column(Numeric, nullable=False, default=0)
+
+
+class ResponseRollupState(Base):
+    """Hasta qué respuesta están al día los rollups (una sola fila, id=1).
+
+    Sin fila, los rollups no se han armado y se arman completos en la próxima
+    lectura. Lo que llegue por otro backend con id mayor se suma al leer.
+    """
+    __tablename__ = 'response_rollup_state'
+    id = Column(SmallInteger, primary_key=True, default=1)
+    last_response_id = Column(BigInteger, nullable=False, default=0)
+    built_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+
 class FormApprovalNotification(Base):
     __tablename__ = 'form_approval_notifications'
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -875,9 +1133,24 @@ class RelationQuestionRule(Base):
     notification_email = Column(String(255), nullable=True)   # Email destinatario custom (campos email_notification)
     notification_message = Column(Text, nullable=True)        # Mensaje personalizado opcional
 
+    # Día en que sale el recordatorio: date_notification (en RULE_TIMEZONE)
+    # - time_alert días. Lo mantiene un trigger de la BD en cada escritura,
+    # venga de este backend o del otro, para que la tarea diaria pida por
+    # índice solo las de hoy. NULL = sin fecha o time_alert que no es un
+    # entero de hasta 4 cifras.
+    notify_on = Column(Date, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index(
+            'ix_relation_question_rule_notify_on',
+            'notify_on',
+            postgresql_where=text('enabled'),
+        ),
+    )
+
     question = relationship('Question', foreign_keys=[id_question], backref='related_question_rule', uselist=False)
     related_form = relationship('Form', foreign_keys=[id_form], backref='related_form_rule', uselist=False)
     related_response = relationship(
@@ -886,6 +1159,12 @@ class RelationQuestionRule(Base):
         back_populates="question_rules"
     )
 
+# Zona en la que se cuenta el día de los recordatorios: la misma en el trigger
+# que llena notify_on (migrations/2026-10-19_relation_question_rule_notify_on_trigger.sql)
+# y en el "hoy" de la tarea diaria.
+RULE_TIMEZONE = "America/Bogota"
+
+
 class TemplateScope(str, enum.Enum):
     private = "private"
     company = "company"
@@ -1149,6 +1428,29 @@ class AuthEvent(Base):
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, index=True)
 
 
+class ChangeEvent(Base):
+    """Feed de cambios (outbox) para los consumidores de ArIA.
+
+    Una fila por respuesta, aprobación, evento de autenticación o usuario
+    creado, editado o borrado, escrita en la misma transacción que el cambio.
+    `seq` es el cursor: se asigna DESPUÉS del commit, en orden y sin huecos
+    de visibilidad (ver `app.core.change_feed`); mientras sea NULL el evento
+    todavía no se entrega. Borrar una respuesta borra sus aprobaciones: llega
+    el evento de la respuesta, no uno por aprobación. Solo se agregan filas
+    (y se purgan las viejas).
+    """
+    __tablename__ = 'change_events'
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    seq = Column(BigInteger, nullable=True, unique=True)
+    # response | approval | auth | user
+    topic = Column(String(20), nullable=False)
+    # insert | update | delete
+    action = Column(String(10), nullable=False)
+    entity_id = Column(BigInteger, nullable=False)
+    payload = Column(AutoJSON, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Feature "Servicios" (ex actividades genéricas) — 2026-06-04.
 # Separa "qué formatos pertenecen al servicio" (usuarios opcionales) de "quién
@@ -1350,6 +1652,35 @@ class TokenEvent(Base):
     actor = relationship('User', foreign_keys=[actor_user_id])
 
 
+class TokenCounter(Base):
+    """Cuántos usuarios, formatos, movimientos y vínculos hay, ya contados.
+
+    Una fila por entidad con la cantidad a la fecha de la última
+    reconciliación o compactación. Lo ocurrido después está en
+    `token_counter_deltas`; cantidad + suma de deltas = conteo exacto.
+    Ver `app.core.token_counters`.
+    """
+    __tablename__ = 'token_counters'
+
+    entidad         = Column(String(20), primary_key=True)   # usuarios|formatos|movimientos|vinculos
+    cantidad        = Column(BigInteger, nullable=False, default=0)
+    reconciliado_en = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+
+class TokenCounterDelta(Base):
+    """+n / -n por cada sentencia que inserta o borra en las tablas contadas.
+
+    Las escriben triggers de la BD (no el ORM), así que cuentan también los
+    borrados en bloque, el SQL a mano y el otro backend. Solo se agregan
+    filas; la compactación las suma al contador y las borra.
+    """
+    __tablename__ = 'token_counter_deltas'
+
+    id      = Column(BigInteger, primary_key=True, autoincrement=True)
+    entidad = Column(String(20), nullable=False)
+    delta   = Column(BigInteger, nullable=False)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # AVISOS EMERGENTES CONFIGURABLES (Feature #55)
 # Un formato puede tener hasta 5 avisos que se disparan en distintos momentos
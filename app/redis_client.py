@@ -4,6 +4,9 @@ import os
 from typing import Optional
 from dotenv import load_dotenv
 import logging
+
+from app.core import metrics
+
 logger = logging.getLogger(__name__)
 
 # Carga variables del archivo .env
@@ -17,24 +20,33 @@ class RedisClient:
         self.host = os.getenv('REDIS_HOST', 'localhost')
         self.port = int(os.getenv('REDIS_PORT', '6379'))
         self.password = os.getenv('REDIS_PASSWORD') or None
-        self.client = None
-        self._connect()
+        # La conexión se abre en el primer uso, no al importar: con Redis lento
+        # o caído, importar la app ya no espera el timeout de conexión.
+        self._client = None
+        self._connected = False
+
+    @property
+    def client(self):
+        if not self._connected:
+            self._connected = True
+            self._connect()
+        return self._client
     
     def _connect(self):
         """Conecta a Redis"""
         try:
-            self.client = redis.Redis(
+            self._client = redis.Redis(
                 host=self.host,
                 port=self.port,
                 password=self.password,
                 decode_responses=True,
                 socket_connect_timeout=5
             )
-            self.client.ping()
+            self._client.ping()
             logger.info(f"✓ Redis conectado en {self.host}:{self.port}")
         except Exception as e:
             logger.error(f"✗ Error conectando a Redis: {e}")
-            self.client = None
+            self._client = None
     
     def check_connection(self) -> bool:
         """Verifica si Redis está conectado"""
@@ -50,10 +62,13 @@ class RedisClient:
         """Obtiene valor de Redis"""
         if not self.client:
             return None
+        prefix = metrics.key_prefix(key)
         try:
             value = self.client.get(key)
+            metrics.CACHE_REQUESTS.labels(prefix, "hit" if value else "miss").inc()
             return json.loads(value) if value else None
         except Exception as e:
+            metrics.CACHE_REQUESTS.labels(prefix, "error").inc()
             logger.error(f"Error getting key '{key}': {e}")
             return None
     
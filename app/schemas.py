@@ -1598,9 +1598,11 @@ class ConsultantResponseRow(BaseModel):
 
 class ConsultantResponsesPage(BaseModel):
     items: List[ConsultantResponseRow]
-    total: int
+    # None si no se contó (paginación por cursor sin include_total).
+    total: Optional[int] = None
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 
 class ConsultantAssignmentBulkRule(BaseModel):
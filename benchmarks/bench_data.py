@@ -0,0 +1,358 @@
+"""Datos sintéticos para los benchmarks (benchmarks/flows.py).
+
+Llena una BD de Postgres VACÍA y dedicada con volúmenes parecidos a los de
+producción: usuarios, formatos con repetidor y un campo condicional, sus
+preguntas, cadenas de aprobación (secuenciales y paralelas), respuestas con
+sus answers y aprobaciones en todos los estados, programaciones y
+movimientos. Con la misma semilla y la misma escala sale siempre lo mismo,
+así que dos corridas en commits distintos miden sobre datos idénticos.
+
+Se inserta en bloque por Core (sin eventos del ORM); lo que esos eventos
+mantendrían (bandeja de aprobación, rollups, contadores de tokens) se
+reconstruye al final con las mismas funciones que usan las tareas nocturnas.
+
+Borra TODO el esquema `public` antes de sembrar: solo corre contra una BD
+cuyo nombre contenga "bench" (o con BENCH_ALLOW_ANY_DB=1).
+
+    DATABASE_URL=postgresql://.../forms_bench python -m benchmarks.bench_data --scale small
+"""
+
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import insert, text, update
+from sqlalchemy.orm import Session
+
+from app.core import token_counters
+from app.core.approval_inbox import rebuild_approval_inbox
+from app.core.response_rollups import rebuild_rollups
+from app.core.security import hash_password
+from app.models import (
+    Answer, ApprovalStatus, Base, Form, FormApproval, FormatType, FormModerators,
+    FormMovimientos, FormQuestion, FormSchedule, Question, QuestionType, Response,
+    ResponseApproval, ResponseStatus, User, UserType, answer_value_date, answer_value_num,
+)
+
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    "small":  {"users": 200,    "forms": 20,  "responses_per_form": 50,  "movimientos": 5},
+    "medium": {"users": 2_000,  "forms": 100, "responses_per_form": 200, "movimientos": 20},
+    "large":  {"users": 10_000, "forms": 300, "responses_per_form": 500, "movimientos": 50},
+}
+
+# Objetos que create_all no crea (secuencias, triggers) y que el código usa.
+_MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+_SCHEMA_EXTRAS = ("2026-10-19_change_events.sql", "2026-10-19_token_counters.sql",
+                  "2026-10-19_relation_question_rule_notify_on_trigger.sql")
+
+_BATCH = 5_000
+
+_TEXTOS = ("Sin novedad", "Revisado", "Pendiente de ajuste", "Conforme", "Observación menor",
+           "Se corrige en sitio", "Cumple", "No aplica")
+
+
+def check_database(engine) -> None:
+    """Aborta si la BD no parece una de benchmarks: sembrar la borra entera."""
+    name = engine.url.database or ""
+    if "bench" not in name and os.getenv("BENCH_ALLOW_ANY_DB") != "1":
+        raise SystemExit(
+            f"La BD '{name}' no parece de benchmarks (el nombre debe contener 'bench'). "
+            "Sembrar borra todo su esquema; usá BENCH_ALLOW_ANY_DB=1 si de verdad es desechable."
+        )
+
+
+def reset_schema(engine) -> None:
+    """Esquema vacío: create_all + los objetos que solo vienen de migraciones."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+        conn.exec_driver_sql("CREATE SCHEMA public")
+    Base.metadata.create_all(bind=engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in _SCHEMA_EXTRAS:
+            conn.exec_driver_sql((_MIGRATIONS_DIR / name).read_text(encoding="utf-8"))
+
+
+def _insert(connection, model, rows: List[dict], returning: bool = False) -> List[int]:
+    """Inserta por lotes; con `returning`, los ids en el orden de `rows`."""
+    ids: List[int] = []
+    for start in range(0, len(rows), _BATCH):
+        chunk = rows[start:start + _BATCH]
+        if returning:
+            stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+            ids.extend(connection.execute(stmt, chunk).scalars())
+        else:
+            connection.execute(insert(model), chunk)
+    return ids
+
+
+def _element_id() -> str:
+    return str(uuid.UUID(int=_rng.getrandbits(128)))
+
+
+# Generador único del módulo para que los uuid del diseño también sean
+# reproducibles; `seed()` lo reinicia con la semilla pedida.
+_rng = random.Random(0)
+
+
+def _form_spec(form_index: int) -> List[dict]:
+    """Campos de un formato: (etiqueta, tipo, opciones, rol en el diseño)."""
+    fields = [
+        {"label": f"Responsable F{form_index}", "qtype": QuestionType.text},
+        {"label": f"Observaciones F{form_index}", "qtype": QuestionType.text},
+        {"label": f"Ubicación F{form_index}", "qtype": QuestionType.text},
+        {"label": f"Cantidad F{form_index}", "qtype": QuestionType.number},
+        {"label": f"Valor F{form_index}", "qtype": QuestionType.number},
+        {"label": f"Fecha inspección F{form_index}", "qtype": QuestionType.date},
+        {"label": f"Estado F{form_index}", "qtype": QuestionType.one_choice,
+         "options": ["Bueno", "Regular", "Malo"]},
+        {"label": f"¿Hubo hallazgos? F{form_index}", "qtype": QuestionType.one_choice,
+         "options": ["Sí", "No"], "condition_source": True},
+        {"label": f"Detalle hallazgo F{form_index}", "qtype": QuestionType.text, "conditional": True},
+    ]
+    repeater = [
+        {"label": f"Ítem F{form_index}", "qtype": QuestionType.text, "in_repeater": True},
+        {"label": f"Cantidad ítem F{form_index}", "qtype": QuestionType.number, "in_repeater": True},
+        {"label": f"Fecha ítem F{form_index}", "qtype": QuestionType.date, "in_repeater": True},
+    ]
+    return fields + repeater
+
+
+def _design(fields: List[dict], repeater_id: str) -> list:
+    """form_design como lo arma el diseñador: campos sueltos + un repetidor."""
+    item_type = {QuestionType.text: "input", QuestionType.number: "input",
+                 QuestionType.date: "date", QuestionType.one_choice: "select"}
+    source = next(f for f in fields if f.get("condition_source"))
+    design, children = [], []
+    for f in fields:
+        props = {"label": f["label"], "required": False, "space": 6}
+        if f.get("options"):
+            props["options"] = f["options"]
+        if f.get("conditional"):
+            props.update({"hidden": True,
+                          "condiciones": [{"condicion": f"question-{source['question_id']}", "valor": "Sí"}]})
+        item = {"id": f["element_id"], "type": item_type[f["qtype"]],
+                "linkExternalId": f["question_id"], "id_question": f["question_id"], "props": props}
+        (children if f.get("in_repeater") else design).append(item)
+    design.append({"id": repeater_id, "type": "repeater",
+                   "props": {"label": "Ítems", "minItems": 0, "maxItems": 99, "addButtonText": "Agregar"},
+                   "children": children})
+    return design
+
+
+def _answer_text(field: dict, row: int = 0) -> str:
+    qtype = field["qtype"]
+    if qtype == QuestionType.number:
+        return str(_rng.randint(1, 5_000))
+    if qtype == QuestionType.date:
+        return (datetime(2026, 1, 1) + timedelta(days=_rng.randint(0, 290))).strftime("%Y-%m-%d")
+    if field.get("options"):
+        return _rng.choice(field["options"])
+    return f"{_rng.choice(_TEXTOS)} {row + 1}"
+
+
+def _answer_row(response_id: int, field: dict, value: str, **extra) -> dict:
+    row = {
+        "response_id": response_id,
+        "question_id": field["question_id"],
+        "answer_text": value,
+        "form_design_element_id": field["element_id"],
+        "value_num": answer_value_num(value),
+        "value_date": answer_value_date(value),
+        "repeated_id": None,
+        "repeater_row_index": None,
+    }
+    row.update(extra)
+    return row
+
+
+def seed(db: Session, scale: str = "small", seed_value: int = 42) -> Dict[str, int]:
+    """Siembra la escala pedida. Devuelve cuántas filas quedaron por tabla."""
+    global _rng
+    _rng = random.Random(seed_value)
+    sizes = SCALES[scale]
+    connection = db.connection()
+    now = datetime.now(timezone.utc)
+    # Todos entran con la contraseña "bench".
+    password = hash_password("bench")
+
+    # ── Usuarios: 1 admin, ~2% creadores, el resto diligenciadores ──────────
+    users = [{"num_document": "1000000000", "name": "Admin Bench", "email": "admin@bench.invalid",
+              "telephone": "3000000000", "user_type": UserType.admin, "password": password,
+              "created_at": now - timedelta(days=400)}]
+    for i in range(1, sizes["users"]):
+        users.append({
+            "num_document": str(1_000_000_000 + i), "name": f"Usuario {i}",
+            "email": f"user{i}@bench.invalid", "telephone": f"300{i:07d}",
+            "user_type": UserType.creator if i % 50 == 0 else UserType.user,
+            "password": password, "created_at": now - timedelta(days=_rng.randint(0, 400)),
+        })
+    user_ids = _insert(connection, User, users, returning=True)
+    admin_id, people = user_ids[0], user_ids[1:]
+
+    # ── Formatos, preguntas, vínculos y diseño ──────────────────────────────
+    specs = [_form_spec(i) for i in range(sizes["forms"])]
+    forms = [{
+        "user_id": admin_id, "title": f"Formato bench {i:04d}", "description": "Sintético",
+        "format_type": FormatType.cerrado if i % 3 == 0 else FormatType.abierto,
+        "approval_mode": "parallel" if i % 4 == 0 else "sequential",
+        "is_enabled": True, "form_design": [], "created_at": now - timedelta(days=400),
+    } for i in range(sizes["forms"])]
+    form_ids = _insert(connection, Form, forms, returning=True)
+
+    questions = [
+        {"question_text": f["label"], "question_type": f["qtype"], "required": False,
+         "id_form": form_id, "text_normalized": f["label"].lower()}
+        for form_id, fields in zip(form_ids, specs) for f in fields
+    ]
+    question_ids = iter(_insert(connection, Question, questions, returning=True))
+    for fields in specs:
+        for f in fields:
+            f["question_id"] = next(question_ids)
+            f["element_id"] = _element_id()
+    _insert(connection, FormQuestion, [
+        {"form_id": form_id, "question_id": f["question_id"]}
+        for form_id, fields in zip(form_ids, specs) for f in fields
+    ])
+
+    repeater_ids = {}
+    for form_id, fields in zip(form_ids, specs):
+        repeater_ids[form_id] = _element_id()
+        connection.execute(
+            update(Form).where(Form.id == form_id).values(form_design=_design(fields, repeater_ids[form_id]))
+        )
+
+    # ── Quién diligencia, quién aprueba, programaciones ────────────────────
+    fillers = {form_id: _rng.sample(people, min(len(people), 30)) for form_id in form_ids}
+    _insert(connection, FormModerators, [
+        {"form_id": form_id, "user_id": user_id} for form_id, ids in fillers.items() for user_id in ids
+    ])
+    chains = {form_id: _rng.sample(people, 3 if i % 2 else 2) for i, form_id in enumerate(form_ids)}
+    _insert(connection, FormApproval, [
+        {"form_id": form_id, "user_id": user_id, "sequence_number": seq, "is_mandatory": seq != 3,
+         "deadline_days": 3, "is_active": True}
+        for form_id, chain in chains.items() for seq, user_id in enumerate(chain, start=1)
+    ])
+    schedules = []
+    for form_id, ids in fillers.items():
+        for user_id in ids[:10]:
+            kind = _rng.choice(("daily", "weekly", "monthly", "interval", "specific"))
+            schedules.append({
+                "form_id": form_id, "user_id": user_id, "frequency_type": kind, "status": True,
+                "repeat_days": json.dumps(_rng.sample(["monday", "wednesday", "friday"], 2))
+                if kind == "weekly" else None,
+                "interval_days": _rng.randint(2, 10) if kind == "interval" else None,
+                "specific_date": now.replace(tzinfo=None) + timedelta(days=_rng.randint(-30, 30))
+                if kind in ("monthly", "specific") else None,
+            })
+    _insert(connection, FormSchedule, schedules)
+
+    # ── Respuestas, answers y aprobaciones ──────────────────────────────────
+    statuses = (ResponseStatus.submitted, ResponseStatus.approved, ResponseStatus.rejected, ResponseStatus.draft)
+    responses, plan = [], []
+    sequence = 0
+    for form_id in form_ids:
+        for _ in range(sizes["responses_per_form"]):
+            sequence += 1
+            status = _rng.choices(statuses, weights=(60, 25, 5, 10))[0]
+            submitted_at = now - timedelta(days=_rng.randint(0, 365), minutes=_rng.randint(0, 1440))
+            responses.append({"form_id": form_id, "user_id": _rng.choice(fillers[form_id]), "mode": "online",
+                              "mode_sequence": sequence, "submitted_at": submitted_at, "status": status})
+            plan.append((form_id, status, submitted_at))
+    response_ids = _insert(connection, Response, responses, returning=True)
+
+    answers, approvals = [], []
+    specs_by_form = dict(zip(form_ids, specs))
+    for response_id, (form_id, status, submitted_at) in zip(response_ids, plan):
+        fields = specs_by_form[form_id]
+        hallazgo = None
+        for f in fields:
+            if f.get("in_repeater"):
+                continue
+            if f.get("conditional") and hallazgo != "Sí":
+                continue
+            value = _answer_text(f)
+            if f.get("condition_source"):
+                hallazgo = value
+            answers.append(_answer_row(response_id, f, value))
+        repeater = [f for f in fields if f.get("in_repeater")]
+        for row in range(_rng.randint(0, 4)):
+            for f in repeater:
+                answers.append(_answer_row(response_id, f, _answer_text(f, row),
+                                           repeated_id=repeater_ids[form_id], repeater_row_index=row))
+
+        if status == ResponseStatus.draft:
+            continue
+        chain = chains[form_id]
+        if status == ResponseStatus.approved:
+            outcome = [ApprovalStatus.aprobado] * len(chain)
+        elif status == ResponseStatus.rejected:
+            outcome = [ApprovalStatus.aprobado] + [ApprovalStatus.rechazado] + \
+                [ApprovalStatus.pendiente] * (len(chain) - 2)
+        else:
+            done = _rng.randint(0, len(chain) - 1)
+            outcome = [ApprovalStatus.aprobado] * done + [ApprovalStatus.pendiente] * (len(chain) - done)
+        for seq, (user_id, result) in enumerate(zip(chain, outcome), start=1):
+            reviewed = result != ApprovalStatus.pendiente
+            approvals.append({
+                "response_id": response_id, "user_id": user_id, "sequence_number": seq,
+                "is_mandatory": seq != 3, "status": result,
+                "reviewed_at": submitted_at + timedelta(hours=seq * 6) if reviewed else None,
+                "message": "Revisado" if reviewed else None,
+            })
+    _insert(connection, Answer, answers)
+    _insert(connection, ResponseApproval, approvals)
+
+    # ── Movimientos: agrupan 2-4 formatos y sus campos numéricos ───────────
+    movimientos = []
+    for i in range(sizes["movimientos"]):
+        chosen = _rng.sample(form_ids, min(len(form_ids), _rng.randint(2, 4)))
+        q_ids = [f["question_id"] for form_id in chosen for f in specs_by_form[form_id]
+                 if not f.get("in_repeater")]
+        movimientos.append({
+            "user_id": admin_id, "title": f"Movimiento bench {i:03d}", "description": "Sintético",
+            "form_ids": chosen, "question_ids": q_ids, "alias_groups": [], "form_aliases": [],
+            "allowed_user_ids": [], "is_enabled": True,
+        })
+    _insert(connection, FormMovimientos, movimientos)
+    db.commit()
+
+    # Lo que mantienen los eventos del ORM, que la inserción en bloque no dispara.
+    rebuild_approval_inbox(db)
+    rebuild_rollups(db)
+    token_counters.reconciliar(db)
+    connection = db.connection()
+    connection.execute(text("ANALYZE"))
+    db.commit()
+
+    return {
+        "users": len(users), "forms": len(forms), "questions": len(questions),
+        "responses": len(responses), "answers": len(answers), "response_approvals": len(approvals),
+        "form_schedules": len(schedules), "movimientos": len(movimientos),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Siembra una BD de benchmarks.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    check_database(engine)
+    inicio = time.perf_counter()
+    reset_schema(engine)
+    with SessionLocal() as _db:
+        filas = seed(_db, args.scale, args.seed)
+    print(f"bench_data ({args.scale}, semilla {args.seed}, {time.perf_counter() - inicio:.1f}s): {filas}")
@@ -0,0 +1,364 @@
+"""Benchmarks de los flujos principales, para comparar entre commits.
+
+No había forma de saber si un cambio hacía más lento algo. Esto mide, contra
+una BD sembrada con benchmarks/bench_data.py:
+
+  · submit_response      crear la respuesta y guardar sus answers (dos POST);
+  · form_design_<aud>    GET /forms/{id}/form_design por audiencia;
+  · approvals_inbox      bandeja de aprobación de un aprobador con pendientes;
+  · movimiento           consolidado paginado de un movimiento;
+  · export_excel/pdf     exporte de todas las respuestas de un formato;
+  · job_<nombre>         lo que corren las tareas nocturnas.
+
+Los endpoints se llaman por HTTP (TestClient, con token real), así que se mide
+también autenticación, middlewares y serialización. Cada escenario hace una
+vuelta de calentamiento y luego `--rounds` vueltas; se guarda mínimo, mediana,
+media, máximo, desviación y cuántas consultas SQL hizo (`query_stats`).
+Un escenario que falla queda con su error y no detiene a los demás.
+
+El SMTP se reemplaza por un envío nulo: se mide el código, no el servidor de
+correo (y no sale ningún correo a las direcciones sintéticas).
+
+    python -m benchmarks.bench_data --scale small          # una vez
+    python -m benchmarks.flows run --out antes.json
+    python -m benchmarks.flows run --out despues.json  # tras el cambio (y resembrar)
+    python -m benchmarks.flows compare antes.json despues.json
+
+`compare` sale con código 1 si algún escenario empeoró más que `--threshold`.
+`submit_response` agrega respuestas: para comparar justo, resembrar antes de
+cada corrida.
+"""
+
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUNDS = 5
+DEFAULT_THRESHOLD = 0.10
+
+_SCENARIOS: Dict[str, Callable] = {}
+
+
+def scenario(name: str):
+    """Registra un escenario: una función (contexto) → un request o trabajo."""
+    def decorator(func_):
+        _SCENARIOS[name] = func_
+        return func_
+    return decorator
+
+
+class BenchError(Exception):
+    pass
+
+
+class Context:
+    """Lo que necesitan los escenarios: cliente, sesión y los ids de muestra."""
+
+    def __init__(self, db: Session):
+        from fastapi.testclient import TestClient
+
+        import main
+        from app.core.security import create_access_token
+        from app.models import ApprovalInbox, Form, FormMovimientos, Response, User, UserType
+
+        self.db = db
+        self.client = TestClient(main.app)
+        self._token = create_access_token
+
+        self.admin = db.scalars(select(User).where(User.user_type == UserType.admin).order_by(User.id)).first()
+        if self.admin is None:
+            raise BenchError("BD sin sembrar: corré primero python -m benchmarks.bench_data")
+        # El formato de muestra es el primero: cerrado, con cadena de aprobación.
+        self.form = db.scalars(select(Form).order_by(Form.id)).first()
+        self.filler = db.get(User, db.scalar(
+            select(Response.user_id).where(Response.form_id == self.form.id).order_by(Response.id)
+        ))
+        # El aprobador con más pendientes.
+        self.approver = db.get(User, db.scalar(
+            select(ApprovalInbox.user_id).group_by(ApprovalInbox.user_id)
+            .order_by(func.count().desc(), ApprovalInbox.user_id).limit(1)
+        ))
+        self.movimiento_id = db.scalar(select(FormMovimientos.id).order_by(FormMovimientos.id))
+
+    def headers(self, user) -> dict:
+        return {"Authorization": f"Bearer {self._token({'sub': user.email})}"}
+
+    def get(self, path: str, user, **params):
+        return _check(self.client.get(path, headers=self.headers(user), params=params))
+
+    def post(self, path: str, user, body, **params):
+        return _check(self.client.post(path, headers=self.headers(user), json=body, params=params))
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise BenchError(f"{response.request.method} {response.request.url.path} → "
+                         f"{response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _fields(design: list):
+    """(elemento, repetidor) de cada campo del diseño, en orden."""
+    for item in design or []:
+        if item.get("type") == "repeater":
+            for child in item.get("children") or []:
+                yield child, item["id"]
+        elif item.get("linkExternalId"):
+            yield item, None
+
+
+def _sample_value(item: dict) -> str:
+    options = (item.get("props") or {}).get("options")
+    if options:
+        return options[0]
+    if item.get("type") == "date":
+        return "2026-10-19"
+    return "123"
+
+
+# ── Escenarios ──────────────────────────────────────────────────────────────
+
+@scenario("submit_response")
+def submit_response(ctx: Context):
+    fields = list(_fields(ctx.form.form_design))
+    created = ctx.post(
+        f"/responses/save-response/{ctx.form.id}", ctx.filler,
+        [{"question_id": item["linkExternalId"], "response": _sample_value(item)} for item, _ in fields],
+        action="send_and_close",
+    ).json()
+    answers = []
+    for item, repeater_id in fields:
+        answers.append({
+            "response_id": created["response_id"],
+            "question_id": item["linkExternalId"],
+            "answer_text": _sample_value(item),
+            "form_design_element_id": item["id"],
+            "repeated_id": repeater_id,
+            "repeater_row_index": 0 if repeater_id else None,
+        })
+    ctx.post("/responses/save-answers/", ctx.filler, answers, action="send_and_close")
+
+
+def _form_design(audience: Optional[str]):
+    def run(ctx: Context):
+        params = {"audience": audience} if audience else {}
+        ctx.get(f"/forms/{ctx.form.id}/form_design", ctx.admin, **params)
+    return run
+
+
+for _audience in ("design", "fill", "approve", "view"):
+    scenario(f"form_design_{_audience}")(_form_design(None if _audience == "design" else _audience))
+
+
+@scenario("approvals_inbox")
+def approvals_inbox(ctx: Context):
+    ctx.get("/forms/user/assigned-forms-with-responses", ctx.approver, page=1, page_size=20)
+
+
+@scenario("movimiento")
+def movimiento(ctx: Context):
+    ctx.get(f"/forms/movimientos/{ctx.movimiento_id}/answers", ctx.admin, page=1, page_size=50)
+
+
+@scenario("export_excel")
+def export_excel(ctx: Context):
+    ctx.get(f"/forms/{ctx.form.id}/questions-answers/excel/all-users", ctx.admin)
+
+
+@scenario("export_pdf")
+def export_pdf(ctx: Context):
+    ctx.get(f"/users/{ctx.form.id}/questions-answers/pdf/all-users", ctx.admin)
+
+
+@scenario("job_daily_schedule")
+def job_daily_schedule(ctx: Context):
+    from app.crud import get_response_details_logic, get_schedules_by_frequency
+
+    get_schedules_by_frequency(ctx.db)
+    get_response_details_logic(ctx.db)
+
+
+@scenario("job_approval_inbox_rebuild")
+def job_approval_inbox_rebuild(ctx: Context):
+    from app.core.approval_inbox import rebuild_approval_inbox
+
+    rebuild_approval_inbox(ctx.db)
+
+
+@scenario("job_rollups_rebuild")
+def job_rollups_rebuild(ctx: Context):
+    from app.core.response_rollups import rebuild_rollups
+
+    rebuild_rollups(ctx.db)
+
+
+@scenario("job_token_counters_reconcile")
+def job_token_counters_reconcile(ctx: Context):
+    from app.core import token_counters
+
+    token_counters.reconciliar(ctx.db)
+
+
+# ── Corrida y comparación ───────────────────────────────────────────────────
+
+def _disable_smtp() -> None:
+    from app.api.controllers import mail
+
+    mail._send_msg = lambda msg: True
+    mail._send_msgs = lambda msgs: len(msgs)
+
+
+def _measure(func_: Callable, ctx: Context, rounds: int) -> dict:
+    from app.core import query_stats
+
+    func_(ctx)  # calentamiento
+    times, queries = [], []
+    for _ in range(rounds):
+        with query_stats.collect() as stats:
+            start = time.perf_counter()
+            func_(ctx)
+            times.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.count)
+        ctx.db.rollback()
+    return {
+        "rounds": rounds,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(max(times), 3),
+        "stdev_ms": round(statistics.stdev(times), 3) if rounds > 1 else 0.0,
+        "queries": int(statistics.median(queries)),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _dataset(db: Session) -> dict:
+    from app.models import Answer, Form, Response, User
+
+    return {model.__tablename__: db.scalar(select(func.count()).select_from(model))
+            for model in (User, Form, Response, Answer)}
+
+
+def run(db: Session, only: Optional[List[str]] = None, rounds: int = DEFAULT_ROUNDS) -> dict:
+    """Corre los escenarios (todos o los de `only`) y devuelve el resultado."""
+    from app.redis_client import redis_client
+
+    names = only or list(_SCENARIOS)
+    unknown = set(names) - set(_SCENARIOS)
+    if unknown:
+        raise BenchError(f"Escenarios desconocidos: {sorted(unknown)}")
+
+    _disable_smtp()
+    ctx = Context(db)
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            # Con Redis algunos endpoints miden el caché, no la consulta.
+            "redis": redis_client.check_connection(),
+            "dataset": _dataset(db),
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        try:
+            result["scenarios"][name] = _measure(_SCENARIOS[name], ctx, rounds)
+            logger.info("%-30s %10.1f ms  %5d consultas", name,
+                        result["scenarios"][name]["median_ms"], result["scenarios"][name]["queries"])
+        except Exception as e:
+            db.rollback()
+            result["scenarios"][name] = {"error": f"{type(e).__name__}: {e}"[:500]}
+            logger.warning("%-30s falló: %s", name, e)
+    return result
+
+
+def compare(old: dict, new: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """Una fila por escenario con la mediana antes/después y si empeoró."""
+    rows = []
+    for name in sorted(set(old["scenarios"]) | set(new["scenarios"])):
+        before, after = old["scenarios"].get(name, {}), new["scenarios"].get(name, {})
+        if "median_ms" not in before or "median_ms" not in after:
+            rows.append({"scenario": name, "status": "sin dato"})
+            continue
+        change = (after["median_ms"] - before["median_ms"]) / before["median_ms"] if before["median_ms"] else 0.0
+        if change > threshold:
+            status = "más lento"
+        elif change < -threshold:
+            status = "más rápido"
+        else:
+            status = "igual"
+        rows.append({
+            "scenario": name, "status": status, "change": change,
+            "before_ms": before["median_ms"], "after_ms": after["median_ms"],
+            "before_queries": before.get("queries"), "after_queries": after.get("queries"),
+        })
+    return rows
+
+
+def _print_comparison(rows: List[dict], old: dict, new: dict) -> None:
+    print(f"{old['meta'].get('commit')} → {new['meta'].get('commit')}")
+    if old["meta"].get("dataset") != new["meta"].get("dataset"):
+        print(f"OJO: los datos no son los mismos ({old['meta'].get('dataset')} vs {new['meta'].get('dataset')})")
+    for row in rows:
+        if "change" not in row:
+            print(f"  {row['scenario']:<30} {row['status']}")
+            continue
+        print(f"  {row['scenario']:<30} {row['before_ms']:>10.1f} → {row['after_ms']:>10.1f} ms "
+              f"({row['change']:+.0%})  consultas {row['before_queries']} → {row['after_queries']}  "
+              f"{row['status']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks de los flujos principales.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="corre los escenarios y guarda el JSON")
+    run_parser.add_argument("--out", required=True)
+    run_parser.add_argument("--only", help="escenarios separados por coma: " + ", ".join(_SCENARIOS))
+    run_parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    compare_parser = commands.add_parser("compare", help="compara dos JSON de `run`")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "run":
+        from benchmarks.bench_data import check_database
+        from app.database import SessionLocal, engine
+
+        # `submit_response` escribe: solo contra la BD de benchmarks.
+        check_database(engine)
+        with SessionLocal() as _db:
+            _result = run(_db, args.only.split(",") if args.only else None, args.rounds)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(_result, fh, indent=2, ensure_ascii=False)
+        print(f"benchmarks: {len(_result['scenarios'])} escenarios → {args.out}")
+    else:
+        with open(args.old, encoding="utf-8") as fh:
+            _old = json.load(fh)
+        with open(args.new, encoding="utf-8") as fh:
+            _new = json.load(fh)
+        _rows = compare(_old, _new, args.threshold)
+        _print_comparison(_rows, _old, _new)
+        sys.exit(1 if any(row["status"] == "más lento" for row in _rows) else 0)
@@ -0,0 +1,122 @@
+"""Microbenchmark: requests/s de una ruta trivial con cada middleware.
+
+Compara, sobre una app mínima con `GET /ping` → `{"ok": true}`:
+
+  · sin_middleware          la base;
+  · cabeceras_basehttp      las cabeceras de seguridad como estaban
+                            (`@app.middleware("http")`, BaseHTTPMiddleware);
+  · cabeceras_asgi          SecurityHeadersMiddleware sin Server-Timing;
+  · cabeceras_asgi_timing   SecurityHeadersMiddleware con Server-Timing.
+
+Los requests se le pasan a la app ASGI directamente, en el mismo proceso y sin
+servidor ni sockets: lo que cambia entre variantes es solo el middleware.
+No toca la BD.
+
+    python -m benchmarks.middleware_bench
+    python -m benchmarks.middleware_bench --requests 50000 --repeat 5
+"""
+
+import asyncio
+import statistics
+import time
+from typing import Callable, Dict
+
+from fastapi import FastAPI
+
+from app.core.security_headers import _SECURITY_HEADERS, SecurityHeadersMiddleware
+
+DEFAULT_REQUESTS = 20000
+DEFAULT_REPEAT = 3
+
+
+def _base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return app
+
+
+def _basehttp_app() -> FastAPI:
+    """La versión anterior de main.py: BaseHTTPMiddleware con las mismas cabeceras."""
+    app = _base_app()
+    headers = {name.decode(): value.decode() for name, value in _SECURITY_HEADERS}
+
+    @app.middleware("http")
+    async def add_security_headers(request, call_next):
+        response = await call_next(request)
+        for name, value in headers.items():
+            response.headers[name] = value
+        return response
+
+    return app
+
+
+def _asgi_app(server_timing: bool) -> FastAPI:
+    app = _base_app()
+    app.add_middleware(SecurityHeadersMiddleware, server_timing=server_timing)
+    return app
+
+
+VARIANTS: Dict[str, Callable[[], FastAPI]] = {
+    "sin_middleware": _base_app,
+    "cabeceras_basehttp": _basehttp_app,
+    "cabeceras_asgi": lambda: _asgi_app(server_timing=False),
+    "cabeceras_asgi_timing": lambda: _asgi_app(server_timing=True),
+}
+
+_SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+    "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+}
+
+
+async def _one(app) -> None:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(dict(_SCOPE), receive, send)
+    if status != [200]:
+        raise RuntimeError(f"respuesta inesperada: {status}")
+
+
+async def _rate(app, requests: int) -> float:
+    """Requests por segundo, uno tras otro."""
+    await _one(app)  # arranque (lifespan, construcción de la pila de middlewares)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await _one(app)
+    return requests / (time.perf_counter() - start)
+
+
+def run(requests: int = DEFAULT_REQUESTS, repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """Mediana de requests/s de cada variante en `repeat` corridas."""
+    results = {}
+    for name, factory in VARIANTS.items():
+        app = factory()
+        rates = [asyncio.run(_rate(app, requests)) for _ in range(repeat)]
+        results[name] = statistics.median(rates)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Requests/s de una ruta trivial por middleware.")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+
+    _results = run(args.requests, args.repeat)
+    _base = _results["sin_middleware"]
+    for _name, _rps in _results.items():
+        print(f"{_name:24s} {_rps:9.0f} req/s  ({_rps / _base:6.1%} de la base)")
@@ -0,0 +1,138 @@
+"""Microbenchmark: lo que agrega el filtro global de response_scope por consulta.
+
+`_excluir_respuestas_de_aprobador` corre en cada SELECT del ORM. Esto toma las
+consultas que hacen de verdad unos escenarios de benchmarks/flows.py (se
+corren una vez contra la BD de benchmarks y se guardan las sentencias) y
+mide, sin volver a la BD, lo que cuesta preparar cada una con:
+
+  · sin_filtro   solo la cache key, que la ejecución calcula igual;
+  · anterior     armar `with_loader_criteria(...)` en cada SELECT;
+  · nuevo        el hook actual (criterio prearmado, solo donde aplica).
+
+La cache key es lo que paga la ejecución por el criterio: una sentencia con
+la opción tiene una key más larga, y armarla analiza la lambda.
+
+    python -m benchmarks.bench_data --scale small          # una vez
+    python -m benchmarks.response_scope_bench
+    python -m benchmarks.response_scope_bench --only approvals_inbox --repeat 9
+"""
+
+import logging
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app.core import response_scope
+from app.models import Response
+
+DEFAULT_SCENARIOS = ["approvals_inbox", "movimiento", "form_design_fill"]
+DEFAULT_REPEAT = 7
+_LOOPS = 200
+
+
+def capture(db: Session, names: List[str]) -> Dict[str, list]:
+    """Sentencias SELECT que le llegan al hook en cada escenario (una vuelta)."""
+    from benchmarks import flows
+
+    flows._disable_smtp()
+    ctx = flows.Context(db)
+    captured: Dict[str, list] = {}
+    current: List = []
+
+    def _record(execute_state):
+        if (execute_state.is_select and not execute_state.is_column_load
+                and not execute_state.is_relationship_load
+                and not execute_state.execution_options.get(response_scope._OPT_IN)):
+            current.append(execute_state.statement)
+
+    # Antes del filtro: se guarda la sentencia tal como la escribió el código.
+    event.listen(Session, "do_orm_execute", _record, insert=True)
+    try:
+        for name in names:
+            flows._SCENARIOS[name](ctx)  # calentamiento (cachés de la app)
+            db.rollback()
+            current.clear()
+            flows._SCENARIOS[name](ctx)
+            db.rollback()
+            captured[name] = list(current)
+    finally:
+        event.remove(Session, "do_orm_execute", _record)
+    return captured
+
+
+def _sin_filtro(statement):
+    return statement
+
+
+def _anterior(statement):
+    return statement.options(with_loader_criteria(
+        Response, lambda cls: cls.parent_response_id.is_(None), include_aliases=True,
+    ))
+
+
+def _nuevo(statement):
+    if response_scope._criterio_aplica(statement):
+        return statement.options(response_scope._SOLO_DILIGENCIAMIENTOS)
+    return statement
+
+
+VARIANTS: Dict[str, Callable] = {
+    "sin_filtro": _sin_filtro,
+    "anterior": _anterior,
+    "nuevo": _nuevo,
+}
+
+
+def _microseconds(variant: Callable, statements: list, repeat: int) -> float:
+    """µs por request (todas sus sentencias), mínimo de `repeat` corridas."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(_LOOPS):
+            for statement in statements:
+                # La cache key queda memorizada en la sentencia: se borra para
+                # medir lo que paga una sentencia recién armada por el código.
+                statement._reset_memoizations()
+                variant(statement)._generate_cache_key()
+        runs.append((time.perf_counter() - start) / _LOOPS * 1e6)
+    return min(runs)
+
+
+def run(db: Session, names: Optional[List[str]] = None, repeat: int = DEFAULT_REPEAT) -> Dict[str, dict]:
+    """Por escenario: consultas, cuántas llevan el filtro y µs de cada variante."""
+    results = {}
+    for name, statements in capture(db, names or DEFAULT_SCENARIOS).items():
+        row = {
+            "consultas": len(statements),
+            "con_filtro": sum(response_scope._criterio_aplica(s) for s in statements),
+        }
+        for variant_name, variant in VARIANTS.items():
+            row[variant_name] = _microseconds(variant, statements, repeat)
+        results[name] = row
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Costo del filtro global de respuestas por request.")
+    parser.add_argument("--only", help="escenarios separados por coma (por defecto: "
+                                       + ", ".join(DEFAULT_SCENARIOS) + ")")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from benchmarks.bench_data import check_database
+    from app.database import SessionLocal, engine
+
+    # Los escenarios son los de flows: solo contra la BD de benchmarks.
+    check_database(engine)
+    with SessionLocal() as _db:
+        _results = run(_db, args.only.split(",") if args.only else None, args.repeat)
+    for _name, _row in _results.items():
+        _base = _row["sin_filtro"]
+        print(f"{_name:20s} {_row['consultas']:4d} consultas ({_row['con_filtro']} con filtro)  "
+              + "  ".join(f"{v} {_row[v]:8.0f} µs (+{_row[v] - _base:5.0f})" for v in VARIANTS))
@@ -1,9 +1,11 @@
+import hmac
 import logging
+import time
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response as _PlainResponse
 from jinja2 import Environment, FileSystemLoader
 from sqlalchemy import text
 from app.api.controllers.mail import send_rule_notification_email
@@ -15,7 +17,19 @@ from app.crud import (
     disable_notification_rule
 )
 
-from app.database import SessionLocal, engine
+from app.core.approval_inbox import rebuild_approval_inbox
+from app.core.answer_lookup import refresh_answer_lookup
+from app.core.response_rollups import rebuild_rollups
+from app.core.change_feed import prune_change_events
+from app.core import token_counters
+from app.core import db_pools
+from app.core import metrics
+from app.core.loop_guard import LoopGuardMiddleware
+from app.core.profiling import ProfilerMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.read_replica import ReadYourWritesMiddleware
+from app.core.security_headers import SecurityHeadersMiddleware
+from app.database import BatchSessionLocal, SessionLocal, all_engines, engine, replica_engine
 from app.models import Base, EmailConfig
 import app.models_audit  # noqa: F401  — registra NotificationSendLog en Base
 from app.api.endpoints import (
@@ -24,6 +38,7 @@ from app.api.endpoints import (
     tokens
 )
 
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.background import BackgroundScheduler
 
 logger = logging.getLogger(__name__)
@@ -46,6 +61,7 @@ app = FastAPI(
 from starlette.exceptions import HTTPException as _StarletteHTTPException
 from starlette.requests import Request as _Request
 from fastapi.exception_handlers import http_exception_handler as _default_http_exception_handler
+from sqlalchemy.exc import OperationalError as _OperationalError, TimeoutError as _PoolTimeoutError
 
 
 @app.exception_handler(_StarletteHTTPException)
@@ -63,6 +79,12 @@ async def _sanitized_http_exception_handler(request: _Request, exc: _StarletteHT
     return await _default_http_exception_handler(request, exc)
 
 
+# Consulta cortada por statement_timeout o pool de conexiones agotado → 503
+# con mensaje claro (ver app/core/db_pools.py); otro error de BD → 500 genérico.
+app.add_exception_handler(_OperationalError, db_pools.db_timeout_handler)
+app.add_exception_handler(_PoolTimeoutError, db_pools.db_timeout_handler)
+
+
 # 1. CORS debe ir primero
 import os
 _default_origins = "https://safemetrics-sfi-dev.service.saferut.com,https://forms.sfisas.com.co,http://localhost:4321"
@@ -94,40 +116,38 @@ app.add_middleware(
     minimum_size=1000
 )
 
-# 3. ✅ SECURITY HEADERS
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
+# 3. ✅ SECURITY HEADERS (+ Server-Timing fuera de producción). ASGI puro:
+#    no envuelve el cuerpo de la respuesta. Ver app/core/security_headers.py.
+app.add_middleware(SecurityHeadersMiddleware)
 
-    # Forzar HTTPS en el navegador por 1 año
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
 
-    # Bloquear embedding en iframes (previene clickjacking)
-    response.headers["X-Frame-Options"] = "DENY"
+# 4. Leer lo propio con réplica: marca al cliente tras una escritura exitosa
+#    para que `get_read_db` le lea del primario. Sin réplica no hace falta.
+#    Ver app/core/read_replica.py.
+if replica_engine is not None:
+    app.add_middleware(ReadYourWritesMiddleware)
 
-    # Evitar que el browser adivine el MIME type
-    response.headers["X-Content-Type-Options"] = "nosniff"
+# 5. Consultas por request (cuenta, tiempo en BD y N+1). Ver app/core/query_stats.py.
+app.add_middleware(QueryStatsMiddleware)
 
-    # No enviar referrer a sitios externos
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+# 6. Métricas Prometheus (latencia por ruta, requests en curso). Va por fuera
+#    de todo lo anterior para medir el request completo. Ver GET /metrics.
+app.add_middleware(metrics.MetricsMiddleware)
+for _engine in all_engines:
+    metrics.instrument_pool(_engine)
 
-    # H-BW-012: X-XSS-Protection deprecado — removido. CSP cubre este caso.
+# 7. Consultas SQL en el event loop (endpoints async con sesión síncrona):
+#    WARNING, o error con LOOP_GUARD=raise. Ver app/core/loop_guard.py.
+app.add_middleware(LoopGuardMiddleware)
 
-    # No permitir acceso a cámara, micrófono, geolocation, etc.
-    response.headers["Permissions-Policy"] = "camera=(), microphone=(), geolocation=()"
+# 8. Quién tiene las conexiones cuando un pool se agota (log con la ruta).
+#    Ver app/core/db_pools.py.
+app.add_middleware(db_pools.PoolWatchMiddleware)
 
-    # Content Security Policy — ajusta los dominios a los tuyos
-    response.headers["Content-Security-Policy"] = (
-        "default-src 'self'; "
-        "script-src 'self'; "
-        "style-src 'self'; "
-        "img-src 'self' data: https:; "
-        "font-src 'self'; "
-        "connect-src 'self' https://app.safemetrics.co https://forms.sfisas.com.co; "
-        "frame-ancestors 'none';"
-    )
+# 9. Perfilado bajo demanda (solo requests con X-Profile firmado). Es el más
+#    externo para muestrear el request entero. Ver app/core/profiling.py.
+app.add_middleware(ProfilerMiddleware)
 
-    return response
 # ========================================
 # CONFIGURACIÓN DE TEMPLATES
 # ========================================
@@ -230,6 +250,18 @@ def health_check():
     }
     return JSONResponse(content=body, status_code=200 if healthy else 503)
 
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: _Request):
+    """Métricas en formato Prometheus (HTTP, pool de BD, Redis, jobs, correo,
+    exportes). Ver app/core/metrics.py. Con METRICS_TOKEN definida exige
+    `Authorization: Bearer <token>`."""
+    if metrics.METRICS_TOKEN:
+        sent = request.headers.get("authorization", "")
+        if not hmac.compare_digest(sent, f"Bearer {metrics.METRICS_TOKEN}"):
+            return JSONResponse(content={"detail": "No autorizado"}, status_code=401)
+    return _PlainResponse(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 # ========================================
 # SCHEDULER PARA TAREAS PROGRAMADAS
 # ========================================
@@ -247,13 +279,23 @@ def daily_schedule_task():
     """Obtiene los registros activos para el día actual y ejecuta la lógica necesaria."""
     logger.info("⏳ Ejecutando tarea diaria de formularios programados...")
 
-    db = SessionLocal()
+    db = BatchSessionLocal()
     try:
+        inicio = time.perf_counter()
         schedules = get_schedules_by_frequency(db)
-        logger.info(f"📆 Registros obtenidos para hoy: {len(schedules)}")
+        logger.info(
+            f"📆 Registros obtenidos para hoy: {len(schedules)} "
+            f"({time.perf_counter() - inicio:.2f}s)"
+        )
 
+        inicio = time.perf_counter()
         response_details = get_response_details_logic(db)
-        logger.info(f"📌 Detalles de respuestas obtenidos: {len(response_details)}")
+        aprobaciones_vencidas = sum(len(r["aprobaciones"]) for r in response_details)
+        logger.info(
+            f"📌 Aprobaciones vencidas ayer: {aprobaciones_vencidas} "
+            f"en {len(response_details)} respuestas "
+            f"({time.perf_counter() - inicio:.2f}s)"
+        )
 
     except Exception as e:
         logger.error(f"⚠️ Error en la tarea diaria de formularios: {str(e)}")
@@ -309,7 +351,7 @@ def notification_rules_task():
     logger.info("⏰ Ejecutando tarea de notificaciones de reglas...")
     logger.info("="*60)
 
-    db = SessionLocal()
+    db = BatchSessionLocal()
     emails_sent = 0
     emails_failed = 0
     
@@ -391,6 +433,99 @@ def notification_rules_task():
         db.close()
 
 
+def approval_inbox_rebuild_task():
+    """Rehace la bandeja de aprobación completa.
+
+    El día a día la mantiene al escribir cada aprobación; esto recoge lo que
+    haya escrito otro backend sobre la misma BD.
+    """
+    db = BatchSessionLocal()
+    try:
+        inicio = time.perf_counter()
+        filas = rebuild_approval_inbox(db)
+        logger.info(f"📥 Bandeja de aprobación reconstruida: {filas} filas ({time.perf_counter() - inicio:.2f}s)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error reconstruyendo la bandeja de aprobación: {str(e)}")
+    finally:
+        db.close()
+
+
+def answer_lookup_refresh_task():
+    """Rehace los índices de autocompletado ya armados.
+
+    Las respuestas nuevas de otro backend se indexan solas al leer; esto recoge
+    las que ese otro backend haya EDITADO. Se siguen leyendo mientras tanto.
+    """
+    db = BatchSessionLocal()
+    try:
+        inicio = time.perf_counter()
+        indices = refresh_answer_lookup(db)
+        logger.info(f"🔎 Autocompletado: {indices} índices rehechos ({time.perf_counter() - inicio:.2f}s)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error rehaciendo el autocompletado: {str(e)}")
+    finally:
+        db.close()
+
+
+def response_rollups_rebuild_task():
+    """Rehace los rollups diarios de respuestas.
+
+    El día a día los mantiene al escribir respuestas y aprobaciones, y las
+    respuestas nuevas de otro backend se suman al leer; esto recoge lo que ese
+    otro backend haya EDITADO (estados, aprobaciones).
+    """
+    db = BatchSessionLocal()
+    try:
+        inicio = time.perf_counter()
+        filas = rebuild_rollups(db)
+        logger.info(f"📊 Rollups de respuestas reconstruidos: {filas} filas ({time.perf_counter() - inicio:.2f}s)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error reconstruyendo los rollups de respuestas: {str(e)}")
+    finally:
+        db.close()
+
+
+def change_events_prune_task():
+    """Purga los eventos del feed de cambios ya entregables de hace más de 30 días."""
+    db = BatchSessionLocal()
+    try:
+        borrados = prune_change_events(db)
+        logger.info(f"🧹 Feed de cambios: {borrados} eventos purgados")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error purgando el feed de cambios: {str(e)}")
+    finally:
+        db.close()
+
+
+def token_counters_compact_task():
+    """Suma a los contadores de tokens los deltas que dejaron los triggers."""
+    db = BatchSessionLocal()
+    try:
+        token_counters.compactar(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error compactando los contadores de tokens: {str(e)}")
+    finally:
+        db.close()
+
+
+def token_counters_reconcile_task():
+    """Vuelve a contar usuarios, formatos, movimientos y vínculos de verdad."""
+    db = BatchSessionLocal()
+    try:
+        conteos = token_counters.reconciliar(db)
+        logger.info(f"🪙 Contadores de tokens reconciliados: {conteos}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error reconciliando los contadores de tokens: {str(e)}")
+    finally:
+        db.close()
+
+
 # Configurar el scheduler
 scheduler = BackgroundScheduler()
 
@@ -429,6 +564,60 @@ if _LEGACY_REMINDERS_ON:
 else:
     logger.info("[M10] Recordatorios heredados APAGADOS — cutover al Acompañante de ArIA.")
 
+# Bandeja de aprobación (3:00 AM). No es un recordatorio: va fuera del flag M10.
+scheduler.add_job(
+    approval_inbox_rebuild_task,
+    "cron",
+    hour=3,
+    minute=0,
+    id="approval_inbox_rebuild_task"
+)
+
+# Autocompletado desde respuestas (3:30 AM). Tampoco es un recordatorio.
+scheduler.add_job(
+    answer_lookup_refresh_task,
+    "cron",
+    hour=3,
+    minute=30,
+    id="answer_lookup_refresh_task"
+)
+
+# Rollups de /responses/aggregate (3:45 AM). Tampoco es un recordatorio.
+scheduler.add_job(
+    response_rollups_rebuild_task,
+    "cron",
+    hour=3,
+    minute=45,
+    id="response_rollups_rebuild_task"
+)
+
+# Purga del feed de cambios (4:15 AM).
+scheduler.add_job(
+    change_events_prune_task,
+    "cron",
+    hour=4,
+    minute=15,
+    id="change_events_prune_task"
+)
+
+# Contadores de /tokens: compactación cada 10 minutos, conteo real a las 4:30 AM.
+scheduler.add_job(
+    token_counters_compact_task,
+    "interval",
+    minutes=10,
+    id="token_counters_compact_task"
+)
+scheduler.add_job(
+    token_counters_reconcile_task,
+    "cron",
+    hour=4,
+    minute=30,
+    id="token_counters_reconcile_task"
+)
+
+# Duración de cada job para /metrics.
+scheduler.add_listener(metrics.scheduler_listener, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
 # Iniciar el scheduler
 scheduler.start()
 
@@ -0,0 +1,38 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Índice del autocompletado desde respuestas (2026-10-19)
+--
+-- GET /questions/question-table-relation/answers/{question_id} armaba las
+-- opciones de los campos con relación de tabla (pregunta relacionada) o con
+-- condición de filtro cargando TODAS las respuestas de los formatos de origen
+-- y reconstruyendo sus filas en cada llamada. Ahora quedan armadas aquí, una
+-- fila por opción, y el endpoint acepta ?q= (prefijo) y ?page=&page_size=.
+--
+-- Las mantiene el backend (app/core/answer_lookup.py):
+--   · cada pregunta se arma sola la primera vez que alguien la lee;
+--   · se actualiza al escribir answers y al llegar respuestas nuevas;
+--   · cada noche a las 3:30 se rehacen (answer_lookup_refresh_task).
+-- No hace falta poblarlas a mano. Nadie más debe escribir aquí.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS answer_lookup_entries (
+    id           BIGSERIAL PRIMARY KEY,
+    question_id  BIGINT NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    response_id  BIGINT NOT NULL REFERENCES responses(id) ON DELETE CASCADE,
+    row_index    INTEGER NOT NULL,
+    value        TEXT NOT NULL,
+    correlations TEXT NOT NULL DEFAULT '{}',
+
+    CONSTRAINT uq_answer_lookup_entry UNIQUE (question_id, response_id, row_index)
+);
+
+-- Búsqueda por prefijo sin distinguir mayúsculas.
+CREATE INDEX IF NOT EXISTS ix_answer_lookup_prefix
+    ON answer_lookup_entries (question_id, lower(value) text_pattern_ops);
+
+CREATE TABLE IF NOT EXISTS answer_lookup_sources (
+    question_id      BIGINT PRIMARY KEY REFERENCES questions(id) ON DELETE CASCADE,
+    last_response_id BIGINT NOT NULL DEFAULT 0,
+    built_at         TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,28 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Búsqueda de texto en respuestas (2026-10-19)
+--
+-- POST /responses/search con text_match hacía answer_text ILIKE '%...%' sobre
+-- TODA la tabla answers. Ahora compara f_unaccent(lower(answer_text)) —sin
+-- mayúsculas ni tildes— y este índice trigram resuelve el LIKE '%...%' sin
+-- recorrerla (app/core/answer_search.py).
+--
+-- unaccent() no es IMMUTABLE y no sirve en un índice; f_unaccent es el
+-- envoltorio inmutable de siempre. El backend usa f_unaccent: sin esta
+-- migración la búsqueda falla.
+--
+-- El índice se crea CONCURRENTLY para no bloquear escrituras en answers:
+-- correr FUERA de una transacción (psql normal, sin BEGIN).
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION public.f_unaccent(text)
+    RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_answers_text_trgm
+    ON answers USING gin (public.f_unaccent(lower(answer_text)) gin_trgm_ops);
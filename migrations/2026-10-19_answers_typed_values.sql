@@ -0,0 +1,29 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Copias tipadas de las respuestas: answers.value_num / answers.value_date
+-- (2026-10-19)
+--
+-- Los filtros >, <, >=, <= del listado de formatos comparaban answer_text como
+-- texto ("100" < "20"). Ahora comparan estas columnas, y los totales de
+-- movimientos y las agregaciones sum/avg de /responses/aggregate las leen de
+-- la BD. Las llena el backend al escribir cada answer (app/models.py,
+-- _set_answer_typed_values); NULL si la respuesta no es número / fecha ISO.
+--
+-- DESPUÉS de aplicar, rellenar las answers existentes (por lotes, se puede
+-- cortar y retomar):
+--     python -m app.core.answer_values
+--
+-- Los índices se crean CONCURRENTLY: correr FUERA de una transacción.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+ALTER TABLE answers ADD COLUMN IF NOT EXISTS value_num  NUMERIC;
+ALTER TABLE answers ADD COLUMN IF NOT EXISTS value_date DATE;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_answers_question_value_num
+    ON answers (question_id, value_num)
+    WHERE value_num IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_answers_question_value_date
+    ON answers (question_id, value_date)
+    WHERE value_date IS NOT NULL;
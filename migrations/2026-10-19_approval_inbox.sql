@@ -0,0 +1,33 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Bandeja de aprobación precalculada (2026-10-19)
+--
+-- GET /forms/user/assigned-forms-with-responses recorría TODAS las respuestas
+-- de TODOS los formatos del aprobador para decidir a cuáles ya les tocaba su
+-- turno. Ahora eso lo guarda esta tabla: una fila por (respuesta,
+-- participante) al que ya le llegó, con la aprobación que manda para él.
+--
+-- La mantiene el backend (app/core/approval_inbox.py) en la misma transacción
+-- que escribe response_approvals. Nadie más debe escribir aquí.
+--
+-- DESPUÉS de aplicar, poblarla UNA vez (y cuando haga falta reconciliar):
+--     python -m app.core.approval_inbox
+-- Además corre sola cada noche a las 3:00 (approval_inbox_rebuild_task).
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS approval_inbox (
+    id                   BIGSERIAL PRIMARY KEY,
+    response_id          BIGINT NOT NULL REFERENCES responses(id) ON DELETE CASCADE,
+    user_id              BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    response_approval_id BIGINT NOT NULL REFERENCES response_approvals(id) ON DELETE CASCADE,
+    form_id              BIGINT NOT NULL REFERENCES forms(id) ON DELETE CASCADE,
+    submitted_at         TIMESTAMPTZ NOT NULL,
+    approval_status      approvalstatus NOT NULL,
+    participant_role     VARCHAR(20) NOT NULL DEFAULT 'approver',
+
+    CONSTRAINT uq_approval_inbox_response_user UNIQUE (response_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_approval_inbox_user_submitted
+    ON approval_inbox (user_id, submitted_at, id);
@@ -0,0 +1,38 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Feed de cambios para los consumidores de ArIA: change_events (2026-10-19)
+--
+-- El Analista y Seguridad sondeaban /responses/aggregate,
+-- /security/auth-events y /tokens/* y releían todo en cada vuelta. Ahora cada
+-- respuesta, aprobación, evento de autenticación y usuario creado, editado o
+-- borrado deja aquí una fila, en la misma transacción que el cambio, y
+-- GET /security/changes?after=<cursor> entrega lo posterior, por lotes.
+--
+-- El cursor es `seq`, no `id`: se asigna después del commit, en orden, con
+-- change_events_cursor_seq (ver app/core/change_feed.py). Mientras sea NULL
+-- el evento no se entrega.
+--
+-- La escribe solo el backend. Cada noche a las 4:15 se purgan los eventos de
+-- más de 30 días (change_events_prune_task).
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE SEQUENCE IF NOT EXISTS change_events_cursor_seq;
+
+CREATE TABLE IF NOT EXISTS change_events (
+    id         BIGSERIAL PRIMARY KEY,
+    seq        BIGINT UNIQUE,
+    topic      VARCHAR(20) NOT NULL,
+    action     VARCHAR(10) NOT NULL,
+    entity_id  BIGINT NOT NULL,
+    payload    TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Lo que falta secuenciar (casi siempre unas pocas filas).
+CREATE INDEX IF NOT EXISTS ix_change_events_pending
+    ON change_events (id) WHERE seq IS NULL;
+
+-- Para la purga por fecha.
+CREATE INDEX IF NOT EXISTS ix_change_events_created_at
+    ON change_events (created_at);
@@ -0,0 +1,16 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Aprobaciones vencidas en una sola consulta (2026-10-19)
+--
+-- `crud.get_response_details_logic` (tarea diaria de las 7:00) ya no recorre
+-- todas las respuestas: calcula el plazo acumulado de cada cadena con una
+-- función de ventana y solo mira las cadenas que tienen algún paso pendiente.
+--
+-- Este índice parcial es el que encuentra esas cadenas: los pasos pendientes
+-- son una fracción pequeña de response_approvals, que crece para siempre.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE INDEX IF NOT EXISTS ix_response_approvals_pendientes
+    ON response_approvals (response_id)
+    WHERE status = 'pendiente';
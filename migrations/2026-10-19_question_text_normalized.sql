@@ -0,0 +1,31 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Texto normalizado de las preguntas: questions.text_normalized (2026-10-19)
+--
+-- GET /questions/check-text (validación en vivo) y la regla de "no repetir
+-- question_text" al crear/editar preguntas y al aprobar solicitudes de campo
+-- leían TODA la tabla questions y normalizaban cada texto en Python. Ahora
+-- comparan esta columna (sin acentos, minúsculas, espacios colapsados) con un
+-- índice. La llena el backend al escribir cada pregunta (app/models.py,
+-- _set_question_text_normalized).
+--
+-- El índice trigram alimenta /questions/check-text?similar=true (preguntas
+-- parecidas, posibles duplicados). Requiere pg_trgm, que ya crea
+-- 2026-10-19_answer_text_search.sql.
+--
+-- DESPUÉS de aplicar, rellenar las preguntas existentes:
+--     python -m app.core.question_text
+--
+-- Los índices se crean CONCURRENTLY: correr FUERA de una transacción.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS text_normalized VARCHAR(255);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_text_normalized
+    ON questions (text_normalized);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_text_normalized_trgm
+    ON questions USING gin (text_normalized gin_trgm_ops);
@@ -0,0 +1,29 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Fecha de envío guardada en las reglas de recordatorio (2026-10-19)
+--
+-- La tarea de las 15:29 (`crud.get_pending_notification_rules`) cargaba TODAS
+-- las reglas habilitadas y calculaba en Python `date_notification - time_alert`
+-- para quedarse con las pocas de hoy. Ahora ese día queda guardado en
+-- `notify_on` al escribir la regla y la tarea lo pide por índice.
+--
+-- La mantiene un trigger (también ante escrituras del otro backend), con una
+-- sola zona horaria: ver 2026-10-19_relation_question_rule_notify_on_trigger.sql,
+-- que va después de esta.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+ALTER TABLE relation_question_rule
+    ADD COLUMN IF NOT EXISTS notify_on DATE NULL;
+
+-- Backfill. time_alert es texto: solo se convierten los que son un entero; el
+-- resto queda NULL igual que antes (la tarea los descartaba por ValueError).
+UPDATE relation_question_rule
+   SET notify_on = date_notification::date - trim(time_alert)::int
+ WHERE notify_on IS NULL
+   AND date_notification IS NOT NULL
+   AND time_alert ~ '^\s*-?\d+\s*$';
+
+CREATE INDEX IF NOT EXISTS ix_relation_question_rule_notify_on
+    ON relation_question_rule (notify_on)
+    WHERE enabled;
@@ -0,0 +1,43 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- notify_on de las reglas de recordatorio, mantenido por trigger (2026-10-19)
+--
+-- Va DESPUÉS de 2026-10-19_relation_question_rule_notify_on.sql.
+--
+-- notify_on lo calculaba este backend al escribir la regla por el ORM. Si el
+-- otro backend (o SQL a mano) cambiaba date_notification o time_alert de una
+-- regla existente, notify_on quedaba con el día viejo y el recordatorio no
+-- salía. Además había tres formas de sacar "el día" de date_notification
+-- (zona del servidor, zona de la sesión de la BD, la del driver), que en la
+-- noche pueden dar días distintos.
+--
+-- Ahora lo calcula la BD en cada INSERT y en cada UPDATE de esas columnas,
+-- venga de donde venga, siempre en hora de Colombia (America/Bogota): la
+-- misma zona con la que la tarea diaria calcula "hoy"
+-- (models.RULE_TIMEZONE, crud.get_pending_notification_rules).
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+-- time_alert es texto: solo cuenta si es un entero (días antes) de hasta 4
+-- cifras. Si no, o si falta la fecha, NULL: la regla no se envía (la tarea la
+-- descartaba igual). Sin ese tope, un número largo hacía fallar el guardado
+-- de la regla (no cabe en int) y uno grande daba una fecha antes de Cristo
+-- que Python no puede leer.
+CREATE OR REPLACE FUNCTION relation_question_rule_notify_on() RETURNS trigger AS $$
+BEGIN
+    NEW.notify_on := CASE
+        WHEN NEW.date_notification IS NOT NULL AND NEW.time_alert ~ '^\s*-?\d{1,4}\s*$'
+        THEN (NEW.date_notification AT TIME ZONE 'America/Bogota')::date - trim(NEW.time_alert)::int
+    END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS relation_question_rule_notify_on ON relation_question_rule;
+CREATE TRIGGER relation_question_rule_notify_on
+    BEFORE INSERT OR UPDATE OF date_notification, time_alert ON relation_question_rule
+    FOR EACH ROW EXECUTE FUNCTION relation_question_rule_notify_on();
+
+-- Recalcular todas con la misma zona (el backfill anterior usaba la de la
+-- sesión). El trigger hace el cálculo.
+UPDATE relation_question_rule SET date_notification = date_notification;
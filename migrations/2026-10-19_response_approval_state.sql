@@ -0,0 +1,30 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Estado precalculado de la cadena de aprobación (2026-10-19)
+--
+-- Quién sigue, si la cadena terminó y si quedó rechazada se recalculaba en
+-- cada aprobación, en cada correo de "pendiente" y en cada validación de
+-- requisitos con línea de aprobación, cada vez con su propia versión de las
+-- reglas. Ahora se guarda aquí: una fila por respuesta con aprobaciones.
+--
+-- La mantiene el backend (app/core/approval_inbox.py) junto con
+-- approval_inbox, en la misma transacción que escribe response_approvals.
+-- Nadie más debe escribir aquí.
+--
+-- DESPUÉS de aplicar, poblarla UNA vez (rehace también la bandeja):
+--     python -m app.core.approval_inbox
+-- Para ver qué estados no coinciden con la cadena real, sin tocar nada:
+--     python -m app.core.approval_inbox --check
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS response_approval_states (
+    response_id     BIGINT PRIMARY KEY REFERENCES responses(id) ON DELETE CASCADE,
+    current_step    INTEGER,
+    next_user_ids   TEXT NOT NULL DEFAULT '[]',
+    total_approvers INTEGER NOT NULL DEFAULT 0,
+    approved_count  INTEGER NOT NULL DEFAULT 0,
+    is_complete     BOOLEAN NOT NULL DEFAULT FALSE,
+    is_rejected     BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
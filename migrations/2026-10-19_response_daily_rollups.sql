@@ -0,0 +1,46 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Rollups diarios de respuestas (2026-10-19)
+--
+-- POST /responses/aggregate (ArIA) y GET /responses/aggregate (conteo semanal
+-- del Analista) agrupaban TODA la tabla responses en cada llamada, y el
+-- promedio de horas de aprobación además agrupaba toda response_approvals.
+-- Ahora count y avg_approval_hours salen de aquí: una fila por (formato,
+-- usuario, estado, día) con el conteo y la suma de segundos hasta la última
+-- revisión. sum/avg de una pregunta siguen yendo a las respuestas.
+--
+-- Las mantiene el backend (app/core/response_rollups.py):
+--   · se arman solas en la primera lectura (o: python -m app.core.response_rollups);
+--   · se actualizan al escribir respuestas y aprobaciones;
+--   · las respuestas nuevas de otro backend se suman al leer;
+--   · cada noche a las 3:45 se rehacen (response_rollups_rebuild_task).
+-- Nadie más debe escribir aquí.
+--
+-- El índice por submitted_at sirve los dos días de borde de un rango de fechas
+-- (se leen de responses). Va CONCURRENTLY: correr FUERA de una transacción.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS response_daily_rollups (
+    form_id            BIGINT NOT NULL REFERENCES forms(id) ON DELETE CASCADE,
+    user_id            BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status             VARCHAR(20) NOT NULL,
+    day                DATE NOT NULL,
+    responses          INTEGER NOT NULL DEFAULT 0,
+    reviewed_responses INTEGER NOT NULL DEFAULT 0,
+    approval_seconds   NUMERIC NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (form_id, user_id, status, day)
+);
+
+CREATE INDEX IF NOT EXISTS ix_response_daily_rollups_day
+    ON response_daily_rollups (day);
+
+CREATE TABLE IF NOT EXISTS response_rollup_state (
+    id               SMALLINT PRIMARY KEY,
+    last_response_id BIGINT NOT NULL DEFAULT 0,
+    built_at         TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_responses_submitted_at
+    ON responses (submitted_at);
@@ -0,0 +1,23 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Índices parciales de diligenciamientos (2026-10-19)
+--
+-- Toda consulta ORM de `Response` lleva `parent_response_id IS NULL` (las
+-- respuestas de aprobador no cuentan, ver app/core/response_scope.py), y la
+-- tabla no tenía índice ni por formato ni por usuario: cada listado, conteo o
+-- export de un formato recorría la tabla completa. Con el mismo predicado del
+-- filtro, estos índices dejan el filtro gratis y solo traen las filas del
+-- formato (o del usuario) en orden de id.
+--
+-- Los índices se crean CONCURRENTLY para no bloquear los envíos de
+-- respuestas: correr FUERA de una transacción.
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_responses_form_submissions
+    ON responses (form_id, id)
+    WHERE parent_response_id IS NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_responses_user_submissions
+    ON responses (user_id, id)
+    WHERE parent_response_id IS NULL;
@@ -0,0 +1,87 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Contadores de capacidad para /tokens (2026-10-19)
+--
+-- /tokens/summary hacía count(*) de users, forms, forms_movimientos y
+-- form_questions en cada llamada (cuatro recorridos completos). Ahora lee
+-- token_counters + la suma de token_counter_deltas, que sigue siendo exacta:
+--
+--   · los triggers de abajo agregan un delta (+n al insertar, -n al borrar)
+--     por sentencia, en la misma transacción del cambio. Cuentan también los
+--     borrados en bloque, el SQL a mano y el otro backend;
+--   · cada 10 minutos los deltas se suman al contador y se borran
+--     (token_counters_compact_task);
+--   · cada noche a las 4:30 se vuelve a contar de verdad
+--     (token_counters_reconcile_task).
+--
+-- Los contadores se llenan solos en la primera lectura de /tokens/summary
+-- (o: python -m app.core.token_counters).
+--
+-- Requiere Postgres 11+ (tablas de transición, EXECUTE FUNCTION).
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS token_counters (
+    entidad         VARCHAR(20) PRIMARY KEY,
+    cantidad        BIGINT      NOT NULL DEFAULT 0,
+    reconciliado_en TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT token_counters_entidad_valida
+        CHECK (entidad IN ('usuarios','formatos','movimientos','vinculos'))
+);
+
+CREATE TABLE IF NOT EXISTS token_counter_deltas (
+    id      BIGSERIAL   PRIMARY KEY,
+    entidad VARCHAR(20) NOT NULL,
+    delta   BIGINT      NOT NULL
+);
+
+-- Un delta por sentencia (no por fila): un borrado en bloque de 5.000
+-- vínculos deja una sola fila con -5000.
+CREATE OR REPLACE FUNCTION token_counter_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO token_counter_deltas (entidad, delta)
+        SELECT TG_ARGV[0], count(*) FROM nuevas HAVING count(*) > 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO token_counter_deltas (entidad, delta)
+        SELECT TG_ARGV[0], -count(*) FROM viejas HAVING count(*) > 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS token_counter_ins ON users;
+CREATE TRIGGER token_counter_ins AFTER INSERT ON users
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('usuarios');
+DROP TRIGGER IF EXISTS token_counter_del ON users;
+CREATE TRIGGER token_counter_del AFTER DELETE ON users
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('usuarios');
+
+DROP TRIGGER IF EXISTS token_counter_ins ON forms;
+CREATE TRIGGER token_counter_ins AFTER INSERT ON forms
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('formatos');
+DROP TRIGGER IF EXISTS token_counter_del ON forms;
+CREATE TRIGGER token_counter_del AFTER DELETE ON forms
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('formatos');
+
+DROP TRIGGER IF EXISTS token_counter_ins ON forms_movimientos;
+CREATE TRIGGER token_counter_ins AFTER INSERT ON forms_movimientos
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('movimientos');
+DROP TRIGGER IF EXISTS token_counter_del ON forms_movimientos;
+CREATE TRIGGER token_counter_del AFTER DELETE ON forms_movimientos
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('movimientos');
+
+DROP TRIGGER IF EXISTS token_counter_ins ON form_questions;
+CREATE TRIGGER token_counter_ins AFTER INSERT ON form_questions
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('vinculos');
+DROP TRIGGER IF EXISTS token_counter_del ON form_questions;
+CREATE TRIGGER token_counter_del AFTER DELETE ON form_questions
+    REFERENCING OLD TABLE AS viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION token_counter_delta('vinculos');
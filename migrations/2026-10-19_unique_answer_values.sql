@@ -0,0 +1,31 @@
+-- ═════════════════════════════════════════════════════════════════════════════
+-- Respuestas no repetidas con índice (2026-10-19)
+--
+-- GET /questions/{question_id}/answer-exists (validación en vivo de las
+-- preguntas con unique_answer) cargaba TODAS las respuestas de la pregunta y
+-- las normalizaba una por una en cada tecla. Ahora cada valor tomado queda
+-- aquí con llave (pregunta, md5 del valor normalizado): la consulta es una
+-- búsqueda por llave y la llave primaria impide que dos respuestas guarden el
+-- mismo valor a la vez (el guardado responde 409).
+--
+-- La mantiene el backend (app/core/unique_answers.py): al guardar answers y al
+-- marcar/desmarcar la pregunta. Solo guarda preguntas marcadas.
+--
+-- Después de crearla, poblarla UNA vez con lo ya registrado:
+--     python -m app.core.unique_answers
+-- (se puede volver a correr; gana la respuesta más antigua de cada valor).
+--
+-- PENDIENTE EN: local y prod.
+-- ═════════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS unique_answer_values (
+    question_id BIGINT NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    value_key   VARCHAR(32) NOT NULL,
+    response_id BIGINT NOT NULL REFERENCES responses(id) ON DELETE CASCADE,
+
+    PRIMARY KEY (question_id, value_key)
+);
+
+-- Para el ON DELETE CASCADE al borrar respuestas y para rehacer una respuesta.
+CREATE INDEX IF NOT EXISTS ix_unique_answer_values_response_id
+    ON unique_answer_values (response_id);
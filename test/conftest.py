@@ -0,0 +1,58 @@
+"""Fixtures comunes de las pruebas.
+
+Las que tocan la BD corren contra una de benchmarks ya sembrada (nombre con
+"bench"), la misma de benchmarks/flows.py:
+
+    DATABASE_URL=postgresql://.../forms_bench python -m benchmarks.bench_data --scale small
+    DATABASE_URL=postgresql://.../forms_bench python -m pytest test
+
+Sin esa BD, esas pruebas se saltan; las demás corren igual.
+
+Ninguna prueba manda correos: `no_smtp` reemplaza el envío en todas (una
+prueba del envío mismo lo anula definiendo su propio `no_smtp`).
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_smtp(monkeypatch):
+    from app.api.controllers import mail
+
+    monkeypatch.setattr(mail, "_send_msg", lambda msg: True)
+    monkeypatch.setattr(mail, "_send_msgs", lambda msgs: len(msgs))
+
+
+@pytest.fixture
+def max_queries():
+    """Techo de consultas SQL para un bloque; falla si lo pasa.
+
+        def test_algo(bench, max_queries):
+            headers = bench.headers(bench.admin)
+            with max_queries(5):
+                bench.client.get("/forms/1/form_design", headers=headers)
+    """
+    from app.core.query_stats import max_queries as _max_queries
+
+    return _max_queries
+
+
+@pytest.fixture(scope="session")
+def bench():
+    """`flows.Context` sobre la BD sembrada: cliente, sesión y usuarios de muestra."""
+    from sqlalchemy.exc import OperationalError, ProgrammingError
+
+    from app.database import SessionLocal, engine
+    from benchmarks import flows
+
+    if "bench" not in (engine.url.database or ""):
+        pytest.skip("DATABASE_URL no apunta a una BD de benchmarks")
+    db = SessionLocal()
+    try:
+        ctx = flows.Context(db)
+    except (flows.BenchError, OperationalError, ProgrammingError) as e:
+        db.close()
+        pytest.skip(f"BD de benchmarks no disponible o sin sembrar: {e}")
+    yield ctx
+    db.rollback()
+    db.close()
@@ -0,0 +1,133 @@
+"""Índice del autocompletado: se arma aparte de la petición y aguanta carreras."""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, select, text, update
+from sqlalchemy.exc import OperationalError
+
+from app.core import answer_lookup
+from app.database import BatchSessionLocal, SessionLocal
+from app.models import Answer, AnswerLookupEntry, FormQuestion, QuestionTableRelation, Response
+
+
+@pytest.fixture
+def source(bench):
+    """Una pregunta del formato de muestra relacionada con la más respondida."""
+    db = SessionLocal()
+    related_id = db.scalar(
+        select(Answer.question_id)
+        .join(Response, Response.id == Answer.response_id)
+        .where(Response.form_id == bench.form.id)
+        .group_by(Answer.question_id)
+        .order_by(func.count().desc(), Answer.question_id)
+        .limit(1)
+    )
+    question_id = db.scalar(
+        select(FormQuestion.question_id)
+        .where(FormQuestion.form_id == bench.form.id, FormQuestion.question_id != related_id)
+        .order_by(FormQuestion.question_id)
+        .limit(1)
+    )
+    relation = QuestionTableRelation(
+        question_id=question_id, related_question_id=related_id, name_table="answers",
+    )
+    db.add(relation)
+    db.commit()
+    try:
+        yield answer_lookup.lookup_source(db.connection(), question_id)
+    finally:
+        db.rollback()
+        db.delete(relation)
+        db.commit()
+        db.close()
+
+
+def _entries(db, question_id: int) -> int:
+    return db.scalar(
+        select(func.count()).select_from(AnswerLookupEntry).where(AnswerLookupEntry.question_id == question_id)
+    )
+
+
+def test_read_builds_in_its_own_session(bench, source):
+    txid = bench.db.scalar(text("SELECT txid_current()"))
+    try:
+        values, _, total, responses = answer_lookup.lookup_page(bench.db, source)
+        assert total == len(values) > 0 and responses > 0
+        assert bench.db.scalar(text("SELECT txid_current()")) == txid
+    finally:
+        bench.db.rollback()
+
+
+def test_concurrent_indexing_of_the_same_responses(bench, source):
+    ids = answer_lookup._source_response_ids(bench.db.connection(), source)
+    bench.db.rollback()
+    errors = []
+
+    def _second():
+        with BatchSessionLocal() as other:
+            try:
+                answer_lookup._index_responses(other.connection(), source, ids)
+                other.commit()
+            except Exception as e:
+                errors.append(e)
+
+    with BatchSessionLocal() as first:
+        expected = answer_lookup._index_responses(first.connection(), source, ids)
+        thread = threading.Thread(target=_second)
+        thread.start()
+        time.sleep(0.3)  # la segunda queda esperando las filas de la primera
+        first.commit()
+        thread.join()
+        assert not errors
+        assert _entries(first, source.question_id) == expected
+
+
+def test_refresh_keeps_the_index_and_picks_up_edits(bench, source):
+    answer_lookup.lookup_page(bench.db, source)
+    bench.db.rollback()
+    with BatchSessionLocal() as db:
+        before = _entries(db, source.question_id)
+        # Lo que dejaría otro backend al editar una respuesta ya indexada.
+        db.execute(
+            update(AnswerLookupEntry)
+            .where(AnswerLookupEntry.question_id == source.question_id)
+            .values(value="editado por otro backend")
+        )
+        db.commit()
+
+        assert answer_lookup.refresh_answer_lookup(db) >= 1
+        assert _entries(db, source.question_id) == before
+        assert not db.scalar(
+            select(func.count()).select_from(AnswerLookupEntry)
+            .where(AnswerLookupEntry.value == "editado por otro backend")
+        )
+
+
+def test_saves_take_the_source_row_before_the_entries(bench, source):
+    """Un guardado espera a quien rehace la pregunta (no al revés), y dos
+    guardados no se esperan entre sí."""
+    answer_lookup.lookup_page(bench.db, source)
+    bench.db.rollback()
+    response_ids = answer_lookup._source_response_ids(bench.db.connection(), source)[:2]
+    bench.db.rollback()
+
+    def _save(db, response_id):
+        db.execute(text("SET LOCAL lock_timeout = '1s'"))
+        db.add(Answer(response_id=response_id, question_id=source.value_question_id, answer_text="nuevo"))
+        db.flush()
+
+    with SessionLocal() as refresher, SessionLocal() as first, SessionLocal() as second:
+        try:
+            answer_lookup._lock_source(refresher.connection(), source.question_id)
+            with pytest.raises(OperationalError, match="lock timeout"):
+                _save(first, response_ids[0])
+            first.rollback()
+            refresher.rollback()
+
+            _save(first, response_ids[0])
+            _save(second, response_ids[1])
+        finally:
+            first.rollback()
+            second.rollback()
@@ -0,0 +1,64 @@
+"""Búsqueda en respuestas: sin tildes ni mayúsculas, y el fragmento resalta lo encontrado.
+
+Las pruebas contra la BD necesitan f_unaccent
+(migrations/2026-10-19_answer_text_search.sql); sin ella se saltan.
+"""
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.core import answer_search
+from app.database import SessionLocal
+from app.models import Answer, Response
+
+_TEXT = "Entrega en Medellín, bodega Núñez"
+
+
+def test_headline_uses_the_search_normalization():
+    sql = str(answer_search.headline("Medellín").compile(dialect=postgresql.dialect()))
+    # Documento y consulta van normalizados, igual que la comparación.
+    assert sql.count("f_unaccent(lower(") == 2
+    assert "f_unaccent(lower(answers.answer_text))" in sql
+
+
+@pytest.fixture
+def answer(bench):
+    db = SessionLocal()
+    if db.scalar(text("SELECT to_regprocedure('public.f_unaccent(text)')")) is None:
+        db.close()
+        pytest.skip("BD sin f_unaccent (migrations/2026-10-19_answer_text_search.sql)")
+    response_id = db.scalar(
+        select(Response.id).where(Response.form_id == bench.form.id).order_by(Response.id).limit(1)
+    )
+    question_id = db.scalar(select(Answer.question_id).where(Answer.response_id == response_id).limit(1))
+    row = Answer(response_id=response_id, question_id=question_id, answer_text=_TEXT)
+    db.add(row)
+    db.commit()
+    try:
+        yield row
+    finally:
+        db.execute(delete(Answer).where(Answer.id == row.id))
+        db.commit()
+        db.close()
+
+
+def test_match_ignores_accents_and_case(bench, answer):
+    found = bench.db.scalars(
+        select(Answer.id).where(answer_search.text_match_clause("MEDELLIN, bodega nunez"))
+    ).all()
+    assert answer.id in found
+    ranked = answer_search.ranked_matches("nunez medellin")
+    assert answer.response_id in bench.db.scalars(select(ranked.c.response_id)).all()
+    bench.db.rollback()
+
+
+def test_search_snippet_highlights_the_match(bench, answer):
+    result = bench.client.post(
+        "/responses/search",
+        headers=bench.headers(bench.admin),
+        json={"text_match": "nunez", "ranked": True, "form_id": bench.form.id},
+    ).json()
+    item = next(i for i in result["items"] if i["response_id"] == answer.response_id)
+    # "ñ" no la quita el stemmer: sin normalizar el fragmento no resaltaba nada.
+    assert "<b>nunez</b>" in item["snippet"]
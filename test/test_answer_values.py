@@ -0,0 +1,49 @@
+"""Copias tipadas de answer_text (value_num / value_date)."""
+
+from decimal import Decimal
+
+import pytest
+
+from app.models import answer_value_date, answer_value_num
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("100", Decimal("100")),
+    ("$ 1.234,56", Decimal("1234.56")),
+    ("12,5", Decimal("12.5")),
+    ("-3.75", Decimal("-3.75")),
+    ("1e3", Decimal("1000")),
+    ("abc", None),
+    ("", None),
+    (None, None),
+    ("NaN", None),
+    ("Infinity", None),
+])
+def test_answer_value_num(text, expected):
+    assert answer_value_num(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "1e999999",                 # exponente fuera de lo que guarda un numeric
+    "1e-999999",
+    "9" * 2000,                 # demasiados dígitos enteros
+    "0." + "1" * 2000,          # demasiados decimales
+])
+def test_answer_value_num_out_of_range(text):
+    assert answer_value_num(text) is None
+
+
+def test_answer_value_num_fits_in_postgres(bench):
+    """Lo más grande que se acepta cabe en el numeric de answers.value_num."""
+    from sqlalchemy import Numeric, cast, literal, select
+
+    for text in ("9" * 1000, "0." + "9" * 1000, "1e1000", "1e-1000"):
+        number = answer_value_num(text)
+        assert number is not None
+        assert bench.db.scalar(select(cast(literal(str(number)), Numeric))) == number
+
+
+def test_answer_value_date():
+    assert str(answer_value_date("2026-10-19T08:00:00")) == "2026-10-19"
+    assert answer_value_date("19/10/2026") is None
+    assert answer_value_date("2026-02-30") is None
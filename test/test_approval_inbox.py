@@ -0,0 +1,55 @@
+"""Bandeja y estado de la cadena: la reconstrucción no choca con una aprobación
+en curso, y leer el estado no recorta lo que devuelve la API."""
+
+from sqlalchemy import func, select, text
+
+from app.core.approval_inbox import check_approval_states, rebuild_approval_inbox
+from app.crud import validate_approval_line_completion
+from app.database import SessionLocal
+from app.models import ApprovalInbox, ApprovalStatus, ResponseApproval, ResponseApprovalState
+
+
+def test_rebuild_next_to_an_approval_in_progress(bench):
+    approving, rebuilding = SessionLocal(), SessionLocal()
+    try:
+        approval = approving.scalars(
+            select(ResponseApproval)
+            .where(ResponseApproval.status == ApprovalStatus.pendiente)
+            .order_by(ResponseApproval.id)
+            .limit(1)
+        ).first()
+        original = approval.status
+        before = approving.scalar(select(func.count()).select_from(ApprovalInbox))
+        # Sin commit: la aprobación y su bandeja quedan bloqueadas.
+        approval.status = ApprovalStatus.aprobado
+        approving.flush()
+
+        # Si la reconstrucción esperara esos bloqueos, fallaría aquí.
+        rebuilding.execute(text("SET lock_timeout = '2s'"))
+        assert rebuild_approval_inbox(rebuilding) > 0
+        approving.commit()
+
+        approval.status = original
+        approving.commit()
+        assert approving.scalar(select(func.count()).select_from(ApprovalInbox)) == before
+        assert check_approval_states(approving) == {}
+    finally:
+        approving.rollback()
+        approving.close()
+        rebuilding.rollback()
+        rebuilding.execute(text("RESET lock_timeout"))  # la conexión vuelve al pool
+        rebuilding.commit()
+        rebuilding.close()
+
+
+def test_complete_line_keeps_the_approver_detail(bench):
+    response_id = bench.db.scalar(
+        select(ResponseApprovalState.response_id)
+        .where(ResponseApprovalState.is_complete.is_(True), ResponseApprovalState.total_approvers > 0)
+        .order_by(ResponseApprovalState.response_id)
+        .limit(1)
+    )
+    result = validate_approval_line_completion(response_id, bench.db)
+    assert result["all_approved"]
+    assert len(result["approval_status"]) == result["total_approvers"] > 0
+    bench.db.rollback()
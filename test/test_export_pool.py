@@ -0,0 +1,26 @@
+"""Los exportes no toman conexiones del pool interactivo.
+
+Piden `get_export_db` (lotes o réplica) y autentican con `get_export_user`,
+sobre esa misma sesión. Un `get_db` en cualquier parte de sus dependencias
+deja una conexión interactiva ociosa durante todo el exporte.
+"""
+
+from fastapi.routing import APIRoute
+
+from app.core.read_replica import get_export_db
+from app.database import get_db
+
+
+def _calls(dependant):
+    for sub in dependant.dependencies:
+        yield sub.call
+        yield from _calls(sub)
+
+
+def test_exports_do_not_use_interactive_pool():
+    import main
+
+    exports = [route for route in main.app.routes
+               if isinstance(route, APIRoute) and get_export_db in set(_calls(route.dependant))]
+    assert exports
+    assert [route.path for route in exports if get_db in set(_calls(route.dependant))] == []
@@ -0,0 +1,24 @@
+"""Los endpoints del Home que guardan en caché leen del primario.
+
+`schedule_expansion.cached` guarda el resultado con la versión vigente del
+usuario; leído de una réplica atrasada quedaría viejo en caché hasta CACHE_TTL.
+"""
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app.core.read_replica import get_read_db
+
+
+def _calls(dependant):
+    for sub in dependant.dependencies:
+        yield sub.call
+        yield from _calls(sub)
+
+
+@pytest.mark.parametrize("path", ["/home/pending-forms", "/home/upcoming-events"])
+def test_cached_home_endpoints_read_the_primary(path):
+    import main
+
+    route = next(r for r in main.app.routes if isinstance(r, APIRoute) and r.path == path)
+    assert get_read_db not in set(_calls(route.dependant))
@@ -0,0 +1,34 @@
+"""Ningún endpoint `async def` usa la sesión síncrona de la BD.
+
+Bloquearía el event loop mientras dura la consulta. Ver app/core/loop_guard.py.
+"""
+
+from fastapi import Depends, FastAPI
+
+from app.core import loop_guard
+from app.database import get_db
+
+
+def test_no_async_routes_with_sync_session():
+    import main
+
+    assert loop_guard.blocking_routes(main.app) == []
+
+
+def test_blocking_routes_finds_async_db_route():
+    app = FastAPI()
+
+    def current_user(db=Depends(get_db)):
+        return None
+
+    @app.get("/sync")
+    def sync_route(db=Depends(get_db)):
+        return {}
+
+    @app.get("/async")
+    async def async_route(user=Depends(current_user)):
+        return {}
+
+    assert loop_guard.blocking_routes(app) == [
+        "GET /async → test.test_loop_guard.async_route"
+    ]
@@ -0,0 +1,81 @@
+"""Envío de correos en lote: cada mensaje cuenta por separado."""
+
+import smtplib
+from email.message import EmailMessage
+
+import pytest
+
+from app.api.controllers import mail
+
+
+class _FakeSMTP:
+    """SMTP_SSL de mentira: falla según el destinatario."""
+
+    connections = 0
+    sent = []
+
+    def __init__(self, host, port):
+        type(self).connections += 1
+        self.alive = True
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("conexión cerrada")
+        to = msg["To"]
+        if to.startswith("rechazado"):
+            raise smtplib.SMTPDataError(554, b"rechazado")
+        if to.startswith("corte"):
+            self.alive = False
+            raise smtplib.SMTPServerDisconnected("se cayó")
+        type(self).sent.append(to)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def no_smtp():
+    """Aquí se prueba el envío: sin el reemplazo de conftest."""
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    _FakeSMTP.connections = 0
+    _FakeSMTP.sent = []
+    monkeypatch.setattr(mail.smtplib, "SMTP_SSL", _FakeSMTP)
+    monkeypatch.setattr(mail, "MAIL_PORT_ALT", "465")
+    return _FakeSMTP
+
+
+def _msg(to: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["To"] = to
+    msg.set_content("hola")
+    return msg
+
+
+def test_rejected_message_does_not_abort_batch(fake_smtp):
+    msgs = [_msg("a@x.co"), _msg("rechazado@x.co"), _msg("b@x.co")]
+    assert mail._send_msgs(msgs) == 2
+    assert fake_smtp.sent == ["a@x.co", "b@x.co"]
+    assert fake_smtp.connections == 1
+
+
+def test_disconnect_reconnects_and_continues(fake_smtp):
+    msgs = [_msg("a@x.co"), _msg("corte@x.co"), _msg("b@x.co"), _msg("c@x.co")]
+    assert mail._send_msgs(msgs) == 3
+    # El mensaje en curso al cortarse no se reenvía.
+    assert fake_smtp.sent == ["a@x.co", "b@x.co", "c@x.co"]
+    assert fake_smtp.connections == 2
+
+
+def test_reconnects_are_bounded(fake_smtp):
+    msgs = [_msg(f"corte{i}@x.co") for i in range(10)]
+    assert mail._send_msgs(msgs) == 0
+    assert fake_smtp.connections == 1 + mail._SMTP_RECONNECTS
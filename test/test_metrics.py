@@ -0,0 +1,67 @@
+"""MetricsMiddleware: etiqueta por plantilla de ruta, estado y tiempo del streaming."""
+
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.metrics import MetricsMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/metrics-test/stream")
+    def stream():
+        def body():
+            yield b"a"
+            time.sleep(0.3)
+            yield b"b"
+        return StreamingResponse(body())
+
+    return app
+
+
+def _sample(name: str, route: str, status: str):
+    return REGISTRY.get_sample_value(
+        name, {"method": "GET", "route": route, "status": status}
+    ) or 0
+
+
+def test_route_template_and_status():
+    client = TestClient(_app())
+    before = _sample("http_request_duration_seconds_count", "/metrics-test/items/{item_id}", "200")
+    client.get("/metrics-test/items/1")
+    client.get("/metrics-test/items/2")
+    after = _sample("http_request_duration_seconds_count", "/metrics-test/items/{item_id}", "200")
+    assert after - before == 2
+
+    before = _sample("http_request_duration_seconds_count", "<sin ruta>", "404")
+    client.get("/metrics-test/no-existe")
+    assert _sample("http_request_duration_seconds_count", "<sin ruta>", "404") - before == 1
+
+
+def test_streaming_is_timed_to_the_end():
+    client = TestClient(_app())
+    before = _sample("http_request_duration_seconds_sum", "/metrics-test/stream", "200")
+    assert client.get("/metrics-test/stream").content == b"ab"
+    assert _sample("http_request_duration_seconds_sum", "/metrics-test/stream", "200") - before >= 0.3
+
+
+def test_every_pool_is_instrumented(bench):
+    import main  # noqa: F401  (instrumenta los pools al importarse)
+    from app.database import all_engines, batch_engine
+
+    names = {e.logging_name for e in all_engines}
+    assert "forms_db_batch" in names
+    before = REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"pool": "forms_db_batch"}) or 0
+    with batch_engine.connect():
+        assert REGISTRY.get_sample_value("db_pool_checked_out", {"pool": "forms_db_batch"}) >= 1
+    assert REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"pool": "forms_db_batch"}) == before + 1
@@ -0,0 +1,15 @@
+"""La pila de middlewares de main.app es ASGI pura.
+
+BaseHTTPMiddleware (`@app.middleware("http")`) crea una tarea y un stream
+intermedio por request y parte las respuestas en streaming: ver
+app/core/security_headers.py.
+"""
+
+from starlette.middleware.base import BaseHTTPMiddleware
+
+
+def test_no_base_http_middleware():
+    import main
+
+    wrapped = [m.cls.__name__ for m in main.app.user_middleware if issubclass(m.cls, BaseHTTPMiddleware)]
+    assert wrapped == []
@@ -0,0 +1,65 @@
+"""notify_on de las reglas de recordatorio: lo mantiene la BD, en hora de Colombia."""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import pytz
+from sqlalchemy import select, text
+
+from app import crud
+from app.models import RULE_TIMEZONE, Question, RelationQuestionRule, Response
+
+
+@pytest.fixture
+def rule_factory(bench):
+    db = bench.db
+    response = db.scalar(select(Response).where(Response.form_id == bench.form.id).limit(1))
+    question_id = db.scalar(select(Question.id).limit(1))
+
+    def make(date_notification, time_alert="2"):
+        rule = RelationQuestionRule(
+            id_form=response.form_id, id_question=question_id, id_response=response.id,
+            date_notification=date_notification, time_alert=time_alert, enabled=True,
+        )
+        db.add(rule)
+        db.flush()
+        return rule
+
+    yield make
+    db.rollback()
+
+
+def test_notify_on_uses_colombian_day(bench, rule_factory):
+    # 03:00 UTC del 20 son las 22:00 del 19 en Bogotá.
+    rule = rule_factory(datetime(2026, 10, 20, 3, 0, tzinfo=timezone.utc))
+    assert rule.notify_on == date(2026, 10, 17)
+
+
+def test_notify_on_follows_writes_outside_the_orm(bench, rule_factory):
+    rule = rule_factory(datetime(2026, 10, 20, 15, 0, tzinfo=timezone.utc))
+    bench.db.execute(text(
+        "UPDATE relation_question_rule SET date_notification = '2026-11-05 12:00+00', time_alert = '3' "
+        "WHERE id = :id"), {"id": rule.id})
+    bench.db.refresh(rule)
+    assert rule.notify_on == date(2026, 11, 2)
+
+    bench.db.execute(text("UPDATE relation_question_rule SET time_alert = 'mañana' WHERE id = :id"),
+                     {"id": rule.id})
+    bench.db.refresh(rule)
+    assert rule.notify_on is None
+
+
+@pytest.mark.parametrize("time_alert", ["99999999999", "2000000", "-10000"])
+def test_out_of_range_time_alert_is_ignored(bench, rule_factory, time_alert):
+    rule = rule_factory(datetime(2026, 10, 20, 15, 0, tzinfo=timezone.utc), time_alert)
+    bench.db.refresh(rule)
+    assert rule.notify_on is None
+
+
+def test_pending_rules_are_today_in_rule_timezone(bench, rule_factory):
+    now = datetime.now(pytz.timezone(RULE_TIMEZONE))
+    due = rule_factory(now + timedelta(days=2), "2")
+    later = rule_factory(now + timedelta(days=3), "2")
+    sent = {n["rule_id"]: n for n in crud.get_pending_notification_rules(bench.db)}
+    assert due.id in sent and later.id not in sent
+    assert sent[due.id]["days_remaining"] == 2
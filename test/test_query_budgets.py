@@ -0,0 +1,37 @@
+"""Techos de consultas SQL por endpoint.
+
+Si una de estas falla, algo agregó consultas (muchas veces un N+1 en un
+bucle): el mensaje trae la sentencia más repetida. Si el aumento es a
+propósito, subir el techo en el mismo cambio.
+
+Ruta y cabeceras se arman antes del bloque: los objetos de `bench` pueden
+venir expirados de otra prueba y recargarlos también contaría.
+"""
+
+import pytest
+
+
+def _get(bench, path: str, user, **params):
+    headers = bench.headers(user)
+    return lambda: bench.client.get(path, headers=headers, params=params)
+
+
+@pytest.mark.parametrize("audience, limit", [(None, 3), ("fill", 4), ("approve", 4), ("view", 4)])
+def test_form_design(bench, max_queries, audience, limit):
+    params = {"audience": audience} if audience else {}
+    request = _get(bench, f"/forms/{bench.form.id}/form_design", bench.admin, **params)
+    with max_queries(limit):
+        assert request().status_code == 200
+
+
+def test_home_pending_forms(bench, max_queries):
+    request = _get(bench, "/home/pending-forms", bench.filler)
+    with max_queries(2):
+        assert request().status_code == 200
+
+
+def test_max_queries_reports_excess(bench, max_queries):
+    request = _get(bench, f"/forms/{bench.form.id}/form_design", bench.admin, audience="fill")
+    with pytest.raises(AssertionError, match="consultas \\(máximo 1\\)"):
+        with max_queries(1):
+            request()
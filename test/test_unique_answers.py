@@ -0,0 +1,63 @@
+"""Preguntas "no repetidas": un valor ya registrado vuelve como 409 en todos los guardados."""
+
+import pytest
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import Answer, Question, Response
+
+
+@pytest.fixture
+def taken(bench):
+    """(pregunta marcada, valor ya registrado, otra respuesta del formato sin ese valor)."""
+    db = SessionLocal()
+    question_id, value = db.execute(
+        select(Answer.question_id, Answer.answer_text)
+        .join(Response, Response.id == Answer.response_id)
+        .where(Response.form_id == bench.form.id, Answer.answer_text.is_not(None), Answer.answer_text != "")
+        .order_by(Answer.id)
+        .limit(1)
+    ).one()
+    other_id = db.scalar(
+        select(Response.id)
+        .where(
+            Response.form_id == bench.form.id,
+            Response.parent_response_id.is_(None),
+            ~select(Answer.id).where(
+                Answer.response_id == Response.id,
+                Answer.question_id == question_id,
+                func.lower(Answer.answer_text) == value.lower(),
+            ).exists(),
+        )
+        .order_by(Response.id)
+        .limit(1)
+    )
+    question = db.get(Question, question_id)
+    was_unique = question.unique_answer
+    question.unique_answer = True
+    db.commit()
+    try:
+        yield question_id, value, other_id
+    finally:
+        question.unique_answer = was_unique
+        db.commit()
+        db.close()
+
+
+def test_create_answers_returns_409(bench, taken):
+    question_id, value, other_id = taken
+    headers = bench.headers(bench.admin)
+    before = bench.db.scalar(select(func.count()).select_from(Answer).where(Answer.response_id == other_id))
+    bench.db.rollback()
+
+    response = bench.client.post(
+        "/responses/create-answers",
+        headers=headers,
+        params={"response_id": other_id, "question_id": question_id, "answer_text": value},
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"]["question_id"] == question_id
+    assert bench.db.scalar(
+        select(func.count()).select_from(Answer).where(Answer.response_id == other_id)
+    ) == before
+    bench.db.rollback()